@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import numpy as np
+
+from webviz_subsurface._providers.ensemble_grid_provider._grid_property_statistics import (
+    calc_property_statistics_chunked,
+)
+from webviz_subsurface._providers.ensemble_grid_provider._grid_property_store import (
+    GridPropertyStore,
+)
+from webviz_subsurface._providers.ensemble_grid_provider.ensemble_grid_provider import (
+    GridPropertyStatistic,
+    StatisticalGridPropertyAddress,
+)
+
+
+def test_chunked_statistics_match_numpy() -> None:
+    rng = np.random.default_rng(seed=1234)
+    stacked = rng.normal(0.25, 0.05, size=(20, 1000)).astype(np.float32)
+    stacked[:, 10] = np.nan
+
+    # A chunk size that doesn't divide the number of cells evenly
+    results = calc_property_statistics_chunked(
+        list(GridPropertyStatistic), list(stacked), chunk_size_bytes=20 * 4 * 64
+    )
+
+    assert results is not None
+    expected = {
+        GridPropertyStatistic.MEAN: np.mean(stacked, axis=0, dtype=np.float64),
+        GridPropertyStatistic.STDDEV: np.std(stacked, axis=0, dtype=np.float64),
+        GridPropertyStatistic.MINIMUM: np.min(stacked, axis=0),
+        GridPropertyStatistic.MAXIMUM: np.max(stacked, axis=0),
+        GridPropertyStatistic.P10: np.percentile(stacked, 10, axis=0),
+        GridPropertyStatistic.P90: np.percentile(stacked, 90, axis=0),
+    }
+    for stat, expected_values in expected.items():
+        assert results[stat].dtype == np.float32
+        np.testing.assert_allclose(results[stat], expected_values, rtol=1e-6)
+        assert np.isnan(results[stat][10])
+
+
+def test_chunked_statistics_with_different_cell_counts() -> None:
+    assert (
+        calc_property_statistics_chunked(
+            [GridPropertyStatistic.MEAN], [np.zeros(10), np.zeros(12)]
+        )
+        is None
+    )
+
+
+def test_statistics_are_keyed_by_realization_set(tmp_path: Path) -> None:
+    store = GridPropertyStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    address = StatisticalGridPropertyAddress(
+        property_name="PORO",
+        datestr=None,
+        statistic=GridPropertyStatistic.P90,
+        realizations=[2, 0, 1, 1],
+    )
+    store.store_statistic("ens__abc", "v1", address, np.arange(5.0))
+
+    same_set = StatisticalGridPropertyAddress(
+        property_name="PORO",
+        datestr=None,
+        statistic=GridPropertyStatistic.P90,
+        realizations=[0, 1, 2],
+    )
+    other_set = StatisticalGridPropertyAddress(
+        property_name="PORO",
+        datestr=None,
+        statistic=GridPropertyStatistic.P90,
+        realizations=[0, 1],
+    )
+    np.testing.assert_array_equal(
+        store.fetch_statistic("ens__abc", "v1", same_set), np.arange(5.0)
+    )
+    assert store.fetch_statistic("ens__abc", "v1", other_set) is None
@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+from webviz_subsurface._providers.ensemble_grid_provider._grid_property_store import (
+    GridPropertyStore,
+    _compose_property_key,
+)
+
+
+def test_get_or_create_only_creates_once(tmp_path: Path) -> None:
+    store = GridPropertyStore(tmp_path, max_size_bytes=1024 * 1024)
+    num_creates = 0
+
+    def create() -> np.ndarray:
+        nonlocal num_creates
+        num_creates += 1
+        return np.array([1.5, np.nan, 3.0], dtype=np.float64)
+
+    first = store.get_or_create("ens__abc", "v1", 0, "PORO", None, create)
+    second = store.get_or_create("ens__abc", "v1", 0, "PORO", None, create)
+
+    assert num_creates == 1
+    assert first is not None and second is not None
+    assert second.dtype == np.float32
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_array_equal(second, [1.5, np.nan, 3.0])
+
+
+def test_properties_are_keyed_by_realization_and_date(tmp_path: Path) -> None:
+    store = GridPropertyStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    store.store("ens__abc", "v1", 0, "PRESSURE", "20200101", np.full(4, 100.0))
+    store.store("ens__abc", "v1", 0, "PRESSURE", "20210101", np.full(4, 200.0))
+
+    assert store.fetch("ens__abc", "v1", 1, "PRESSURE", "20200101") is None
+    assert store.fetch("ens__abc", "v1", 0, "PRESSURE", None) is None
+    np.testing.assert_array_equal(
+        store.fetch("ens__abc", "v1", 0, "PRESSURE", "20210101"), np.full(4, 200.0)
+    )
+
+
+def test_properties_are_keyed_by_data_version(tmp_path: Path) -> None:
+    store = GridPropertyStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    store.store("ens__abc", "v1", 0, "PORO", None, np.full(4, 0.25))
+
+    assert store.fetch("ens__abc", "v2", 0, "PORO", None) is None
+
+
+def test_discrete_properties_keep_their_dtype(tmp_path: Path) -> None:
+    store = GridPropertyStore(tmp_path, max_size_bytes=1024 * 1024)
+    codes = np.array([1, 2, -1, 3], dtype=np.int32)
+
+    created = store.get_or_create("ens__abc", "v1", 0, "FACIES", None, lambda: codes)
+    fetched = store.fetch("ens__abc", "v1", 0, "FACIES", None)
+
+    assert created is not None and fetched is not None
+    assert created.dtype == np.int32
+    assert fetched.dtype == np.int32
+    np.testing.assert_array_equal(fetched, codes)
+
+
+def test_create_returning_none_is_not_stored(tmp_path: Path) -> None:
+    store = GridPropertyStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    assert store.get_or_create("ens__abc", "v1", 0, "PORO", None, lambda: None) is None
+    assert store.fetch("ens__abc", "v1", 0, "PORO", None) is None
+
+
+def test_least_recently_used_properties_are_evicted(tmp_path: Path) -> None:
+    # Each stored array is 400 bytes of values plus a 128 byte .npy header, so only
+    # two arrays fit within the budget
+    store = GridPropertyStore(tmp_path, max_size_bytes=1200)
+
+    store.store("ens__abc", "v1", 0, "PORO", None, np.zeros(100))
+    store.store("ens__abc", "v1", 1, "PORO", None, np.zeros(100))
+
+    # Make realization 0 the most recently used
+    for real, mtime in [(1, 1000), (0, 2000)]:
+        key = _compose_property_key("ens__abc", "v1", real, "PORO", None)
+        os.utime(tmp_path / f"{key}.npy", (mtime, mtime))
+
+    store.store("ens__abc", "v1", 2, "PORO", None, np.zeros(100))
+
+    assert store.fetch("ens__abc", "v1", 1, "PORO", None) is None
+    assert store.fetch("ens__abc", "v1", 0, "PORO", None) is not None
+    assert store.fetch("ens__abc", "v1", 2, "PORO", None) is not None
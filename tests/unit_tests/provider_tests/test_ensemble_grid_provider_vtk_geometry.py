@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import numpy as np
+import xtgeo
+
+from webviz_subsurface._providers.ensemble_grid_provider._vtk_esg_geometry import (
+    EsgGeometry,
+    calc_grid_geometry_fingerprint,
+    read_esg_geometry,
+    write_esg_geometry,
+)
+
+
+def test_write_and_read_esg_geometry(tmp_path: Path) -> None:
+    geometry = EsgGeometry(
+        point_dims=np.array([3, 2, 2]),
+        vertex_arr=np.arange(36, dtype=np.float64).reshape(-1, 3),
+        conn_arr=np.arange(16, dtype=np.int64),
+        inactive_arr=np.array([1], dtype=np.int64),
+    )
+    geometry_dir = tmp_path / "vtk_geometry" / "real-0"
+
+    assert read_esg_geometry(geometry_dir) is None
+
+    write_esg_geometry(geometry_dir, geometry)
+    # Rewriting must replace the existing geometry
+    write_esg_geometry(geometry_dir, geometry)
+
+    read_geometry = read_esg_geometry(geometry_dir)
+    assert read_geometry is not None
+    assert read_geometry.cell_count() == 2
+    np.testing.assert_array_equal(read_geometry.vertex_arr, geometry.vertex_arr)
+    np.testing.assert_array_equal(read_geometry.conn_arr, geometry.conn_arr)
+    np.testing.assert_array_equal(read_geometry.inactive_arr, geometry.inactive_arr)
+    assert isinstance(read_geometry.vertex_arr, np.memmap)
+    assert [path.name for path in (tmp_path / "vtk_geometry").iterdir()] == ["real-0"]
+
+
+def test_grid_geometry_fingerprint() -> None:
+    grid_a = xtgeo.create_box_grid((4, 3, 2))
+    grid_b = xtgeo.create_box_grid((4, 3, 2))
+    grid_c = xtgeo.create_box_grid((4, 3, 2), increment=(2.0, 1.0, 1.0))
+
+    assert calc_grid_geometry_fingerprint(grid_a) == calc_grid_geometry_fingerprint(
+        grid_b
+    )
+    assert calc_grid_geometry_fingerprint(grid_a) != calc_grid_geometry_fingerprint(
+        grid_c
+    )
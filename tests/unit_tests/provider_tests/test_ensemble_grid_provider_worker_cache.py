@@ -0,0 +1,59 @@
+from webviz_subsurface._providers.ensemble_grid_provider._grid_worker_cache import (
+    GridWorkerCache,
+    ResidentGridInfo,
+)
+
+
+def test_get_and_put_workers() -> None:
+    cache: GridWorkerCache[str] = GridWorkerCache(max_size_bytes=1000)
+
+    assert cache.get("P1__R0") is None
+    cache.put("P1__R0", "worker_0", 400)
+    assert cache.get("P1__R0") == "worker_0"
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (1, 1, 0)
+    assert stats.size_bytes == 400
+    assert stats.resident_grids == [ResidentGridInfo("P1__R0", 400)]
+
+
+def test_least_recently_used_workers_are_evicted() -> None:
+    cache: GridWorkerCache[str] = GridWorkerCache(max_size_bytes=1000)
+
+    cache.put("P1__R0", "worker_0", 400)
+    cache.put("P1__R1", "worker_1", 400)
+    cache.get("P1__R0")
+    cache.put("P1__R2", "worker_2", 400)
+
+    assert cache.get("P1__R1") is None
+    assert [grid.key for grid in cache.stats().resident_grids] == ["P1__R0", "P1__R2"]
+    assert cache.stats().size_bytes == 800
+    assert cache.stats().evictions == 1
+
+
+def test_newest_worker_is_kept_even_if_over_budget() -> None:
+    cache: GridWorkerCache[str] = GridWorkerCache(max_size_bytes=1000)
+
+    cache.put("P1__R0", "worker_0", 400)
+    cache.put("P1__R1", "worker_1", 2000)
+
+    assert cache.get("P1__R0") is None
+    assert cache.get("P1__R1") == "worker_1"
+    assert cache.stats().size_bytes == 2000
+
+
+def test_growing_worker_is_accounted_for() -> None:
+    cache: GridWorkerCache[str] = GridWorkerCache(max_size_bytes=1000)
+
+    cache.put("P1__R0", "worker_0", 400)
+    cache.put("P1__R1", "worker_1", 400)
+    cache.update_size("P1__R0", "worker_0", 700)
+
+    assert cache.get("P1__R1") is None
+    assert cache.get("P1__R0") == "worker_0"
+    assert cache.stats().size_bytes == 700
+
+    # Updates for workers that have since been replaced are ignored
+    cache.put("P1__R0", "worker_0_reloaded", 400)
+    cache.update_size("P1__R0", "worker_0", 900)
+    assert cache.stats().size_bytes == 400
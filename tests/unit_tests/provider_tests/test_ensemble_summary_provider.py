@@ -1,9 +1,12 @@
 import datetime
 import os
+import shutil
 from pathlib import Path
 from typing import Optional
 
 import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
 
 # The fmu.ensemble dependency resdata is only available for Linux,
 # hence, ignore any import exception here to make
@@ -106,6 +109,63 @@ def test_create_from_arrow_unsmry_lazy(testdata_folder: Path, tmp_path: Path) ->
     assert vecdf["REAL"][0] == 5
 
 
+def _write_synthetic_arrow_unsmry_file(
+    ens_folder: Path, real: int, fopt_values: list
+) -> None:
+    output_folder = ens_folder / f"realization-{real}/iter-0/share/results/unsmry"
+    os.makedirs(output_folder, exist_ok=True)
+    table = pa.table(
+        {
+            "DATE": pa.array(
+                [datetime.datetime(2020, 1, 1), datetime.datetime(2021, 1, 1)],
+                type=pa.timestamp("ms"),
+            ),
+            "FOPT": fopt_values,
+        }
+    )
+    feather.write_feather(table, output_folder / "smry.arrow")
+
+
+def test_arrow_unsmry_lazy_updates_changed_realizations(tmp_path: Path) -> None:
+    ens_folder = tmp_path / "ens"
+    for real in [0, 1, 2]:
+        _write_synthetic_arrow_unsmry_file(ens_folder, real, [real, real + 1.0])
+
+    factory = EnsembleSummaryProviderFactory(
+        tmp_path / "storage", allow_storage_writes=True
+    )
+    provider = factory.create_from_arrow_unsmry_lazy(
+        ens_path=str(ens_folder / "realization-*/iter-0"),
+        rel_file_pattern="share/results/unsmry/*.arrow",
+        presampled_tiers=True,
+    )
+    assert provider.realizations() == [0, 1, 2]
+
+    # Rerun realization 1, add realization 3 and remove realization 2
+    # The file size stays the same, so make sure the modification time differs
+    _write_synthetic_arrow_unsmry_file(ens_folder, 1, [10.0, 11.0])
+    os.utime(
+        ens_folder / "realization-1/iter-0/share/results/unsmry/smry.arrow",
+        ns=(0, 0),
+    )
+    _write_synthetic_arrow_unsmry_file(ens_folder, 3, [3.0, 4.0])
+    shutil.rmtree(ens_folder / "realization-2")
+
+    provider = factory.create_from_arrow_unsmry_lazy(
+        ens_path=str(ens_folder / "realization-*/iter-0"),
+        rel_file_pattern="share/results/unsmry/*.arrow",
+        presampled_tiers=True,
+    )
+    assert provider.realizations() == [0, 1, 3]
+
+    vecdf = provider.get_vectors_df(["FOPT"], None)
+    assert vecdf["REAL"].tolist() == [0, 0, 1, 1, 3, 3]
+    assert vecdf["FOPT"].tolist() == [0.0, 1.0, 10.0, 11.0, 3.0, 4.0]
+
+    vecdf = provider.get_vectors_df(["FOPT"], Frequency.YEARLY)
+    assert vecdf["FOPT"].tolist() == [0.0, 1.0, 10.0, 11.0, 3.0, 4.0]
+
+
 def test_arrow_unsmry_lazy_vector_metadata(
     testdata_folder: Path, tmp_path: Path
 ) -> None:
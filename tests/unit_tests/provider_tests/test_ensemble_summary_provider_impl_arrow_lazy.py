@@ -13,6 +13,14 @@ from webviz_subsurface._providers.ensemble_summary_provider._provider_impl_arrow
     _find_first_non_increasing_date_pair,
     _is_date_column_monotonically_increasing,
 )
+from webviz_subsurface._providers.ensemble_summary_provider._resampled_column_cache import (
+    ResampledColumnCache,
+)
+from webviz_subsurface._providers.ensemble_summary_provider._table_utils import (
+    add_per_vector_min_max_to_table_schema_metadata,
+    find_min_max_for_numeric_table_columns,
+    get_per_vector_min_max_from_schema_metadata,
+)
 from webviz_subsurface._providers.ensemble_summary_provider.ensemble_summary_provider import (
     EnsembleSummaryProvider,
 )
@@ -386,3 +394,282 @@ def test_create_with_repeated_dates(tmp_path: Path) -> None:
 
     with pytest.raises(ValueError):
         _create_provider_obj_with_data(input_data, tmp_path)
+
+
+def test_backing_store_has_one_batch_per_realization(tmp_path: Path) -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                            "REAL",  "A"],
+        [np.datetime64("2023-12-20", "ms"),  2,      30.0],
+        [np.datetime64("2023-12-20", "ms"),  0,      10.0],
+        [np.datetime64("2023-12-21", "ms"),  0,      11.0],
+        [np.datetime64("2023-12-20", "ms"),  1,      20.0],
+        [np.datetime64("2023-12-21", "ms"),  1,      21.0],
+        [np.datetime64("2023-12-22", "ms"),  1,      22.0],
+    ]
+    # fmt:on
+    provider = _create_provider_obj_with_data(input_data, tmp_path)
+    assert provider.realizations() == [0, 1, 2]
+
+    source = pa.memory_map(str(tmp_path / "dummy_key.arrow"), "r")
+    reader = pa.ipc.RecordBatchFileReader(source)
+    assert reader.num_record_batches == 3
+    assert reader.get_batch(0).column(0).to_pylist() == [0, 0]
+    assert reader.get_batch(1).column(0).to_pylist() == [1, 1, 1]
+    assert reader.get_batch(2).column(0).to_pylist() == [2]
+
+    vecdf = provider.get_vectors_df(["A"], None, realizations=[2, 1, 99])
+    assert vecdf["REAL"].tolist() == [1, 1, 1, 2]
+    assert vecdf["A"].tolist() == [20.0, 21.0, 22.0, 30.0]
+
+    vecdf = provider.get_vectors_df(["A"], None, realizations=[])
+    assert vecdf.shape == (0, 3)
+
+
+def test_read_backing_store_without_batch_index(tmp_path: Path) -> None:
+    # Backing stores written before the per realization batch index was introduced
+    # hold all realizations in a single record batch
+    table = pa.Table.from_pydict(
+        {
+            "REAL": pa.array([0, 1, 1], type=pa.int32()),
+            "DATE": pa.array(
+                [
+                    np.datetime64("2023-12-20", "ms"),
+                    np.datetime64("2023-12-20", "ms"),
+                    np.datetime64("2023-12-21", "ms"),
+                ],
+                type=pa.timestamp("ms"),
+            ),
+            "A": [10.0, 12.0, 13.0],
+        }
+    )
+    table = add_per_vector_min_max_to_table_schema_metadata(
+        table, find_min_max_for_numeric_table_columns(table)
+    )
+    with pa.OSFile(str(tmp_path / "legacy_key.arrow"), "wb") as sink:
+        with pa.RecordBatchFileWriter(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    provider = ProviderImplArrowLazy.from_backing_store(tmp_path, "legacy_key")
+    assert provider is not None
+    assert provider.realizations() == [0, 1]
+
+    vecdf = provider.get_vectors_df(["A"], None, realizations=[1])
+    assert vecdf["A"].tolist() == [12.0, 13.0]
+
+
+def test_write_backing_store_from_table_stream(tmp_path: Path) -> None:
+    def _make_real_table(dates: list, vectors: Dict[str, list]) -> pa.Table:
+        return pa.Table.from_pydict(
+            {"DATE": pa.array(dates, type=pa.timestamp("ms")), **vectors}
+        )
+
+    # Vector B is missing from realization 0 and must be filled with nulls
+    per_real_tables = [
+        (0, _make_real_table([np.datetime64("2023-12-20", "ms")], {"A": [1.0]})),
+        (
+            3,
+            _make_real_table(
+                [np.datetime64("2023-12-20", "ms"), np.datetime64("2023-12-21", "ms")],
+                {"A": [5.0, -2.0], "B": [7.0, 8.0]},
+            ),
+        ),
+    ]
+    unified_schema = pa.unify_schemas(
+        [table.schema for _real, table in per_real_tables]
+    )
+
+    ProviderImplArrowLazy.write_backing_store_from_per_realization_table_stream(
+        tmp_path, "stream_key", unified_schema, iter(per_real_tables)
+    )
+    assert not (tmp_path / "stream_key.arrow.tmp").exists()
+
+    provider = ProviderImplArrowLazy.from_backing_store(tmp_path, "stream_key")
+    assert provider is not None
+    assert provider.realizations() == [0, 3]
+    assert provider.vector_names() == ["A", "B"]
+
+    vecdf = provider.get_vectors_df(["A", "B"], None)
+    assert vecdf["REAL"].tolist() == [0, 3, 3]
+    assert vecdf["A"].tolist() == [1.0, 5.0, -2.0]
+    assert np.isnan(vecdf["B"][0])
+    assert vecdf["B"].tolist()[1:] == [7.0, 8.0]
+
+    source = pa.memory_map(str(tmp_path / "stream_key.arrow"), "r")
+    schema = pa.ipc.RecordBatchFileReader(source).schema
+    from_schema = get_per_vector_min_max_from_schema_metadata(schema)
+    assert from_schema["A"] == {"min": -2.0, "max": 5.0}
+    assert from_schema["B"] == {"min": 7.0, "max": 8.0}
+
+    # Realizations must arrive in ascending order
+    with pytest.raises(ValueError):
+        ProviderImplArrowLazy.write_backing_store_from_per_realization_table_stream(
+            tmp_path, "unordered_key", unified_schema, reversed(per_real_tables)
+        )
+    assert not (tmp_path / "unordered_key.arrow.tmp").exists()
+
+
+def test_get_vectors_for_dates(tmp_path: Path) -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                            "REAL",  "TOT_t",  "RATE_r"],
+        [np.datetime64("2020-01-01", "ms"),  0,      10.0,     1.0],
+        [np.datetime64("2020-01-04", "ms"),  0,      40.0,     4.0],
+        [np.datetime64("2020-01-06", "ms"),  0,      60.0,     6.0],
+        [np.datetime64("2020-01-02", "ms"),  1,      20.0,     2.0],
+        [np.datetime64("2020-01-03", "ms"),  1,      30.0,     3.0],
+    ]
+    # fmt:on
+    provider = _create_provider_obj_with_data(input_data, tmp_path)
+
+    dates_to_get = [datetime(2020, 1, 3), datetime(2020, 1, 1), datetime(2020, 1, 5)]
+    df = provider.get_vectors_for_dates_df(dates_to_get, ["TOT_t", "RATE_r"])
+    assert df.columns.tolist() == ["DATE", "REAL", "TOT_t", "RATE_r"]
+    assert df.shape == (6, 4)
+    assert (
+        df["DATE"].tolist()
+        == [dates_to_get[0]] * 2 + [dates_to_get[1]] * 2 + [dates_to_get[2]] * 2
+    )
+    assert df["REAL"].tolist() == [0, 1, 0, 1, 0, 1]
+    assert df["TOT_t"].tolist() == [30.0, 30.0, 10.0, 20.0, 50.0, 30.0]
+    assert df["RATE_r"].tolist() == [4.0, 3.0, 1.0, 0.0, 6.0, 0.0]
+
+    # Must agree with sampling one date at a time
+    for date_to_get in dates_to_get:
+        single_df = provider.get_vectors_for_date_df(date_to_get, ["TOT_t", "RATE_r"])
+        multi_df = df[df["DATE"] == date_to_get].drop(columns="DATE")
+        assert single_df.values.tolist() == multi_df.values.tolist()
+
+    df = provider.get_vectors_for_dates_df(dates_to_get, ["TOT_t"], realizations=[1])
+    assert df["REAL"].tolist() == [1, 1, 1]
+
+
+def test_get_vectors_with_resampled_column_cache(tmp_path: Path) -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                            "REAL",  "TOT_t",  "RATE_r",  "C"],
+        [np.datetime64("2020-01-01", "ms"),  0,      10.0,     1.0,       5.0],
+        [np.datetime64("2020-01-04", "ms"),  0,      40.0,     4.0,       6.0],
+        [np.datetime64("2020-01-06", "ms"),  0,      60.0,     6.0,       7.0],
+        [np.datetime64("2020-01-02", "ms"),  1,      20.0,     2.0,       8.0],
+        [np.datetime64("2020-01-03", "ms"),  1,      30.0,     3.0,       9.0],
+    ]
+    # fmt:on
+    uncached_provider = _create_provider_obj_with_data(input_data, tmp_path)
+
+    cache = ResampledColumnCache(max_size_bytes=1024 * 1024)
+    provider = ProviderImplArrowLazy.from_backing_store(tmp_path, "dummy_key", cache)
+    assert provider is not None
+
+    vecdf = provider.get_vectors_df(["TOT_t"], Frequency.DAILY)
+    assert cache.stats().hits == 0
+
+    # TOT_t, DATE and REAL should now come from the cache, only C gets resampled
+    vecdf = provider.get_vectors_df(["C", "TOT_t"], Frequency.DAILY)
+    assert cache.stats().hits == 3
+    assert vecdf.equals(
+        uncached_provider.get_vectors_df(["C", "TOT_t"], Frequency.DAILY)
+    )
+
+    vecdf = provider.get_vectors_df(["TOT_t", "RATE_r"], Frequency.DAILY, [1])
+    assert vecdf.equals(
+        uncached_provider.get_vectors_df(["TOT_t", "RATE_r"], Frequency.DAILY, [1])
+    )
+
+    # Without resampling the cache is not involved
+    stats_before = cache.stats()
+    provider.get_vectors_df(["TOT_t"], None)
+    assert cache.stats() == stats_before
+
+
+def test_get_vectors_from_presampled_tiers(tmp_path: Path) -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                            "REAL",  "TOT_t",  "RATE_r"],
+        [np.datetime64("2020-01-01", "ms"),  0,      10.0,     1.0],
+        [np.datetime64("2020-02-14", "ms"),  0,      40.0,     4.0],
+        [np.datetime64("2020-06-20", "ms"),  0,      60.0,     6.0],
+        [np.datetime64("2020-01-20", "ms"),  1,      20.0,     2.0],
+        [np.datetime64("2021-03-03", "ms"),  1,      30.0,     3.0],
+    ]
+    # fmt:on
+    lazy_provider = _create_provider_obj_with_data(input_data, tmp_path)
+    assert isinstance(lazy_provider, ProviderImplArrowLazy)
+    assert not lazy_provider.presampled_tier_frequencies()
+
+    ProviderImplArrowLazy.write_presampled_tiers_to_backing_store(tmp_path, "dummy_key")
+    tiered_provider = ProviderImplArrowLazy.from_backing_store(tmp_path, "dummy_key")
+    assert tiered_provider is not None
+    assert tiered_provider.presampled_tier_frequencies() == [
+        Frequency.MONTHLY,
+        Frequency.QUARTERLY,
+        Frequency.YEARLY,
+    ]
+
+    for freq in [Frequency.DAILY, Frequency.MONTHLY, Frequency.YEARLY, None]:
+        for realizations in [None, [1], [0, 1]]:
+            tiered_df = tiered_provider.get_vectors_df(
+                ["RATE_r", "TOT_t"], freq, realizations
+            )
+            lazy_df = lazy_provider.get_vectors_df(
+                ["RATE_r", "TOT_t"], freq, realizations
+            )
+            assert tiered_df.equals(lazy_df)
+
+
+def test_write_compressed_and_downcasted_backing_store(tmp_path: Path) -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                            "REAL",  "TOT_t",  "RATE_r"],
+        [np.datetime64("2020-01-01", "ms"),  0,      10.0,     1.1],
+        [np.datetime64("2020-02-14", "ms"),  0,      40.0,     4.0],
+        [np.datetime64("2020-01-20", "ms"),  1,      20.0,     2.0],
+    ]
+    # fmt:on
+    columns_with_header = list(zip(*input_data))
+    input_table = pa.Table.from_pydict({col[0]: col[1:] for col in columns_with_header})
+    per_real_tables = _split_into_per_realization_tables(
+        _add_mock_smry_meta_to_table(input_table)
+    )
+
+    ProviderImplArrowLazy.write_backing_store_from_per_realization_tables(
+        tmp_path, "plain_key", per_real_tables
+    )
+    ProviderImplArrowLazy.write_backing_store_from_per_realization_tables(
+        tmp_path,
+        "small_key",
+        per_real_tables,
+        compression="zstd",
+        downcast_to_float32=True,
+    )
+    ProviderImplArrowLazy.write_presampled_tiers_to_backing_store(
+        tmp_path, "small_key", compression="zstd"
+    )
+
+    source = pa.memory_map(str(tmp_path / "small_key.arrow"), "r")
+    schema = pa.ipc.RecordBatchFileReader(source).schema
+    assert schema.field("TOT_t").type == pa.float64()
+    assert schema.field("RATE_r").type == pa.float32()
+    assert schema.field("RATE_r").metadata[b"is_rate"] == b"True"
+
+    plain_provider = ProviderImplArrowLazy.from_backing_store(tmp_path, "plain_key")
+    small_provider = ProviderImplArrowLazy.from_backing_store(tmp_path, "small_key")
+    assert plain_provider is not None
+    assert small_provider is not None
+    assert small_provider.presampled_tier_frequencies()
+
+    # Min/max is determined before downcasting
+    assert small_provider.vector_names_filtered_by_value(
+        exclude_constant_values=True
+    ) == ["TOT_t", "RATE_r"]
+
+    for freq in [None, Frequency.DAILY, Frequency.MONTHLY]:
+        plain_df = plain_provider.get_vectors_df(["TOT_t", "RATE_r"], freq)
+        small_df = small_provider.get_vectors_df(["TOT_t", "RATE_r"], freq)
+        assert small_df["TOT_t"].equals(plain_df["TOT_t"])
+        assert np.allclose(small_df["RATE_r"], plain_df["RATE_r"])
+
+    with pytest.raises(ValueError):
+        ProviderImplArrowLazy.write_backing_store_from_per_realization_tables(
+            tmp_path, "bad_key", per_real_tables, compression="gzip"
+        )
@@ -158,3 +158,15 @@ def test_get_vectors_for_date(provider: EnsembleSummaryProvider) -> None:
     vecdf = provider.get_vectors_for_date_df(date_to_get, ["A", "Z"])
     assert vecdf.shape == (1, 3)
     assert vecdf.columns.tolist() == ["REAL", "A", "Z"]
+
+
+def test_get_vectors_for_dates(provider: EnsembleSummaryProvider) -> None:
+    real1_dates = provider.dates(resampling_frequency=None, realizations=[1])
+    assert len(real1_dates) == 2
+
+    vecdf = provider.get_vectors_for_dates_df(real1_dates, ["A"])
+    assert vecdf.shape == (3, 3)
+    assert vecdf.columns.tolist() == ["DATE", "REAL", "A"]
+    assert vecdf["DATE"].tolist() == [real1_dates[0], real1_dates[0], real1_dates[1]]
+    assert vecdf["REAL"].tolist() == [0, 1, 1]
+    assert vecdf["A"].tolist() == [10.0, 12.0, 13.0]
@@ -0,0 +1,73 @@
+import pyarrow as pa
+
+from webviz_subsurface._providers.ensemble_summary_provider._resampled_column_cache import (
+    ResampledColumnCache,
+    make_rows_key,
+)
+from webviz_subsurface._providers.ensemble_summary_provider.ensemble_summary_provider import (
+    Frequency,
+)
+
+
+def _make_column(num_values: int) -> pa.ChunkedArray:
+    return pa.chunked_array([pa.array(range(num_values), type=pa.float64())])
+
+
+def test_rows_key() -> None:
+    assert make_rows_key(Frequency.MONTHLY, None) == (Frequency.MONTHLY, None)
+    assert make_rows_key(Frequency.MONTHLY, [3, 1, 3]) == (Frequency.MONTHLY, (1, 3))
+    assert make_rows_key(Frequency.MONTHLY, [1, 3]) == make_rows_key(
+        Frequency.MONTHLY, [3, 1]
+    )
+
+
+def test_get_and_put_columns() -> None:
+    cache = ResampledColumnCache(max_size_bytes=1000)
+    rows_key = make_rows_key(Frequency.YEARLY, None)
+
+    assert not cache.get_columns("owner", rows_key, ["A", "B"])
+
+    cache.put_columns("owner", rows_key, {"A": _make_column(10)})
+    found = cache.get_columns("owner", rows_key, ["A", "B"])
+    assert list(found.keys()) == ["A"]
+    assert found["A"].to_pylist() == list(range(10))
+
+    # Other owners and other rows keys must not see the entry
+    assert not cache.get_columns("other_owner", rows_key, ["A"])
+    assert not cache.get_columns("owner", make_rows_key(Frequency.YEARLY, [0]), ["A"])
+
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 5
+    assert stats.evictions == 0
+    assert stats.num_entries == 1
+    assert stats.size_bytes == 80
+
+
+def test_lru_eviction() -> None:
+    # Room for three columns of 10 float64 values
+    cache = ResampledColumnCache(max_size_bytes=240)
+    rows_key = make_rows_key(Frequency.MONTHLY, None)
+
+    cache.put_columns(
+        "owner",
+        rows_key,
+        {"A": _make_column(10), "B": _make_column(10), "C": _make_column(10)},
+    )
+    assert cache.stats().num_entries == 3
+
+    # Touch A so that B becomes the least recently used entry
+    cache.get_columns("owner", rows_key, ["A"])
+    cache.put_columns("owner", rows_key, {"D": _make_column(10)})
+
+    found = cache.get_columns("owner", rows_key, ["A", "B", "C", "D"])
+    assert sorted(found.keys()) == ["A", "C", "D"]
+
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.size_bytes == 240
+
+    # Entries larger than the whole budget are never stored
+    cache.put_columns("owner", rows_key, {"E": _make_column(100)})
+    assert not cache.get_columns("owner", rows_key, ["E"])
+    assert cache.stats().num_entries == 3
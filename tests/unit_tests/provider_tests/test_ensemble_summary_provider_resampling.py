@@ -5,7 +5,10 @@ from webviz_subsurface._providers.ensemble_summary_provider._resampling import (
     Frequency,
     generate_normalized_sample_dates,
     interpolate_backfill,
+    resample_segmented_multi_real_table,
+    resample_single_real_table,
     sample_segmented_multi_real_table_at_date,
+    sample_segmented_multi_real_table_at_dates,
 )
 
 
@@ -130,6 +133,55 @@ def test_interpolate_backfill() -> None:
     assert (y == expected_y).all()
 
 
+def test_resample_segmented_multi_real_table() -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                                   "REAL",  "T",     "R",    "N"],
+        [np.datetime64("2020-01-01T12:00", "ms"),  0,       10.0,    1.0,    0.1],
+        [np.datetime64("2020-03-15", "ms"),        0,       40.0,    4.0,    np.nan],
+        [np.datetime64("2020-07-01", "ms"),        0,       60.0,    6.0,    0.3],
+        [np.datetime64("2019-11-20", "ms"),        1,       -0.0,    200.0,  0.7],
+        [np.datetime64("2020-02-01", "ms"),        1,       -0.0,    500.0,  np.inf],
+        [np.datetime64("2020-02-11", "ms"),        3,       77.0,    70.0,   1.0],
+    ]
+    # fmt:on
+
+    schema = pa.schema(
+        [
+            pa.field("DATE", pa.timestamp("ms")),
+            pa.field("REAL", pa.int32()),
+            pa.field("T", pa.float64(), metadata={b"is_rate": b"False"}),
+            pa.field("R", pa.float64(), metadata={b"is_rate": b"True"}),
+            pa.field("N", pa.float64(), metadata={b"is_rate": b"False"}),
+        ]
+    )
+
+    table = _create_table_from_row_data(per_row_input_data=input_data, schema=schema)
+
+    for freq in [Frequency.DAILY, Frequency.WEEKLY, Frequency.MONTHLY]:
+        res = resample_segmented_multi_real_table(table, freq)
+
+        # Must give bitwise identical results to resampling one realization at a time
+        expected = pa.concat_tables(
+            [
+                resample_single_real_table(table.slice(0, 3), freq),
+                resample_single_real_table(table.slice(3, 2), freq),
+                resample_single_real_table(table.slice(5, 1), freq),
+            ]
+        )
+        assert res.schema == expected.schema
+        for colname in schema.names:
+            assert (
+                res[colname].to_numpy().tobytes()
+                == expected[colname].to_numpy().tobytes()
+            )
+
+    res = resample_segmented_multi_real_table(table, Frequency.MONTHLY)
+    assert res["REAL"].to_pylist() == [0] * 7 + [1] * 4 + [3] * 2
+    assert res["T"].to_pylist()[7:11] == [0.0, 0.0, 0.0, 0.0]
+    assert res["R"].to_pylist()[0:7] == [0, 4, 4, 6, 6, 6, 6]
+
+
 def test_sample_segmented_multi_real_table_at_date_with_single_real() -> None:
     # pylint: disable=too-many-statements
     # fmt:off
@@ -318,3 +370,44 @@ def test_sample_segmented_multi_real_table_at_date() -> None:
     assert res["T"][1].as_py() == 3000
     assert res["R"][0].as_py() == 4
     assert res["R"][1].as_py() == 500
+
+
+def test_sample_segmented_multi_real_table_at_dates() -> None:
+    # fmt:off
+    input_data = [
+        ["DATE",                             "REAL",  "T",    "R"],
+        [np.datetime64("2020-01-01", "ms"),  0,       10.0,   1],
+        [np.datetime64("2020-01-04", "ms"),  0,       40.0,   4],
+        [np.datetime64("2020-01-06", "ms"),  0,       60.0,   6],
+        [np.datetime64("2020-01-02", "ms"),  1,       2000.0,  200],
+        [np.datetime64("2020-01-05", "ms"),  1,       5000.0,  500],
+        [np.datetime64("2020-01-07", "ms"),  1,       7000.0,  700],
+    ]
+    # fmt:on
+
+    schema = pa.schema(
+        [
+            pa.field("DATE", pa.timestamp("ms")),
+            pa.field("REAL", pa.int64()),
+            pa.field("T", pa.float32(), metadata={b"is_rate": b"False"}),
+            pa.field("R", pa.float32(), metadata={b"is_rate": b"True"}),
+        ]
+    )
+
+    table = _create_table_from_row_data(per_row_input_data=input_data, schema=schema)
+
+    sampledates = np.array(
+        ["2020-01-03", "2019-01-01", "2020-01-07", "2020-01-06", "2021-01-01"],
+        dtype="M8[ms]",
+    )
+    res = sample_segmented_multi_real_table_at_dates(table, sampledates)
+    assert res.num_rows == 10
+    assert res["DATE"].to_numpy().tolist() == np.repeat(sampledates, 2).tolist()
+    assert res["REAL"].to_pylist() == [0, 1] * 5
+    assert res["T"].to_pylist() == [30, 3000, 10, 2000, 60, 7000, 60, 6000, 60, 7000]
+    assert res["R"].to_pylist() == [4, 500, 0, 0, 0, 700, 6, 700, 0, 0]
+
+    # Sampling all dates in one go must give the same result as one date at a time
+    for i, sampledate in enumerate(sampledates):
+        single_res = sample_segmented_multi_real_table_at_date(table, sampledate)
+        assert res.slice(2 * i, 2).equals(single_res)
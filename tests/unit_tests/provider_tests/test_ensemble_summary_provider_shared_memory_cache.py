@@ -0,0 +1,110 @@
+import os
+from typing import Iterator
+
+import pyarrow as pa
+import pytest
+
+from webviz_subsurface._providers.ensemble_summary_provider._resampled_column_cache import (
+    make_rows_key,
+)
+from webviz_subsurface._providers.ensemble_summary_provider._shared_memory_column_cache import (
+    SharedMemoryResampledColumnCache,
+    _make_digest,
+    _open_shared_memory,
+)
+from webviz_subsurface._providers.ensemble_summary_provider.ensemble_summary_provider import (
+    Frequency,
+)
+
+pytestmark = pytest.mark.skipif(
+    os.name == "nt", reason="Shared memory cache is not supported on Windows"
+)
+
+
+@pytest.fixture(name="namespace")
+def fixture_namespace() -> Iterator[str]:
+    namespace = f"wvstest{os.getpid()}"
+    yield namespace
+    SharedMemoryResampledColumnCache(namespace, max_size_bytes=1).unlink()
+
+
+def test_shared_memory_cache_is_shared_between_instances(namespace: str) -> None:
+    rows_key = make_rows_key(Frequency.MONTHLY, [1, 0])
+    column_a = pa.chunked_array([[1.0, 2.0], [3.0]])
+    column_b = pa.chunked_array([[10, 20, 30]], type=pa.int32())
+
+    publishing_cache = SharedMemoryResampledColumnCache(namespace, 1024 * 1024)
+    publishing_cache.put_columns("owner", rows_key, {"A": column_a, "B": column_b})
+
+    # Simulates another worker process attaching to the same cache
+    attaching_cache = SharedMemoryResampledColumnCache(namespace, 1024 * 1024)
+    found = attaching_cache.get_columns("owner", rows_key, ["A", "B", "C"])
+    assert set(found.keys()) == {"A", "B"}
+    assert found["A"].to_pylist() == [1.0, 2.0, 3.0]
+    assert found["B"].type == pa.int32()
+    assert found["B"].to_pylist() == [10, 20, 30]
+
+    assert not attaching_cache.get_columns("other_owner", rows_key, ["A"])
+    assert not attaching_cache.get_columns(
+        "owner", make_rows_key(Frequency.YEARLY, [0, 1]), ["A"]
+    )
+
+    stats = attaching_cache.stats()
+    assert stats.hits == 2
+    assert stats.misses == 3
+    assert stats.num_entries == 2
+
+
+def test_shared_memory_cache_evicts_least_recently_used(namespace: str) -> None:
+    rows_key = make_rows_key(Frequency.DAILY, None)
+    column = pa.chunked_array([list(range(100))], type=pa.float64())
+
+    probe_cache = SharedMemoryResampledColumnCache(f"{namespace}p", 1024 * 1024)
+    probe_cache.put_columns("owner", rows_key, {"X": column})
+    entry_size = probe_cache.stats().size_bytes
+    probe_cache.unlink()
+
+    cache = SharedMemoryResampledColumnCache(namespace, 2 * entry_size)
+    cache.put_columns("owner", rows_key, {"A": column, "B": column})
+    cache.get_columns("owner", rows_key, ["A"])
+    cache.put_columns("owner", rows_key, {"C": column})
+
+    found = cache.get_columns("owner", rows_key, ["A", "B", "C"])
+    assert set(found.keys()) == {"A", "C"}
+
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.num_entries == 2
+    assert stats.size_bytes <= stats.max_size_bytes
+
+
+def test_shared_memory_cache_recovers_orphaned_segment(namespace: str) -> None:
+    rows_key = make_rows_key(Frequency.MONTHLY, None)
+    cache = SharedMemoryResampledColumnCache(namespace, 1024 * 1024)
+
+    # Simulates a process that died after creating the segment, but before adding
+    # it to the index
+    # pylint: disable=protected-access
+    orphan_name = cache._segment_name(_make_digest("owner", rows_key, "A"))
+    _open_shared_memory(orphan_name, create=True, size=16).close()
+
+    cache.put_columns("owner", rows_key, {"A": pa.chunked_array([[1.0, 2.0]])})
+
+    found = cache.get_columns("owner", rows_key, ["A"])
+    assert found["A"].to_pylist() == [1.0, 2.0]
+    assert cache.stats().num_entries == 1
+
+
+def test_shared_memory_cache_outlives_closed_instance(namespace: str) -> None:
+    rows_key = make_rows_key(Frequency.MONTHLY, [0])
+
+    cache = SharedMemoryResampledColumnCache(namespace, 1024 * 1024)
+    cache.put_columns("owner", rows_key, {"A": pa.chunked_array([[1.0, 2.0]])})
+    found = cache.get_columns("owner", rows_key, ["A"])
+    cache.close()
+    cache.close()
+
+    assert found["A"].to_pylist() == [1.0, 2.0]
+    other_cache = SharedMemoryResampledColumnCache(namespace, 1024 * 1024)
+    assert set(other_cache.get_columns("owner", rows_key, ["A"])) == {"A"}
+    other_cache.close()
@@ -0,0 +1,268 @@
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+import xtgeo
+
+from webviz_subsurface._providers.ensemble_surface_provider import (
+    _streaming_surface_statistics,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._provider_impl_file import (
+    ProviderImplFile,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._stacked_surface_cube import (
+    calc_statistics_from_stacked_values,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._streaming_surface_statistics import (
+    StreamingStatisticsOptions,
+    calc_statistics_streaming,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._surface_discovery import (
+    SurfaceFileInfo,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._surface_loading import (
+    load_stacked_surface_values,
+)
+from webviz_subsurface._providers.ensemble_surface_provider.ensemble_surface_provider import (
+    StatisticalSurfaceAddress,
+    SurfaceStatistic,
+)
+
+
+def _write_synthetic_surfaces(
+    surf_dir: Path, realizations: List[int]
+) -> List[SurfaceFileInfo]:
+    rng = np.random.default_rng(seed=1234)
+    surf_dir.mkdir(parents=True, exist_ok=True)
+
+    surfinfos = []
+    for real in realizations:
+        values = np.ma.masked_array(rng.uniform(1000, 2000, size=(7, 5)))
+        if real == realizations[0]:
+            values[2, 3] = np.ma.masked
+        surface = xtgeo.RegularSurface(
+            ncol=7, nrow=5, xinc=25.0, yinc=50.0, xori=100.0, yori=200.0, values=values
+        )
+        surf_path = surf_dir / f"{real}--top--depth.gri"
+        surface.to_file(surf_path)
+        surfinfos.append(
+            SurfaceFileInfo(
+                path=str(surf_path),
+                real=real,
+                name="top",
+                attribute="depth",
+                datestr=None,
+            )
+        )
+
+    return surfinfos
+
+
+def test_statistics_from_stacked_cube_match_statistics_from_files(
+    tmp_path: Path,
+) -> None:
+    surfinfos = _write_synthetic_surfaces(tmp_path / "source", [0, 1, 2, 4, 7])
+
+    storage_dir = tmp_path / "storage"
+    for key, create_cubes in [("files", False), ("cubes", True)]:
+        ProviderImplFile.write_backing_store(
+            storage_dir,
+            key,
+            sim_surfaces=surfinfos,
+            obs_surfaces=[],
+            avoid_copying_surfaces=True,
+            create_stacked_cubes=create_cubes,
+        )
+    files_provider = ProviderImplFile.from_backing_store(storage_dir, "files")
+    cubes_provider = ProviderImplFile.from_backing_store(storage_dir, "cubes")
+    assert files_provider and cubes_provider
+
+    for statistic in SurfaceStatistic:
+        # Realization 3 doesn't exist and should be ignored
+        address = StatisticalSurfaceAddress(
+            attribute="depth",
+            name="top",
+            datestr=None,
+            statistic=statistic,
+            realizations=[7, 0, 1, 3, 4],
+        )
+        expected_surf = files_provider.get_surface(address)
+        actual_surf = cubes_provider.get_surface(address)
+        assert expected_surf and actual_surf
+
+        assert actual_surf.compare_topology(expected_surf)
+        assert np.array_equal(actual_surf.values.mask, expected_surf.values.mask)
+        assert actual_surf.values.mask[2, 3]
+        np.testing.assert_allclose(
+            actual_surf.values.compressed(),
+            expected_surf.values.compressed(),
+            rtol=1e-6,
+        )
+
+
+def test_calc_all_statistics_from_stacked_values() -> None:
+    rng = np.random.default_rng(seed=1234)
+    stacked_values = rng.uniform(0, 1, size=(10, 30, 20)).astype(np.float32)
+
+    results = calc_statistics_from_stacked_values(
+        list(SurfaceStatistic), stacked_values, np.array([1, 3, 5, 6])
+    )
+
+    selected = stacked_values[[1, 3, 5, 6]].astype(np.float64)
+    assert set(results.keys()) == set(SurfaceStatistic)
+    np.testing.assert_allclose(results[SurfaceStatistic.MEAN], selected.mean(axis=0))
+    np.testing.assert_allclose(results[SurfaceStatistic.STDDEV], selected.std(axis=0))
+    np.testing.assert_allclose(results[SurfaceStatistic.MINIMUM], selected.min(axis=0))
+    np.testing.assert_allclose(results[SurfaceStatistic.MAXIMUM], selected.max(axis=0))
+    np.testing.assert_allclose(
+        results[SurfaceStatistic.P10], np.percentile(selected, 10, axis=0)
+    )
+    np.testing.assert_allclose(
+        results[SurfaceStatistic.P90], np.percentile(selected, 90, axis=0)
+    )
+
+
+@pytest.mark.parametrize("max_slab_bytes", [1, 1000])
+def test_calc_statistics_from_stacked_values_in_slabs(
+    monkeypatch: pytest.MonkeyPatch, max_slab_bytes: int
+) -> None:
+    monkeypatch.setattr(
+        "webviz_subsurface._providers.ensemble_surface_provider."
+        "_stacked_surface_cube._MAX_REDUCTION_SLAB_BYTES",
+        max_slab_bytes,
+    )
+    rng = np.random.default_rng(seed=1234)
+    stacked_values = rng.uniform(0, 1, size=(5, 13, 3))
+
+    results = calc_statistics_from_stacked_values(
+        [SurfaceStatistic.P90, SurfaceStatistic.MEAN], stacked_values
+    )
+    np.testing.assert_allclose(
+        results[SurfaceStatistic.P90], np.percentile(stacked_values, 90, axis=0)
+    )
+    np.testing.assert_allclose(
+        results[SurfaceStatistic.MEAN], stacked_values.mean(axis=0)
+    )
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_load_stacked_surface_values_matches_xtgeo(
+    tmp_path: Path, max_workers: int
+) -> None:
+    surfinfos = _write_synthetic_surfaces(tmp_path, [0, 1, 2, 3])
+    surf_fns = [info.path for info in surfinfos]
+
+    geometry_and_values = load_stacked_surface_values(surf_fns, max_workers)
+    assert geometry_and_values is not None
+    geometry, stacked_values = geometry_and_values
+    assert stacked_values.shape == (4, 7, 5)
+    assert stacked_values.dtype == np.float32
+
+    for real_idx, surf_fn in enumerate(surf_fns):
+        surface = xtgeo.surface_from_file(surf_fn)
+        assert geometry.create_surface(stacked_values[real_idx]).compare_topology(
+            surface
+        )
+        np.testing.assert_array_equal(
+            stacked_values[real_idx],
+            np.ma.filled(surface.values.astype(np.float32), fill_value=np.nan),
+        )
+    assert np.isnan(stacked_values[0, 2, 3])
+
+
+def test_load_stacked_surface_values_with_different_geometries(
+    tmp_path: Path,
+) -> None:
+    surfinfos = _write_synthetic_surfaces(tmp_path, [0, 1])
+    odd_surf_path = tmp_path / "2--top--depth.gri"
+    xtgeo.RegularSurface(ncol=3, nrow=3, xinc=25.0, yinc=50.0, values=1.0).to_file(
+        odd_surf_path
+    )
+    surf_fns = [info.path for info in surfinfos] + [str(odd_surf_path)]
+
+    assert load_stacked_surface_values(surf_fns) is None
+
+
+@pytest.mark.parametrize("percentile_tolerance", [1e-2, 1e-6])
+@pytest.mark.parametrize("max_nodes_per_slab", [8, 1024])
+def test_calc_statistics_streaming_matches_stacked_values(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    percentile_tolerance: float,
+    max_nodes_per_slab: int,
+) -> None:
+    monkeypatch.setattr(
+        _streaming_surface_statistics, "_MAX_NODES_PER_SLAB", max_nodes_per_slab
+    )
+    surfinfos = _write_synthetic_surfaces(tmp_path, list(range(23)))
+    surf_fns = [info.path for info in surfinfos]
+
+    geometry_and_values = load_stacked_surface_values(surf_fns)
+    assert geometry_and_values is not None
+    _geometry, stacked_values = geometry_and_values
+    expected = calc_statistics_from_stacked_values(
+        list(SurfaceStatistic), stacked_values
+    )
+
+    actual = calc_statistics_streaming(
+        list(SurfaceStatistic), surf_fns, percentile_tolerance, chunk_size=4
+    )
+    assert actual is not None
+    assert set(actual.keys()) == set(SurfaceStatistic)
+
+    value_range = np.nanmax(stacked_values, axis=0) - np.nanmin(stacked_values, axis=0)
+    for stat in SurfaceStatistic:
+        assert np.array_equal(np.isnan(actual[stat]), np.isnan(expected[stat]))
+        assert np.isnan(actual[stat][2, 3])
+        if stat in (SurfaceStatistic.P10, SurfaceStatistic.P90):
+            assert np.all(
+                np.abs(actual[stat] - expected[stat])[~np.isnan(expected[stat])]
+                <= (percentile_tolerance * value_range + 1e-9)[
+                    ~np.isnan(expected[stat])
+                ]
+            )
+        else:
+            np.testing.assert_allclose(actual[stat], expected[stat], rtol=1e-10)
+
+
+def test_statistics_from_streaming_provider_match_statistics_from_files(
+    tmp_path: Path,
+) -> None:
+    surfinfos = _write_synthetic_surfaces(tmp_path / "source", list(range(10)))
+    ProviderImplFile.write_backing_store(
+        tmp_path / "storage",
+        "files",
+        sim_surfaces=surfinfos,
+        obs_surfaces=[],
+        avoid_copying_surfaces=True,
+    )
+    files_provider = ProviderImplFile.from_backing_store(tmp_path / "storage", "files")
+    streaming_provider = ProviderImplFile.from_backing_store(
+        tmp_path / "storage",
+        "files",
+        streaming_stats_options=StreamingStatisticsOptions(
+            min_stacked_size_bytes=0, percentile_tolerance=1e-6
+        ),
+    )
+    assert files_provider and streaming_provider
+
+    for statistic in SurfaceStatistic:
+        address = StatisticalSurfaceAddress(
+            attribute="depth",
+            name="top",
+            datestr=None,
+            statistic=statistic,
+            realizations=list(range(10)),
+        )
+        expected_surf = files_provider.get_surface(address)
+        actual_surf = streaming_provider.get_surface(address)
+        assert expected_surf and actual_surf
+
+        assert actual_surf.compare_topology(expected_surf)
+        assert np.array_equal(actual_surf.values.mask, expected_surf.values.mask)
+        np.testing.assert_allclose(
+            actual_surf.values.compressed(),
+            expected_surf.values.compressed(),
+            atol=2e-3,
+        )
@@ -0,0 +1,68 @@
+import gzip
+import zlib
+
+import numpy as np
+
+from webviz_subsurface._providers.ensemble_surface_provider._surface_array_encoding import (
+    UINT16_MAX_VALUE,
+    UINT16_UNDEF_VALUE,
+    ArrayValueEncoding,
+    ContentEncoding,
+    encode_array_payload,
+    negotiate_content_encoding,
+    quantize_float32_to_uint16,
+    shuffle_bytes,
+)
+
+
+def test_quantize_float32_to_uint16() -> None:
+    values = np.array([10.0, 15.0, np.nan, 20.0], dtype=np.float32)
+
+    quantized = quantize_float32_to_uint16(values, 10.0, 20.0)
+
+    assert quantized.dtype == np.uint16
+    np.testing.assert_array_equal(
+        quantized, [0, round(UINT16_MAX_VALUE / 2), UINT16_UNDEF_VALUE, 65534]
+    )
+    recovered = 10.0 + quantized[[0, 1, 3]] * (20.0 - 10.0) / UINT16_MAX_VALUE
+    np.testing.assert_allclose(recovered, [10.0, 15.0, 20.0], atol=1e-3)
+
+
+def test_quantize_constant_values() -> None:
+    values = np.array([5.0, 5.0], dtype=np.float32)
+    np.testing.assert_array_equal(quantize_float32_to_uint16(values, 5.0, 5.0), [0, 0])
+
+
+def test_shuffle_bytes() -> None:
+    values = np.array([0x04030201, 0x08070605], dtype="<u4")
+    assert shuffle_bytes(values) == bytes([1, 5, 2, 6, 3, 7, 4, 8])
+
+
+def test_encode_array_payload_roundtrip() -> None:
+    values = np.linspace(0, 1, 100, dtype=np.float32)
+
+    gzipped = encode_array_payload(
+        values, ArrayValueEncoding.FLOAT32, False, ContentEncoding.GZIP
+    )
+    np.testing.assert_array_equal(
+        np.frombuffer(gzip.decompress(gzipped), dtype=np.float32), values
+    )
+
+    deflated = encode_array_payload(
+        values, ArrayValueEncoding.FLOAT32, True, ContentEncoding.DEFLATE
+    )
+    unshuffled = np.frombuffer(zlib.decompress(deflated), dtype=np.uint8)
+    unshuffled = unshuffled.reshape(4, -1).T.copy().view(np.float32).reshape(-1)
+    np.testing.assert_array_equal(unshuffled, values)
+
+    quantized = encode_array_payload(
+        values, ArrayValueEncoding.UINT16, False, ContentEncoding.IDENTITY, 0.0, 1.0
+    )
+    assert len(quantized) == 2 * len(values)
+
+
+def test_negotiate_content_encoding() -> None:
+    assert negotiate_content_encoding(["deflate", "GZIP"]) == ContentEncoding.GZIP
+    assert negotiate_content_encoding(["deflate"]) == ContentEncoding.DEFLATE
+    assert negotiate_content_encoding(["br"]) == ContentEncoding.IDENTITY
+    assert negotiate_content_encoding([]) == ContentEncoding.IDENTITY
@@ -0,0 +1,164 @@
+import gzip
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import xtgeo
+from dash import Dash, html
+
+from webviz_subsurface._providers.ensemble_surface_provider._surface_blob_store import (
+    LocalDirBlobStore,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._types import (
+    QualifiedSurfaceAddress,
+)
+from webviz_subsurface._providers.ensemble_surface_provider.ensemble_surface_provider import (
+    EnsembleSurfaceProvider,
+    SimulatedSurfaceAddress,
+    SurfaceAddress,
+)
+from webviz_subsurface._providers.ensemble_surface_provider.surface_array_server import (
+    SurfaceArrayServer,
+)
+
+QUALIFIED_ADDRESS = QualifiedSurfaceAddress(
+    "ens__fake",
+    SimulatedSurfaceAddress(attribute="depth", name="top", datestr=None, realization=0),
+)
+
+
+def _make_surface(offset: float = 0.0) -> xtgeo.RegularSurface:
+    return xtgeo.RegularSurface(
+        ncol=7,
+        nrow=5,
+        xinc=25.0,
+        yinc=50.0,
+        values=np.arange(35, dtype=np.float64).reshape(7, 5) + offset,
+    )
+
+
+class _FakeProvider(EnsembleSurfaceProvider):
+    def __init__(self) -> None:
+        self.num_get_surface_calls = 0
+
+    def provider_id(self) -> str:
+        return "ens__fake"
+
+    def attributes(self) -> List[str]:
+        return ["depth"]
+
+    def surface_names_for_attribute(self, surface_attribute: str) -> List[str]:
+        return ["top"]
+
+    def surface_dates_for_attribute(
+        self, surface_attribute: str
+    ) -> Optional[List[str]]:
+        return None
+
+    def realizations(self) -> List[int]:
+        return [0]
+
+    def get_surface(self, address: SurfaceAddress) -> Optional[xtgeo.RegularSurface]:
+        self.num_get_surface_calls += 1
+        return _make_surface()
+
+
+def _make_server(blob_store_dir: Path) -> Tuple[Dash, SurfaceArrayServer]:
+    app = Dash(__name__)
+    # Dash refuses to serve any request until the app has a layout
+    app.layout = html.Div()
+    server = SurfaceArrayServer(
+        app, blob_store=LocalDirBlobStore(blob_store_dir, max_size_bytes=1024 * 1024)
+    )
+    return app, server
+
+
+def test_etag_and_conditional_requests(tmp_path: Path) -> None:
+    app, server = _make_server(tmp_path)
+    client = app.server.test_client()
+    server.publish_surface(QUALIFIED_ADDRESS, _make_surface())
+    url = SurfaceArrayServer.encode_partial_url(QUALIFIED_ADDRESS)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert np.frombuffer(response.data, dtype=np.float32).size == 35
+    assert response.headers["Cache-Control"] == "no-cache"
+    etag = response.headers["ETag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Republishing with different content under the same address changes the ETag
+    server.publish_surface(QUALIFIED_ADDRESS, _make_surface(offset=1.0))
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_only_versioned_urls_are_immutable(tmp_path: Path) -> None:
+    app, server = _make_server(tmp_path)
+    client = app.server.test_client()
+    server.publish_surface(QUALIFIED_ADDRESS, _make_surface())
+    meta = server.get_surface_metadata(QUALIFIED_ADDRESS)
+    assert meta is not None
+
+    url = SurfaceArrayServer.encode_partial_url(QUALIFIED_ADDRESS, version=meta.digest)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+
+    stale_url = SurfaceArrayServer.encode_partial_url(QUALIFIED_ADDRESS, version="0")
+    assert client.get(stale_url).headers["Cache-Control"] == "no-cache"
+
+
+def test_conditional_request_for_missing_surface(tmp_path: Path) -> None:
+    app, server = _make_server(tmp_path / "a")
+    server.publish_surface(QUALIFIED_ADDRESS, _make_surface())
+    url = SurfaceArrayServer.encode_partial_url(QUALIFIED_ADDRESS)
+    etag = app.server.test_client().get(url).headers["ETag"]
+
+    other_app, _other_server = _make_server(tmp_path / "b")
+    response = other_app.server.test_client().get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 404
+
+
+def test_encoding_negotiation(tmp_path: Path) -> None:
+    app, server = _make_server(tmp_path)
+    client = app.server.test_client()
+    server.publish_surface(QUALIFIED_ADDRESS, _make_surface())
+    url = SurfaceArrayServer.encode_partial_url(QUALIFIED_ADDRESS)
+
+    identity_response = client.get(url)
+    gzip_response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in identity_response.headers
+    assert gzip_response.headers["Content-Encoding"] == "gzip"
+    assert gzip_response.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(gzip_response.data) == identity_response.data
+    assert gzip_response.headers["ETag"] != identity_response.headers["ETag"]
+
+    uint16_response = client.get(url + "?encoding=uint16")
+    assert uint16_response.headers["X-Value-Encoding"] == "uint16"
+    assert float(uint16_response.headers["X-Value-Min"]) == 0.0
+    assert float(uint16_response.headers["X-Value-Max"]) == 34.0
+    assert len(uint16_response.data) == 35 * 2
+
+    assert client.get(url + "?encoding=float64").status_code == 400
+
+
+def test_lazy_request_computes_surface_once(tmp_path: Path) -> None:
+    app, server = _make_server(tmp_path)
+    client = app.server.test_client()
+    provider = _FakeProvider()
+    server.add_provider(provider)
+    url = SurfaceArrayServer.encode_partial_lazy_url(QUALIFIED_ADDRESS)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert np.frombuffer(response.data, dtype=np.float32).size == 35
+
+    response = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert provider.num_get_surface_calls == 1
+    assert server.get_surface_metadata(QUALIFIED_ADDRESS) is not None
+
+    assert client.get("/SurfaceArrayServer/lazy/not-an-address").status_code == 400
@@ -0,0 +1,59 @@
+import os
+import time
+from pathlib import Path
+
+from webviz_subsurface._providers.ensemble_surface_provider._surface_blob_store import (
+    REL_BLOB_DIR,
+    LocalDirBlobStore,
+)
+
+
+def test_put_and_get_with_metrics(tmp_path: Path) -> None:
+    store = LocalDirBlobStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    assert store.get("ARRAY:a") is None
+    assert not store.contains("ARRAY:a")
+    store.put("ARRAY:a", b"0123456789")
+    assert store.contains("ARRAY:a")
+    assert store.get("ARRAY:a") == b"0123456789"
+
+    metrics = store.metrics()
+    assert (metrics.hits, metrics.misses, metrics.writes) == (1, 1, 1)
+    assert metrics.bytes_read == 10
+    assert metrics.bytes_written == 10
+    assert metrics.hit_ratio == 0.5
+
+
+def test_identical_blobs_are_stored_once(tmp_path: Path) -> None:
+    store = LocalDirBlobStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    store.put("ARRAY:a", b"same contents")
+    store.put("ARRAY:b", b"same contents")
+
+    assert store.get("ARRAY:a") == store.get("ARRAY:b") == b"same contents"
+    assert len(list((tmp_path / REL_BLOB_DIR).iterdir())) == 1
+
+
+def test_shared_between_store_instances(tmp_path: Path) -> None:
+    store_a = LocalDirBlobStore(tmp_path, max_size_bytes=1024 * 1024)
+    store_b = LocalDirBlobStore(tmp_path, max_size_bytes=1024 * 1024)
+
+    store_a.put("IMG:a", b"png")
+    assert store_b.get("IMG:a") == b"png"
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path: Path) -> None:
+    store = LocalDirBlobStore(tmp_path, max_size_bytes=250)
+
+    now = time.time()
+    for idx in range(3):
+        store.put(f"key_{idx}", bytes([idx]) * 100)
+        # Make the access order explicit instead of relying on timer resolution
+        for path in (tmp_path / REL_BLOB_DIR).glob("*.blob"):
+            if path.read_bytes()[0] == idx:
+                os.utime(path, (now - 100 + idx, now - 100 + idx))
+
+    assert store.get("key_0") is None
+    assert store.get("key_1") == bytes([1]) * 100
+    assert store.get("key_2") == bytes([2]) * 100
+    assert store.metrics().evictions == 1
@@ -0,0 +1,54 @@
+from webviz_subsurface._providers.ensemble_surface_provider._provider_impl_file import (
+    SurfaceType,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._surface_inventory_index import (
+    SurfaceInventoryIndex,
+)
+
+
+def _create_index() -> SurfaceInventoryIndex:
+    rows = [
+        (SurfaceType.SIMULATED, 2, "depth", "top", "", "sim/2--top--depth.gri"),
+        (SurfaceType.SIMULATED, 0, "depth", "top", "", "sim/0--top--depth.gri"),
+        (SurfaceType.SIMULATED, 1, "depth", "top", "", "sim/1--top--depth.gri"),
+        (SurfaceType.SIMULATED, 0, "depth", "base", "", "sim/0--base--depth.gri"),
+        (SurfaceType.SIMULATED, 0, "swat", "top", "20200101", "sim/0--top--swat.gri"),
+        (SurfaceType.SIMULATED, 0, "swat", "top", "20210101", "sim/0--top--swat2.gri"),
+        (SurfaceType.OBSERVED, -1, "depth", "top", "", "obs/top--depth.gri"),
+    ]
+    return SurfaceInventoryIndex(
+        type_arr=[row[0] for row in rows],
+        real_arr=[row[1] for row in rows],
+        attribute_arr=[row[2] for row in rows],
+        name_arr=[row[3] for row in rows],
+        datestr_arr=[row[4] for row in rows],
+        path_arr=[row[5] for row in rows],
+    )
+
+
+def test_inventory_index_listings() -> None:
+    index = _create_index()
+
+    assert index.attributes() == ["depth", "swat"]
+    assert index.names_for_attribute("depth") == ["base", "top"]
+    assert not index.names_for_attribute("unknown")
+    assert index.datestrs_for_attribute("depth") == [""]
+    assert index.datestrs_for_attribute("swat") == ["20200101", "20210101"]
+    assert index.realizations() == [0, 1, 2]
+
+
+def test_inventory_index_locate() -> None:
+    index = _create_index()
+
+    assert index.locate(SurfaceType.SIMULATED, "depth", "top", "", [2, 0, 7]) == [
+        "sim/0--top--depth.gri",
+        "sim/2--top--depth.gri",
+    ]
+    assert index.locate("simulated", "depth", "top", "", [1]) == [
+        "sim/1--top--depth.gri"
+    ]
+    assert index.locate(SurfaceType.SIMULATED, "depth", "top", "", []) == []
+    assert index.locate(SurfaceType.SIMULATED, "depth", "mid", "", [0]) == []
+    assert index.locate(SurfaceType.OBSERVED, "depth", "top", "") == [
+        "obs/top--depth.gri"
+    ]
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import List, Optional
+
+import pytest
+
+from webviz_subsurface._providers.ensemble_surface_provider._lazy_surface_resolver import (
+    LazySurfaceResolver,
+    decode_qualified_address,
+    encode_qualified_address,
+)
+from webviz_subsurface._providers.ensemble_surface_provider._types import (
+    QualifiedDiffSurfaceAddress,
+    QualifiedSurfaceAddress,
+)
+from webviz_subsurface._providers.ensemble_surface_provider.ensemble_surface_provider import (
+    ObservedSurfaceAddress,
+    SimulatedSurfaceAddress,
+    StatisticalSurfaceAddress,
+    SurfaceStatistic,
+)
+
+
+def test_encode_and_decode_qualified_addresses() -> None:
+    sta_address = QualifiedSurfaceAddress(
+        "ens__abc",
+        StatisticalSurfaceAddress(
+            attribute="depth/m",
+            name="top",
+            datestr=None,
+            statistic=SurfaceStatistic.P10,
+            realizations=[0, 1, 5],
+        ),
+    )
+    diff_address = QualifiedDiffSurfaceAddress(
+        "ens__abc",
+        SimulatedSurfaceAddress(
+            attribute="depth", name="top", datestr="20200101", realization=3
+        ),
+        "ens__def",
+        ObservedSurfaceAddress(attribute="depth", name="top", datestr="20200101"),
+    )
+
+    for qualified_address in [sta_address, diff_address]:
+        encoded = encode_qualified_address(qualified_address)
+        assert "/" not in encoded
+        assert decode_qualified_address(encoded) == qualified_address
+
+
+def test_decode_invalid_address() -> None:
+    with pytest.raises(ValueError):
+        decode_qualified_address("not-an-address")
+
+
+def test_get_or_create_coalesces_concurrent_calls() -> None:
+    resolver = LazySurfaceResolver()
+    store: List[str] = []
+    num_creates = 0
+
+    def lookup() -> Optional[str]:
+        return store[0] if store else None
+
+    def create() -> str:
+        nonlocal num_creates
+        num_creates += 1
+        time.sleep(0.05)
+        store.append("surface")
+        return "surface"
+
+    results: List[Optional[str]] = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(resolver.get_or_create("key", lookup, create))
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["surface"] * 5
+    assert num_creates == 1
+    # pylint: disable=protected-access
+    assert not resolver._locks
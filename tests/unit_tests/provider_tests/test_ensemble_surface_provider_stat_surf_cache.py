@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import xtgeo
+
+from webviz_subsurface._providers.ensemble_surface_provider._stat_surf_cache import (
+    StatSurfCache,
+)
+from webviz_subsurface._providers.ensemble_surface_provider.ensemble_surface_provider import (
+    StatisticalSurfaceAddress,
+    SurfaceStatistic,
+)
+from webviz_subsurface._utils.disk_lru_dir import source_files_version
+
+
+def _make_address(
+    realizations: List[int], name: str = "top"
+) -> StatisticalSurfaceAddress:
+    return StatisticalSurfaceAddress(
+        attribute="depth",
+        name=name,
+        datestr=None,
+        statistic=SurfaceStatistic.MEAN,
+        realizations=realizations,
+    )
+
+
+def _make_surface() -> xtgeo.RegularSurface:
+    values = np.ma.masked_array(np.arange(35, dtype=np.float64).reshape(7, 5))
+    values[1, 2] = np.ma.masked
+    return xtgeo.RegularSurface(
+        ncol=7,
+        nrow=5,
+        xinc=25.0,
+        yinc=50.0,
+        xori=100.0,
+        yori=200.0,
+        rotation=30.0,
+        values=values,
+    )
+
+
+def test_store_and_fetch_with_canonical_realizations(tmp_path: Path) -> None:
+    cache = StatSurfCache(tmp_path, max_size_bytes=1024 * 1024)
+    surface = _make_surface()
+
+    assert cache.fetch("prov", "v1", _make_address([2, 1, 0])) is None
+    cache.store("prov", "v1", _make_address([2, 1, 0]), surface)
+
+    fetched = cache.fetch("prov", "v1", _make_address([0, 1, 1, 2]))
+    assert fetched is not None
+    assert fetched.compare_topology(surface)
+    assert fetched.rotation == surface.rotation
+    assert np.array_equal(fetched.values.mask, surface.values.mask)
+    assert np.array_equal(fetched.values.compressed(), surface.values.compressed())
+
+    assert cache.fetch("other_prov", "v1", _make_address([0, 1, 2])) is None
+    assert cache.fetch("prov", "v1", _make_address([0, 1])) is None
+    assert cache.fetch("prov", "v2", _make_address([0, 1, 2])) is None
+
+
+def test_least_recently_used_surfaces_are_evicted(tmp_path: Path) -> None:
+    surface = _make_surface()
+    probe_cache = StatSurfCache(tmp_path / "probe", max_size_bytes=1024 * 1024)
+    probe_cache.store("prov", "v1", _make_address([0]), surface)
+    entry_size = sum(p.stat().st_size for p in (tmp_path / "probe").glob("*.rawsurf"))
+
+    cache = StatSurfCache(tmp_path / "cache", max_size_bytes=2 * entry_size)
+    cache.store("prov", "v1", _make_address([0], "a"), surface)
+    cache.store("prov", "v1", _make_address([0], "b"), surface)
+
+    # Make sure the access of "a" gets a later timestamp than the store of "b"
+    for path in (tmp_path / "cache").glob("*.rawsurf"):
+        os.utime(path, (time.time() - 10, time.time() - 10))
+    assert cache.fetch("prov", "v1", _make_address([0], "a")) is not None
+
+    cache.store("prov", "v1", _make_address([0], "c"), surface)
+
+    assert cache.fetch("prov", "v1", _make_address([0], "a")) is not None
+    assert cache.fetch("prov", "v1", _make_address([0], "b")) is None
+    assert cache.fetch("prov", "v1", _make_address([0], "c")) is not None
+
+
+def test_get_or_create_only_creates_once(tmp_path: Path) -> None:
+    cache = StatSurfCache(tmp_path, max_size_bytes=1024 * 1024)
+    num_creates = 0
+
+    def create_surface() -> xtgeo.RegularSurface:
+        nonlocal num_creates
+        num_creates += 1
+        time.sleep(0.1)
+        return _make_surface()
+
+    threads = [
+        threading.Thread(
+            target=cache.get_or_create,
+            args=("prov", "v1", _make_address([0, 1]), create_surface),
+        )
+        for _i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert num_creates == 1
+    assert cache.get_or_create("prov", "v1", _make_address([1, 0]), create_surface)
+    assert num_creates == 1
+
+
+def test_source_files_version_changes_when_files_are_modified(tmp_path: Path) -> None:
+    surf_fn = str(tmp_path / "surf.gri")
+    Path(surf_fn).write_bytes(b"original")
+    version = source_files_version([surf_fn])
+
+    assert source_files_version([surf_fn]) == version
+    stat = os.stat(surf_fn)
+    os.utime(surf_fn, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert source_files_version([surf_fn]) != version
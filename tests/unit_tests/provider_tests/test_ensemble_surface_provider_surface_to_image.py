@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import xtgeo
+from PIL import Image
+
+from webviz_subsurface._providers.ensemble_surface_provider._surface_to_image import (
+    SurfaceImageEncoder,
+    SurfaceImageFormat,
+    surface_to_png_bytes_optimized,
+)
+
+
+def _create_surface(ncol: int, nrow: int) -> xtgeo.RegularSurface:
+    values = np.ma.masked_array(
+        np.linspace(1000, 2000, ncol * nrow).reshape(ncol, nrow)
+    )
+    values[0, :2] = np.ma.masked
+    return xtgeo.RegularSurface(
+        ncol=ncol, nrow=nrow, xinc=25.0, yinc=25.0, values=values
+    )
+
+
+def _decode_png(png_bytes: bytes) -> np.ndarray:
+    return np.asarray(Image.open(io.BytesIO(png_bytes)).convert("RGBA"))
+
+
+def test_png_matches_optimized_encoder() -> None:
+    surface = _create_surface(7, 5)
+    encoder = SurfaceImageEncoder()
+
+    expected = _decode_png(surface_to_png_bytes_optimized(surface))
+    actual = _decode_png(encoder.encode_surface(surface, SurfaceImageFormat.PNG))
+
+    assert actual.shape == (5, 7, 4)
+    np.testing.assert_array_equal(actual, expected)
+    # Masked nodes are in the bottom left corner of the image, and are transparent
+    assert actual[-2:, 0, 3].tolist() == [0, 0]
+
+
+def test_raw_rgba_and_buffer_reuse() -> None:
+    encoder = SurfaceImageEncoder()
+
+    surface = _create_surface(20, 10)
+    rgba_bytes = encoder.encode_surface(surface, SurfaceImageFormat.RGBA)
+    assert len(rgba_bytes) == 20 * 10 * 4
+
+    # Smaller images reuse the buffers from the larger one
+    values = np.array([[0.0, np.nan], [1.0, 0.5]])
+    rgba = np.frombuffer(
+        encoder.encode_image_values(values, SurfaceImageFormat.RGBA), dtype=np.uint8
+    ).reshape(2, 2, 4)
+
+    assert rgba[0, 0].tolist() == [0, 0, 0, 255]
+    assert rgba[0, 1].tolist() == [0, 0, 0, 0]
+    assert rgba[1, 0].tolist() == [255, 255, 255, 255]
+    assert rgba[1, 1].tolist() == [127, 255, 255, 255]
+
+
+def test_all_undefined_values() -> None:
+    values = np.full((3, 4), np.nan)
+    rgba = SurfaceImageEncoder().values_to_rgba_array(values)
+    assert rgba.shape == (3, 4, 4)
+    assert not rgba.any()
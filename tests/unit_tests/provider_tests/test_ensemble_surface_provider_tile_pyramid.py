@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from webviz_subsurface._providers.ensemble_surface_provider._surface_tile_pyramid import (
+    DownsampleMethod,
+    calc_num_tile_levels,
+    create_tile_pyramid_meta,
+    downsample_values,
+    extract_tile_as_float32_array,
+)
+
+
+def test_create_tile_pyramid_meta() -> None:
+    assert calc_num_tile_levels(256, 100, 256) == 1
+    assert calc_num_tile_levels(257, 100, 256) == 2
+    assert calc_num_tile_levels(10, 1000, 256) == 3
+
+    meta = create_tile_pyramid_meta(1000, 300, 25.0, 50.0, 256)
+    assert meta.tile_size == 256
+    assert len(meta.levels) == 3
+
+    coarsest, _middle, finest = meta.levels
+    assert (coarsest.x_count, coarsest.y_count) == (250, 75)
+    assert (coarsest.x_inc, coarsest.y_inc) == (100.0, 200.0)
+    assert (coarsest.x_tile_count, coarsest.y_tile_count) == (1, 1)
+    assert (finest.x_count, finest.y_count) == (1000, 300)
+    assert (finest.x_tile_count, finest.y_tile_count) == (4, 2)
+
+
+def test_downsample_values_mean_ignores_nan() -> None:
+    values = np.arange(15, dtype=np.float32).reshape(5, 3)
+    values[0, 0] = np.nan
+    values[4, 2] = np.nan
+
+    downsampled = downsample_values(values, 2, DownsampleMethod.MEAN)
+
+    assert downsampled.shape == (3, 2)
+    assert downsampled.dtype == np.float32
+    assert downsampled[0, 0] == pytest.approx((1 + 3 + 4) / 3)
+    assert downsampled[0, 1] == pytest.approx((2 + 5) / 2)
+    assert downsampled[2, 0] == pytest.approx((12 + 13) / 2)
+    assert np.isnan(downsampled[2, 1])
+
+
+def test_downsample_values_nearest() -> None:
+    values = np.arange(15, dtype=np.float32).reshape(5, 3)
+
+    downsampled = downsample_values(values, 2, DownsampleMethod.NEAREST)
+
+    np.testing.assert_array_equal(downsampled, [[0, 2], [6, 8], [12, 14]])
+
+
+def test_extract_tile_as_float32_array() -> None:
+    values = np.arange(15, dtype=np.float32).reshape(5, 3)
+
+    tile_bytes = extract_tile_as_float32_array(values, 1, 0, 4)
+    tile = np.frombuffer(tile_bytes.getvalue(), dtype=np.float32).reshape(4, 4)
+
+    # Same layout as the full array, rotated so the last row holds y index 0
+    expected = np.full((4, 4), np.nan, dtype=np.float32)
+    expected[0, :3] = values[4]
+    np.testing.assert_array_equal(np.rot90(tile, k=-1), expected)
+
+    with pytest.raises(IndexError):
+        extract_tile_as_float32_array(values, 0, 1, 4)
@@ -0,0 +1,52 @@
+import datetime
+from pathlib import Path
+
+import pytest
+from pyarrow import feather
+
+# resdata and res2df are only available for Linux
+pytest.importorskip("res2df")
+resdata_summary = pytest.importorskip("resdata.summary")
+
+# pylint: disable=wrong-import-position
+from webviz_subsurface.smry2arrow_batch import (
+    _convert_single_smry_file,
+    _convert_single_smry_file_direct,
+)
+
+
+def _write_synthetic_smry_files(case_path: Path) -> str:
+    writer = resdata_summary.Summary.writer(
+        str(case_path), datetime.datetime(2020, 1, 1), 10, 10, 10
+    )
+    writer.add_variable("FOPT", unit="SM3")
+    writer.add_variable("FOPR", unit="SM3/DAY")
+    writer.add_variable("WOPR", wgname="OP_1", unit="SM3/DAY")
+    writer.add_variable("BPR", num=567, unit="BARSA")
+
+    for step, sim_days in enumerate([0, 31, 60, 91, 121], start=1):
+        t_step = writer.add_t_step(step, sim_days)
+        t_step["FOPT"] = 100.0 * step
+        t_step["FOPR"] = 10.0 + step
+        t_step["WOPR:OP_1"] = 5.0 + step
+        t_step["BPR:567"] = 250.0 - step
+
+    writer.fwrite()
+    return str(case_path) + ".UNSMRY"
+
+
+def test_direct_conversion_matches_res2df(tmp_path: Path) -> None:
+    smry_filename = _write_synthetic_smry_files(tmp_path / "CASE")
+
+    res2df_arrow_filename = str(tmp_path / "res2df.arrow")
+    direct_arrow_filename = str(tmp_path / "direct.arrow")
+    _convert_single_smry_file(smry_filename, res2df_arrow_filename)
+    _convert_single_smry_file_direct(smry_filename, direct_arrow_filename)
+
+    res2df_table = feather.read_table(res2df_arrow_filename)
+    direct_table = feather.read_table(direct_arrow_filename)
+
+    assert direct_table.schema.equals(res2df_table.schema, check_metadata=True)
+    assert direct_table.equals(res2df_table, check_metadata=True)
+    for field in res2df_table.schema:
+        assert direct_table.schema.field(field.name).metadata == field.metadata
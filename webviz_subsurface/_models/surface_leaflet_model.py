@@ -1,12 +1,12 @@
 import base64
-import io
 from typing import Optional
 
 import numpy as np
 import xtgeo
-from PIL import Image
 
-from webviz_subsurface._datainput.image_processing import array2d_to_png
+from webviz_subsurface._providers.ensemble_surface_provider._surface_to_image import (
+    image_values_to_image_bytes,
+)
 
 
 class SurfaceLeafletModel:
@@ -35,7 +35,9 @@ class SurfaceLeafletModel:
 
     @property
     def img_url(self) -> str:
-        return array2d_to_png(self.scaled_zvalues.copy())
+        png_bytes = image_values_to_image_bytes(self.zvalues)
+        base64_data = base64.b64encode(png_bytes).decode("ascii")
+        return f"data:image/png;base64,{base64_data}"
 
     @property
     def min_val(self) -> float:
@@ -53,12 +55,7 @@ class SurfaceLeafletModel:
 
     @property
     def map_scale(self) -> float:
-        img = Image.open(
-            io.BytesIO(
-                base64.b64decode(array2d_to_png(self.scaled_zvalues.copy())[22:])
-            )
-        )
-        width, height = img.size
+        height, width = self.zvalues.shape
         if width * height >= 300 * 300:
             return 1.0
         ratio = (1000**2) / (width * height)
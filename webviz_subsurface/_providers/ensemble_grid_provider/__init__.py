@@ -1,3 +1,7 @@
-from .ensemble_grid_provider import EnsembleGridProvider
+from .ensemble_grid_provider import (
+    EnsembleGridProvider,
+    GridPropertyStatistic,
+    StatisticalGridPropertyAddress,
+)
 from .ensemble_grid_provider_factory import EnsembleGridProviderFactory
 from .grid_viz_service import CellFilter, GridVizService, PickResult, PropertySpec, Ray
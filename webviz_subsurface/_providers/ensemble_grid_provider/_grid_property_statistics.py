@@ -0,0 +1,230 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+from ._grid_property_store import GridPropertyStore
+from .ensemble_grid_provider import (
+    EnsembleGridProvider,
+    GridPropertyStatistic,
+    StatisticalGridPropertyAddress,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Default upper bound on the memory used for the values of one chunk of cells, for
+# all the realizations
+DEFAULT_CHUNK_SIZE_BYTES = 64 * 1024 * 1024
+
+_PERCENTILES = {
+    GridPropertyStatistic.P10: 10,
+    GridPropertyStatistic.P90: 90,
+}
+
+
+def calc_property_statistics_chunked(
+    statistics: Sequence[GridPropertyStatistic],
+    realization_values: Sequence[np.ndarray],
+    chunk_size_bytes: int = DEFAULT_CHUNK_SIZE_BYTES,
+) -> Optional[Dict[GridPropertyStatistic, np.ndarray]]:
+    """Calculate the statistics per cell across the property values of the
+    realizations. Returns None if the realizations don't have the same number of
+    cells.
+
+    The cells are processed in chunks, gathering the values of all realizations for
+    one chunk at a time. When the realization values are memory mapped, only about
+    `chunk_size_bytes` of them are held in memory at once, regardless of the size of
+    the grid. The percentiles are exact.
+
+    Cells that are undefined (NaN) in any of the realizations will be NaN in the
+    result.
+    """
+    timer = PerfTimer()
+
+    num_reals = len(realization_values)
+    if num_reals == 0:
+        return None
+
+    num_cells = len(realization_values[0])
+    if any(len(values) != num_cells for values in realization_values):
+        return None
+
+    unique_statistics = set(statistics)
+    results: Dict[GridPropertyStatistic, np.ndarray] = {
+        stat: np.empty(num_cells, dtype=np.float32) for stat in unique_statistics
+    }
+    requested_percentiles = [stat for stat in _PERCENTILES if stat in unique_statistics]
+
+    cells_per_chunk = max(1, min(num_cells, chunk_size_bytes // (num_reals * 4)))
+    chunk_buffer = np.empty((num_reals, cells_per_chunk), dtype=np.float32)
+
+    for start_idx in range(0, num_cells, cells_per_chunk):
+        end_idx = min(start_idx + cells_per_chunk, num_cells)
+        chunk = chunk_buffer[:, : end_idx - start_idx]
+        for real_idx, values in enumerate(realization_values):
+            chunk[real_idx] = values[start_idx:end_idx]
+
+        for stat in unique_statistics:
+            if stat == GridPropertyStatistic.MEAN:
+                results[stat][start_idx:end_idx] = np.mean(
+                    chunk, axis=0, dtype=np.float64
+                )
+            elif stat == GridPropertyStatistic.STDDEV:
+                results[stat][start_idx:end_idx] = np.std(
+                    chunk, axis=0, dtype=np.float64
+                )
+            elif stat == GridPropertyStatistic.MINIMUM:
+                results[stat][start_idx:end_idx] = np.min(chunk, axis=0)
+            elif stat == GridPropertyStatistic.MAXIMUM:
+                results[stat][start_idx:end_idx] = np.max(chunk, axis=0)
+
+        # Done last, since the chunk is partially sorted in place
+        if requested_percentiles:
+            percentile_values = np.percentile(
+                chunk,
+                [_PERCENTILES[stat] for stat in requested_percentiles],
+                axis=0,
+                overwrite_input=True,
+            )
+            for stat, values in zip(requested_percentiles, percentile_values):
+                results[stat][start_idx:end_idx] = values
+
+    LOGGER.debug(
+        f"Calculated grid property statistics in: {timer.elapsed_s():.2f}s "
+        f"[#cells={num_cells}, #realizations={num_reals}, "
+        f"#chunks={-(-num_cells // cells_per_chunk)}]"
+    )
+
+    return results
+
+
+def get_or_calc_statistical_property_values(
+    provider: EnsembleGridProvider,
+    address: StatisticalGridPropertyAddress,
+    property_store: Optional[GridPropertyStore],
+    data_version: str,
+) -> Optional[np.ndarray]:
+    """Returns the values of the statistical property, using the property store to
+    cache the result if available. The `data_version` should identify the state of
+    the grid files of all the realizations in the address.
+
+    Since reading the realizations' values is the expensive part, all the
+    statistics are calculated in the same pass, and the ones that weren't requested
+    are stored for later."""
+    if property_store is None:
+        realization_values = _load_all_realization_values(provider, address)
+        if realization_values is None:
+            return None
+        results = _calc_all_statistics(address, realization_values)
+        return results[address.statistic] if results else None
+
+    provider_id = provider.provider_id()
+    values = property_store.fetch_statistic(provider_id, data_version, address)
+    if values is not None:
+        return values
+
+    # Loading the realizations' values may take the store's locks for the
+    # realizations, so it is done before taking the lock for the statistic. The
+    # store returns the values memory mapped, so they aren't all held in memory.
+    realization_values = _load_all_realization_values(provider, address)
+    if realization_values is None:
+        return None
+
+    def create_and_store_others() -> Optional[np.ndarray]:
+        results = _calc_all_statistics(address, realization_values)
+        if results is None:
+            return None
+
+        for stat, stat_values in results.items():
+            if stat != address.statistic:
+                other_address = StatisticalGridPropertyAddress(
+                    property_name=address.property_name,
+                    datestr=address.datestr,
+                    statistic=stat,
+                    realizations=address.realizations,
+                )
+                property_store.store_statistic(
+                    provider_id, data_version, other_address, stat_values
+                )
+
+        # Stored by the caller
+        return results[address.statistic]
+
+    return property_store.get_or_create_statistic(
+        provider_id, data_version, address, create_and_store_others
+    )
+
+
+def _load_all_realization_values(
+    provider: EnsembleGridProvider,
+    address: StatisticalGridPropertyAddress,
+) -> Optional[List[np.ndarray]]:
+    timer = PerfTimer()
+
+    realizations = sorted({int(real) for real in address.realizations})
+    if not realizations:
+        return None
+
+    # Grids of the same size may still differ, so the realizations must have
+    # fingerprints that establish that they share geometry
+    fingerprints = {provider.get_geometry_fingerprint(real) for real in realizations}
+    if None in fingerprints:
+        LOGGER.warning(
+            f"Cannot calculate statistics of {address.property_name}, not all the "
+            f"realizations have grid geometry fingerprints"
+        )
+        return None
+    if len(fingerprints) > 1:
+        LOGGER.warning(
+            f"Cannot calculate statistics of {address.property_name}, the "
+            f"realizations have {len(fingerprints)} different grid geometries"
+        )
+        return None
+
+    realization_values: List[np.ndarray] = []
+    for real in realizations:
+        values = _load_realization_values(provider, address, real)
+        if values is None:
+            LOGGER.warning(
+                f"Cannot calculate statistics of {address.property_name}, "
+                f"no values found for realization {real}"
+            )
+            return None
+        realization_values.append(values)
+
+    LOGGER.debug(
+        f"Loaded {address.property_name} for {len(realizations)} realizations "
+        f"in: {timer.elapsed_s():.2f}s"
+    )
+
+    return realization_values
+
+
+def _calc_all_statistics(
+    address: StatisticalGridPropertyAddress,
+    realization_values: List[np.ndarray],
+) -> Optional[Dict[GridPropertyStatistic, np.ndarray]]:
+    results = calc_property_statistics_chunked(
+        list(GridPropertyStatistic), realization_values
+    )
+    if results is None:
+        LOGGER.warning(
+            f"Cannot calculate statistics of {address.property_name}, the "
+            f"realizations have different numbers of cells"
+        )
+    return results
+
+
+def _load_realization_values(
+    provider: EnsembleGridProvider,
+    address: StatisticalGridPropertyAddress,
+    realization: int,
+) -> Optional[np.ndarray]:
+    if address.datestr:
+        return provider.get_dynamic_property_values(
+            address.property_name, address.datestr, realization
+        )
+
+    return provider.get_static_property_values(address.property_name, realization)
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from webviz_subsurface._utils.disk_lru_dir import DiskLruDir, touch
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+from .ensemble_grid_provider import (
+    GridPropertyStatistic,
+    StatisticalGridPropertyAddress,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+FILE_EXTENSION = ".npy"
+
+
+class GridPropertyStore:
+    """On-disk store of grid property values that can be shared between processes.
+
+    Each property of each realization, and for dynamic properties each date, is
+    extracted from the grid files once and stored as a flat array. Continuous
+    properties are stored as float32, while discrete properties keep their integer
+    dtype. Later requests memory map the array, so switching between properties and
+    dates doesn't need to parse the grid files again.
+
+    The total size of the stored arrays is kept within `max_size_bytes` by evicting
+    the least recently used arrays, using the files' modification times to track
+    access.
+
+    The `data_version` passed along with each property should identify the state of
+    the grid files that the values are extracted from, see `source_files_version()`,
+    so that values from since modified files are never returned.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self._lru_dir = DiskLruDir(cache_dir, FILE_EXTENSION, max_size_bytes)
+
+    def fetch(
+        self,
+        provider_id: str,
+        data_version: str,
+        realization: int,
+        property_name: str,
+        datestr: Optional[str],
+    ) -> Optional[np.ndarray]:
+        """Returns a read only memory map of the stored values, or None if the
+        property hasn't been stored"""
+        return self._fetch(
+            _compose_property_key(
+                provider_id, data_version, realization, property_name, datestr
+            )
+        )
+
+    def store(
+        self,
+        provider_id: str,
+        data_version: str,
+        realization: int,
+        property_name: str,
+        datestr: Optional[str],
+        values: np.ndarray,
+    ) -> None:
+        self._store(
+            _compose_property_key(
+                provider_id, data_version, realization, property_name, datestr
+            ),
+            _as_stored_values(values),
+        )
+
+    def get_or_create(
+        self,
+        provider_id: str,
+        data_version: str,
+        realization: int,
+        property_name: str,
+        datestr: Optional[str],
+        create_func: Callable[[], Optional[np.ndarray]],
+    ) -> Optional[np.ndarray]:
+        """Returns the stored values if present, otherwise calls `create_func()` and
+        stores the result. Concurrent calls for the same property, also from other
+        processes, are serialized so that the grid files are only read once."""
+        return self._get_or_create(
+            _compose_property_key(
+                provider_id, data_version, realization, property_name, datestr
+            ),
+            create_func,
+            f"real={realization}, prop={property_name}, date={datestr}",
+        )
+
+    def fetch_statistic(
+        self,
+        provider_id: str,
+        data_version: str,
+        address: StatisticalGridPropertyAddress,
+    ) -> Optional[np.ndarray]:
+        return self._fetch(_compose_statistic_key(provider_id, data_version, address))
+
+    def store_statistic(
+        self,
+        provider_id: str,
+        data_version: str,
+        address: StatisticalGridPropertyAddress,
+        values: np.ndarray,
+    ) -> None:
+        self._store(
+            _compose_statistic_key(provider_id, data_version, address),
+            _as_stored_values(values),
+        )
+
+    def get_or_create_statistic(
+        self,
+        provider_id: str,
+        data_version: str,
+        address: StatisticalGridPropertyAddress,
+        create_func: Callable[[], Optional[np.ndarray]],
+    ) -> Optional[np.ndarray]:
+        """As `get_or_create()`, for statistical properties. These are keyed by the
+        set of realizations in the address, so the order of the realizations and
+        any duplicates don't matter."""
+        return self._get_or_create(
+            _compose_statistic_key(provider_id, data_version, address),
+            create_func,
+            f"stat={GridPropertyStatistic(address.statistic).value}, "
+            f"prop={address.property_name}, date={address.datestr}, "
+            f"#reals={len(set(address.realizations))}",
+        )
+
+    def _fetch(self, key: str) -> Optional[np.ndarray]:
+        full_path = self._lru_dir.path_for(key)
+
+        try:
+            values = np.load(full_path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+
+        touch(full_path)
+
+        return values
+
+    def _store(self, key: str, values: np.ndarray) -> None:
+        if self._lru_dir.write_atomically(
+            self._lru_dir.path_for(key), lambda f: np.save(f, values)
+        ):
+            self._lru_dir.evict_if_needed()
+
+    def _get_or_create(
+        self,
+        key: str,
+        create_func: Callable[[], Optional[np.ndarray]],
+        dbg_str: str,
+    ) -> Optional[np.ndarray]:
+        values = self._fetch(key)
+        if values is not None:
+            return values
+
+        with self._lru_dir.locked(key):
+            # Someone else may have created it while we were waiting for the lock
+            values = self._fetch(key)
+            if values is not None:
+                return values
+
+            timer = PerfTimer()
+            created_values = create_func()
+            if created_values is None:
+                return None
+            values = _as_stored_values(created_values)
+            et_create_s = timer.lap_s()
+
+            self._store(key, values)
+            et_store_s = timer.lap_s()
+
+        LOGGER.debug(
+            f"Extracted grid property into cache in: {timer.elapsed_s():.2f}s "
+            f"(create={et_create_s:.2f}s, store={et_store_s:.2f}s, {dbg_str})"
+        )
+
+        # Return the memory mapped copy when the values could be stored, so that
+        # callers don't hold on to the extracted values
+        mapped_values = self._fetch(key)
+        return mapped_values if mapped_values is not None else values
+
+
+def _as_stored_values(values: np.ndarray) -> np.ndarray:
+    """Flat, contiguous copy of the values as they are stored. Floating point
+    values are narrowed to float32, while discrete values keep their integer dtype
+    so that their codes and undefined value are preserved."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.floating):
+        return np.ascontiguousarray(values, dtype=np.float32).ravel()
+    return np.ascontiguousarray(values).ravel()
+
+
+def _compose_property_key(
+    provider_id: str,
+    data_version: str,
+    realization: int,
+    property_name: str,
+    datestr: Optional[str],
+) -> str:
+    # Realizations are often numpy integers, which have a different repr()
+    canonical_key = (
+        provider_id,
+        data_version,
+        int(realization),
+        property_name,
+        datestr,
+    )
+    return hashlib.md5(repr(canonical_key).encode()).hexdigest()  # nosec
+
+
+def _compose_statistic_key(
+    provider_id: str, data_version: str, address: StatisticalGridPropertyAddress
+) -> str:
+    canonical_key = (
+        "statistic",
+        provider_id,
+        data_version,
+        address.property_name,
+        address.datestr,
+        GridPropertyStatistic(address.statistic).value,
+        tuple(sorted({int(real) for real in address.realizations})),
+    )
+    return hashlib.md5(repr(canonical_key).encode()).hexdigest()  # nosec
@@ -0,0 +1,106 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, List, Optional, Tuple, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ResidentGridInfo:
+    key: str
+    size_bytes: int
+
+
+@dataclass(frozen=True)
+class GridWorkerCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size_bytes: int
+    max_size_bytes: int
+    # Ordered from least to most recently used
+    resident_grids: List[ResidentGridInfo]
+
+
+class GridWorkerCache(Generic[T]):
+    """Thread safe LRU cache of grid workers, bounded by the total size in bytes of
+    the grids and other data that the workers hold. Use `update_size()` when the
+    data held by a cached worker grows or shrinks.
+
+    The most recently added worker is always kept, even if it alone exceeds the
+    budget, since it is about to be used.
+    """
+
+    def __init__(self, max_size_bytes: int) -> None:
+        self._max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[T, int]]" = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: str, worker: T, size_bytes: int) -> None:
+        with self._lock:
+            existing_entry = self._entries.pop(key, None)
+            if existing_entry is not None:
+                self._size_bytes -= existing_entry[1]
+
+            self._entries[key] = (worker, size_bytes)
+            self._size_bytes += size_bytes
+
+            self._evict_until_within_budget()
+
+    def update_size(self, key: str, worker: T, size_bytes: int) -> None:
+        """Update the size of the worker if it is still cached, and mark it as
+        recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not worker:
+                return
+
+            self._size_bytes += size_bytes - entry[1]
+            self._entries[key] = (worker, size_bytes)
+            self._entries.move_to_end(key)
+
+            self._evict_until_within_budget()
+
+    def stats(self) -> GridWorkerCacheStats:
+        with self._lock:
+            return GridWorkerCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size_bytes=self._size_bytes,
+                max_size_bytes=self._max_size_bytes,
+                resident_grids=[
+                    ResidentGridInfo(key=key, size_bytes=size_bytes)
+                    for key, (_worker, size_bytes) in self._entries.items()
+                ],
+            )
+
+    def _evict_until_within_budget(self) -> None:
+        while self._size_bytes > self._max_size_bytes and len(self._entries) > 1:
+            key, (_worker, size_bytes) = self._entries.popitem(last=False)
+            self._size_bytes -= size_bytes
+            self._evictions += 1
+            LOGGER.info(
+                f"Evicted grid worker {key} ({size_bytes / (1024*1024):.2f}MB), "
+                f"cache size is now {self._size_bytes / (1024*1024):.2f}MB "
+                f"in {len(self._entries)} grids"
+            )
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import xtgeo
+
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+LOGGER = logging.getLogger(__name__)
+
+REL_VTK_GEOMETRY_DIR = "vtk_geometry"
+
+_POINT_DIMS_FILE = "point_dims.npy"
+_VERTEX_ARR_FILE = "vertex_arr.npy"
+_CONN_ARR_FILE = "conn_arr.npy"
+_INACTIVE_ARR_FILE = "inactive_arr.npy"
+
+
+@dataclass(frozen=True)
+class EsgGeometry:
+    """Geometry data for creating a VTK explicit structured grid.
+    Note that the z values of the vertices are negated, so they're ready for VTK."""
+
+    point_dims: np.ndarray
+    vertex_arr: np.ndarray
+    conn_arr: np.ndarray
+    inactive_arr: np.ndarray
+
+    def cell_count(self) -> int:
+        return int(np.prod(self.point_dims - 1))
+
+
+def esg_geometry_from_xtgeo_grid(xtg_grid: xtgeo.Grid) -> EsgGeometry:
+    pt_dims, vertex_arr, conn_arr, inactive_arr = xtg_grid.get_vtk_esg_geometry_data()
+    vertex_arr = vertex_arr.reshape(-1, 3)
+    vertex_arr[:, 2] *= -1
+
+    return EsgGeometry(
+        point_dims=np.asarray(pt_dims, dtype=np.int64),
+        vertex_arr=vertex_arr,
+        conn_arr=np.asarray(conn_arr, dtype=np.int64),
+        inactive_arr=np.asarray(inactive_arr, dtype=np.int64),
+    )
+
+
+def calc_grid_geometry_fingerprint(xtg_grid: xtgeo.Grid) -> str:
+    """Hash of the grid's dimensions, pillars, corner depths and active cells, which
+    identifies grids with identical geometry across realizations"""
+    # pylint: disable=protected-access
+    hasher = hashlib.sha256()
+    hasher.update(np.asarray(xtg_grid.dimensions, dtype=np.int64).tobytes())
+    for arr in [xtg_grid._coordsv, xtg_grid._zcornsv, xtg_grid._actnumsv]:
+        if arr is not None:
+            hasher.update(np.ascontiguousarray(arr).tobytes())
+
+    return hasher.hexdigest()
+
+
+def write_deduplicated_esg_geometries(
+    provider_dir: Path, real_to_grid_path: Dict[int, Path], fformat: Optional[str]
+) -> Dict[int, str]:
+    """Convert the grid of each realization and write its geometry to the provider's
+    backing store, but only once per unique geometry. Returns the geometry
+    fingerprint of each realization."""
+    timer = PerfTimer()
+
+    real_to_fingerprint: Dict[int, str] = {}
+    for real, grid_path in real_to_grid_path.items():
+        xtg_grid = xtgeo.grid_from_file(grid_path, fformat=fformat)
+        fingerprint = calc_grid_geometry_fingerprint(xtg_grid)
+        real_to_fingerprint[real] = fingerprint
+
+        geometry_dir = esg_geometry_dir(provider_dir, fingerprint)
+        if not geometry_dir.exists():
+            write_esg_geometry(geometry_dir, esg_geometry_from_xtgeo_grid(xtg_grid))
+
+    LOGGER.debug(
+        f"Wrote {len(set(real_to_fingerprint.values()))} unique VTK grid geometries "
+        f"for {len(real_to_fingerprint)} realizations in: {timer.elapsed_s():.2f}s"
+    )
+
+    return real_to_fingerprint
+
+
+def esg_geometry_dir(provider_dir: Path, fingerprint: str) -> Path:
+    return provider_dir / REL_VTK_GEOMETRY_DIR / fingerprint
+
+
+def write_esg_geometry(geometry_dir: Path, geometry: EsgGeometry) -> None:
+    """Write the geometry as .npy files that can be memory mapped. The files are
+    written to a temp directory that is then moved into place, so readers never see
+    partially written geometry."""
+    timer = PerfTimer()
+
+    geometry_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = geometry_dir.with_name(geometry_dir.name + f"__{uuid.uuid4().hex}.tmp")
+    tmp_dir.mkdir()
+    try:
+        np.save(tmp_dir / _POINT_DIMS_FILE, geometry.point_dims)
+        np.save(tmp_dir / _VERTEX_ARR_FILE, geometry.vertex_arr)
+        np.save(tmp_dir / _CONN_ARR_FILE, geometry.conn_arr)
+        np.save(tmp_dir / _INACTIVE_ARR_FILE, geometry.inactive_arr)
+        if geometry_dir.exists():
+            shutil.rmtree(geometry_dir)
+        os.replace(tmp_dir, geometry_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    LOGGER.debug(
+        f"Wrote VTK grid geometry with {geometry.cell_count()} cells "
+        f"in: {timer.elapsed_s():.2f}s ({geometry_dir})"
+    )
+
+
+def read_esg_geometry(geometry_dir: Path) -> Optional[EsgGeometry]:
+    """Returns None if no geometry has been written to the directory.
+
+    The arrays are memory mapped copy-on-write, so they can be handed to VTK without
+    copying, while the pages are shared between processes and the files are left
+    untouched.
+    """
+    try:
+        return EsgGeometry(
+            point_dims=np.load(geometry_dir / _POINT_DIMS_FILE),
+            vertex_arr=np.load(geometry_dir / _VERTEX_ARR_FILE, mmap_mode="c"),
+            conn_arr=np.load(geometry_dir / _CONN_ARR_FILE, mmap_mode="c"),
+            inactive_arr=np.load(geometry_dir / _INACTIVE_ARR_FILE, mmap_mode="c"),
+        )
+    except FileNotFoundError:
+        return None
@@ -3,13 +3,14 @@ import logging
 import numpy as np
 import xtgeo
 from vtkmodules.util.numpy_support import (
+    get_vtk_to_numpy_typemap,
     numpy_to_vtk,
     numpy_to_vtkIdTypeArray,
     vtk_to_numpy,
 )
 
 # pylint: disable=no-name-in-module,
-from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonCore import VTK_ID_TYPE, vtkPoints
 
 # pylint: disable=no-name-in-module,
 from vtkmodules.vtkCommonDataModel import (
@@ -20,8 +21,13 @@ from vtkmodules.vtkCommonDataModel import (
 
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
+from ._vtk_esg_geometry import EsgGeometry, esg_geometry_from_xtgeo_grid
+
 LOGGER = logging.getLogger(__name__)
 
+# Numpy dtype matching vtkIdType, which is either 32 or 64 bit depending on the build
+_VTK_ID_DTYPE = np.dtype(get_vtk_to_numpy_typemap()[VTK_ID_TYPE])
+
 
 # -----------------------------------------------------------------------------
 def xtgeo_grid_to_vtk_explicit_structured_grid(
@@ -31,26 +37,13 @@ def xtgeo_grid_to_vtk_explicit_structured_grid(
 
     # Create geometry data suitable for use with VTK's explicit structured grid
     # based on the specified xtgeo 3d grid
-    pt_dims, vertex_arr, conn_arr, inactive_arr = xtg_grid.get_vtk_esg_geometry_data()
-    vertex_arr[:, 2] *= -1
+    esg_geometry = esg_geometry_from_xtgeo_grid(xtg_grid)
     et_get_esg_geo_data_ms = timer.lap_ms()
 
-    # LOGGER.debug(f"pt_dims={pt_dims}")
-    # LOGGER.debug(f"vertex_arr.shape={vertex_arr.shape}")
-    # LOGGER.debug(f"vertex_arr.dtype={vertex_arr.dtype}")
-    # LOGGER.debug(f"conn_arr.shape={conn_arr.shape}")
-    # LOGGER.debug(f"conn_arr.dtype={conn_arr.dtype}")
-
-    vtk_esgrid = _create_vtk_esgrid_from_verts_and_conn(pt_dims, vertex_arr, conn_arr)
+    # The arrays were just created for this grid, so VTK can use them directly
+    vtk_esgrid = esg_geometry_to_vtk_explicit_structured_grid(esg_geometry)
     et_create_vtk_esg_ms = timer.lap_ms()
 
-    # Make sure we hide the inactive cells.
-    # First we let VTK allocate cell ghost array, then we obtain a numpy view
-    # on the array and write to that (we're actually modifying the native VTK array)
-    ghost_arr_vtk = vtk_esgrid.AllocateCellGhostArray()
-    ghost_arr_np = vtk_to_numpy(ghost_arr_vtk)
-    ghost_arr_np[inactive_arr] = vtkDataSetAttributes.HIDDENCELL
-
     LOGGER.debug(
         f"xtgeo_grid_to_vtk_explicit_structured_grid() took {timer.elapsed_s():.2f}s "
         f"(get_esg_geo_data={et_get_esg_geo_data_ms}ms, "
@@ -60,17 +53,41 @@ def xtgeo_grid_to_vtk_explicit_structured_grid(
     return vtk_esgrid
 
 
+# -----------------------------------------------------------------------------
+def esg_geometry_to_vtk_explicit_structured_grid(
+    esg_geometry: EsgGeometry,
+) -> vtkExplicitStructuredGrid:
+    """Create a VTK grid that wraps the geometry arrays without copying them.
+    The VTK arrays keep references to the numpy arrays, so they stay alive with the
+    grid, but the numpy arrays must not be modified afterwards."""
+
+    vtk_esgrid = _create_vtk_esgrid_from_verts_and_conn(
+        esg_geometry.point_dims, esg_geometry.vertex_arr, esg_geometry.conn_arr
+    )
+
+    # Make sure we hide the inactive cells.
+    # First we let VTK allocate cell ghost array, then we obtain a numpy view
+    # on the array and write to that (we're actually modifying the native VTK array)
+    ghost_arr_vtk = vtk_esgrid.AllocateCellGhostArray()
+    ghost_arr_np = vtk_to_numpy(ghost_arr_vtk)
+    ghost_arr_np[esg_geometry.inactive_arr] = vtkDataSetAttributes.HIDDENCELL
+
+    return vtk_esgrid
+
+
 # -----------------------------------------------------------------------------
 def _create_vtk_esgrid_from_verts_and_conn(
     point_dims: np.ndarray, vertex_arr_np: np.ndarray, conn_arr_np: np.ndarray
 ) -> vtkExplicitStructuredGrid:
     vertex_arr_np = vertex_arr_np.reshape(-1, 3)
-    points_vtkarr = numpy_to_vtk(vertex_arr_np, deep=1)
+    points_vtkarr = numpy_to_vtk(vertex_arr_np, deep=0)
     vtk_points = vtkPoints()
     vtk_points.SetData(points_vtkarr)
 
-    # conn_idarr = numpy_to_vtk(conn_arr_np, deep=1, array_type=vtkConstants.VTK_ID_TYPE)
-    conn_idarr = numpy_to_vtkIdTypeArray(conn_arr_np, deep=1)
+    # Zero copy requires that the connectivity already has VTK's id type
+    if conn_arr_np.dtype != _VTK_ID_DTYPE:
+        conn_arr_np = conn_arr_np.astype(_VTK_ID_DTYPE)
+    conn_idarr = numpy_to_vtkIdTypeArray(conn_arr_np, deep=0)
     vtk_cell_array = vtkCellArray()
     vtk_cell_array.SetData(8, conn_idarr)
 
@@ -1,9 +1,34 @@
 import abc
+from dataclasses import dataclass
 from typing import List, Optional
 
 import numpy as np
 import xtgeo
 
+from webviz_subsurface._utils.enum_shim import StrEnum
+
+from ._vtk_esg_geometry import EsgGeometry
+
+
+class GridPropertyStatistic(StrEnum):
+    MEAN = "Mean"
+    STDDEV = "StdDev"
+    MINIMUM = "Minimum"
+    MAXIMUM = "Maximum"
+    P10 = "P10"
+    P90 = "P90"
+
+
+@dataclass(frozen=True)
+class StatisticalGridPropertyAddress:
+    """Specifies a per cell statistic of a grid property across the given
+    realizations. A datestr of None denotes a static property."""
+
+    property_name: str
+    datestr: Optional[str]
+    statistic: GridPropertyStatistic
+    realizations: List[int]
+
 
 class EnsembleGridProvider(abc.ABC):
     @abc.abstractmethod
@@ -33,6 +58,21 @@ class EnsembleGridProvider(abc.ABC):
     ) -> xtgeo.Grid:
         """Returns grid for specified realization"""
 
+    def get_geometry_fingerprint(self, realization: int) -> Optional[str]:
+        """Returns a fingerprint of the specified realization's grid geometry, if it
+        was computed when the provider was created, otherwise None. Realizations
+        with the same fingerprint have identical grid geometry."""
+        # pylint: disable=unused-argument
+        return None
+
+    def get_vtk_esg_geometry(self, realization: int) -> Optional[EsgGeometry]:
+        """Returns geometry data ready for creating a VTK explicit structured grid for
+        the specified realization, if it was precomputed when the provider was
+        created. Returns None otherwise, in which case the grid must be obtained
+        through get_3dgrid()."""
+        # pylint: disable=unused-argument
+        return None
+
     @abc.abstractmethod
     def get_static_property_values(
         self, property_name: str, realization: int
@@ -44,3 +84,12 @@ class EnsembleGridProvider(abc.ABC):
         self, property_name: str, property_date: str, realization: int
     ) -> Optional[np.ndarray]:
         """Returns 1d cell values for a given dynamic property"""
+
+    @abc.abstractmethod
+    def get_statistical_property_values(
+        self, address: StatisticalGridPropertyAddress
+    ) -> Optional[np.ndarray]:
+        """Returns 1d cell values of a statistic calculated per cell across the
+        realizations in the address. The realizations must have geometry
+        fingerprints establishing that their grid geometry is identical, otherwise
+        None is returned."""
@@ -1,8 +1,9 @@
 import hashlib
 import logging
 import os
+import tempfile
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from webviz_config.webviz_factory import WebvizFactory
 from webviz_config.webviz_factory_registry import WEBVIZ_FACTORY_REGISTRY
@@ -11,6 +12,7 @@ from webviz_config.webviz_instance_info import WebvizRunMode
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
 from ._egrid_file_discovery import discover_per_realization_eclipse_files
+from ._grid_property_store import GridPropertyStore
 from ._roff_file_discovery import discover_per_realization_roff_files
 from .ensemble_grid_provider import EnsembleGridProvider
 from .provider_impl_egrid import ProviderImplEgrid
@@ -18,6 +20,11 @@ from .provider_impl_roff import ProviderImplRoff
 
 LOGGER = logging.getLogger(__name__)
 
+# Disk budget for the store of extracted grid property values that is enabled for
+# portable apps, shared by all the providers created by the factory, and by all
+# processes using the same storage
+_PORTABLE_PROPERTY_STORE_MAX_SIZE_MB = 8192
+
 
 class EnsembleGridProviderFactory(WebvizFactory):
     def __init__(
@@ -25,13 +32,38 @@ class EnsembleGridProviderFactory(WebvizFactory):
         root_storage_folder: Path,
         allow_storage_writes: bool,
         avoid_copying_grid_data: bool,
+        create_vtk_geometry: bool = False,
+        property_store_max_size_mb: int = 0,
     ) -> None:
+        """If create_vtk_geometry is True, the grid geometries are converted to VTK
+        ready arrays when the backing store is created. Grids for visualization can
+        then be created directly from these arrays instead of parsing the grid files.
+
+        The `property_store_max_size_mb` parameter sets the disk budget for the store
+        of grid property values that have been extracted from the grid files, which
+        is disabled by default. The store is placed in the system's temp directory so
+        that it is shared by all processes on the machine that use the same storage
+        folder. Since the store is keyed on the storage folder, it should only be
+        enabled when the storage folder is reused between runs, which is the case
+        for portable apps.
+        """
         self._storage_dir = Path(root_storage_folder) / __name__
         self._allow_storage_writes = allow_storage_writes
         self._avoid_copying_grid_data = avoid_copying_grid_data
+        self._create_vtk_geometry = create_vtk_geometry
+
+        self._property_store: Optional[GridPropertyStore] = None
+        if property_store_max_size_mb > 0:
+            storage_dir_hash = _make_hash_string(str(self._storage_dir.resolve()))
+            self._property_store = GridPropertyStore(
+                cache_dir=Path(tempfile.gettempdir())
+                / f"webviz_grid_property_store__{storage_dir_hash}",
+                max_size_bytes=property_store_max_size_mb * 1024 * 1024,
+            )
 
         LOGGER.info(
-            f"EnsembleGridProviderFactory init: storage_dir={self._storage_dir}"
+            f"EnsembleGridProviderFactory init: storage_dir={self._storage_dir}, "
+            f"property_store_max_size_mb={property_store_max_size_mb}"
         )
 
         if self._allow_storage_writes:
@@ -49,11 +81,25 @@ class EnsembleGridProviderFactory(WebvizFactory):
             dont_copy_grid_data = (
                 app_instance_info.run_mode == WebvizRunMode.NON_PORTABLE
             )
+            # Converting the geometries takes about as long as loading each grid
+            # once, which is only worth it up front when building a portable app
+            create_vtk_geometry = (
+                app_instance_info.run_mode == WebvizRunMode.BUILDING_PORTABLE
+            )
+            # Non-portable runs get a fresh storage folder each time, which would leave
+            # behind an orphaned property store on every run
+            property_store_max_size_mb = (
+                _PORTABLE_PROPERTY_STORE_MAX_SIZE_MB
+                if app_instance_info.run_mode == WebvizRunMode.PORTABLE
+                else 0
+            )
 
             factory = EnsembleGridProviderFactory(
                 root_storage_folder=storage_folder,
                 allow_storage_writes=allow_writes,
                 avoid_copying_grid_data=dont_copy_grid_data,
+                create_vtk_geometry=create_vtk_geometry,
+                property_store_max_size_mb=property_store_max_size_mb,
             )
 
             # Store the factory object in the global factory registry
@@ -71,7 +117,9 @@ class EnsembleGridProviderFactory(WebvizFactory):
             else f"{ens_path}_{grid_name}_{'_'.join([str(attr) for attr in attribute_filter])}"
         )
         storage_key = f"ens__{_make_hash_string(string_to_hash)}"
-        provider = ProviderImplRoff.from_backing_store(self._storage_dir, storage_key)
+        provider = ProviderImplRoff.from_backing_store(
+            self._storage_dir, storage_key, self._property_store
+        )
         if provider:
             LOGGER.info(
                 f"Loaded grid provider from backing store in {timer.elapsed_s():.2f}s ("
@@ -98,10 +146,13 @@ class EnsembleGridProviderFactory(WebvizFactory):
             grid_geometries_info=grid_info,
             grid_parameters_info=grid_parameters_info,
             avoid_copying_grid_data=self._avoid_copying_grid_data,
+            create_vtk_geometry=self._create_vtk_geometry,
         )
         et_write_s = timer.lap_s()
 
-        provider = ProviderImplRoff.from_backing_store(self._storage_dir, storage_key)
+        provider = ProviderImplRoff.from_backing_store(
+            self._storage_dir, storage_key, self._property_store
+        )
         if not provider:
             raise ValueError(f"Failed to load/create grid provider for {ens_path}")
 
@@ -124,7 +175,11 @@ class EnsembleGridProviderFactory(WebvizFactory):
         string_to_hash = f"{ens_path}_{grid_name}_egrid"
         storage_key = f"ens__{_make_hash_string(string_to_hash)}"
         provider = ProviderImplEgrid.from_backing_store(
-            self._storage_dir, storage_key, init_properties, restart_properties
+            self._storage_dir,
+            storage_key,
+            init_properties,
+            restart_properties,
+            self._property_store,
         )
         if provider:
             LOGGER.info(
@@ -149,10 +204,15 @@ class EnsembleGridProviderFactory(WebvizFactory):
             storage_key,
             eclipse_case_paths=eclipse_case_paths,
             avoid_copying_grid_data=self._avoid_copying_grid_data,
+            create_vtk_geometry=self._create_vtk_geometry,
         )
         et_write_s = timer.lap_s()
         provider = ProviderImplEgrid.from_backing_store(
-            self._storage_dir, storage_key, init_properties, restart_properties
+            self._storage_dir,
+            storage_key,
+            init_properties,
+            restart_properties,
+            self._property_store,
         )
         if not provider:
             raise ValueError(f"Failed to load/create grid provider for {ens_path}")
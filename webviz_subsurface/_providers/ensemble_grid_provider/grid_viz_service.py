@@ -34,21 +34,35 @@ from vtkmodules.vtkFiltersGeometry import vtkExplicitStructuredGridSurfaceFilter
 
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
+from ._grid_worker_cache import GridWorkerCache, GridWorkerCacheStats
+
 # Requires updated xtgeo
+from ._vtk_esg_geometry import calc_grid_geometry_fingerprint
 from ._xtgeo_to_vtk_explicit_structured_grid import (
+    esg_geometry_to_vtk_explicit_structured_grid,
     xtgeo_grid_to_vtk_explicit_structured_grid,
 )
-from .ensemble_grid_provider import EnsembleGridProvider
+from .ensemble_grid_provider import (
+    EnsembleGridProvider,
+    GridPropertyStatistic,
+    StatisticalGridPropertyAddress,
+)
 
 LOGGER = logging.getLogger(__name__)
 
 _GRID_VIZ_SERVICE_INSTANCE: Optional["GridVizService"] = None
 
+# Default memory budget for the VTK grids held by the grid workers
+_DEFAULT_MAX_WORKER_CACHE_SIZE_MB = 4096
+
 
 @dataclass
 class PropertySpec:
     prop_name: str
     prop_date: Optional[str]
+    # If specified, the statistic is calculated across all realizations that share
+    # grid geometry with the requested realization
+    statistic: Optional[GridPropertyStatistic] = None
 
 
 @dataclass
@@ -91,48 +105,98 @@ class PickResult:
     cell_property_value: Optional[np.ndarray]
 
 
+@dataclass(frozen=True)
+class _CachedGridSurface:
+    cell_filter: Optional[CellFilter]
+    # The VTK polydata owns the memory of the numpy arrays, so it must be kept alive
+    polydata: vtkPolyData
+    surface_polys: SurfacePolys
+    original_cell_indices: np.ndarray
+
+
 # =============================================================================
 class GridWorker:
+    """Holds the VTK grid for a grid geometry, which may be shared by several
+    realizations, along with the grid's surface for the most recently used cell
+    filter."""
+
     # -----------------------------------------------------------------------------
-    def __init__(self, full_esgrid: vtkExplicitStructuredGrid) -> None:
+    def __init__(self, key: str, full_esgrid: vtkExplicitStructuredGrid) -> None:
+        self.key = key
         self._full_esgrid = full_esgrid
+        self._grid_size_bytes = _calc_esgrid_size_bytes(full_esgrid)
 
-        self._cached_cell_filter: Optional[CellFilter] = None
-        self._cached_original_cell_indices: Optional[np.ndarray] = None
+        # Stored as one object so that concurrent requests never see a surface
+        # and cell filter that don't belong together
+        self._cached_surface: Optional[_CachedGridSurface] = None
 
     # -----------------------------------------------------------------------------
     def get_full_esgrid(self) -> vtkExplicitStructuredGrid:
         return self._full_esgrid
 
     # -----------------------------------------------------------------------------
-    def get_cached_original_cell_indices(
-        self, cell_filter: Optional[CellFilter]
-    ) -> Optional[np.ndarray]:
-        if self._cached_original_cell_indices is None:
-            return None
+    def get_grid_size_bytes(self) -> int:
+        return self._grid_size_bytes
 
-        if cell_filter == self._cached_cell_filter:
-            return self._cached_original_cell_indices
+    # -----------------------------------------------------------------------------
+    def get_size_bytes(self) -> int:
+        """Size of the grid along with the cached surface"""
+        cached_surface = self._cached_surface
+        if cached_surface is None:
+            return self._grid_size_bytes
 
-        return None
+        # VTK reports the memory size in KiB
+        surface_size_bytes = cached_surface.polydata.GetActualMemorySize() * 1024
+        return self._grid_size_bytes + surface_size_bytes
 
     # -----------------------------------------------------------------------------
-    def set_cached_original_cell_indices(
-        self, cell_filter: Optional[CellFilter], original_cell_indices: np.ndarray
-    ) -> None:
-        # Make copy of the cell filter
-        self._cached_cell_filter = (
-            dataclasses.replace(cell_filter) if cell_filter is not None else None
+    def get_or_calc_surface(
+        self, cell_filter: Optional[CellFilter]
+    ) -> Tuple[SurfacePolys, np.ndarray]:
+        """Returns the surface of the grid, cropped by the cell filter, along with
+        the original cell index of each of the surface's polygons"""
+        cached_surface = self._cached_surface
+        if cached_surface is not None and cached_surface.cell_filter == cell_filter:
+            return cached_surface.surface_polys, cached_surface.original_cell_indices
+
+        grid = self._full_esgrid
+        if cell_filter:
+            grid = _calc_cropped_grid(grid, cell_filter)
+
+        polydata = _calc_grid_surface(grid)
+        points_np = vtk_to_numpy(polydata.GetPoints().GetData()).ravel()
+        polys_np = vtk_to_numpy(polydata.GetPolys().GetData())
+        original_cell_indices_np = vtk_to_numpy(
+            polydata.GetCellData().GetAbstractArray("vtkOriginalCellIds")
         )
-        self._cached_original_cell_indices = original_cell_indices
+        surface_polys = SurfacePolys(point_arr=points_np, poly_arr=polys_np)
+
+        self._cached_surface = _CachedGridSurface(
+            # Make copy of the cell filter
+            cell_filter=(
+                dataclasses.replace(cell_filter) if cell_filter is not None else None
+            ),
+            polydata=polydata,
+            surface_polys=surface_polys,
+            original_cell_indices=original_cell_indices_np,
+        )
+
+        return surface_polys, original_cell_indices_np
 
 
 # =============================================================================
 class GridVizService:
     # -----------------------------------------------------------------------------
-    def __init__(self) -> None:
+    def __init__(
+        self, max_worker_cache_size_mb: int = _DEFAULT_MAX_WORKER_CACHE_SIZE_MB
+    ) -> None:
         self._id_to_provider_dict: Dict[str, EnsembleGridProvider] = {}
-        self._key_to_worker_dict: Dict[str, GridWorker] = {}
+        self._worker_cache: GridWorkerCache[GridWorker] = GridWorkerCache(
+            max_worker_cache_size_mb * 1024 * 1024
+        )
+        # Worker keys of realizations whose geometry fingerprints have been
+        # calculated on the fly, since their providers don't have them
+        self._real_to_worker_key: Dict[Tuple[str, int], str] = {}
 
     # -----------------------------------------------------------------------------
     @staticmethod
@@ -163,6 +227,12 @@ class GridVizService:
 
         self._id_to_provider_dict[provider_id] = provider
 
+    # -----------------------------------------------------------------------------
+    def worker_cache_stats(self) -> GridWorkerCacheStats:
+        """Returns the hit/miss/eviction counters of the grid worker cache, along
+        with the grids that are currently resident and their sizes"""
+        return self._worker_cache.stats()
+
     # -----------------------------------------------------------------------------
     # pylint: disable=too-many-locals,
     def get_surface(
@@ -189,24 +259,12 @@ class GridVizService:
             raise ValueError("Could not get grid worker")
         et_get_grid_worker_ms = timer.lap_ms()
 
-        grid = worker.get_full_esgrid()
-
-        if cell_filter:
-            grid = _calc_cropped_grid(grid, cell_filter)
-        et_crop_grid_ms = timer.lap_ms()
-
-        polydata = _calc_grid_surface(grid)
-
-        # !!!!!!
-        # Need to watch out here, think these may go out of scope!
-        points_np = vtk_to_numpy(polydata.GetPoints().GetData()).ravel()
-        polys_np = vtk_to_numpy(polydata.GetPolys().GetData())
-        original_cell_indices_np = vtk_to_numpy(
-            polydata.GetCellData().GetAbstractArray("vtkOriginalCellIds")
+        # The surface is cached by the worker, and shared by all realizations
+        # with the same grid geometry
+        surface_polys, original_cell_indices_np = self._get_or_calc_worker_surface(
+            worker, cell_filter
         )
-
-        surface_polys = SurfacePolys(point_arr=points_np, poly_arr=polys_np)
-        et_calc_surf_ms = timer.lap_ms()
+        et_get_surf_ms = timer.lap_ms()
 
         property_scalars: Optional[PropertyScalars] = None
         if property_spec:
@@ -216,13 +274,10 @@ class GridVizService:
                 property_scalars = PropertyScalars(value_arr=mapped_cell_vals)
         et_read_and_map_scalars_ms = timer.lap_ms()
 
-        worker.set_cached_original_cell_indices(cell_filter, original_cell_indices_np)
-
         LOGGER.debug(
             f"Got grid surface in {timer.elapsed_s():.2f}s "
             f"(get_grid_worker={et_get_grid_worker_ms}ms, "
-            f"crop_grid={et_crop_grid_ms}ms, "
-            f"calc_surf={et_calc_surf_ms}ms, "
+            f"get_surf={et_get_surf_ms}ms, "
             f"read_and_map_scalars={et_read_and_map_scalars_ms}ms, "
             f"provider_id={provider_id}, real={realization}, "
             f"{_property_spec_dbg_str(property_spec)}, "
@@ -256,20 +311,11 @@ class GridVizService:
             raise ValueError("Could not get grid worker")
         et_get_grid_worker_ms = timer.lap_ms()
 
-        original_cell_indices_np = worker.get_cached_original_cell_indices(cell_filter)
-        if original_cell_indices_np is None:
-            # Must first generate the grid to get the original cell indices
-            grid = worker.get_full_esgrid()
-            if cell_filter:
-                grid = _calc_cropped_grid(grid, cell_filter)
-
-            polydata = _calc_grid_surface(grid)
-            original_cell_indices_np = vtk_to_numpy(
-                polydata.GetCellData().GetAbstractArray("vtkOriginalCellIds")
-            )
-            worker.set_cached_original_cell_indices(
-                cell_filter, original_cell_indices_np
-            )
+        # Normally the surface has already been calculated, so that the original
+        # cell indices can be taken from the worker's cache
+        _surface_polys, original_cell_indices_np = self._get_or_calc_worker_surface(
+            worker, cell_filter
+        )
         et_get_mapping_indices_ms = timer.lap_ms()
 
         raw_cell_vals = _load_property_values(provider, realization, property_spec)
@@ -510,40 +556,119 @@ class GridVizService:
     def _get_or_create_grid_worker(
         self, provider_id: str, realization: int
     ) -> Optional[GridWorker]:
+        """Grid workers are shared by all realizations with identical geometry"""
         timer = PerfTimer()
 
-        worker_key = f"P{provider_id}__R{realization}"
-        worker = self._key_to_worker_dict.get(worker_key)
-        if worker:
-            LOGGER.debug("_get_or_create_grid_worker() returning cached data")
-            return worker
-
         provider = self._id_to_provider_dict.get(provider_id)
         if not provider:
             raise ValueError("Could not find provider")
 
-        LOGGER.debug("_get_or_create_grid_worker() data not in cache, loading...")
+        worker_key = self._get_known_worker_key(provider, realization)
+        if worker_key is not None:
+            worker = self._worker_cache.get(worker_key)
+            if worker:
+                LOGGER.debug("_get_or_create_grid_worker() returning cached data")
+                return worker
 
-        xtg_grid = provider.get_3dgrid(realization=realization)
-        et_xtgeo_grid_from_provider_grid_ms = timer.lap_ms()
+        LOGGER.debug("_get_or_create_grid_worker() data not in cache, loading...")
 
-        cell_count = xtg_grid.ncol * xtg_grid.nrow * xtg_grid.nlay
-        LOGGER.debug(f"_get_or_create_grid_worker() grid cell count: {cell_count}")
+        # Prefer the precomputed geometry, which is wrapped without copying
+        esg_geometry = provider.get_vtk_esg_geometry(realization=realization)
+        if esg_geometry is not None:
+            cell_count = esg_geometry.cell_count()
+            et_xtgeo_grid_from_provider_grid_ms = timer.lap_ms()
+            vtk_esg = esg_geometry_to_vtk_explicit_structured_grid(esg_geometry)
+        else:
+            xtg_grid = provider.get_3dgrid(realization=realization)
+            et_xtgeo_grid_from_provider_grid_ms = timer.lap_ms()
+
+            # Without a precomputed fingerprint we must identify the geometry now,
+            # so that the VTK grid can still be shared with other realizations
+            worker_key = _make_worker_key(
+                provider_id, calc_grid_geometry_fingerprint(xtg_grid)
+            )
+            self._real_to_worker_key[(provider_id, realization)] = worker_key
+            worker = self._worker_cache.get(worker_key)
+            if worker:
+                LOGGER.debug(
+                    f"_get_or_create_grid_worker() reusing grid with identical "
+                    f"geometry, loaded in {timer.elapsed_s():.2f}s"
+                )
+                return worker
 
-        vtk_esg = xtgeo_grid_to_vtk_explicit_structured_grid(xtg_grid)
+            cell_count = xtg_grid.ncol * xtg_grid.nrow * xtg_grid.nlay
+            vtk_esg = xtgeo_grid_to_vtk_explicit_structured_grid(xtg_grid)
         et_create_vtk_esg_ms = timer.lap_ms()
 
-        worker = GridWorker(vtk_esg)
-        self._key_to_worker_dict[worker_key] = worker
+        LOGGER.debug(
+            f"_get_or_create_grid_worker() grid cell count: {cell_count} "
+            f"(precomputed_geometry={esg_geometry is not None})"
+        )
+
+        assert worker_key is not None
+        worker = GridWorker(worker_key, vtk_esg)
+        grid_size_bytes = worker.get_grid_size_bytes()
+        self._worker_cache.put(worker_key, worker, grid_size_bytes)
 
         LOGGER.debug(
             f"_get_or_create_grid_worker() loaded data in {timer.elapsed_s():.2f}s "
             f"(xtgeo_grid_from_provider_grid={et_xtgeo_grid_from_provider_grid_ms}ms, "
-            f"create_vtk_esg={et_create_vtk_esg_ms}ms)"
+            f"create_vtk_esg={et_create_vtk_esg_ms}ms, "
+            f"grid_size={grid_size_bytes / (1024 * 1024):.2f}MB)"
         )
 
         return worker
 
+    # -----------------------------------------------------------------------------
+    def _get_or_calc_worker_surface(
+        self, worker: GridWorker, cell_filter: Optional[CellFilter]
+    ) -> Tuple[SurfacePolys, np.ndarray]:
+        """The surface cached by the worker counts towards the worker cache's budget,
+        so the worker's size is updated whenever the surface may have changed"""
+        surface_polys, original_cell_indices_np = worker.get_or_calc_surface(
+            cell_filter
+        )
+        self._worker_cache.update_size(worker.key, worker, worker.get_size_bytes())
+        return surface_polys, original_cell_indices_np
+
+    # -----------------------------------------------------------------------------
+    def _get_known_worker_key(
+        self, provider: EnsembleGridProvider, realization: int
+    ) -> Optional[str]:
+        """Returns None if the realization's geometry fingerprint isn't known yet"""
+        provider_id = provider.provider_id()
+        fingerprint = provider.get_geometry_fingerprint(realization)
+        if fingerprint is not None:
+            return _make_worker_key(provider_id, fingerprint)
+
+        return self._real_to_worker_key.get((provider_id, realization))
+
+
+# -----------------------------------------------------------------------------
+def _make_worker_key(provider_id: str, geometry_fingerprint: str) -> str:
+    return f"P{provider_id}__G{geometry_fingerprint}"
+
+
+# -----------------------------------------------------------------------------
+def _calc_esgrid_size_bytes(esgrid: vtkExplicitStructuredGrid) -> int:
+    """Size of the grid's points, cell connectivity and cell data arrays, where the
+    latter holds the ghost array and the face connectivity flags"""
+    vtk_arrays = [esgrid.GetPoints().GetData()]
+
+    cell_array = esgrid.GetCells()
+    vtk_arrays.append(cell_array.GetConnectivityArray())
+    vtk_arrays.append(cell_array.GetOffsetsArray())
+
+    cell_data = esgrid.GetCellData()
+    for idx in range(cell_data.GetNumberOfArrays()):
+        vtk_arrays.append(cell_data.GetAbstractArray(idx))
+
+    return sum(
+        vtk_arr.GetNumberOfValues() * vtk_arr.GetDataTypeSize()
+        for vtk_arr in vtk_arrays
+        if vtk_arr is not None
+    )
+
 
 # -----------------------------------------------------------------------------
 def _calc_cropped_grid(
@@ -626,7 +751,25 @@ def _load_property_values(
 ) -> Optional[np.ndarray]:
     timer = PerfTimer()
 
-    if property_spec.prop_date:
+    if property_spec.statistic:
+        realizations = _realizations_sharing_geometry(provider, realization)
+        if realizations is None:
+            LOGGER.warning(
+                f"Cannot calculate {property_spec.statistic} of "
+                f"{property_spec.prop_name}, the grid geometry of realization "
+                f"{realization} has no fingerprint"
+            )
+            return None
+
+        prop_values = provider.get_statistical_property_values(
+            StatisticalGridPropertyAddress(
+                property_name=property_spec.prop_name,
+                datestr=property_spec.prop_date,
+                statistic=property_spec.statistic,
+                realizations=realizations,
+            )
+        )
+    elif property_spec.prop_date:
         prop_values = provider.get_dynamic_property_values(
             property_spec.prop_name, property_spec.prop_date, realization
         )
@@ -643,6 +786,23 @@ def _load_property_values(
     return prop_values
 
 
+# -----------------------------------------------------------------------------
+def _realizations_sharing_geometry(
+    provider: EnsembleGridProvider, realization: int
+) -> Optional[List[int]]:
+    """Returns None if the realization's geometry has no precomputed fingerprint,
+    since it can then not be established which realizations share its geometry"""
+    fingerprint = provider.get_geometry_fingerprint(realization)
+    if fingerprint is None:
+        return None
+
+    return [
+        real
+        for real in provider.realizations()
+        if provider.get_geometry_fingerprint(real) == fingerprint
+    ]
+
+
 # -----------------------------------------------------------------------------
 def _vtk_esg_to_ug(vtk_esgrid: vtkExplicitStructuredGrid) -> vtkUnstructuredGrid:
     convert_filter = vtkExplicitStructuredGridToUnstructuredGrid()
@@ -776,6 +936,12 @@ def _property_spec_dbg_str(property_spec: Optional[PropertySpec]) -> str:
     if not property_spec:
         return "prop=None"
 
+    if property_spec.statistic:
+        return (
+            f"prop=({property_spec.prop_name}, {property_spec.prop_date}, "
+            f"{property_spec.statistic})"
+        )
+
     return f"prop=({property_spec.prop_name}, {property_spec.prop_date})"
 
 
@@ -1,26 +1,40 @@
 import logging
 import shutil
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 import xtgeo
 
+from webviz_subsurface._utils.disk_lru_dir import source_files_version
 from webviz_subsurface._utils.enum_shim import StrEnum
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
 from ._egrid_file_discovery import EclipseCaseFileInfo
-from .ensemble_grid_provider import EnsembleGridProvider
+from ._grid_property_statistics import get_or_calc_statistical_property_values
+from ._grid_property_store import GridPropertyStore
+from ._vtk_esg_geometry import (
+    EsgGeometry,
+    esg_geometry_dir,
+    read_esg_geometry,
+    write_deduplicated_esg_geometries,
+)
+from .ensemble_grid_provider import EnsembleGridProvider, StatisticalGridPropertyAddress
 
 LOGGER = logging.getLogger(__name__)
 
+# Upper bound on the memory used for the values of the restart dates that are read in
+# a single pass over an UNRST file when extracting a dynamic property
+_MAX_UNRST_PASS_SIZE_BYTES = 1024 * 1024 * 1024
+
 
 class Col(StrEnum):
     REAL = "realization"
     EGRID = "egrid_path"
     INIT = "init_path"
     UNRST = "unrst_path"
+    GEOMETRY_FINGERPRINT = "geometry_fingerprint"
 
 
 class GridType(StrEnum):
@@ -37,10 +51,24 @@ class ProviderImplEgrid(EnsembleGridProvider):
         grid_inventory_df: pd.DataFrame,
         init_properties: List[str],
         restart_properties: List[str],
+        property_store: Optional[GridPropertyStore] = None,
     ) -> None:
         self._provider_id = provider_id
         self._provider_dir = provider_dir
         self._inventory_df = grid_inventory_df
+        self._property_store = property_store
+
+        # Backing stores written without VTK geometry don't have fingerprints
+        self._real_to_geometry_fingerprint: Dict[int, str] = {}
+        if Col.GEOMETRY_FINGERPRINT in grid_inventory_df.columns:
+            self._real_to_geometry_fingerprint = {
+                real: fingerprint
+                for real, fingerprint in zip(
+                    grid_inventory_df[Col.REAL],
+                    grid_inventory_df[Col.GEOMETRY_FINGERPRINT],
+                )
+                if fingerprint
+            }
         self._init_properties = init_properties
         self._restart_properties = restart_properties
         first_unrst = self._inventory_df[Col.UNRST][0]
@@ -57,11 +85,18 @@ class ProviderImplEgrid(EnsembleGridProvider):
         storage_key: str,
         eclipse_case_paths: List[EclipseCaseFileInfo],
         avoid_copying_grid_data: bool,
+        create_vtk_geometry: bool = False,
     ) -> None:
         """If avoid_copying_grid_data if True, the specified grid data will NOT be copied
         into the backing store, but will be referenced from their source locations.
         Note that this is only useful when running in non-portable mode and will fail
         in portable mode.
+
+        If create_vtk_geometry is True, the geometry of each realization's grid is
+        converted to VTK ready arrays that are stored in the backing store, so that
+        grids can later be created without parsing the EGRID files. Each unique
+        geometry is only stored once, and the geometry fingerprint of each
+        realization is stored in the inventory.
         """
 
         timer = PerfTimer()
@@ -102,20 +137,42 @@ class ProviderImplEgrid(EnsembleGridProvider):
             else:
                 ecl_stored_cases.append(ecl_case)
 
-        timer.lap_s()
+        et_copy_s = timer.lap_s()
+
+        real_to_fingerprint: Dict[int, str] = {}
+        if create_vtk_geometry:
+            real_to_fingerprint = write_deduplicated_esg_geometries(
+                provider_dir,
+                {
+                    ecl_case.realization: provider_dir / ecl_case.egrid_path
+                    for ecl_case in ecl_stored_cases
+                },
+                fformat="egrid",
+            )
+        et_vtk_geometry_s = timer.lap_s()
 
         grid_inventory_df = pd.DataFrame(ecl_stored_cases)
+        grid_inventory_df[Col.GEOMETRY_FINGERPRINT.value] = [
+            real_to_fingerprint.get(ecl_case.realization, "")
+            for ecl_case in ecl_stored_cases
+        ]
 
         parquet_file_name = provider_dir / "grid_inventory.parquet"
 
         grid_inventory_df.to_parquet(path=parquet_file_name)
 
+        LOGGER.debug(
+            f"Wrote grid backing store in: {timer.elapsed_s():.2f}s ("
+            f"copy={et_copy_s:.2f}s, vtk_geometry={et_vtk_geometry_s:.2f}s)"
+        )
+
     @staticmethod
     def from_backing_store(
         storage_dir: Path,
         storage_key: str,
         init_properties: List[str],
         restart_properties: List[str],
+        property_store: Optional[GridPropertyStore] = None,
     ) -> Optional["ProviderImplEgrid"]:
         provider_dir = storage_dir / storage_key
         parquet_file_name = provider_dir / "grid_inventory.parquet"
@@ -129,6 +186,7 @@ class ProviderImplEgrid(EnsembleGridProvider):
                 grid_inventory_df,
                 init_properties,
                 restart_properties,
+                property_store,
             )
 
         except FileNotFoundError:
@@ -159,8 +217,78 @@ class ProviderImplEgrid(EnsembleGridProvider):
 
         return grid
 
+    def get_geometry_fingerprint(self, realization: int) -> Optional[str]:
+        return self._real_to_geometry_fingerprint.get(realization)
+
+    def get_vtk_esg_geometry(self, realization: int) -> Optional[EsgGeometry]:
+        fingerprint = self.get_geometry_fingerprint(realization)
+        if fingerprint is None:
+            return None
+
+        return read_esg_geometry(esg_geometry_dir(self._provider_dir, fingerprint))
+
     def get_static_property_values(
         self, property_name: str, realization: int
+    ) -> Optional[np.ndarray]:
+        if self._property_store is None:
+            return self._load_static_property_values(property_name, realization)
+
+        return self._property_store.get_or_create(
+            self._provider_id,
+            self._property_data_version(None, [realization]),
+            realization,
+            property_name,
+            None,
+            lambda: self._load_static_property_values(property_name, realization),
+        )
+
+    def get_dynamic_property_values(
+        self, property_name: str, property_date: str, realization: int
+    ) -> Optional[np.ndarray]:
+        if self._property_store is None:
+            return self._load_dynamic_property_values(
+                property_name, property_date, realization
+            )
+
+        # Scanning the UNRST file is the expensive part, so when the property is
+        # missing from the store we extract all its restart dates at once
+        return self._property_store.get_or_create(
+            self._provider_id,
+            self._property_data_version(property_date, [realization]),
+            realization,
+            property_name,
+            property_date,
+            lambda: self._extract_dynamic_property_into_store(
+                property_name, property_date, realization
+            ),
+        )
+
+    def get_statistical_property_values(
+        self, address: StatisticalGridPropertyAddress
+    ) -> Optional[np.ndarray]:
+        return get_or_calc_statistical_property_values(
+            self,
+            address,
+            self._property_store,
+            self._property_data_version(address.datestr, address.realizations),
+        )
+
+    def _property_data_version(
+        self, property_datestr: Optional[str], realizations: List[int]
+    ) -> str:
+        """Returns the version of the files that the property values are read from,
+        for keying stored values. All restart dates share the UNRST file."""
+        df = self._inventory_df.loc[self._inventory_df[Col.REAL].isin(realizations)]
+        property_col = Col.INIT if property_datestr is None else Col.UNRST
+        return source_files_version(
+            [
+                str(self._provider_dir / rel_path)
+                for rel_path in [*df[Col.EGRID], *df[property_col]]
+            ]
+        )
+
+    def _load_static_property_values(
+        self, property_name: str, realization: int
     ) -> Optional[np.ndarray]:
         grid = self.get_3dgrid(realization)
         df = self._inventory_df.loc[self._inventory_df[Col.REAL] == realization]
@@ -175,7 +303,7 @@ class ProviderImplEgrid(EnsembleGridProvider):
 
         return grid_property.get_npvalues1d(order="F", fill_value=fill_value).ravel()
 
-    def get_dynamic_property_values(
+    def _load_dynamic_property_values(
         self, property_name: str, property_date: str, realization: int
     ) -> Optional[np.ndarray]:
         grid = self.get_3dgrid(realization)
@@ -189,3 +317,69 @@ class ProviderImplEgrid(EnsembleGridProvider):
             grid=grid,
         )
         return grid_property.get_npvalues1d(order="F").ravel()
+
+    def _extract_dynamic_property_into_store(
+        self, property_name: str, property_date: str, realization: int
+    ) -> Optional[np.ndarray]:
+        """Read the values of all restart dates of the property and put them in the
+        property store. Returns the values of the requested date."""
+        if self._property_store is None or property_date not in self._restart_dates:
+            return self._load_dynamic_property_values(
+                property_name, property_date, realization
+            )
+
+        timer = PerfTimer()
+
+        grid = self.get_3dgrid(realization)
+        df = self._inventory_df.loc[self._inventory_df[Col.REAL] == realization]
+        unrst_path = self._provider_dir / df[Col.UNRST].iloc[0]
+        data_version = self._property_data_version(property_date, [realization])
+
+        # Dates that are already in the store are skipped, but the requested date is
+        # always read since it is returned
+        dates_to_read = [
+            datestr
+            for datestr in self._restart_dates
+            if datestr == property_date
+            or self._property_store.fetch(
+                self._provider_id, data_version, realization, property_name, datestr
+            )
+            is None
+        ]
+
+        # Limit the number of dates per pass, so that we don't run out of memory for
+        # large grids with many restart dates
+        dates_per_pass = max(1, _MAX_UNRST_PASS_SIZE_BYTES // (grid.ntotal * 8))
+
+        requested_values: Optional[np.ndarray] = None
+        for start_idx in range(0, len(dates_to_read), dates_per_pass):
+            date_batch = dates_to_read[start_idx : start_idx + dates_per_pass]
+            grid_properties = xtgeo.gridproperties_from_file(
+                unrst_path,
+                fformat="unrst",
+                names=[property_name],
+                dates=[int(datestr) for datestr in date_batch],
+                grid=grid,
+            )
+            for grid_property in grid_properties.props:
+                datestr = str(grid_property.date)
+                values = grid_property.get_npvalues1d(order="F").ravel()
+                if datestr == property_date:
+                    # Stored by the caller
+                    requested_values = values
+                else:
+                    self._property_store.store(
+                        self._provider_id,
+                        data_version,
+                        realization,
+                        property_name,
+                        datestr,
+                        values,
+                    )
+
+        LOGGER.debug(
+            f"Extracted {len(dates_to_read)} restart dates of {property_name} for "
+            f"realization {realization} in: {timer.elapsed_s():.2f}s"
+        )
+
+        return requested_values
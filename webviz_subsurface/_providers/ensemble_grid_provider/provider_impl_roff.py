@@ -1,17 +1,26 @@
 import logging
 import shutil
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 import xtgeo
 
+from webviz_subsurface._utils.disk_lru_dir import source_files_version
 from webviz_subsurface._utils.enum_shim import StrEnum
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
+from ._grid_property_statistics import get_or_calc_statistical_property_values
+from ._grid_property_store import GridPropertyStore
 from ._roff_file_discovery import GridFileInfo, GridParameterFileInfo
-from .ensemble_grid_provider import EnsembleGridProvider
+from ._vtk_esg_geometry import (
+    EsgGeometry,
+    esg_geometry_dir,
+    read_esg_geometry,
+    write_deduplicated_esg_geometries,
+)
+from .ensemble_grid_provider import EnsembleGridProvider, StatisticalGridPropertyAddress
 
 LOGGER = logging.getLogger(__name__)
 
@@ -25,6 +34,7 @@ class Col:
     DATESTR = "datestr"
     ORIGINAL_PATH = "original_path"
     REL_PATH = "rel_path"
+    GEOMETRY_FINGERPRINT = "geometry_fingerprint"
 
 
 class GridType(StrEnum):
@@ -35,11 +45,27 @@ class GridType(StrEnum):
 
 class ProviderImplRoff(EnsembleGridProvider):
     def __init__(
-        self, provider_id: str, provider_dir: Path, grid_inventory_df: pd.DataFrame
+        self,
+        provider_id: str,
+        provider_dir: Path,
+        grid_inventory_df: pd.DataFrame,
+        property_store: Optional[GridPropertyStore] = None,
     ) -> None:
         self._provider_id = provider_id
         self._provider_dir = provider_dir
         self._inventory_df = grid_inventory_df
+        self._property_store = property_store
+
+        # Backing stores written without VTK geometry don't have fingerprints
+        self._real_to_geometry_fingerprint: Dict[int, str] = {}
+        if Col.GEOMETRY_FINGERPRINT in grid_inventory_df.columns:
+            geometry_df = grid_inventory_df.loc[
+                (grid_inventory_df[Col.TYPE] == GridType.GEOMETRY)
+                & (grid_inventory_df[Col.GEOMETRY_FINGERPRINT] != "")
+            ]
+            self._real_to_geometry_fingerprint = dict(
+                zip(geometry_df[Col.REAL], geometry_df[Col.GEOMETRY_FINGERPRINT])
+            )
 
     @staticmethod
     # pylint: disable=too-many-locals
@@ -49,11 +75,18 @@ class ProviderImplRoff(EnsembleGridProvider):
         grid_geometries_info: List[GridFileInfo],
         grid_parameters_info: List[GridParameterFileInfo],
         avoid_copying_grid_data: bool,
+        create_vtk_geometry: bool = False,
     ) -> None:
         """If avoid_copying_grid_data if True, the specified grid data will NOT be copied
         into the backing store, but will be referenced from their source locations.
         Note that this is only useful when running in non-portable mode and will fail
         in portable mode.
+
+        If create_vtk_geometry is True, the geometry of each realization's grid is
+        converted to VTK ready arrays that are stored in the backing store, so that
+        grids can later be created without parsing the grid files. Each unique
+        geometry is only stored once, and the geometry fingerprint of each
+        realization is stored in the inventory.
         """
 
         timer = PerfTimer()
@@ -128,6 +161,23 @@ class ProviderImplRoff(EnsembleGridProvider):
             )
         et_copy_s = timer.lap_s()
 
+        real_to_fingerprint: Dict[int, str] = {}
+        if create_vtk_geometry:
+            real_to_fingerprint = write_deduplicated_esg_geometries(
+                provider_dir,
+                {
+                    grid_info.real: Path(grid_info.path)
+                    for grid_info in grid_geometries_info
+                },
+                fformat=None,
+            )
+        et_vtk_geometry_s = timer.lap_s()
+
+        fingerprint_arr = [
+            real_to_fingerprint.get(real, "") if grid_type == GridType.GEOMETRY else ""
+            for grid_type, real in zip(type_arr, real_arr)
+        ]
+
         grid_inventory_df = pd.DataFrame(
             {
                 Col.TYPE: type_arr,
@@ -137,6 +187,7 @@ class ProviderImplRoff(EnsembleGridProvider):
                 Col.DATESTR: datestr_arr,
                 Col.REL_PATH: rel_path_arr,
                 Col.ORIGINAL_PATH: original_path_arr,
+                Col.GEOMETRY_FINGERPRINT: fingerprint_arr,
             }
         )
 
@@ -146,25 +197,28 @@ class ProviderImplRoff(EnsembleGridProvider):
         if do_copy_grid_data_into_store:
             LOGGER.debug(
                 f"Wrote grid backing store in: {timer.elapsed_s():.2f}s ("
-                f"copy={et_copy_s:.2f}s)"
+                f"copy={et_copy_s:.2f}s, vtk_geometry={et_vtk_geometry_s:.2f}s)"
             )
         else:
             LOGGER.debug(
                 f"Wrote grid backing store without copying grid data in: "
-                f"{timer.elapsed_s():.2f}s"
+                f"{timer.elapsed_s():.2f}s (vtk_geometry={et_vtk_geometry_s:.2f}s)"
             )
 
     @staticmethod
     def from_backing_store(
         storage_dir: Path,
         storage_key: str,
+        property_store: Optional[GridPropertyStore] = None,
     ) -> Optional["ProviderImplRoff"]:
         provider_dir = storage_dir / storage_key
         parquet_file_name = provider_dir / "grid_inventory.parquet"
 
         try:
             grid_inventory_df = pd.read_parquet(path=parquet_file_name)
-            return ProviderImplRoff(storage_key, provider_dir, grid_inventory_df)
+            return ProviderImplRoff(
+                storage_key, provider_dir, grid_inventory_df, property_store
+            )
         except FileNotFoundError:
             return None
 
@@ -232,8 +286,64 @@ class ProviderImplRoff(EnsembleGridProvider):
         grid = xtgeo.grid_from_file(fn_list[0])
         return grid
 
+    def get_geometry_fingerprint(self, realization: int) -> Optional[str]:
+        return self._real_to_geometry_fingerprint.get(realization)
+
+    def get_vtk_esg_geometry(self, realization: int) -> Optional[EsgGeometry]:
+        fingerprint = self.get_geometry_fingerprint(realization)
+        if fingerprint is None:
+            return None
+
+        return read_esg_geometry(esg_geometry_dir(self._provider_dir, fingerprint))
+
     def get_static_property_values(
         self, property_name: str, realization: int
+    ) -> Optional[np.ndarray]:
+        if self._property_store is None:
+            return self._load_static_property_values(property_name, realization)
+
+        return self._property_store.get_or_create(
+            self._provider_id,
+            self._property_data_version(property_name, None, [realization]),
+            realization,
+            property_name,
+            None,
+            lambda: self._load_static_property_values(property_name, realization),
+        )
+
+    def get_dynamic_property_values(
+        self, property_name: str, property_date: str, realization: int
+    ) -> Optional[np.ndarray]:
+        if self._property_store is None:
+            return self._load_dynamic_property_values(
+                property_name, property_date, realization
+            )
+
+        return self._property_store.get_or_create(
+            self._provider_id,
+            self._property_data_version(property_name, property_date, [realization]),
+            realization,
+            property_name,
+            property_date,
+            lambda: self._load_dynamic_property_values(
+                property_name, property_date, realization
+            ),
+        )
+
+    def get_statistical_property_values(
+        self, address: StatisticalGridPropertyAddress
+    ) -> Optional[np.ndarray]:
+        return get_or_calc_statistical_property_values(
+            self,
+            address,
+            self._property_store,
+            self._property_data_version(
+                address.property_name, address.datestr, address.realizations
+            ),
+        )
+
+    def _load_static_property_values(
+        self, property_name: str, realization: int
     ) -> Optional[np.ndarray]:
         fn_list: List[str] = self._locate_static_property(
             property_name=property_name, realizations=[realization]
@@ -250,7 +360,7 @@ class ProviderImplRoff(EnsembleGridProvider):
         fill_value = np.nan if not grid_property.isdiscrete else -1
         return grid_property.get_npvalues1d(order="F", fill_value=fill_value).ravel()
 
-    def get_dynamic_property_values(
+    def _load_dynamic_property_values(
         self, property_name: str, property_date: str, realization: int
     ) -> Optional[np.ndarray]:
         fn_list: List[str] = self._locate_dynamic_property(
@@ -269,6 +379,21 @@ class ProviderImplRoff(EnsembleGridProvider):
         grid_property = xtgeo.gridproperty_from_file(fn_list[0])
         return grid_property.get_npvalues1d(order="F").ravel()
 
+    def _property_data_version(
+        self,
+        property_name: str,
+        property_datestr: Optional[str],
+        realizations: List[int],
+    ) -> str:
+        """Returns the version of the property's files, for keying stored values"""
+        if property_datestr is None:
+            fn_list = self._locate_static_property(property_name, realizations)
+        else:
+            fn_list = self._locate_dynamic_property(
+                property_name, property_datestr, realizations
+            )
+        return source_files_version([str(fn) for fn in fn_list])
+
     def _locate_static_property(
         self, property_name: str, realizations: List[int]
     ) -> List[str]:
@@ -2,9 +2,10 @@ import glob
 import logging
 import os
 import re
-from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Set
+from typing import Deque, Dict, Iterator, List, Set, Tuple
 
 import pyarrow as pa
 
@@ -50,6 +51,17 @@ def _discover_arrow_unsmry_files(globpattern: str) -> List[FileEntry]:
     return file_list
 
 
+def get_arrow_unsmry_file_info(entry: FileEntry) -> dict:
+    """Return json friendly dict with the file's name, modification time and size,
+    which can be used to detect if the file has changed"""
+    stat_result = os.stat(entry.filename)
+    return {
+        "filename": entry.filename,
+        "mtime_ns": stat_result.st_mtime_ns,
+        "size": stat_result.st_size,
+    }
+
+
 def _load_table_from_arrow_file(entry: FileEntry) -> pa.Table:
     LOGGER.debug(f"loading table real={entry.real}: {entry.filename}")
     source = pa.memory_map(entry.filename, "r")
@@ -96,3 +108,65 @@ def load_per_realization_arrow_unsmry_files(
     )
 
     return per_real_tables
+
+
+def discover_per_realization_arrow_unsmry_files(
+    ens_path: str, rel_file_pattern: str
+) -> List[FileEntry]:
+    """Find the per-realization arrow files without loading any of them.
+    The returned entries are sorted on realization number.
+    """
+    globpattern = os.path.join(ens_path, rel_file_pattern)
+    files = _discover_arrow_unsmry_files(globpattern)
+    if len(files) == 0:
+        LOGGER.warning(f"No arrow files were discovered in: {ens_path}")
+        LOGGER.warning(f"Glob pattern used: {globpattern}")
+
+    return files
+
+
+def unify_arrow_unsmry_file_schemas(file_entries: List[FileEntry]) -> pa.Schema:
+    """Return the union of the schemas of the files, reading only the schemas.
+    The fields are ordered as they would be when concatenating the tables.
+    """
+    schemas = []
+    for entry in file_entries:
+        source = pa.memory_map(entry.filename, "r")
+        schemas.append(pa.ipc.RecordBatchFileReader(source).schema)
+
+    return pa.unify_schemas(schemas)
+
+
+def iterate_per_realization_arrow_unsmry_tables(
+    file_entries: List[FileEntry], max_concurrent_loads: int = 4
+) -> Iterator[Tuple[int, pa.Table]]:
+    """Load the files using a pool of threads and yield (real, table) tuples in the
+    same order as the file entries.
+    At most `max_concurrent_loads` tables will be loaded ahead of the consumer, so
+    memory use stays bounded regardless of the number of realizations.
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrent_loads) as executor:
+        pending: Deque[Tuple[int, Future]] = deque()
+        entry_iter = iter(file_entries)
+
+        for entry in entry_iter:
+            pending.append(
+                (entry.real, executor.submit(_load_table_from_arrow_file, entry))
+            )
+            if len(pending) >= max_concurrent_loads:
+                break
+
+        while pending:
+            real, future = pending.popleft()
+            table = future.result()
+
+            next_entry = next(entry_iter, None)
+            if next_entry is not None:
+                pending.append(
+                    (
+                        next_entry.real,
+                        executor.submit(_load_table_from_arrow_file, next_entry),
+                    )
+                )
+
+            yield real, table
@@ -41,6 +41,24 @@ def is_rate_from_field_meta(field: pa.Field) -> bool:
     #     ) from e
 
 
+def is_total_from_field_meta(field: pa.Field) -> bool:
+    """Determine if the field is a total (cumulative) by querying for the "is_total"
+    keyword in the field's metadata.
+    Will silently return False if no metadata exists for the field, but will raise an
+    exception if the field HAS metadata but the 'is_total' key is missing.
+    """
+    meta_dict = field.metadata
+    if meta_dict is not None:
+        try:
+            is_total_bytestr = meta_dict[b"is_total"]
+            return bool(is_total_bytestr == b"True")
+        except KeyError as exc:
+            raise KeyError(
+                f"Field {field.name} has metadata, but the is_total key was not found"
+            ) from exc
+    return False
+
+
 def create_vector_metadata_from_field_meta(
     field: pa.Field,
 ) -> Optional[VectorMetadata]:
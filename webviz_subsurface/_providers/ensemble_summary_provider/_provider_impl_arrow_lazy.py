@@ -1,8 +1,10 @@
 import datetime
+import heapq
 import logging
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
@@ -12,15 +14,22 @@ import pyarrow.compute as pc
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
 from ._field_metadata import create_vector_metadata_from_field_meta
+from ._resampled_column_cache import ResampledColumnCacheBase, make_rows_key
 from ._resampling import (
     generate_normalized_sample_dates,
     resample_segmented_multi_real_table,
     sample_segmented_multi_real_table_at_date,
+    sample_segmented_multi_real_table_at_dates,
 )
 from ._table_utils import (
+    add_per_real_batch_index_to_table_schema_metadata,
+    add_per_real_source_file_info_to_table_schema_metadata,
     add_per_vector_min_max_to_table_schema_metadata,
+    create_float_downcasting_schema,
     find_intersected_dates_between_realizations,
     find_min_max_for_numeric_table_columns,
+    get_per_real_batch_index_from_schema_metadata,
+    get_per_real_source_file_info_from_schema_metadata,
     get_per_vector_min_max_from_schema_metadata,
 )
 from .ensemble_summary_provider import (
@@ -35,14 +44,6 @@ from .ensemble_summary_provider import (
 LOGGER = logging.getLogger(__name__)
 
 
-def _sort_table_on_real_then_date(table: pa.Table) -> pa.Table:
-    indices = pc.sort_indices(
-        table, sort_keys=[("REAL", "ascending"), ("DATE", "ascending")]
-    )
-    sorted_table = table.take(indices)
-    return sorted_table
-
-
 def _is_date_column_monotonically_increasing(table: pa.Table) -> bool:
     dates_np = table.column("DATE").to_numpy()
     if not np.all(np.diff(dates_np) > np.timedelta64(0)):
@@ -62,13 +63,232 @@ def _find_first_non_increasing_date_pair(
     return (dates_np[offending_indices[0]], dates_np[offending_indices[0] + 1])
 
 
+def _validate_per_realization_table(real_num: int, table: pa.Table) -> None:
+    if "REAL" in table.schema.names:
+        raise ValueError(f"Input tables should not have REAL column (real={real_num})")
+
+    if table.schema.field("DATE").type != pa.timestamp("ms"):
+        raise ValueError(
+            f"DATE column must have timestamp[ms] data type (real={real_num})"
+        )
+
+    if not _is_date_column_monotonically_increasing(table):
+        offending_pair = _find_first_non_increasing_date_pair(table)
+        raise ValueError(
+            f"DATE column must be monotonically increasing\n"
+            f"Error detected in realization: {real_num}\n"
+            f"First offending timestamps: {offending_pair}"
+        )
+
+
+def _conform_table_to_schema(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Return table with columns ordered as in schema, missing columns filled with
+    nulls"""
+    columns = []
+    for field in schema:
+        if field.name in table.schema.names:
+            column = table.column(field.name)
+            if column.type != field.type:
+                column = column.cast(field.type)
+            columns.append(column)
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _merge_min_max(
+    accumulated_min_max: Dict[str, dict], per_vector_min_max: Dict[str, dict]
+) -> None:
+    """Merge min/max values for one realization into the accumulated values.
+    Null values are ignored."""
+    for vec_name, min_max in per_vector_min_max.items():
+        acc = accumulated_min_max.setdefault(vec_name, {"min": None, "max": None})
+        if min_max["min"] is not None and (
+            acc["min"] is None or min_max["min"] < acc["min"]
+        ):
+            acc["min"] = min_max["min"]
+        if min_max["max"] is not None and (
+            acc["max"] is None or min_max["max"] > acc["max"]
+        ):
+            acc["max"] = min_max["max"]
+
+
+def _create_ipc_write_options(compression: Optional[str]) -> pa.ipc.IpcWriteOptions:
+    if compression is not None and compression not in ["lz4", "zstd"]:
+        raise ValueError(f"Unsupported backing store compression: {compression}")
+    return pa.ipc.IpcWriteOptions(compression=compression)
+
+
+def _write_per_realization_batches(
+    per_real_tables: Iterable[Tuple[int, pa.Table]],
+    unified_schema: pa.Schema,
+    output_schema: pa.Schema,
+    arrow_file_name: Path,
+) -> Tuple[Dict[str, dict], Dict[int, int]]:
+    """Validate the tables and write them to arrow file, one record batch per
+    realization. Returns the accumulated per-vector min/max values and the
+    REAL -> batch index mapping.
+    The min/max values are found before the tables are cast to `output_schema`.
+    """
+    per_vector_min_max: Dict[str, dict] = {}
+    per_real_batch_index: Dict[int, int] = {}
+    prev_real_num: Optional[int] = None
+
+    with pa.OSFile(str(arrow_file_name), "wb") as sink:
+        with pa.RecordBatchFileWriter(sink, output_schema) as writer:
+            for real_num, table in per_real_tables:
+                if prev_real_num is not None and real_num <= prev_real_num:
+                    raise ValueError(
+                        f"Realizations must be in ascending order "
+                        f"(real={real_num} after real={prev_real_num})"
+                    )
+                prev_real_num = real_num
+
+                _validate_per_realization_table(real_num, table)
+
+                # A realization without any rows would not show up in the
+                # REAL column, so it gets no batch either
+                if table.num_rows == 0:
+                    continue
+
+                real_table = _conform_table_to_schema(table, unified_schema)
+                real_table = real_table.add_column(
+                    0,
+                    output_schema.field("REAL"),
+                    pa.array(np.full(real_table.num_rows, real_num, np.int32)),
+                ).combine_chunks()
+
+                _merge_min_max(
+                    per_vector_min_max,
+                    find_min_max_for_numeric_table_columns(real_table),
+                )
+                if real_table.schema != output_schema:
+                    real_table = real_table.cast(output_schema)
+
+                per_real_batch_index[real_num] = len(per_real_batch_index)
+                writer.write_batch(real_table.to_batches()[0])
+
+    return per_vector_min_max, per_real_batch_index
+
+
+def _presampled_tier_file_name(
+    storage_dir: Path, storage_key: str, freq: Frequency
+) -> Path:
+    return storage_dir / f"{storage_key}__presampled_{freq.value}.arrow"
+
+
+def _open_reader_for_columns(
+    arrow_file_name: str, schema: pa.Schema, columns: List[str]
+) -> pa.ipc.RecordBatchFileReader:
+    """Open a reader that will only read the specified columns from the file.
+    For compressed files this avoids decompressing the columns that are not wanted.
+    """
+    included_fields = sorted(schema.get_field_index(colname) for colname in columns)
+    source = pa.memory_map(arrow_file_name, "r")
+    return pa.ipc.RecordBatchFileReader(
+        source, options=pa.ipc.IpcReadOptions(included_fields=included_fields)
+    )
+
+
+def _read_table_from_file(
+    arrow_file_name: str,
+    schema: pa.Schema,
+    per_real_batch_index: Optional[Dict[int, int]],
+    columns: List[str],
+    realizations: Optional[Sequence[int]],
+) -> pa.Table:
+    reader = _open_reader_for_columns(arrow_file_name, schema, columns)
+
+    if realizations is not None and per_real_batch_index is not None:
+        # Only fetch the record batches belonging to the requested realizations.
+        # Iterate in sorted order so that the table stays segmented on REAL
+        batches = [
+            reader.get_batch(per_real_batch_index[real])
+            for real in sorted(set(realizations))
+            if real in per_real_batch_index
+        ]
+        return pa.Table.from_batches(batches, schema=reader.schema).select(columns)
+
+    table = reader.read_all().select(columns)
+    return _filter_table_on_realizations(table, realizations)
+
+
+@dataclass
+class _PresampledTier:
+    file_name: str
+    reader: pa.ipc.RecordBatchFileReader
+    per_real_batch_index: Optional[Dict[int, int]]
+
+
+def _open_reusable_presampled_tier(
+    tier_file_name: Path, backing_store_schema: pa.Schema
+) -> Optional[_PresampledTier]:
+    """Open existing presampled tier if its batches can be reused for a backing store
+    with the specified schema, otherwise return None"""
+    if not tier_file_name.is_file():
+        return None
+
+    tier_reader = pa.ipc.RecordBatchFileReader(pa.memory_map(str(tier_file_name), "r"))
+    if not tier_reader.schema.equals(backing_store_schema, check_metadata=False):
+        return None
+
+    per_real_batch_index = get_per_real_batch_index_from_schema_metadata(
+        tier_reader.schema
+    )
+    if per_real_batch_index is None:
+        return None
+
+    return _PresampledTier(
+        file_name=str(tier_file_name),
+        reader=tier_reader,
+        per_real_batch_index=per_real_batch_index,
+    )
+
+
+def _filter_table_on_realizations(
+    table: pa.Table, realizations: Optional[Sequence[int]]
+) -> pa.Table:
+    if realizations is None:
+        return table
+
+    mask = pc.is_in(table["REAL"], value_set=pa.array(realizations))
+    return table.filter(mask)
+
+
 class ProviderImplArrowLazy(EnsembleSummaryProvider):
     """This class implements an EnsembleSummaryProvider with lazy (on-demand)
     resampling/interpolation.
+
+    Optionally, the backing store may contain presampled tiers, which are additional
+    arrow files holding the data resampled to some of the more commonly used
+    frequencies. Requests for those frequencies are served directly from the tiers
+    without any resampling.
     """
 
-    def __init__(self, arrow_file_name: Path) -> None:
+    # Frequencies that presampled tiers will be written for
+    PRESAMPLED_TIER_FREQUENCIES = [
+        Frequency.MONTHLY,
+        Frequency.QUARTERLY,
+        Frequency.YEARLY,
+    ]
+
+    def __init__(
+        self,
+        arrow_file_name: Path,
+        resampled_column_cache: Optional[ResampledColumnCacheBase] = None,
+        presampled_tier_file_names: Optional[Dict[Frequency, Path]] = None,
+    ) -> None:
+        # pylint: disable=too-many-locals
         self._arrow_file_name = str(arrow_file_name)
+        self._resampled_column_cache = resampled_column_cache
+
+        # Include the modification time in the id used in the cache, so that entries
+        # for an older version of the backing store will never be returned
+        self._cache_owner_id = (
+            self._arrow_file_name,
+            os.stat(self._arrow_file_name).st_mtime_ns,
+        )
 
         LOGGER.debug(f"init with arrow file: {self._arrow_file_name}")
         timer = PerfTimer()
@@ -88,12 +308,25 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
         ]
         et_find_vec_names_ms = timer.lap_ms()
 
-        unique_realizations_on_file = reader.read_all().column("REAL").unique()
-        self._realizations: List[int] = unique_realizations_on_file.to_pylist()
+        # Backing stores with one record batch per realization carry an index that
+        # lets us both discover the realizations and read them individually
+        self._per_real_batch_index = get_per_real_batch_index_from_schema_metadata(
+            reader.schema
+        )
+        if self._per_real_batch_index is not None:
+            self._realizations: List[int] = sorted(self._per_real_batch_index.keys())
+        else:
+            unique_realizations_on_file = reader.read_all().column("REAL").unique()
+            self._realizations = unique_realizations_on_file.to_pylist()
         et_find_real_ms = timer.lap_ms()
 
-        # We'll try and keep the file open for the life-span of the provider.
-        # Done to try and stop blobfuse from throwing the file out of its cache.
+        self._per_real_source_file_info = (
+            get_per_real_source_file_info_from_schema_metadata(reader.schema)
+        )
+
+        # Keep the reader for the life-span of the provider, so that the schema and
+        # its metadata don't have to be read again. The data itself is read through
+        # per call memory maps in _read_table_from_file().
         self._cached_reader = reader
 
         # For testing, uncomment code below and we will be more aggressive
@@ -101,12 +334,29 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
         self._cached_full_table = None
         # self._cached_full_table = reader.read_all()
 
+        self._presampled_tiers: Dict[Frequency, _PresampledTier] = {}
+        if presampled_tier_file_names:
+            for freq, tier_file_name in presampled_tier_file_names.items():
+                tier_reader = pa.ipc.RecordBatchFileReader(
+                    pa.memory_map(str(tier_file_name), "r")
+                )
+                self._presampled_tiers[freq] = _PresampledTier(
+                    file_name=str(tier_file_name),
+                    reader=tier_reader,
+                    per_real_batch_index=get_per_real_batch_index_from_schema_metadata(
+                        tier_reader.schema
+                    ),
+                )
+        et_open_tiers_ms = timer.lap_ms()
+
         LOGGER.debug(
             f"init took: {timer.elapsed_s():.2f}s, "
             f"(open={et_open_ms}ms, create_reader={et_create_reader_ms}ms, "
-            f"find_vec_names={et_find_vec_names_ms}ms, find_real={et_find_real_ms}ms), "
+            f"find_vec_names={et_find_vec_names_ms}ms, find_real={et_find_real_ms}ms, "
+            f"open_tiers={et_open_tiers_ms}ms), "
             f"#vector_names={len(self._vector_names)}, "
-            f"#realization={len(self._realizations)}"
+            f"#realization={len(self._realizations)}, "
+            f"presampled_tiers={list(self._presampled_tiers.keys())}"
         )
 
         if not self._realizations:
@@ -116,100 +366,290 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
 
     @staticmethod
     def write_backing_store_from_per_realization_tables(
-        storage_dir: Path, storage_key: str, per_real_tables: Dict[int, pa.Table]
+        storage_dir: Path,
+        storage_key: str,
+        per_real_tables: Dict[int, pa.Table],
+        compression: Optional[str] = None,
+        downcast_to_float32: bool = False,
     ) -> None:
+        unified_schema = pa.unify_schemas(
+            [table.schema for table in per_real_tables.values()]
+        )
+        ProviderImplArrowLazy.write_backing_store_from_per_realization_table_stream(
+            storage_dir,
+            storage_key,
+            unified_schema,
+            sorted(per_real_tables.items()),
+            compression=compression,
+            downcast_to_float32=downcast_to_float32,
+        )
+
+    @staticmethod
+    def write_backing_store_from_per_realization_table_stream(
+        storage_dir: Path,
+        storage_key: str,
+        unified_schema: pa.Schema,
+        per_real_tables: Iterable[Tuple[int, pa.Table]],
+        compression: Optional[str] = None,
+        downcast_to_float32: bool = False,
+        per_real_source_file_info: Optional[Dict[int, dict]] = None,
+    ) -> None:
+        """Write backing store from a stream of (real, table) tuples.
+
+        The tables must be delivered in ascending realization order and are consumed
+        one at a time, so only the table currently being processed needs to be held in
+        memory. The `unified_schema` must be the union of the schemas of all the
+        tables, see `pa.unify_schemas()`. Columns that are missing from a table will be
+        filled with nulls.
+
+        Each realization is written as a separate record batch to a temporary file.
+        Once all the realizations have been seen, the batches are copied to the final
+        file whose schema carries the min/max and batch index metadata. The final file
+        replaces any existing backing store in one go, so readers will never see a
+        partially written file.
+
+        The `compression` parameter selects compression of the arrow IPC buffers in
+        the final file, valid values are None, "lz4" and "zstd". LZ4 is the faster
+        of the two to decompress, while ZSTD gives smaller files.
+        If `downcast_to_float32` is True, all float64 vectors except totals are stored
+        as float32, roughly halving the size of the data.
+        The optional `per_real_source_file_info` is stored in the metadata, see
+        `per_real_source_file_info()`.
+        """
+
         # pylint: disable=too-many-locals
         @dataclass
         class Elapsed:
-            concat_tables_s: float = -1
-            build_add_real_col_s: float = -1
-            sorting_s: float = -1
-            find_and_store_min_max_s: float = -1
-            write_s: float = -1
+            process_and_write_tmp_s: float = -1
+            write_final_s: float = -1
 
         elapsed = Elapsed()
 
         arrow_file_name = storage_dir / (storage_key + ".arrow")
+        tmp_arrow_file_name = storage_dir / (storage_key + ".arrow.tmp")
+        new_arrow_file_name = storage_dir / (storage_key + ".arrow.new")
         LOGGER.debug(f"Writing backing store to arrow file: {arrow_file_name}")
         timer = PerfTimer()
 
-        unique_column_names = set()
-        for real_num, table in per_real_tables.items():
-            unique_column_names.update(table.schema.names)
+        if "REAL" in unified_schema.names:
+            raise ValueError("Input tables should not have REAL column")
 
-            if "REAL" in table.schema.names:
-                raise ValueError(
-                    f"Input tables should not have REAL column (real={real_num})"
-                )
+        ipc_write_options = _create_ipc_write_options(compression)
 
-            if table.schema.field("DATE").type != pa.timestamp("ms"):
-                raise ValueError(
-                    f"DATE column must have timestamp[ms] data type (real={real_num})"
-                )
+        output_schema = unified_schema.insert(0, pa.field("REAL", pa.int32()))
+        if downcast_to_float32:
+            output_schema = create_float_downcasting_schema(
+                output_schema, keep_total_vectors_as_float64=True
+            )
 
-            if not _is_date_column_monotonically_increasing(table):
-                offending_pair = _find_first_non_increasing_date_pair(table)
-                raise ValueError(
-                    f"DATE column must be monotonically increasing\n"
-                    f"Error detected in realization: {real_num}\n"
-                    f"First offending timestamps: {offending_pair}"
+        try:
+            per_vector_min_max, per_real_batch_index = _write_per_realization_batches(
+                per_real_tables, unified_schema, output_schema, tmp_arrow_file_name
+            )
+            elapsed.process_and_write_tmp_s = timer.lap_s()
+
+            # The final schema can only be determined after all realizations have
+            # been seen. Copy the batches over to the final file, reading from the
+            # temporary file through a memory map so that only one batch is touched
+            # at a time.
+            final_table = add_per_vector_min_max_to_table_schema_metadata(
+                output_schema.empty_table(), per_vector_min_max
+            )
+            final_table = add_per_real_batch_index_to_table_schema_metadata(
+                final_table, per_real_batch_index
+            )
+            if per_real_source_file_info is not None:
+                final_table = add_per_real_source_file_info_to_table_schema_metadata(
+                    final_table, per_real_source_file_info
                 )
+            with pa.memory_map(str(tmp_arrow_file_name), "r") as source:
+                tmp_reader = pa.ipc.RecordBatchFileReader(source)
+                with pa.OSFile(str(new_arrow_file_name), "wb") as sink:
+                    with pa.RecordBatchFileWriter(
+                        sink, final_table.schema, options=ipc_write_options
+                    ) as writer:
+                        for batch_idx in range(tmp_reader.num_record_batches):
+                            writer.write_batch(tmp_reader.get_batch(batch_idx))
+            os.replace(new_arrow_file_name, arrow_file_name)
+            elapsed.write_final_s = timer.lap_s()
+        finally:
+            tmp_arrow_file_name.unlink(missing_ok=True)
+            new_arrow_file_name.unlink(missing_ok=True)
 
         LOGGER.debug(
-            f"Concatenating {len(per_real_tables)} tables with "
-            f"{len(unique_column_names)} unique column names"
+            f"Wrote backing store to arrow file in: {timer.elapsed_s():.2f}s ("
+            f"process_and_write_tmp={elapsed.process_and_write_tmp_s:.2f}s, "
+            f"write_final={elapsed.write_final_s:.2f}s, "
+            f"#realizations={len(per_real_batch_index)}, "
+            f"compression={compression}, downcast_to_float32={downcast_to_float32})"
         )
 
-        full_table = pa.concat_tables(
-            per_real_tables.values(), promote_options="default"
-        )
-        elapsed.concat_tables_s = timer.lap_s()
-
-        real_arr = np.empty(full_table.num_rows, np.int32)
-        table_start_idx = 0
-        for real_num, real_table in per_real_tables.items():
-            real_arr[table_start_idx : table_start_idx + real_table.num_rows] = real_num
-            table_start_idx += real_table.num_rows
-
-        full_table = full_table.add_column(0, "REAL", pa.array(real_arr))
-        elapsed.build_add_real_col_s = timer.lap_s()
-
-        # Must sort table on real since interpolations work per realization
-        # and we utilize slicing for speed
-        full_table = _sort_table_on_real_then_date(full_table)
-        elapsed.sorting_s = timer.lap_s()
-
-        # Find per column min/max values and store them as metadata on table's schema
-        per_vector_min_max = find_min_max_for_numeric_table_columns(full_table)
-        full_table = add_per_vector_min_max_to_table_schema_metadata(
-            full_table, per_vector_min_max
+    @staticmethod
+    def update_backing_store_from_per_realization_table_stream(
+        storage_dir: Path,
+        storage_key: str,
+        unified_schema: pa.Schema,
+        changed_per_real_tables: Iterable[Tuple[int, pa.Table]],
+        realizations_to_keep: Sequence[int],
+        compression: Optional[str] = None,
+        downcast_to_float32: bool = False,
+        per_real_source_file_info: Optional[Dict[int, dict]] = None,
+    ) -> None:
+        """Rewrite an existing backing store, taking the realizations in
+        `realizations_to_keep` from the existing store and the rest from the stream
+        of changed (real, table) tuples. Realizations that are in neither will be
+        removed from the store.
+
+        Only the changed realizations need to be loaded from their source files, the
+        kept ones are read directly from the existing store. The `unified_schema`
+        must be the union of the schemas of all the realizations' source files.
+        See `write_backing_store_from_per_realization_table_stream()` for the
+        remaining parameters.
+        """
+        arrow_file_name = storage_dir / (storage_key + ".arrow")
+        LOGGER.debug(f"Updating backing store in arrow file: {arrow_file_name}")
+
+        source = pa.memory_map(str(arrow_file_name), "r")
+        reader = pa.ipc.RecordBatchFileReader(source)
+        per_real_batch_index = get_per_real_batch_index_from_schema_metadata(
+            reader.schema
         )
-        elapsed.find_and_store_min_max_s = timer.lap_s()
+        if per_real_batch_index is None:
+            raise ValueError(
+                "Updating requires a backing store with one batch per realization"
+            )
 
-        # feather.write_feather(full_table, dest=arrow_file_name)
-        with pa.OSFile(str(arrow_file_name), "wb") as sink:
-            with pa.RecordBatchFileWriter(sink, full_table.schema) as writer:
-                writer.write_table(full_table)
-        elapsed.write_s = timer.lap_s()
+        # Realizations that had no rows will not have a batch, so there is nothing to
+        # take from the store for them
+        realizations_to_keep_set = set(realizations_to_keep)
+        kept_per_real_tables = (
+            (real, pa.Table.from_batches([reader.get_batch(batch_idx)]).drop(["REAL"]))
+            for real, batch_idx in sorted(per_real_batch_index.items())
+            if real in realizations_to_keep_set
+        )
 
-        LOGGER.debug(
-            f"Wrote backing store to arrow file in: {timer.elapsed_s():.2f}s ("
-            f"concat_tables={elapsed.concat_tables_s:.2f}s, "
-            f"build_add_real_col={elapsed.build_add_real_col_s:.2f}s, "
-            f"sorting={elapsed.sorting_s:.2f}s, "
-            f"find_and_store_min_max={elapsed.find_and_store_min_max_s:.2f}s, "
-            f"write={elapsed.write_s:.2f}s)"
+        ProviderImplArrowLazy.write_backing_store_from_per_realization_table_stream(
+            storage_dir,
+            storage_key,
+            unified_schema,
+            heapq.merge(
+                kept_per_real_tables, changed_per_real_tables, key=lambda item: item[0]
+            ),
+            compression=compression,
+            downcast_to_float32=downcast_to_float32,
+            per_real_source_file_info=per_real_source_file_info,
         )
 
     @staticmethod
     def from_backing_store(
-        storage_dir: Path, storage_key: str
+        storage_dir: Path,
+        storage_key: str,
+        resampled_column_cache: Optional[ResampledColumnCacheBase] = None,
     ) -> Optional["ProviderImplArrowLazy"]:
         arrow_file_name = storage_dir / (storage_key + ".arrow")
-        if arrow_file_name.is_file():
-            return ProviderImplArrowLazy(arrow_file_name)
+        if not arrow_file_name.is_file():
+            return None
 
-        return None
+        presampled_tier_file_names: Dict[Frequency, Path] = {}
+        for freq in ProviderImplArrowLazy.PRESAMPLED_TIER_FREQUENCIES:
+            tier_file_name = _presampled_tier_file_name(storage_dir, storage_key, freq)
+            if tier_file_name.is_file():
+                presampled_tier_file_names[freq] = tier_file_name
+
+        return ProviderImplArrowLazy(
+            arrow_file_name, resampled_column_cache, presampled_tier_file_names
+        )
+
+    @staticmethod
+    def write_presampled_tiers_to_backing_store(
+        storage_dir: Path,
+        storage_key: str,
+        compression: Optional[str] = None,
+        realizations_to_resample: Optional[Sequence[int]] = None,
+    ) -> None:
+        """Write presampled tiers next to an existing backing store.
+        The data is resampled one realization at a time and each tier file gets
+        the same layout and column types as the backing store, with one record batch
+        per realization. See `write_backing_store_from_per_realization_table_stream()`
+        for valid values of `compression`.
+
+        If `realizations_to_resample` is specified, existing tiers with matching
+        columns are updated by only resampling the listed realizations, while the
+        batches for the other realizations are copied from the existing tier.
+        """
+        # pylint: disable=too-many-locals
+        arrow_file_name = storage_dir / (storage_key + ".arrow")
+        LOGGER.debug(f"Writing presampled tiers for arrow file: {arrow_file_name}")
+        timer = PerfTimer()
+
+        ipc_write_options = _create_ipc_write_options(compression)
+
+        source = pa.memory_map(str(arrow_file_name), "r")
+        reader = pa.ipc.RecordBatchFileReader(source)
+        per_real_batch_index = get_per_real_batch_index_from_schema_metadata(
+            reader.schema
+        )
+        if per_real_batch_index is None:
+            raise ValueError(
+                "Presampled tiers require a backing store with one batch per realization"
+            )
+
+        realizations_to_resample_set = set(realizations_to_resample or [])
+        elapsed_per_tier: List[str] = []
+        for freq in ProviderImplArrowLazy.PRESAMPLED_TIER_FREQUENCIES:
+            tier_file_name = _presampled_tier_file_name(storage_dir, storage_key, freq)
+            # Batch index of the realizations that can be copied from the existing tier
+            reusable_tier = None
+            reusable_batch_index: Dict[int, int] = {}
+            if realizations_to_resample is not None:
+                reusable_tier = _open_reusable_presampled_tier(
+                    tier_file_name, reader.schema
+                )
+            if reusable_tier is not None and reusable_tier.per_real_batch_index:
+                reusable_batch_index = {
+                    real: batch_idx
+                    for real, batch_idx in reusable_tier.per_real_batch_index.items()
+                    if real not in realizations_to_resample_set
+                }
+
+            new_tier_file_name = tier_file_name.with_suffix(".arrow.new")
+            with pa.OSFile(str(new_tier_file_name), "wb") as sink:
+                with pa.RecordBatchFileWriter(
+                    sink, reader.schema, options=ipc_write_options
+                ) as writer:
+                    for real, batch_idx in sorted(
+                        per_real_batch_index.items(), key=lambda item: item[1]
+                    ):
+                        reusable_batch_idx = reusable_batch_index.get(real)
+                        if reusable_batch_idx is not None and reusable_tier is not None:
+                            writer.write_batch(
+                                reusable_tier.reader.get_batch(reusable_batch_idx)
+                            )
+                            continue
+
+                        real_table = pa.Table.from_batches(
+                            [reader.get_batch(batch_idx)]
+                        )
+                        resampled_table = resample_segmented_multi_real_table(
+                            real_table, freq
+                        ).combine_chunks()
+                        writer.write_batch(resampled_table.to_batches()[0])
+            os.replace(new_tier_file_name, tier_file_name)
+            elapsed_per_tier.append(f"{freq.value}={timer.lap_s():.2f}s")
+
+        LOGGER.debug(
+            f"Wrote presampled tiers in: {timer.elapsed_s():.2f}s "
+            f"({', '.join(elapsed_per_tier)})"
+        )
+
+    def per_real_source_file_info(self) -> Optional[Dict[int, dict]]:
+        """Returns the per-realization source file info that was recorded when the
+        backing store was written, or None if no such info was recorded"""
+        return self._per_real_source_file_info
+
+    def presampled_tier_frequencies(self) -> List[Frequency]:
+        """Returns the frequencies for which the backing store has presampled tiers"""
+        return list(self._presampled_tiers.keys())
 
     def _get_or_read_schema(self) -> pa.Schema:
         if self._cached_full_table:
@@ -220,15 +660,58 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
         source = pa.memory_map(self._arrow_file_name, "r")
         return pa.ipc.RecordBatchFileReader(source).schema
 
-    def _get_or_read_table(self, columns: List[str]) -> pa.Table:
+    def _get_or_read_table(
+        self, columns: List[str], realizations: Optional[Sequence[int]] = None
+    ) -> pa.Table:
+        """Get table with the specified columns, restricted to the specified
+        realizations. If realizations is None, all realizations will be returned.
+        The REAL column must be included in columns when filtering on realizations.
+        """
         if self._cached_full_table:
-            return self._cached_full_table.select(columns)
-        if self._cached_reader:
-            return self._cached_reader.read_all().select(columns)
+            table = self._cached_full_table.select(columns)
+            return _filter_table_on_realizations(table, realizations)
+
+        return _read_table_from_file(
+            self._arrow_file_name,
+            self._get_or_read_schema(),
+            self._per_real_batch_index,
+            columns,
+            realizations,
+        )
 
-        source = pa.memory_map(self._arrow_file_name, "r")
-        reader = pa.ipc.RecordBatchFileReader(source)
-        return reader.read_all().select(columns)
+    def _get_resampled_table_using_cache(
+        self,
+        cache: ResampledColumnCacheBase,
+        vector_names: Sequence[str],
+        resampling_frequency: Frequency,
+        realizations: Optional[Sequence[int]],
+    ) -> pa.Table:
+        """Get resampled table, only resampling the columns not found in the cache"""
+        rows_key = make_rows_key(resampling_frequency, realizations)
+        columns_to_get = ["DATE", "REAL"]
+        columns_to_get.extend(vector_names)
+
+        columns = cache.get_columns(self._cache_owner_id, rows_key, columns_to_get)
+
+        missing_vector_names = [
+            vec_name
+            for vec_name in dict.fromkeys(vector_names)
+            if vec_name not in columns
+        ]
+        if missing_vector_names or "DATE" not in columns or "REAL" not in columns:
+            table = self._get_or_read_table(
+                ["DATE", "REAL"] + missing_vector_names, realizations
+            )
+            table = resample_segmented_multi_real_table(table, resampling_frequency)
+            resampled_columns = {
+                colname: table.column(colname) for colname in table.column_names
+            }
+            cache.put_columns(self._cache_owner_id, rows_key, resampled_columns)
+            columns.update(resampled_columns)
+
+        return pa.table(
+            [columns[colname] for colname in columns_to_get], names=columns_to_get
+        )
 
     def vector_names(self) -> List[str]:
         return self._vector_names
@@ -288,14 +771,11 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
     ) -> List[datetime.datetime]:
         timer = PerfTimer()
 
-        table = self._get_or_read_table(["DATE", "REAL"])
+        table = self._get_or_read_table(
+            ["DATE", "REAL"], realizations if realizations else None
+        )
         et_read_ms = timer.lap_ms()
 
-        if realizations:
-            mask = pc.is_in(table["REAL"], value_set=pa.array(realizations))
-            table = table.filter(mask)
-        et_filter_ms = timer.lap_ms()
-
         if resampling_frequency is not None:
             unique_dates_np = table.column("DATE").unique().to_numpy()
             min_raw_date = np.min(unique_dates_np)
@@ -311,7 +791,6 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
         LOGGER.debug(
             f"dates({resampling_frequency}) took: {timer.elapsed_ms()}ms ("
             f"read={et_read_ms}ms, "
-            f"filter={et_filter_ms}ms, "
             f"find_unique={et_find_unique_ms}ms)"
         )
 
@@ -328,27 +807,50 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
 
         timer = PerfTimer()
 
-        columns_to_get = ["DATE", "REAL"]
-        columns_to_get.extend(vector_names)
-        table = self._get_or_read_table(columns_to_get)
-        et_read_ms = timer.lap_ms()
+        presampled_tier = (
+            self._presampled_tiers.get(resampling_frequency)
+            if resampling_frequency is not None
+            else None
+        )
 
-        if realizations is not None:
-            mask = pc.is_in(table["REAL"], value_set=pa.array(realizations))
-            table = table.filter(mask)
-        et_filter_ms = timer.lap_ms()
+        if presampled_tier:
+            columns_to_get = ["DATE", "REAL"]
+            columns_to_get.extend(vector_names)
+            table = _read_table_from_file(
+                presampled_tier.file_name,
+                presampled_tier.reader.schema,
+                presampled_tier.per_real_batch_index,
+                columns_to_get,
+                realizations,
+            )
+            et_read_ms = timer.lap_ms()
+            et_resample_ms = 0
+        elif resampling_frequency is not None and self._resampled_column_cache:
+            table = self._get_resampled_table_using_cache(
+                self._resampled_column_cache,
+                vector_names,
+                resampling_frequency,
+                realizations,
+            )
+            et_read_ms = 0
+            et_resample_ms = timer.lap_ms()
+        else:
+            columns_to_get = ["DATE", "REAL"]
+            columns_to_get.extend(vector_names)
+            table = self._get_or_read_table(columns_to_get, realizations)
+            et_read_ms = timer.lap_ms()
 
-        if resampling_frequency is not None:
-            table = resample_segmented_multi_real_table(table, resampling_frequency)
-        et_resample_ms = timer.lap_ms()
+            if resampling_frequency is not None:
+                table = resample_segmented_multi_real_table(table, resampling_frequency)
+            et_resample_ms = timer.lap_ms()
 
         df = table.to_pandas(timestamp_as_object=True)
         et_to_pandas_ms = timer.lap_ms()
 
         LOGGER.debug(
             f"get_vectors_df({resampling_frequency}) took: {timer.elapsed_ms()}ms ("
+            f"presampled_tier={presampled_tier is not None}, "
             f"read={et_read_ms}ms, "
-            f"filter={et_filter_ms}ms, "
             f"resample={et_resample_ms}ms, "
             f"to_pandas={et_to_pandas_ms}ms), "
             f"#vecs={len(vector_names)}, "
@@ -371,14 +873,11 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
 
         columns_to_get = ["DATE", "REAL"]
         columns_to_get.extend(vector_names)
-        table = self._get_or_read_table(columns_to_get)
+        table = self._get_or_read_table(
+            columns_to_get, realizations if realizations else None
+        )
         et_read_ms = timer.lap_ms()
 
-        if realizations:
-            real_mask = pc.is_in(table["REAL"], value_set=pa.array(realizations))
-            table = table.filter(real_mask)
-        et_filter_ms = timer.lap_ms()
-
         np_lookup_date = np.datetime64(date).astype("M8[ms]")
         table = sample_segmented_multi_real_table_at_date(table, np_lookup_date)
 
@@ -391,7 +890,6 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
         LOGGER.debug(
             f"get_vectors_for_date_df() took: {timer.elapsed_ms()}ms ("
             f"read={et_read_ms}ms, "
-            f"filter={et_filter_ms}ms, "
             f"resample={et_resample_ms}ms, "
             f"to_pandas={et_to_pandas_ms}ms), "
             f"#vecs={len(vector_names)}, "
@@ -400,3 +898,43 @@ class ProviderImplArrowLazy(EnsembleSummaryProvider):
         )
 
         return df
+
+    def get_vectors_for_dates_df(
+        self,
+        dates: Sequence[datetime.datetime],
+        vector_names: Sequence[str],
+        realizations: Optional[Sequence[int]] = None,
+    ) -> pd.DataFrame:
+        if not vector_names:
+            raise ValueError("List of requested vector names is empty")
+        if not dates:
+            raise ValueError("List of requested dates is empty")
+
+        timer = PerfTimer()
+
+        columns_to_get = ["DATE", "REAL"]
+        columns_to_get.extend(vector_names)
+        table = self._get_or_read_table(
+            columns_to_get, realizations if realizations else None
+        )
+        et_read_ms = timer.lap_ms()
+
+        np_lookup_dates = np.array(dates, dtype="M8[ms]")
+        table = sample_segmented_multi_real_table_at_dates(table, np_lookup_dates)
+        et_resample_ms = timer.lap_ms()
+
+        df = table.to_pandas(timestamp_as_object=True)
+        et_to_pandas_ms = timer.lap_ms()
+
+        LOGGER.debug(
+            f"get_vectors_for_dates_df() took: {timer.elapsed_ms()}ms ("
+            f"read={et_read_ms}ms, "
+            f"resample={et_resample_ms}ms, "
+            f"to_pandas={et_to_pandas_ms}ms), "
+            f"#dates={len(dates)}, "
+            f"#vecs={len(vector_names)}, "
+            f"#real={len(realizations) if realizations else 'all'}, "
+            f"df.shape={df.shape}, file={Path(self._arrow_file_name).name}"
+        )
+
+        return df
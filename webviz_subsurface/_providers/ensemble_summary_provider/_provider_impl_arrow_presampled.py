@@ -33,18 +33,6 @@ from .ensemble_summary_provider import (
 LOGGER = logging.getLogger(__name__)
 
 
-def _create_float_downcasting_schema(schema: pa.Schema) -> pa.Schema:
-    dt_float64 = pa.float64()
-    dt_float32 = pa.float32()
-    types = schema.types
-    for idx, typ in enumerate(types):
-        if typ == dt_float64:
-            types[idx] = dt_float32
-
-    field_list = zip(schema.names, types)
-    return pa.schema(field_list)
-
-
 def _set_date_column_type_to_timestamp_ms(schema: pa.Schema) -> pa.Schema:
     dt_timestamp_ms = pa.timestamp("ms")
 
@@ -147,7 +135,7 @@ class ProviderImplArrowPresampled(EnsembleSummaryProvider):
 
         # For experimenting with conversion to float
         # timer.lap_s()
-        # schema_to_use = _create_float_downcasting_schema(schema_to_use)
+        # schema_to_use = create_float_downcasting_schema(schema_to_use)
         # LOGGER.info(
         #     f"Created schema for float downcasting in : {timer.lap_s():.2f}s"
         # )
@@ -0,0 +1,158 @@
+import abc
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import pyarrow as pa
+
+from .ensemble_summary_provider import Frequency
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Key identifying the rows of a resampled table, consisting of the resampling
+# frequency and the realizations (sorted and de-duplicated, None means all).
+# All resampled columns that share this key have identical row layout.
+RowsKey = Tuple[Frequency, Optional[Tuple[int, ...]]]
+
+
+def make_rows_key(
+    frequency: Frequency, realizations: Optional[Sequence[int]]
+) -> RowsKey:
+    if realizations is None:
+        return (frequency, None)
+    return (frequency, tuple(sorted(set(realizations))))
+
+
+@dataclass(frozen=True)
+class ResampledColumnCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    num_entries: int
+    size_bytes: int
+    max_size_bytes: int
+
+
+def _compact_column(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Copy the data into buffers of its own. The column may be a zero-copy view into
+    # a larger block of memory, which would both keep the whole block alive and make
+    # the byte accounting wrong.
+    if column.num_chunks == 0:
+        return column
+    return pa.chunked_array([pa.concat_arrays(column.chunks)], type=column.type)
+
+
+class ResampledColumnCacheBase(abc.ABC):
+    """Interface for caches of resampled summary columns used by the lazy providers.
+    Columns are identified by the owner id, the rows key and the column name."""
+
+    @abc.abstractmethod
+    def get_columns(
+        self, owner_id: Hashable, rows_key: RowsKey, column_names: Sequence[str]
+    ) -> Dict[str, pa.ChunkedArray]:
+        """Returns dict with the requested columns that are present in the cache.
+        Columns not found in the cache will be missing from the returned dict.
+        """
+
+    @abc.abstractmethod
+    def put_columns(
+        self, owner_id: Hashable, rows_key: RowsKey, columns: Dict[str, pa.ChunkedArray]
+    ) -> None:
+        """Store columns in the cache"""
+
+    @abc.abstractmethod
+    def stats(self) -> ResampledColumnCacheStats:
+        """Returns hit/miss/eviction counters and current size of the cache"""
+
+
+class ResampledColumnCache(ResampledColumnCacheBase):
+    """Thread safe, size bounded LRU cache for resampled summary columns.
+
+    Entries are stored per column so that a request for vectors [A, B] can reuse a
+    cached A and only compute B. The DATE and REAL columns are stored as ordinary
+    columns alongside the vectors. The size of each entry is counted in bytes and the
+    least recently used entries are evicted once the total exceeds the budget.
+
+    The cache can be shared between providers, in which case the `owner_id` is used
+    to keep the providers' entries apart.
+    """
+
+    def __init__(self, max_size_bytes: int) -> None:
+        self._max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Hashable, RowsKey, str], pa.ChunkedArray]" = (
+            OrderedDict()
+        )
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_columns(
+        self, owner_id: Hashable, rows_key: RowsKey, column_names: Sequence[str]
+    ) -> Dict[str, pa.ChunkedArray]:
+        found_columns: Dict[str, pa.ChunkedArray] = {}
+        with self._lock:
+            for colname in column_names:
+                key = (owner_id, rows_key, colname)
+                column = self._entries.get(key)
+                if column is None:
+                    self._misses += 1
+                    continue
+
+                self._entries.move_to_end(key)
+                self._hits += 1
+                found_columns[colname] = column
+
+        return found_columns
+
+    def put_columns(
+        self, owner_id: Hashable, rows_key: RowsKey, columns: Dict[str, pa.ChunkedArray]
+    ) -> None:
+        compacted_columns = {
+            colname: _compact_column(column) for colname, column in columns.items()
+        }
+
+        with self._lock:
+            for colname, column in compacted_columns.items():
+                entry_size = column.nbytes
+                if entry_size > self._max_size_bytes:
+                    continue
+
+                key = (owner_id, rows_key, colname)
+                existing_column = self._entries.pop(key, None)
+                if existing_column is not None:
+                    self._size_bytes -= existing_column.nbytes
+
+                self._entries[key] = column
+                self._size_bytes += entry_size
+
+            self._evict_until_within_budget()
+
+    def stats(self) -> ResampledColumnCacheStats:
+        with self._lock:
+            return ResampledColumnCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                num_entries=len(self._entries),
+                size_bytes=self._size_bytes,
+                max_size_bytes=self._max_size_bytes,
+            )
+
+    def _evict_until_within_budget(self) -> None:
+        num_evicted = 0
+        while self._size_bytes > self._max_size_bytes and self._entries:
+            _key, column = self._entries.popitem(last=False)
+            self._size_bytes -= column.nbytes
+            num_evicted += 1
+
+        if num_evicted > 0:
+            self._evictions += num_evicted
+            LOGGER.debug(
+                f"Evicted {num_evicted} entries from resampled column cache, "
+                f"size is now {self._size_bytes / (1024*1024):.2f}MB"
+            )
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, fields
+from typing import Dict, List
 
 import numpy as np
 import pyarrow as pa
@@ -7,6 +7,10 @@ import pyarrow as pa
 from ._field_metadata import is_rate_from_field_meta
 from .ensemble_summary_provider import Frequency
 
+# Upper limit on number of values in each chunk of vectors that gets resampled in
+# one go by resample_segmented_multi_real_table()
+_MAX_VALUES_PER_VECTOR_CHUNK = 4_000_000
+
 
 def _truncate_day_to_monday(datetime_day: np.datetime64) -> np.datetime64:
     # A bit hackish, utilizes the fact that datetime64 is relative to epoch
@@ -152,30 +156,161 @@ def resample_single_real_table(table: pa.Table, freq: Frequency) -> pa.Table:
 
 
 @dataclass
-class RealInterpolationInfo:
-    raw_dates_np: np.ndarray
-    raw_dates_np_as_uint: np.ndarray
-    sample_dates_np: np.ndarray
-    sample_dates_np_as_uint: np.ndarray
+class MultiRealSamplingPlan:
+    """Row indices and interpolation weights for resampling all vectors of a
+    segmented multi realization table.
+    All arrays have one entry per output row (i.e. per sample date per realization).
+    The row indices refer to rows in the input table.
+    """
 
+    sample_dates_np: np.ndarray
+    sample_reals_np: np.ndarray
+
+    # Rows to blend between when doing linear interpolation. For samples that
+    # need no blending (exact matches and samples outside the realization's date
+    # range) the two indices are equal and blend_mask is False.
+    interp_row_idx0: np.ndarray
+    interp_row_idx1: np.ndarray
+    blend_mask: np.ndarray
+
+    # Distances, in the same float64 representation that np.interp() uses, from
+    # the sample date to the two raw dates and between the two raw dates.
+    dist_to_date0: np.ndarray
+    dist_to_date1: np.ndarray
+    dist_date0_to_date1: np.ndarray
+
+    # Rows to pick values from when doing backfill. Samples that lie outside the
+    # realization's date range have backfill_mask set to False and should get 0
+    backfill_row_idx: np.ndarray
+    backfill_mask: np.ndarray
+
+
+def _create_multi_real_sampling_plan(
+    table: pa.Table, freq: Frequency
+) -> MultiRealSamplingPlan:
+    # pylint: disable=too-many-locals
+    unique_reals, first_occurrence_idx, real_counts = np.unique(
+        table.column("REAL").to_numpy(), return_index=True, return_counts=True
+    )
+    all_raw_dates_np = table.column("DATE").to_numpy()
+
+    per_real_arrays: Dict[str, List[np.ndarray]] = {
+        field.name: [] for field in fields(MultiRealSamplingPlan)
+    }
+
+    for real, start_row_idx, row_count in zip(
+        unique_reals, first_occurrence_idx, real_counts
+    ):
+        raw_dates_np = all_raw_dates_np[start_row_idx : start_row_idx + row_count]
+        sample_dates_np = generate_normalized_sample_dates(
+            np.min(raw_dates_np), np.max(raw_dates_np), freq
+        )
 
-def _extract_real_interpolation_info(
-    table: pa.Table, start_row_idx: int, row_count: int, freq: Frequency
-) -> RealInterpolationInfo:
-    real_dates = table["DATE"].slice(start_row_idx, row_count).to_numpy()
+        # Note that we must do the same conversions of the dates as is being done by
+        # resample_single_real_table() in order to get identical results. Most
+        # importantly, np.interp() does its calculations using float64
+        raw_dates_as_uint = raw_dates_np.astype(np.uint64)
+        sample_dates_as_uint = sample_dates_np.astype(np.uint64)
+        raw_dates_as_float = raw_dates_as_uint.astype(np.float64)
+        sample_dates_as_float = sample_dates_as_uint.astype(np.float64)
+
+        # Linear interpolation, mimicking np.interp(), where idx0 is the last raw date
+        # that is less than or equal to the sample date
+        idx0 = np.searchsorted(raw_dates_as_float, sample_dates_as_float, "right") - 1
+        before_first = idx0 < 0
+        at_or_beyond_last = idx0 >= row_count - 1
+        idx0 = np.clip(idx0, 0, row_count - 1)
+        exact_match = raw_dates_as_float[idx0] == sample_dates_as_float
+        blend_mask = ~(before_first | at_or_beyond_last | exact_match)
+        idx1 = np.where(blend_mask, idx0 + 1, idx0)
+
+        per_real_arrays["sample_dates_np"].append(sample_dates_np)
+        per_real_arrays["sample_reals_np"].append(np.full(len(sample_dates_np), real))
+        per_real_arrays["interp_row_idx0"].append(start_row_idx + idx0)
+        per_real_arrays["interp_row_idx1"].append(start_row_idx + idx1)
+        per_real_arrays["blend_mask"].append(blend_mask)
+        per_real_arrays["dist_to_date0"].append(
+            sample_dates_as_float - raw_dates_as_float[idx0]
+        )
+        per_real_arrays["dist_to_date1"].append(
+            sample_dates_as_float - raw_dates_as_float[idx1]
+        )
+        per_real_arrays["dist_date0_to_date1"].append(
+            raw_dates_as_float[idx1] - raw_dates_as_float[idx0]
+        )
 
-    min_raw_date = np.min(real_dates)
-    max_raw_date = np.max(real_dates)
-    sample_dates = generate_normalized_sample_dates(min_raw_date, max_raw_date, freq)
+        # Backfill, mimicking interpolate_backfill()
+        backfill_idx = np.searchsorted(raw_dates_as_uint, sample_dates_as_uint, "left")
+        backfill_mask = (backfill_idx < row_count) & (
+            sample_dates_as_uint >= raw_dates_as_uint[0]
+        )
+        backfill_idx = np.minimum(backfill_idx, row_count - 1)
+        per_real_arrays["backfill_row_idx"].append(start_row_idx + backfill_idx)
+        per_real_arrays["backfill_mask"].append(backfill_mask)
+
+    if len(unique_reals) == 0:
+        return MultiRealSamplingPlan(
+            sample_dates_np=np.empty(0, dtype="M8[ms]"),
+            sample_reals_np=np.empty(0, dtype=np.int32),
+            interp_row_idx0=np.empty(0, dtype=np.int64),
+            interp_row_idx1=np.empty(0, dtype=np.int64),
+            blend_mask=np.empty(0, dtype=bool),
+            dist_to_date0=np.empty(0),
+            dist_to_date1=np.empty(0),
+            dist_date0_to_date1=np.empty(0),
+            backfill_row_idx=np.empty(0, dtype=np.int64),
+            backfill_mask=np.empty(0, dtype=bool),
+        )
 
-    return RealInterpolationInfo(
-        raw_dates_np=real_dates,
-        raw_dates_np_as_uint=real_dates.astype(np.uint64),
-        sample_dates_np=sample_dates,
-        sample_dates_np_as_uint=sample_dates.astype(np.uint64),
+    return MultiRealSamplingPlan(
+        **{name: np.concatenate(arr_list) for name, arr_list in per_real_arrays.items()}
     )
 
 
+def _interpolate_vectors(
+    raw_values_2d: np.ndarray, plan: MultiRealSamplingPlan
+) -> np.ndarray:
+    """Do linear interpolation for multiple vectors in one go.
+    The raw_values_2d array must have shape (num_vectors, num_input_rows) and the
+    returned array will have shape (num_vectors, num_output_rows).
+    The arithmetic is identical to that of np.interp() so that results are bitwise
+    equal to what we get when interpolating per vector and per realization.
+    """
+    v0 = raw_values_2d[:, plan.interp_row_idx0]
+    v1 = raw_values_2d[:, plan.interp_row_idx1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Operate in-place where possible to limit the number of temporaries
+        slope = v1 - v0
+        slope /= plan.dist_date0_to_date1
+        blended = slope * plan.dist_to_date0
+        blended += v0
+
+        # Same fallbacks as np.interp() if we get NaN in the blending
+        nan_mask = np.isnan(blended) & plan.blend_mask
+        if np.any(nan_mask):
+            blended = np.where(nan_mask, slope * plan.dist_to_date1 + v1, blended)
+            nan_mask = np.isnan(blended) & plan.blend_mask & (v0 == v1)
+            blended = np.where(nan_mask, v0, blended)
+
+    np.copyto(blended, v0, where=~plan.blend_mask)
+    return blended
+
+
+def _backfill_vectors(
+    raw_values_2d: np.ndarray, plan: MultiRealSamplingPlan
+) -> np.ndarray:
+    """Do backfill for multiple vectors in one go, see _interpolate_vectors()"""
+    return np.where(plan.backfill_mask, raw_values_2d[:, plan.backfill_row_idx], 0.0)
+
+
+def _stack_columns_as_float64(table: pa.Table, column_names: List[str]) -> np.ndarray:
+    raw_values_2d = np.empty((len(column_names), table.num_rows), dtype=np.float64)
+    for row_idx, colname in enumerate(column_names):
+        raw_values_2d[row_idx] = table.column(colname).to_numpy()
+    return raw_values_2d
+
+
 def resample_segmented_multi_real_table(table: pa.Table, freq: Frequency) -> pa.Table:
     """Resample table containing multiple realizations.
     The table must contain both a REAL and a DATE column.
@@ -184,88 +319,55 @@ def resample_segmented_multi_real_table(table: pa.Table, freq: Frequency) -> pa.
     sorted on DATE.
     The segmentation is needed since interpolations must be done per realization
     and we utilize slicing on rows for speed.
-    """
-    # pylint: disable=too-many-locals
-
-    real_arr_np = table.column("REAL").to_numpy()
-    unique_reals, first_occurrence_idx, real_counts = np.unique(
-        real_arr_np, return_index=True, return_counts=True
-    )
 
-    output_columns_dict: Dict[str, pa.ChunkedArray] = {}
+    Interpolation indices and weights are computed once per realization and then
+    applied to all the vectors at once, giving results that are bitwise identical to
+    resampling each realization with resample_single_real_table().
+    """
 
-    real_interpolation_info_dict: Dict[int, RealInterpolationInfo] = {}
+    plan = _create_multi_real_sampling_plan(table, freq)
 
+    rate_colnames: List[str] = []
+    non_rate_colnames: List[str] = []
     for colname in table.schema.names:
         if colname in ["DATE", "REAL"]:
             continue
+        if is_rate_from_field_meta(table.field(colname)):
+            rate_colnames.append(colname)
+        else:
+            non_rate_colnames.append(colname)
 
-        is_rate = is_rate_from_field_meta(table.field(colname))
-        raw_whole_numpy_arr = table.column(colname).to_numpy()
-
-        vec_arr_list = []
-        for i, real in enumerate(unique_reals):
-            start_row_idx = first_occurrence_idx[i]
-            row_count = real_counts[i]
-
-            rii = real_interpolation_info_dict.get(real)
-            if not rii:
-                rii = _extract_real_interpolation_info(
-                    table, start_row_idx, row_count, freq
-                )
-                real_interpolation_info_dict[real] = rii
-
-            raw_numpy_arr = raw_whole_numpy_arr[
-                start_row_idx : start_row_idx + row_count
-            ]
-
-            if is_rate:
-                inter = interpolate_backfill(
-                    rii.sample_dates_np_as_uint,
-                    rii.raw_dates_np_as_uint,
-                    raw_numpy_arr,
-                    0,
-                    0,
-                )
-            else:
-                inter = np.interp(
-                    rii.sample_dates_np_as_uint,
-                    rii.raw_dates_np_as_uint,
-                    raw_numpy_arr,
-                )
-
-            arr_length = len(rii.sample_dates_np_as_uint)
-            assert arr_length == len(inter)
-
-            vec_arr_list.append(inter)
+    output_columns_dict: Dict[str, np.ndarray] = {
+        "DATE": plan.sample_dates_np,
+        "REAL": plan.sample_reals_np,
+    }
 
-        output_columns_dict[colname] = pa.chunked_array(vec_arr_list)
+    # Process the vectors in chunks to put a bound on the size of the temporaries
+    num_output_rows = len(plan.sample_dates_np)
+    chunk_size = max(1, _MAX_VALUES_PER_VECTOR_CHUNK // max(1, num_output_rows))
 
-    date_arr_list = []
-    real_arr_list = []
-    for real in unique_reals:
-        rii = real_interpolation_info_dict[real]
-        arr_length = len(rii.sample_dates_np)
-        date_arr_list.append(rii.sample_dates_np)
-        real_arr_list.append(np.full(arr_length, real))
+    for i in range(0, len(non_rate_colnames), chunk_size):
+        chunk_colnames = non_rate_colnames[i : i + chunk_size]
+        interpolated_2d = _interpolate_vectors(
+            _stack_columns_as_float64(table, chunk_colnames), plan
+        )
+        output_columns_dict.update(zip(chunk_colnames, interpolated_2d))
 
-    output_columns_dict["DATE"] = pa.chunked_array(date_arr_list)
-    output_columns_dict["REAL"] = pa.chunked_array(real_arr_list)
+    for i in range(0, len(rate_colnames), chunk_size):
+        chunk_colnames = rate_colnames[i : i + chunk_size]
+        backfilled_2d = _backfill_vectors(
+            _stack_columns_as_float64(table, chunk_colnames), plan
+        )
+        output_columns_dict.update(zip(chunk_colnames, backfilled_2d))
 
-    ret_table = pa.table(output_columns_dict, schema=table.schema)
+    ret_table = pa.table(
+        [output_columns_dict[colname] for colname in table.schema.names],
+        schema=table.schema,
+    )
 
     return ret_table
 
 
-def _compute_interpolation_weight(
-    d: np.datetime64, d0: np.datetime64, d1: np.datetime64
-) -> float:
-    d_as_uint = d.astype(np.uint64)
-    d0_as_uint = d0.astype(np.uint64)
-    d1_as_uint = d1.astype(np.uint64)
-    return float(d_as_uint - d0_as_uint) / float(d1_as_uint - d0_as_uint)
-
-
 def sample_segmented_multi_real_table_at_date(
     table: pa.Table, np_datetime: np.datetime64
 ) -> pa.Table:
@@ -275,102 +377,97 @@ def sample_segmented_multi_real_table_at_date(
     realization are contiguous) and within each REAL segment, it must be
     sorted on DATE.
     """
+    return sample_segmented_multi_real_table_at_dates(
+        table, np.array([np_datetime], dtype="M8[ms]")
+    )
+
+
+def sample_segmented_multi_real_table_at_dates(
+    table: pa.Table, np_datetimes: np.ndarray
+) -> pa.Table:
+    """Sample table containing multiple realizations at all the specified dates.
+    The table must contain both a REAL and a DATE column.
+    The table must be segmented on REAL (so that all rows from a single
+    realization are contiguous) and within each REAL segment, it must be
+    sorted on DATE.
+    The returned table will be sorted on the order of the specified dates, then
+    on REAL, with one row per date per realization.
+    """
     # pylint: disable=too-many-locals
 
     unique_reals_arr_np, first_occurrence_idx, real_counts = np.unique(
         table.column("REAL").to_numpy(), return_index=True, return_counts=True
     )
-
-    all_dates_arr_np = table.column("DATE").to_numpy()
-
-    # Will receive row indices into the full input table for the two values we should
-    # interpolate/blend between.
-    # To keep things simple we always add two indices for each realization even if
-    # we know that no interpolation will be needed (e.g. exact matches)
-    row_indices = []
-
-    # Will receive the blending weights for doing interpolation
-    interpolate_t_arr = np.zeros(len(unique_reals_arr_np))
+    num_reals = len(unique_reals_arr_np)
+
+    all_dates_as_int = table.column("DATE").to_numpy().astype("M8[ms]").astype(np.int64)
+    query_dates_np = np.asarray(np_datetimes, dtype="M8[ms]")
+    query_dates_as_int = query_dates_np.astype(np.int64)
+
+    # Per output row (date-major, then realization) start and end row of the
+    # realization's segment in the input table
+    seg_start_idx = np.tile(first_occurrence_idx, len(query_dates_np))
+    seg_last_idx = seg_start_idx + np.tile(real_counts, len(query_dates_np)) - 1
+    seg_number = np.tile(np.arange(num_reals), len(query_dates_np))
+    query_per_row_as_int = np.repeat(query_dates_as_int, num_reals)
+
+    # Encode the dates as offsets within their realization's segment so that the
+    # encoded dates for the whole table become monotonically increasing. That way
+    # a single searchsorted() will find the insertion points for all realizations.
+    # Since span covers both the row and the query dates, all offsets fall in the
+    # range [1, span-2], which keeps the queries inside their realization's segment.
+    # The indices found are then clipped to the segment's rows further down.
+    min_date = min(all_dates_as_int.min(initial=0), query_dates_as_int.min(initial=0))
+    max_date = max(all_dates_as_int.max(initial=0), query_dates_as_int.max(initial=0))
+    span = max_date - min_date + 3
+    row_seg_number = np.repeat(np.arange(num_reals), real_counts)
+    encoded_dates = row_seg_number * span + (all_dates_as_int - min_date + 1)
+    encoded_queries = seg_number * span + (query_per_row_as_int - min_date + 1)
+
+    # Index of the last row whose date is less than or equal to the query date
+    last_le_idx = np.searchsorted(encoded_dates, encoded_queries, side="right") - 1
+
+    before_first = last_le_idx < seg_start_idx
+    clamped_idx = np.clip(last_le_idx, seg_start_idx, seg_last_idx)
+    exact_match = all_dates_as_int[clamped_idx] == query_per_row_as_int
+    beyond_last = (last_le_idx == seg_last_idx) & ~exact_match
+    needs_blend = ~(before_first | beyond_last | exact_match)
+
+    # Row indices into the full input table for the two values we should
+    # interpolate/blend between. For rows not needing interpolation the two indices
+    # are equal. For rows before the first date, we use the first row.
+    row_idx0 = np.where(before_first, seg_start_idx, clamped_idx)
+    row_idx1 = np.where(needs_blend, row_idx0 + 1, row_idx0)
+
+    # Blending weights for doing interpolation. Compute using the same
+    # arithmetic as the previous per realization implementation
+    interpolate_t_arr = np.zeros(len(row_idx0))
+    date0 = all_dates_as_int[row_idx0[needs_blend]].astype(np.uint64)
+    date1 = all_dates_as_int[row_idx1[needs_blend]].astype(np.uint64)
+    query = query_per_row_as_int[needs_blend].astype(np.uint64)
+    interpolate_t_arr[needs_blend] = (query - date0).astype(np.float64) / (
+        date1 - date0
+    ).astype(np.float64)
 
     # Array with mask for selecting values when doing backfill. A value of 1 will select
     # v1, while a value of 0 will yield a 0 value
-    backfill_mask_arr = np.ones(len(unique_reals_arr_np))
-
-    for i, _real in enumerate(unique_reals_arr_np):
-        # Starting row of this realization and number of rows belonging to realization
-        start_row_idx = first_occurrence_idx[i]
-        row_count = real_counts[i]
-
-        # Get slice of the dates for just this realization
-        dates_arr_np = all_dates_arr_np[start_row_idx : start_row_idx + row_count]
-        assert len(dates_arr_np) > 0
-
-        # OUTSIDE RANGE (query date is before our first date)
-        if np_datetime < dates_arr_np[0]:
-            row_indices.append(start_row_idx)
-            row_indices.append(start_row_idx)
-            # Extrapolate or just fill with 0 for rates
-            # interpolate_t_arr[i] = 0
-            backfill_mask_arr[i] = 0
-
-        # OUTSIDE RANGE (query date is beyond our last date)
-        elif np_datetime > dates_arr_np[-1]:
-            row_indices.append(start_row_idx + row_count - 1)
-            row_indices.append(start_row_idx + row_count - 1)
-            # Extrapolate or just fill with 0 for rates. For interpolation, t should
-            # really 1, but since the rows are duplicated it does not matter
-            # interpolate_t_arr[i] = 0
-            backfill_mask_arr[i] = 0
-
-        # EXACT MATCH on the LAST DATE
-        elif np_datetime == dates_arr_np[-1]:
-            row_indices.append(start_row_idx + row_count - 1)
-            row_indices.append(start_row_idx + row_count - 1)
-            # interpolate_t_arr[i] = 0
-            # backfill_mask_arr[i] = 1
+    backfill_mask_arr = np.where(before_first | beyond_last, 0.0, 1.0)
 
-        else:
-            # Search for query date amongst the realization's dates.
-            # last_insertion_index is the last legal insertion index of the queried value
-            last_insertion_index: int = np.searchsorted(
-                dates_arr_np, np_datetime, side="right"
-            ).item()
-
-            assert 0 < last_insertion_index < len(dates_arr_np)
-            assert dates_arr_np[last_insertion_index - 1] <= np_datetime
-            assert dates_arr_np[last_insertion_index] > np_datetime
-
-            if dates_arr_np[last_insertion_index - 1] == np_datetime:
-                # Exact match
-                row_indices.append(start_row_idx + last_insertion_index - 1)
-                row_indices.append(start_row_idx + last_insertion_index - 1)
-                # interpolate_t_arr[i] = 0
-                # backfill_mask_arr[i] = 1
-            else:
-                row_indices.append(start_row_idx + last_insertion_index - 1)
-                row_indices.append(start_row_idx + last_insertion_index)
-                interpolate_t_arr[i] = _compute_interpolation_weight(
-                    np_datetime,
-                    dates_arr_np[last_insertion_index - 1],
-                    dates_arr_np[last_insertion_index],
-                )
-                # backfill_mask_arr[i] = 1
+    row_indices = np.concatenate((row_idx0, row_idx1))
 
     column_arrays = []
-
     for colname in table.schema.names:
         if colname == "REAL":
-            column_arrays.append(unique_reals_arr_np)
+            column_arrays.append(np.tile(unique_reals_arr_np, len(query_dates_np)))
         elif colname == "DATE":
-            column_arrays.append(np.full(len(unique_reals_arr_np), np_datetime))
+            column_arrays.append(np.repeat(query_dates_np, num_reals))
         else:
             records_np = table.column(colname).take(row_indices).to_numpy()
+            v0_arr = records_np[: len(row_idx0)]
+            v1_arr = records_np[len(row_idx0) :]
             if is_rate_from_field_meta(table.field(colname)):
-                v1_arr = records_np[1::2]
                 interpolated_vec_values = v1_arr * backfill_mask_arr
             else:
-                v0_arr = records_np[0::2]
-                v1_arr = records_np[1::2]
                 delta_arr = v1_arr - v0_arr
                 interpolated_vec_values = v0_arr + (delta_arr * interpolate_t_arr)
 
@@ -0,0 +1,385 @@
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from ._resampled_column_cache import (
+    ResampledColumnCacheBase,
+    ResampledColumnCacheStats,
+    RowsKey,
+)
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the shared memory cache is not supported
+    fcntl = None  # type: ignore
+
+LOGGER = logging.getLogger(__name__)
+
+# Layout of the slots in the index segment. A digest of 0 marks a free slot.
+_INDEX_SLOT_DTYPE = np.dtype(
+    [("digest", "<u8"), ("size", "<i8"), ("last_access", "<f8")]
+)
+
+# Each data segment starts with the size of the arrow IPC stream that follows
+_SEGMENT_HEADER_SIZE = 8
+
+# Where POSIX shared memory segments live on Linux. Only used to look up the size
+# of the file system, no files are created here directly.
+_SHM_DIR = "/dev/shm"  # nosec
+
+
+def _get_shm_total_and_free_bytes() -> Optional[Tuple[int, int]]:
+    """Returns None if the size of the shared memory file system can't be found"""
+    try:
+        statvfs = os.statvfs(_SHM_DIR)
+    except OSError:
+        return None
+    return statvfs.f_blocks * statvfs.f_frsize, statvfs.f_bavail * statvfs.f_frsize
+
+
+def _get_shm_free_bytes() -> Optional[int]:
+    total_and_free = _get_shm_total_and_free_bytes()
+    return total_and_free[1] if total_and_free is not None else None
+
+
+def _make_digest(owner_id: Hashable, rows_key: RowsKey, column_name: str) -> int:
+    # The digest must be the same in all processes, so we can not use hash()
+    key_bytes = repr((owner_id, rows_key, column_name)).encode()
+    digest = int.from_bytes(
+        hashlib.blake2b(key_bytes, digest_size=8).digest(), byteorder="little"
+    )
+    return digest if digest != 0 else 1
+
+
+def _open_shared_memory(
+    name: str, create: bool = False, size: int = 0
+) -> shared_memory.SharedMemory:
+    """Create or attach to shared memory segment without having the multiprocessing
+    resource tracker take ownership of it. The lifetime of the segments is managed by
+    the cache, and we don't want the segments to be unlinked when the process that
+    happened to create them exits."""
+    if sys.version_info >= (3, 13):
+        # pylint: disable=unexpected-keyword-arg
+        return shared_memory.SharedMemory(  # type: ignore[call-arg]
+            name=name, create=create, size=size, track=False
+        )
+
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    # pylint: disable=protected-access
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def _unlink_shared_memory(name: str) -> None:
+    try:
+        # Let the resource tracker register the segment here, since unlink() will
+        # unregister it
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.unlink()
+    shm.close()
+
+
+def _serialize_column(column: pa.ChunkedArray) -> pa.Buffer:
+    batch = pa.record_batch([column.combine_chunks()], names=["column"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
+
+
+def _column_from_shared_memory(shm: shared_memory.SharedMemory) -> pa.ChunkedArray:
+    """Return column that references the data in the shared memory segment directly.
+    The returned column keeps the segment mapped for as long as the column is alive.
+    """
+    payload_size = int(np.frombuffer(shm.buf, dtype="<i8", count=1)[0])
+
+    # Release the temporary buffer export right away, since the segment can not be
+    # closed while there are exports
+    buf_view = np.frombuffer(shm.buf, dtype=np.uint8)
+    address = buf_view.ctypes.data
+    del buf_view
+
+    buffer = pa.foreign_buffer(address + _SEGMENT_HEADER_SIZE, payload_size, base=shm)
+    batch = pa.ipc.open_stream(buffer).read_next_batch()
+    return pa.chunked_array([batch.column(0)])
+
+
+class SharedMemoryResampledColumnCache(ResampledColumnCacheBase):
+    """Size bounded LRU cache for resampled summary columns that is shared between
+    processes, typically the workers of a gunicorn deployment.
+
+    Every column is stored as an arrow IPC stream in its own POSIX shared memory
+    segment. The segment names are derived from the cache keys, and a small index
+    segment keeps track of the sizes and last access times of the entries, so that
+    the least recently used entries can be evicted. Columns returned from the cache
+    reference the shared memory directly, without any copying.
+
+    Whichever process first resamples a column publishes it to the cache, after
+    which all other processes using the same `namespace` will find it there. Access
+    to the index is serialized using a lock file.
+
+    Segments stay around after the processes exit, use `unlink()` to remove them.
+    Use `close()` to detach from the cache without removing it.
+
+    The segments live in /dev/shm, which is only 64MB by default in Docker
+    containers. Writing past the capacity of /dev/shm crashes the process with
+    SIGBUS rather than raising an error, so `max_size_bytes` is capped to half the
+    size of /dev/shm, and columns are not cached when there isn't enough free space.
+    Increase the size with `docker run --shm-size` if needed.
+    """
+
+    def __init__(
+        self, namespace: str, max_size_bytes: int, max_entries: int = 4096
+    ) -> None:
+        if fcntl is None:
+            raise ValueError("The shared memory cache is not supported on this OS")
+
+        self._namespace = namespace
+        self._max_size_bytes = max_size_bytes
+
+        shm_total_and_free = _get_shm_total_and_free_bytes()
+        if shm_total_and_free is not None:
+            max_size_within_shm = shm_total_and_free[0] // 2
+            if max_size_bytes > max_size_within_shm:
+                LOGGER.warning(
+                    f"Shared memory column cache size capped to "
+                    f"{max_size_within_shm} bytes, half the size of {_SHM_DIR}"
+                )
+                self._max_size_bytes = max_size_within_shm
+        self._thread_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        self._lock_file_name = Path(tempfile.gettempdir()) / f"{namespace}.lock"
+        self._lock_fd = os.open(self._lock_file_name, os.O_RDWR | os.O_CREAT, 0o600)
+
+        index_name = f"{namespace}_index"
+        try:
+            with self._locked():
+                try:
+                    self._index_shm = _open_shared_memory(
+                        index_name,
+                        create=True,
+                        size=max_entries * _INDEX_SLOT_DTYPE.itemsize,
+                    )
+                except FileExistsError:
+                    self._index_shm = _open_shared_memory(index_name)
+        except BaseException:
+            os.close(self._lock_fd)
+            self._lock_fd = -1
+            raise
+        self._num_slots = self._index_shm.size // _INDEX_SLOT_DTYPE.itemsize
+
+        LOGGER.debug(
+            f"Attached to shared memory column cache: {namespace} "
+            f"(#slots={self._num_slots})"
+        )
+
+    def get_columns(
+        self, owner_id: Hashable, rows_key: RowsKey, column_names: Sequence[str]
+    ) -> Dict[str, pa.ChunkedArray]:
+        digests = {
+            colname: _make_digest(owner_id, rows_key, colname)
+            for colname in column_names
+        }
+
+        indexed_colnames: List[str] = []
+        with self._locked():
+            index = self._index_view()
+            now = time.time()
+            for colname, digest in digests.items():
+                slot_indices = np.flatnonzero(index["digest"] == np.uint64(digest))
+                if len(slot_indices) > 0:
+                    index["last_access"][slot_indices[0]] = now
+                    indexed_colnames.append(colname)
+            del index
+
+        found_columns: Dict[str, pa.ChunkedArray] = {}
+        for colname in indexed_colnames:
+            try:
+                shm = _open_shared_memory(self._segment_name(digests[colname]))
+            except FileNotFoundError:
+                # Evicted by another process after we looked it up
+                continue
+            found_columns[colname] = _column_from_shared_memory(shm)
+
+        with self._thread_lock:
+            self._hits += len(found_columns)
+            self._misses += len(column_names) - len(found_columns)
+
+        return found_columns
+
+    def put_columns(
+        self, owner_id: Hashable, rows_key: RowsKey, columns: Dict[str, pa.ChunkedArray]
+    ) -> None:
+        for colname, column in columns.items():
+            digest = _make_digest(owner_id, rows_key, colname)
+            payload = _serialize_column(column)
+            payload_view = memoryview(payload).cast("B")
+            segment_size = _SEGMENT_HEADER_SIZE + payload.size
+            if segment_size > self._max_size_bytes:
+                continue
+
+            # Creating the segment and adding it to the index is done while holding
+            # the lock, so that a segment without an index entry can only be left
+            # behind by a process that died while publishing it
+            with self._locked():
+                if self._is_indexed(digest):
+                    continue
+
+                self._evict_to_make_room(segment_size)
+
+                free_bytes = _get_shm_free_bytes()
+                if free_bytes is not None and segment_size > free_bytes:
+                    LOGGER.warning(
+                        f"Not enough free shared memory to cache column "
+                        f"({segment_size} bytes needed, {free_bytes} bytes free)"
+                    )
+                    continue
+
+                segment_name = self._segment_name(digest)
+                try:
+                    shm = _open_shared_memory(
+                        segment_name, create=True, size=segment_size
+                    )
+                except FileExistsError:
+                    # Orphaned by a process that died while publishing it
+                    _unlink_shared_memory(segment_name)
+                    shm = _open_shared_memory(
+                        segment_name, create=True, size=segment_size
+                    )
+
+                try:
+                    shm.buf[:_SEGMENT_HEADER_SIZE] = payload.size.to_bytes(
+                        _SEGMENT_HEADER_SIZE, byteorder="little"
+                    )
+                    shm.buf[_SEGMENT_HEADER_SIZE:segment_size] = payload_view
+                    shm.close()
+                    self._add_to_index(digest, segment_size)
+                except BaseException:
+                    shm.close()
+                    _unlink_shared_memory(segment_name)
+                    raise
+
+    def stats(self) -> ResampledColumnCacheStats:
+        with self._locked():
+            index = self._index_view()
+            occupied = index["digest"] != 0
+            num_entries = int(np.count_nonzero(occupied))
+            size_bytes = int(index["size"][occupied].sum())
+            del index
+
+            return ResampledColumnCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                num_entries=num_entries,
+                size_bytes=size_bytes,
+                max_size_bytes=self._max_size_bytes,
+            )
+
+    def unlink(self) -> None:
+        """Remove all the cache's shared memory segments, including the index, and
+        the lock file. Must only be called when no other process is using the cache.
+        """
+        with self._locked():
+            index = self._index_view()
+            for digest in index["digest"][index["digest"] != 0]:
+                _unlink_shared_memory(self._segment_name(int(digest)))
+            del index
+            _unlink_shared_memory(self._index_shm.name)
+            self._lock_file_name.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Detach from the cache, leaving it in place for other processes. The
+        instance can not be used after this. Columns that have been returned from
+        the cache remain valid."""
+        with self._thread_lock:
+            if self._lock_fd < 0:
+                return
+            self._index_shm.close()
+            os.close(self._lock_fd)
+            self._lock_fd = -1
+
+    def __del__(self) -> None:
+        # The constructor may have failed before attaching to the cache
+        if getattr(self, "_lock_fd", -1) >= 0:
+            self.close()
+
+    def _segment_name(self, digest: int) -> str:
+        return f"{self._namespace}_{digest:016x}"
+
+    def _index_view(self) -> np.ndarray:
+        # Note that the returned view must be deleted after use, as the index segment
+        # can not be closed while there are views into it
+        return np.ndarray(
+            (self._num_slots,), dtype=_INDEX_SLOT_DTYPE, buffer=self._index_shm.buf
+        )
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # The file lock is held by the open file description, so it does not
+        # protect against other threads in this process
+        with self._thread_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _is_indexed(self, digest: int) -> bool:
+        """Must be called with the lock held."""
+        index = self._index_view()
+        is_indexed = bool((index["digest"] == np.uint64(digest)).any())
+        del index
+        return is_indexed
+
+    def _evict_to_make_room(self, segment_size: int) -> None:
+        """Evict least recently used entries until there is a free slot in the index
+        and room for the segment within the size budget. Must be called with the lock
+        held."""
+        index = self._index_view()
+        occupied = index["digest"] != 0
+
+        num_evicted = 0
+        while occupied.any() and (
+            occupied.all()
+            or index["size"][occupied].sum() + segment_size > self._max_size_bytes
+        ):
+            occupied_indices = np.flatnonzero(occupied)
+            lru_idx = occupied_indices[np.argmin(index["last_access"][occupied])]
+            _unlink_shared_memory(self._segment_name(int(index["digest"][lru_idx])))
+            index[lru_idx] = (0, 0, 0.0)
+            occupied[lru_idx] = False
+            num_evicted += 1
+        del index
+
+        if num_evicted > 0:
+            self._evictions += num_evicted
+            LOGGER.debug(
+                f"Evicted {num_evicted} entries from shared memory column cache "
+                f"{self._namespace}"
+            )
+
+    def _add_to_index(self, digest: int, segment_size: int) -> None:
+        """Add entry to a free slot in the index, see _evict_to_make_room(). Must be
+        called with the lock held."""
+        index = self._index_view()
+        free_idx = np.flatnonzero(index["digest"] == 0)[0]
+        index[free_idx] = (digest, segment_size, time.time())
+        del index
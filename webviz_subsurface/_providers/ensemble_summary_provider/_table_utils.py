@@ -1,12 +1,51 @@
 import json
-from typing import Dict
+from typing import Dict, Optional
 
 import numpy as np
 import pyarrow as pa
 import pyarrow.compute as pc
 
+from ._field_metadata import is_total_from_field_meta
+
 _MAIN_WEBVIZ_METADATA_KEY = b"webviz"
 _PER_VECTOR_MIN_MAX_KEY = "per_vector_min_max"
+_PER_REAL_BATCH_INDEX_KEY = "per_real_batch_index"
+_PER_REAL_SOURCE_FILE_INFO_KEY = "per_real_source_file_info"
+
+
+def create_float_downcasting_schema(
+    schema: pa.Schema, keep_total_vectors_as_float64: bool = False
+) -> pa.Schema:
+    """Return copy of schema where float64 fields have been changed to float32.
+    Field and schema metadata is retained.
+    If `keep_total_vectors_as_float64` is True, fields that are flagged as totals in
+    their metadata are left as float64. Totals (cumulatives) are typically large and
+    steadily increasing numbers where the loss of precision would be noticeable.
+    """
+    dt_float64 = pa.float64()
+    dt_float32 = pa.float32()
+    for idx, field in enumerate(schema):
+        if field.type != dt_float64:
+            continue
+        if keep_total_vectors_as_float64 and is_total_from_field_meta(field):
+            continue
+        schema = schema.set(idx, field.with_type(dt_float32))
+
+    return schema
+
+
+def _add_to_webviz_schema_metadata(table: pa.Table, meta_to_add: dict) -> pa.Table:
+    """Merge entries into the webviz json blob in the schema's metadata"""
+
+    webviz_meta = {}
+    new_combined_meta = {}
+    if table.schema.metadata is not None:
+        new_combined_meta.update(table.schema.metadata)
+        if _MAIN_WEBVIZ_METADATA_KEY in table.schema.metadata:
+            webviz_meta = json.loads(table.schema.metadata[_MAIN_WEBVIZ_METADATA_KEY])
+    webviz_meta.update(meta_to_add)
+    new_combined_meta.update({_MAIN_WEBVIZ_METADATA_KEY: json.dumps(webviz_meta)})
+    return table.replace_schema_metadata(new_combined_meta)
 
 
 def find_min_max_for_numeric_table_columns(
@@ -31,13 +70,9 @@ def add_per_vector_min_max_to_table_schema_metadata(
 ) -> pa.Table:
     """Store dict with per-vector min/max values schema's metadata"""
 
-    webviz_meta = {_PER_VECTOR_MIN_MAX_KEY: per_vector_min_max}
-    new_combined_meta = {}
-    if table.schema.metadata is not None:
-        new_combined_meta.update(table.schema.metadata)
-    new_combined_meta.update({_MAIN_WEBVIZ_METADATA_KEY: json.dumps(webviz_meta)})
-    table = table.replace_schema_metadata(new_combined_meta)
-    return table
+    return _add_to_webviz_schema_metadata(
+        table, {_PER_VECTOR_MIN_MAX_KEY: per_vector_min_max}
+    )
 
 
 def get_per_vector_min_max_from_schema_metadata(schema: pa.Schema) -> Dict[str, dict]:
@@ -47,6 +82,68 @@ def get_per_vector_min_max_from_schema_metadata(schema: pa.Schema) -> Dict[str,
     return webviz_meta[_PER_VECTOR_MIN_MAX_KEY]
 
 
+def add_per_real_batch_index_to_table_schema_metadata(
+    table: pa.Table, per_real_batch_index: Dict[int, int]
+) -> pa.Table:
+    """Store dict mapping realization number to record batch index in the
+    schema's metadata"""
+
+    # Note that json only supports string keys
+    json_friendly_index = {str(real): idx for real, idx in per_real_batch_index.items()}
+    return _add_to_webviz_schema_metadata(
+        table, {_PER_REAL_BATCH_INDEX_KEY: json_friendly_index}
+    )
+
+
+def get_per_real_batch_index_from_schema_metadata(
+    schema: pa.Schema,
+) -> Optional[Dict[int, int]]:
+    """Extract dict mapping realization number to record batch index from the
+    schema-level metadata. Returns None if the schema has no such index, which will
+    be the case for backing stores written before the index was introduced."""
+
+    if not schema.metadata or _MAIN_WEBVIZ_METADATA_KEY not in schema.metadata:
+        return None
+
+    webviz_meta = json.loads(schema.metadata[_MAIN_WEBVIZ_METADATA_KEY])
+    json_friendly_index = webviz_meta.get(_PER_REAL_BATCH_INDEX_KEY)
+    if json_friendly_index is None:
+        return None
+
+    return {int(real): idx for real, idx in json_friendly_index.items()}
+
+
+def add_per_real_source_file_info_to_table_schema_metadata(
+    table: pa.Table, per_real_source_file_info: Dict[int, dict]
+) -> pa.Table:
+    """Store dict with per-realization info about the source files (typically file
+    name, modification time and size) in the schema's metadata"""
+
+    json_friendly_info = {
+        str(real): info for real, info in per_real_source_file_info.items()
+    }
+    return _add_to_webviz_schema_metadata(
+        table, {_PER_REAL_SOURCE_FILE_INFO_KEY: json_friendly_info}
+    )
+
+
+def get_per_real_source_file_info_from_schema_metadata(
+    schema: pa.Schema,
+) -> Optional[Dict[int, dict]]:
+    """Extract dict with per-realization source file info from the schema-level
+    metadata. Returns None if the schema has no such info."""
+
+    if not schema.metadata or _MAIN_WEBVIZ_METADATA_KEY not in schema.metadata:
+        return None
+
+    webviz_meta = json.loads(schema.metadata[_MAIN_WEBVIZ_METADATA_KEY])
+    json_friendly_info = webviz_meta.get(_PER_REAL_SOURCE_FILE_INFO_KEY)
+    if json_friendly_info is None:
+        return None
+
+    return {int(real): info for real, info in json_friendly_info.items()}
+
+
 def find_intersected_dates_between_realizations(table: pa.Table) -> np.ndarray:
     """Find the intersection of dates present in all the realizations
     The input table must contain both REAL and DATE columns, but this function makes
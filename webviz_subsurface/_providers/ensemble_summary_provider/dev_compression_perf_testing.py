@@ -0,0 +1,153 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from ._provider_impl_arrow_lazy import ProviderImplArrowLazy
+from .ensemble_summary_provider import Frequency
+
+
+def _create_synthetic_schema(num_vectors: int) -> pa.Schema:
+    """Every other vector is flagged as a total, the rest as rates"""
+    fields = [pa.field("DATE", pa.timestamp("ms"))]
+    for vec_idx in range(num_vectors):
+        is_total = vec_idx % 2 == 0
+        meta = {
+            b"unit": b"SM3" if is_total else b"SM3/DAY",
+            b"is_rate": b"False" if is_total else b"True",
+            b"is_total": b"True" if is_total else b"False",
+            b"is_historical": b"False",
+            b"keyword": b"UNKNOWN",
+        }
+        fields.append(pa.field(f"VEC_{vec_idx}", pa.float64(), metadata=meta))
+    return pa.schema(fields)
+
+
+def _generate_synthetic_per_real_tables(
+    schema: pa.Schema, num_realizations: int, num_raw_dates: int
+) -> Iterator[Tuple[int, pa.Table]]:
+    rng = np.random.default_rng(seed=1234)
+    num_vectors = len(schema) - 1
+    start_date = np.datetime64("2020-01-01", "ms")
+
+    for real in range(num_realizations):
+        day_offsets = np.sort(rng.choice(10 * 365, size=num_raw_dates, replace=False))
+        dates = start_date + (day_offsets * 86400000).astype("m8[ms]")
+        rates = np.round(rng.uniform(0, 1000, size=(num_vectors, num_raw_dates)), 2)
+        rates[:, : num_raw_dates // 4] = 0
+        values = np.where(
+            (np.arange(num_vectors) % 2 == 0)[:, None], np.cumsum(rates, axis=1), rates
+        )
+        yield real, pa.table([dates, *values], schema=schema)
+
+
+def _run_compression_perf_test(
+    storage_dir: Path,
+    schema: pa.Schema,
+    num_realizations: int,
+    num_raw_dates: int,
+    compression: Optional[str],
+    downcast_to_float32: bool,
+) -> None:
+    # pylint: disable=too-many-locals
+    storage_key = f"perf_{compression}_{downcast_to_float32}"
+    print("## ------------------")
+    print(f"## compression={compression}, downcast_to_float32={downcast_to_float32}")
+
+    start_tim = time.perf_counter()
+    ProviderImplArrowLazy.write_backing_store_from_per_realization_table_stream(
+        storage_dir,
+        storage_key,
+        schema,
+        _generate_synthetic_per_real_tables(schema, num_realizations, num_raw_dates),
+        compression=compression,
+        downcast_to_float32=downcast_to_float32,
+    )
+    write_time_ms = 1000 * (time.perf_counter() - start_tim)
+
+    file_size_mb = os.path.getsize(storage_dir / f"{storage_key}.arrow") / (1024 * 1024)
+
+    start_tim = time.perf_counter()
+    provider = ProviderImplArrowLazy.from_backing_store(storage_dir, storage_key)
+    open_time_ms = 1000 * (time.perf_counter() - start_tim)
+    assert provider is not None
+
+    vector_names = provider.vector_names()[:50]
+
+    start_tim = time.perf_counter()
+    provider.get_vectors_df(vector_names, None)
+    raw_time_ms = 1000 * (time.perf_counter() - start_tim)
+
+    start_tim = time.perf_counter()
+    provider.get_vectors_df(vector_names, Frequency.MONTHLY)
+    monthly_time_ms = 1000 * (time.perf_counter() - start_tim)
+
+    start_tim = time.perf_counter()
+    provider.get_vectors_df(vector_names, None, realizations=[0, 1, 2])
+    three_reals_time_ms = 1000 * (time.perf_counter() - start_tim)
+
+    print("## write time (ms):", write_time_ms)
+    print("## file size (MB):", file_size_mb)
+    print("## open time (ms):", open_time_ms)
+    print(
+        f"## get_vectors_df({len(vector_names)} vectors, raw), time (ms):", raw_time_ms
+    )
+    print(
+        f"## get_vectors_df({len(vector_names)} vectors, MONTHLY), time (ms):",
+        monthly_time_ms,
+    )
+    print(
+        f"## get_vectors_df({len(vector_names)} vectors, 3 reals), time (ms):",
+        three_reals_time_ms,
+    )
+    print("## ------------------")
+
+
+def main() -> None:
+    print()
+    print("## Running backing store compression performance tests")
+    print("## ===================================================")
+
+    num_realizations = 100
+    num_vectors = 1000
+    num_raw_dates = 200
+
+    print()
+    print("## num_realizations:", num_realizations)
+    print("## num_vectors:", num_vectors)
+    print("## num_raw_dates:", num_raw_dates)
+
+    # Note that the open and read timings are for files that are in the OS' page
+    # cache. For truly cold timings, the page cache must be dropped between the
+    # writing and the reading.
+    schema = _create_synthetic_schema(num_vectors)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for compression, downcast_to_float32 in [
+            (None, False),
+            ("lz4", False),
+            ("zstd", False),
+            (None, True),
+            ("lz4", True),
+            ("zstd", True),
+        ]:
+            _run_compression_perf_test(
+                Path(tmp_dir),
+                schema,
+                num_realizations,
+                num_raw_dates,
+                compression,
+                downcast_to_float32,
+            )
+
+    print("## done")
+
+
+# Running:
+#   python -m webviz_subsurface._providers.ensemble_summary_provider.dev_compression_perf_testing
+# -------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
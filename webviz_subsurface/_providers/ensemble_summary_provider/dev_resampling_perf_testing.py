@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from ._resampling import resample_segmented_multi_real_table, resample_single_real_table
+from .ensemble_summary_provider import Frequency
+
+
+def _create_synthetic_ensemble_table(
+    num_realizations: int, num_vectors: int, num_raw_dates: int
+) -> pa.Table:
+    """Create segmented multi realization table with synthetic data.
+    Every other vector is flagged as a rate so that both interpolation and
+    backfill gets exercised. The raw dates differ between realizations.
+    """
+    rng = np.random.default_rng(seed=1234)
+
+    rate_meta = {
+        b"unit": b"SM3/DAY",
+        b"is_rate": b"True",
+        b"is_total": b"False",
+        b"is_historical": b"False",
+        b"keyword": b"UNKNOWN",
+    }
+    fields = [pa.field("DATE", pa.timestamp("ms")), pa.field("REAL", pa.int32())]
+    for vec_idx in range(num_vectors):
+        meta = rate_meta if vec_idx % 2 == 0 else None
+        fields.append(pa.field(f"VEC_{vec_idx}", pa.float64(), metadata=meta))
+    schema = pa.schema(fields)
+
+    start_date = np.datetime64("2020-01-01", "ms")
+    per_real_tables = []
+    for real in range(num_realizations):
+        day_offsets = np.sort(
+            rng.choice(10 * 365, size=num_raw_dates, replace=False)
+        ) + rng.uniform(0, 1, size=num_raw_dates)
+        dates = start_date + (day_offsets * 86400000).astype("m8[ms]")
+        columns = [dates, np.full(num_raw_dates, real, dtype=np.int32)]
+        columns.extend(
+            np.cumsum(rng.uniform(0, 100, size=(num_vectors, num_raw_dates)), axis=1)
+        )
+        per_real_tables.append(pa.table(columns, schema=schema))
+
+    return pa.concat_tables(per_real_tables)
+
+
+def _resample_one_realization_at_a_time(table: pa.Table, freq: Frequency) -> pa.Table:
+    """Reference implementation that loops over realizations, and inside
+    resample_single_real_table() over vectors, doing one np.interp() call per vector
+    per realization"""
+    _unique_reals, first_occurrence_idx, real_counts = np.unique(
+        table.column("REAL").to_numpy(), return_index=True, return_counts=True
+    )
+    return pa.concat_tables(
+        [
+            resample_single_real_table(table.slice(start_row_idx, row_count), freq)
+            for start_row_idx, row_count in zip(first_occurrence_idx, real_counts)
+        ]
+    )
+
+
+def _assert_tables_bitwise_equal(table_a: pa.Table, table_b: pa.Table) -> None:
+    assert table_a.schema == table_b.schema
+    for colname in table_a.schema.names:
+        arr_a = table_a.column(colname).to_numpy()
+        arr_b = table_b.column(colname).to_numpy()
+        assert arr_a.tobytes() == arr_b.tobytes(), f"Mismatch in column {colname}"
+
+
+def _run_resampling_perf_test(table: pa.Table, freq: Frequency) -> None:
+    print("## ------------------")
+    print(f"## entering _run_resampling_perf_test({freq}) ...")
+
+    start_tim = time.perf_counter()
+    reference_table = _resample_one_realization_at_a_time(table, freq)
+    reference_time_ms = 1000 * (time.perf_counter() - start_tim)
+
+    start_tim = time.perf_counter()
+    resampled_table = resample_segmented_multi_real_table(table, freq)
+    vectorized_time_ms = 1000 * (time.perf_counter() - start_tim)
+
+    _assert_tables_bitwise_equal(reference_table, resampled_table)
+
+    print("## resampled table shape:", resampled_table.shape)
+    print("## one realization at a time, time (ms):", reference_time_ms)
+    print("## vectorized, time (ms):", vectorized_time_ms)
+    print("## speedup:", reference_time_ms / vectorized_time_ms)
+    print("## ------------------")
+
+
+def main() -> None:
+    print()
+    print("## Running resampling performance tests")
+    print("## ====================================")
+
+    num_realizations = 100
+    num_vectors = 1000
+    num_raw_dates = 200
+
+    print()
+    print("## num_realizations:", num_realizations)
+    print("## num_vectors:", num_vectors)
+    print("## num_raw_dates:", num_raw_dates)
+
+    table = _create_synthetic_ensemble_table(
+        num_realizations, num_vectors, num_raw_dates
+    )
+
+    for freq in [Frequency.MONTHLY, Frequency.QUARTERLY, Frequency.YEARLY]:
+        _run_resampling_perf_test(table, freq)
+
+    print("## done")
+
+
+# Running:
+#   python -m webviz_subsurface._providers.ensemble_summary_provider.dev_resampling_perf_testing
+# -------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -117,3 +117,33 @@ class EnsembleSummaryProvider(abc.ABC):
         The returned DataFrame will always contain a 'REAL' column in addition to
         columns for all the requested vectors.
         """
+
+    def get_vectors_for_dates_df(
+        self,
+        dates: Sequence[datetime.datetime],
+        vector_names: Sequence[str],
+        realizations: Optional[Sequence[int]] = None,
+    ) -> pd.DataFrame:
+        """Returns a Pandas DataFrame with data for all the specified `dates` and the
+        vectors specified in `vector_names.`
+
+        The values are the same as those returned by `get_vectors_for_date_df()` for
+        each of the dates. Providers may override this method to fetch the data for
+        all the dates in one go.
+
+        The returned DataFrame will always contain a 'DATE' and a 'REAL' column in
+        addition to columns for all the requested vectors. The rows are ordered by
+        the order of `dates`, then by realization.
+        """
+        if not dates:
+            raise ValueError("List of requested dates is empty")
+
+        per_date_dfs = []
+        for date in dates:
+            df = self.get_vectors_for_date_df(date, vector_names, realizations)
+            df.insert(
+                0, "DATE", pd.Series([date] * len(df), index=df.index, dtype=object)
+            )
+            per_date_dfs.append(df)
+
+        return pd.concat(per_date_dfs, ignore_index=True)
@@ -11,23 +11,75 @@ from webviz_config.webviz_instance_info import WebvizRunMode
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
 from ..ensemble_table_provider._table_import import load_per_real_csv_file
-from ._arrow_unsmry_import import load_per_realization_arrow_unsmry_files
+from ._arrow_unsmry_import import (
+    discover_per_realization_arrow_unsmry_files,
+    get_arrow_unsmry_file_info,
+    iterate_per_realization_arrow_unsmry_tables,
+    load_per_realization_arrow_unsmry_files,
+    unify_arrow_unsmry_file_schemas,
+)
 from ._csv_import import load_ensemble_summary_csv_file
 from ._provider_impl_arrow_lazy import ProviderImplArrowLazy
 from ._provider_impl_arrow_presampled import ProviderImplArrowPresampled
+from ._resampled_column_cache import (
+    ResampledColumnCache,
+    ResampledColumnCacheBase,
+    ResampledColumnCacheStats,
+)
 from ._resampling import Frequency, resample_single_real_table
+from ._shared_memory_column_cache import SharedMemoryResampledColumnCache
 from .ensemble_summary_provider import EnsembleSummaryProvider
 
 LOGGER = logging.getLogger(__name__)
 
+# Default memory budget for the cache of resampled vectors that is shared by all the
+# lazy summary providers created by the factory
+_DEFAULT_RESAMPLED_CACHE_MAX_SIZE_MB = 512
+
+# Environment variable that, when set to 1, places the cache of resampled vectors in
+# shared memory so that it is shared by all processes serving the app, e.g. the
+# workers of a gunicorn deployment
+_RESAMPLED_CACHE_IN_SHARED_MEMORY_ENV_VAR = (
+    "WEBVIZ_SUBSURFACE_RESAMPLED_CACHE_IN_SHARED_MEMORY"
+)
+
 
 class EnsembleSummaryProviderFactory(WebvizFactory):
-    def __init__(self, root_storage_folder: Path, allow_storage_writes: bool) -> None:
+    def __init__(
+        self,
+        root_storage_folder: Path,
+        allow_storage_writes: bool,
+        resampled_cache_max_size_mb: int = _DEFAULT_RESAMPLED_CACHE_MAX_SIZE_MB,
+        resampled_cache_in_shared_memory: bool = False,
+    ) -> None:
+        """The `resampled_cache_max_size_mb` parameter sets the memory budget for
+        the cache of resampled vectors used by the lazy providers.
+        Specify 0 to disable the cache.
+
+        If `resampled_cache_in_shared_memory` is True, the cache is placed in POSIX
+        shared memory so that it is shared by all processes using the same storage
+        folder, e.g. multiple gunicorn workers. Not supported on Windows. The factory
+        instance enables this when the environment variable
+        `WEBVIZ_SUBSURFACE_RESAMPLED_CACHE_IN_SHARED_MEMORY` is set to 1.
+        """
         self._storage_dir = Path(root_storage_folder) / __name__
         self._allow_storage_writes = allow_storage_writes
 
+        self._resampled_column_cache: Optional[ResampledColumnCacheBase] = None
+        if resampled_cache_max_size_mb > 0:
+            max_size_bytes = resampled_cache_max_size_mb * 1024 * 1024
+            if resampled_cache_in_shared_memory:
+                self._resampled_column_cache = SharedMemoryResampledColumnCache(
+                    namespace=_make_shared_memory_namespace(self._storage_dir),
+                    max_size_bytes=max_size_bytes,
+                )
+            else:
+                self._resampled_column_cache = ResampledColumnCache(max_size_bytes)
+
         LOGGER.info(
-            f"EnsembleSummaryProviderFactory init: storage_dir={self._storage_dir}"
+            f"EnsembleSummaryProviderFactory init: storage_dir={self._storage_dir}, "
+            f"resampled_cache_max_size_mb={resampled_cache_max_size_mb}, "
+            f"resampled_cache_in_shared_memory={resampled_cache_in_shared_memory}"
         )
 
         if self._allow_storage_writes:
@@ -42,14 +94,28 @@ class EnsembleSummaryProviderFactory(WebvizFactory):
             app_instance_info = WEBVIZ_FACTORY_REGISTRY.app_instance_info
             storage_folder = app_instance_info.storage_folder
             allow_writes = app_instance_info.run_mode != WebvizRunMode.PORTABLE
+            in_shared_memory = (
+                os.environ.get(_RESAMPLED_CACHE_IN_SHARED_MEMORY_ENV_VAR, "0") == "1"
+            )
 
-            factory = EnsembleSummaryProviderFactory(storage_folder, allow_writes)
+            factory = EnsembleSummaryProviderFactory(
+                storage_folder,
+                allow_writes,
+                resampled_cache_in_shared_memory=in_shared_memory,
+            )
 
             # Store the factory object in the global factory registry
             WEBVIZ_FACTORY_REGISTRY.set_factory(EnsembleSummaryProviderFactory, factory)
 
         return factory
 
+    def resampled_cache_stats(self) -> Optional[ResampledColumnCacheStats]:
+        """Returns hit/miss/eviction counters and current size of the cache of
+        resampled vectors, or None if the cache is disabled."""
+        if self._resampled_column_cache is None:
+            return None
+        return self._resampled_column_cache.stats()
+
     def create_from_ensemble_csv_file(
         self,
         csv_file: Path,
@@ -184,7 +250,12 @@ class EnsembleSummaryProviderFactory(WebvizFactory):
         return provider
 
     def create_from_arrow_unsmry_lazy(
-        self, ens_path: str, rel_file_pattern: str
+        self,
+        ens_path: str,
+        rel_file_pattern: str,
+        presampled_tiers: bool = False,
+        compression: Optional[str] = None,
+        downcast_to_float32: bool = False,
     ) -> EnsembleSummaryProvider:
         """Create EnsembleSummaryProvider from per-realization unsmry data in .arrow format.
 
@@ -193,17 +264,60 @@ class EnsembleSummaryProviderFactory(WebvizFactory):
         pattern is relative to each realization's `runpath`.
         Typically the file pattern will be: "share/results/unsmry/*.arrow"
 
+        If `presampled_tiers` is True, MONTHLY, QUARTERLY and YEARLY presampled versions
+        of the data will be written alongside the raw data in the backing store.
+        Requests for those frequencies will then be served directly from the presampled
+        data, while other frequencies are resampled lazily.
+
+        The `compression` parameter enables compression of the backing store files,
+        valid values are None, "lz4" and "zstd". If `downcast_to_float32` is True, all
+        vectors except totals will be stored as float32. Note that compression only
+        applies when the backing store is written, an existing backing store will be
+        used regardless of its compression.
+
+        The modification time and size of each realization's .arrow file is recorded in
+        the backing store. When storage writes are allowed, realizations that have been
+        added, rerun or removed since the backing store was written are detected, and
+        the backing store is updated by importing only those realizations.
+
         The returned summary provider supports lazy resampling.
         """
+        # pylint: disable=too-many-locals
 
         timer = PerfTimer()
 
-        storage_key = (
-            f"arrow_unsmry_lazy__{_make_hash_string(ens_path + rel_file_pattern)}"
-        )
+        storage_key = "arrow_unsmry_lazy"
+        if downcast_to_float32:
+            storage_key += "_float32"
+        storage_key += f"__{_make_hash_string(ens_path + rel_file_pattern)}"
+
         provider = ProviderImplArrowLazy.from_backing_store(
-            self._storage_dir, storage_key
+            self._storage_dir, storage_key, self._resampled_column_cache
         )
+        if provider and self._allow_storage_writes:
+            provider = self._update_lazy_backing_store_if_stale(
+                provider,
+                storage_key,
+                ens_path,
+                rel_file_pattern,
+                compression,
+                downcast_to_float32,
+            )
+
+        if provider and presampled_tiers and self._allow_storage_writes:
+            # The backing store may have been written without the presampled tiers
+            if set(provider.presampled_tier_frequencies()) != set(
+                ProviderImplArrowLazy.PRESAMPLED_TIER_FREQUENCIES
+            ):
+                LOGGER.info(f"Adding presampled tiers to backing store for: {ens_path}")
+                del provider
+                ProviderImplArrowLazy.write_presampled_tiers_to_backing_store(
+                    self._storage_dir, storage_key, compression
+                )
+                provider = ProviderImplArrowLazy.from_backing_store(
+                    self._storage_dir, storage_key, self._resampled_column_cache
+                )
+
         if provider:
             LOGGER.info(
                 f"Loaded lazy summary provider from backing store in {timer.elapsed_s():.2f}s ("
@@ -218,37 +332,140 @@ class EnsembleSummaryProviderFactory(WebvizFactory):
         LOGGER.info(f"Importing/saving arrow summary data for: {ens_path}")
 
         timer.lap_s()
-        per_real_tables = load_per_realization_arrow_unsmry_files(
+        file_entries = discover_per_realization_arrow_unsmry_files(
             ens_path, rel_file_pattern
         )
-        if not per_real_tables:
+        if not file_entries:
             raise ValueError(
                 f"Could not find any .arrow unsmry files for ens_path={ens_path}"
             )
+        unified_schema = unify_arrow_unsmry_file_schemas(file_entries)
+        per_real_file_info = {
+            entry.real: get_arrow_unsmry_file_info(entry) for entry in file_entries
+        }
         et_import_smry_s = timer.lap_s()
 
+        # The realizations are streamed from file into the backing store, so that
+        # only a few of them are held in memory at any time
         try:
-            ProviderImplArrowLazy.write_backing_store_from_per_realization_tables(
-                self._storage_dir, storage_key, per_real_tables
+            ProviderImplArrowLazy.write_backing_store_from_per_realization_table_stream(
+                self._storage_dir,
+                storage_key,
+                unified_schema,
+                iterate_per_realization_arrow_unsmry_tables(file_entries),
+                compression=compression,
+                downcast_to_float32=downcast_to_float32,
+                per_real_source_file_info=per_real_file_info,
             )
         except ValueError as exc:
             raise ValueError(f"Failed to write backing store for: {ens_path}") from exc
 
         et_write_s = timer.lap_s()
 
+        if presampled_tiers:
+            ProviderImplArrowLazy.write_presampled_tiers_to_backing_store(
+                self._storage_dir, storage_key, compression
+            )
+        et_write_tiers_s = timer.lap_s()
+
         provider = ProviderImplArrowLazy.from_backing_store(
-            self._storage_dir, storage_key
+            self._storage_dir, storage_key, self._resampled_column_cache
         )
         if not provider:
             raise ValueError(f"Failed to load/create lazy provider for {ens_path}")
 
         LOGGER.info(
             f"Saved lazy summary provider to backing store in {timer.elapsed_s():.2f}s ("
-            f"import_smry={et_import_smry_s:.2f}s, write={et_write_s:.2f}s, ens_path={ens_path})"
+            f"import_smry={et_import_smry_s:.2f}s, write={et_write_s:.2f}s, "
+            f"write_tiers={et_write_tiers_s:.2f}s, ens_path={ens_path})"
         )
 
         return provider
 
+    def _update_lazy_backing_store_if_stale(
+        self,
+        provider: ProviderImplArrowLazy,
+        storage_key: str,
+        ens_path: str,
+        rel_file_pattern: str,
+        compression: Optional[str],
+        downcast_to_float32: bool,
+    ) -> Optional[ProviderImplArrowLazy]:
+        """Compare the realizations' .arrow files with the file info recorded in the
+        backing store, and update the backing store if any realizations have been
+        added, changed or removed. Returns the provider to use, which will be a new
+        provider object if the backing store was updated.
+        """
+        # pylint: disable=too-many-locals
+        timer = PerfTimer()
+
+        file_entries = discover_per_realization_arrow_unsmry_files(
+            ens_path, rel_file_pattern
+        )
+        if not file_entries:
+            LOGGER.warning(
+                f"No .arrow unsmry files found, using existing backing store as is "
+                f"(ens_path={ens_path})"
+            )
+            return provider
+
+        per_real_file_info = {
+            entry.real: get_arrow_unsmry_file_info(entry) for entry in file_entries
+        }
+        # Backing stores written before the file info was recorded will get all their
+        # realizations reimported
+        stored_per_real_file_info = provider.per_real_source_file_info() or {}
+        if per_real_file_info == stored_per_real_file_info:
+            return provider
+
+        changed_reals = [
+            real
+            for real, file_info in per_real_file_info.items()
+            if stored_per_real_file_info.get(real) != file_info
+        ]
+        kept_reals = sorted(set(per_real_file_info.keys()) - set(changed_reals))
+        removed_reals = sorted(
+            set(stored_per_real_file_info.keys()) - set(per_real_file_info.keys())
+        )
+        LOGGER.info(
+            f"Updating backing store for: {ens_path} (#changed_or_added_reals="
+            f"{len(changed_reals)}, #removed_reals={len(removed_reals)})"
+        )
+
+        had_presampled_tiers = bool(provider.presampled_tier_frequencies())
+        del provider
+
+        try:
+            ProviderImplArrowLazy.update_backing_store_from_per_realization_table_stream(
+                self._storage_dir,
+                storage_key,
+                unify_arrow_unsmry_file_schemas(file_entries),
+                iterate_per_realization_arrow_unsmry_tables(
+                    [entry for entry in file_entries if entry.real in changed_reals]
+                ),
+                realizations_to_keep=kept_reals,
+                compression=compression,
+                downcast_to_float32=downcast_to_float32,
+                per_real_source_file_info=per_real_file_info,
+            )
+            if had_presampled_tiers:
+                ProviderImplArrowLazy.write_presampled_tiers_to_backing_store(
+                    self._storage_dir,
+                    storage_key,
+                    compression,
+                    realizations_to_resample=changed_reals,
+                )
+        except ValueError as exc:
+            raise ValueError(f"Failed to update backing store for: {ens_path}") from exc
+
+        LOGGER.info(
+            f"Updated backing store in {timer.elapsed_s():.2f}s (ens_path={ens_path})"
+        )
+
+        return ProviderImplArrowLazy.from_backing_store(
+            self._storage_dir, storage_key, self._resampled_column_cache
+        )
+
     def create_from_arrow_unsmry_presampled(
         self,
         ens_path: str,
@@ -335,3 +552,9 @@ class EnsembleSummaryProviderFactory(WebvizFactory):
 def _make_hash_string(string_to_hash: str) -> str:
     # There is no security risk here and chances of collision should be very slim
     return hashlib.md5(string_to_hash.encode()).hexdigest()  # nosec
+
+
+def _make_shared_memory_namespace(storage_dir: Path) -> str:
+    # Keep it short, since macOS limits shared memory names to 31 characters and
+    # the cache appends a 16 character digest
+    return f"wvs{_make_hash_string(str(storage_dir.resolve()))[:8]}"
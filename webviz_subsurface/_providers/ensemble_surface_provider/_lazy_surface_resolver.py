@@ -0,0 +1,196 @@
+import base64
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar, Union
+
+import xtgeo
+
+from ._types import QualifiedDiffSurfaceAddress, QualifiedSurfaceAddress
+from .ensemble_surface_provider import (
+    EnsembleSurfaceProvider,
+    ObservedSurfaceAddress,
+    SimulatedSurfaceAddress,
+    StatisticalSurfaceAddress,
+    SurfaceAddress,
+    SurfaceStatistic,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazySurfaceResolver:
+    """Lets a surface server compute surfaces on request instead of requiring them to
+    be published up front. The fully qualified address is encoded in the URL, and is
+    resolved against the providers that have been added.
+
+    Concurrent requests for the same surface within the process are coalesced so that
+    the surface is only computed once. Statistical surfaces are additionally shared
+    between processes by the provider's statistical surface cache.
+    """
+
+    def __init__(self) -> None:
+        self._id_to_provider_dict: Dict[str, EnsembleSurfaceProvider] = {}
+        self._locks_lock = threading.Lock()
+        # Lock and number of callers holding or waiting for it, per key
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+
+    def add_provider(self, provider: EnsembleSurfaceProvider) -> None:
+        provider_id = provider.provider_id()
+        existing_provider = self._id_to_provider_dict.get(provider_id)
+        if existing_provider is not None and existing_provider is not provider:
+            LOGGER.warning(
+                f"Provider with id={provider_id} ignored, the id is already present"
+            )
+            return
+
+        self._id_to_provider_dict[provider_id] = provider
+
+    def compute_surface(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> Optional[xtgeo.RegularSurface]:
+        """Returns None if the surface can't be found, or if a provider is unknown"""
+        if isinstance(qualified_address, QualifiedSurfaceAddress):
+            return self._get_provider_surface(
+                qualified_address.provider_id, qualified_address.address
+            )
+
+        surface_a = self._get_provider_surface(
+            qualified_address.provider_id_a, qualified_address.address_a
+        )
+        surface_b = self._get_provider_surface(
+            qualified_address.provider_id_b, qualified_address.address_b
+        )
+        if surface_a is None or surface_b is None:
+            return None
+
+        return surface_a - surface_b
+
+    def get_or_create(
+        self,
+        key: str,
+        lookup_func: Callable[[], Optional[T]],
+        create_func: Callable[[], Optional[T]],
+    ) -> Optional[T]:
+        """Returns the result of `lookup_func()` if it is not None, otherwise calls
+        `create_func()`. Concurrent calls with the same key wait for the first one to
+        finish, and then repeat the lookup instead of creating the result again."""
+        result = lookup_func()
+        if result is not None:
+            return result
+
+        with self._locked(key):
+            result = lookup_func()
+            if result is not None:
+                return result
+            return create_func()
+
+    def _get_provider_surface(
+        self, provider_id: str, address: SurfaceAddress
+    ) -> Optional[xtgeo.RegularSurface]:
+        provider = self._id_to_provider_dict.get(provider_id)
+        if provider is None:
+            LOGGER.error(f"No provider with id={provider_id} has been added")
+            return None
+
+        return provider.get_surface(address)
+
+    @contextmanager
+    def _locked(self, key: str) -> Iterator[None]:
+        # The locks are discarded when no one is holding or waiting for them, so that
+        # they don't accumulate for every surface that has been resolved
+        with self._locks_lock:
+            lock, num_users = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, num_users + 1)
+
+        try:
+            with lock:
+                yield
+        finally:
+            with self._locks_lock:
+                lock, num_users = self._locks[key]
+                if num_users > 1:
+                    self._locks[key] = (lock, num_users - 1)
+                else:
+                    del self._locks[key]
+
+
+def encode_qualified_address(
+    qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+) -> str:
+    """Encode the address as URL safe base64 of its JSON representation"""
+    if isinstance(qualified_address, QualifiedSurfaceAddress):
+        address_dict: Dict[str, Any] = _address_to_dict(
+            qualified_address.provider_id, qualified_address.address
+        )
+    else:
+        address_dict = {
+            "diff": [
+                _address_to_dict(
+                    qualified_address.provider_id_a, qualified_address.address_a
+                ),
+                _address_to_dict(
+                    qualified_address.provider_id_b, qualified_address.address_b
+                ),
+            ]
+        }
+
+    encoded = base64.urlsafe_b64encode(json.dumps(address_dict).encode())
+    return encoded.decode().rstrip("=")
+
+
+def decode_qualified_address(
+    encoded_address: str,
+) -> Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress]:
+    """Raises ValueError if the address can't be decoded"""
+    try:
+        padding = "=" * (-len(encoded_address) % 4)
+        address_dict = json.loads(base64.urlsafe_b64decode(encoded_address + padding))
+        if "diff" in address_dict:
+            provider_id_a, address_a = _address_from_dict(address_dict["diff"][0])
+            provider_id_b, address_b = _address_from_dict(address_dict["diff"][1])
+            return QualifiedDiffSurfaceAddress(
+                provider_id_a, address_a, provider_id_b, address_b
+            )
+
+        provider_id, address = _address_from_dict(address_dict)
+        return QualifiedSurfaceAddress(provider_id, address)
+    except (TypeError, KeyError, IndexError, ValueError) as exc:
+        raise ValueError(f"Invalid surface address: {encoded_address}") from exc
+
+
+def _address_to_dict(provider_id: str, address: SurfaceAddress) -> Dict[str, Any]:
+    if isinstance(address, StatisticalSurfaceAddress):
+        addr_type_str = "sta"
+    elif isinstance(address, SimulatedSurfaceAddress):
+        addr_type_str = "sim"
+    elif isinstance(address, ObservedSurfaceAddress):
+        addr_type_str = "obs"
+    else:
+        raise TypeError("Unknown type of surface address")
+
+    return {"provider_id": provider_id, "type": addr_type_str, **asdict(address)}
+
+
+def _address_from_dict(address_dict: Dict[str, Any]) -> Tuple[str, SurfaceAddress]:
+    fields = dict(address_dict)
+    provider_id = fields.pop("provider_id")
+    addr_type_str = fields.pop("type")
+
+    address: SurfaceAddress
+    if addr_type_str == "sta":
+        fields["statistic"] = SurfaceStatistic(fields["statistic"])
+        address = StatisticalSurfaceAddress(**fields)
+    elif addr_type_str == "sim":
+        address = SimulatedSurfaceAddress(**fields)
+    elif addr_type_str == "obs":
+        address = ObservedSurfaceAddress(**fields)
+    else:
+        raise ValueError(f"Unknown address type: {addr_type_str}")
+
+    return provider_id, address
@@ -8,10 +8,25 @@ import numpy as np
 import pandas as pd
 import xtgeo
 
+from webviz_subsurface._utils.disk_lru_dir import source_files_version
 from webviz_subsurface._utils.enum_shim import StrEnum
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
+from ._stacked_surface_cube import (
+    StackedCubeInfo,
+    StackedSurfaceCubes,
+    calc_statistics_from_stacked_values,
+    select_realizations_in_cube,
+    write_stacked_surface_cubes,
+)
+from ._stat_surf_cache import StatSurfCache
+from ._streaming_surface_statistics import (
+    StreamingStatisticsOptions,
+    calc_statistics_streaming,
+)
 from ._surface_discovery import SurfaceFileInfo
+from ._surface_inventory_index import SurfaceInventoryIndex
+from ._surface_loading import load_stacked_surface_values, read_surface_geometry
 from .ensemble_surface_provider import (
     EnsembleSurfaceProvider,
     ObservedSurfaceAddress,
@@ -45,25 +60,41 @@ class SurfaceType(StrEnum):
 
 class ProviderImplFile(EnsembleSurfaceProvider):
     def __init__(
-        self, provider_id: str, provider_dir: Path, surface_inventory_df: pd.DataFrame
+        self,
+        provider_id: str,
+        provider_dir: Path,
+        surface_inventory_df: pd.DataFrame,
+        stacked_cubes: Optional[StackedSurfaceCubes] = None,
+        stat_surf_cache: Optional[StatSurfCache] = None,
+        streaming_stats_options: Optional[StreamingStatisticsOptions] = None,
     ) -> None:
         self._provider_id = provider_id
         self._provider_dir = provider_dir
-        self._inventory_df = surface_inventory_df
+        self._inventory_index = _build_inventory_index(
+            surface_inventory_df, provider_dir
+        )
+        self._stacked_cubes = stacked_cubes
+        self._stat_surf_cache = stat_surf_cache
+        self._streaming_stats_options = streaming_stats_options
 
     @staticmethod
-    # pylint: disable=too-many-locals
+    # pylint: disable=too-many-locals, too-many-statements
     def write_backing_store(
         storage_dir: Path,
         storage_key: str,
         sim_surfaces: List[SurfaceFileInfo],
         obs_surfaces: List[SurfaceFileInfo],
         avoid_copying_surfaces: bool,
+        create_stacked_cubes: bool = False,
     ) -> None:
         """If avoid_copying_surfaces if True, the specified surfaces will NOT be copied
         into the backing store, but will be referenced from their source locations.
         Note that this is only useful when running in non-portable mode and will fail
         in portable mode.
+
+        If create_stacked_cubes is True, the realizations of each simulated surface
+        are also stacked into a single memory mapped cube, from which statistical
+        surfaces can be calculated without loading the individual surface files.
         """
 
         timer = PerfTimer()
@@ -138,6 +169,10 @@ class ProviderImplFile(EnsembleSurfaceProvider):
             )
         et_copy_s = timer.lap_s()
 
+        if create_stacked_cubes:
+            write_stacked_surface_cubes(provider_dir, sim_surfaces)
+        et_cubes_s = timer.lap_s()
+
         surface_inventory_df = pd.DataFrame(
             {
                 Col.TYPE: type_arr,
@@ -150,31 +185,50 @@ class ProviderImplFile(EnsembleSurfaceProvider):
             }
         )
 
+        # Store the inventory sorted on the index keys, and with categorical string
+        # columns, which keeps the parquet file small and quick to read back
+        surface_inventory_df = surface_inventory_df.sort_values(
+            [Col.TYPE, Col.ATTRIBUTE, Col.NAME, Col.DATESTR, Col.REAL],
+            ignore_index=True,
+        )
+        for col in [Col.TYPE, Col.ATTRIBUTE, Col.NAME, Col.DATESTR]:
+            surface_inventory_df[col] = surface_inventory_df[col].astype("category")
+
         parquet_file_name = provider_dir / "surface_inventory.parquet"
         surface_inventory_df.to_parquet(path=parquet_file_name)
 
         if do_copy_surfs_into_store:
             LOGGER.debug(
                 f"Wrote surface backing store in: {timer.elapsed_s():.2f}s ("
-                f"copy={et_copy_s:.2f}s)"
+                f"copy={et_copy_s:.2f}s, cubes={et_cubes_s:.2f}s)"
             )
         else:
             LOGGER.debug(
                 f"Wrote surface backing store without copying surfaces in: "
-                f"{timer.elapsed_s():.2f}s"
+                f"{timer.elapsed_s():.2f}s (cubes={et_cubes_s:.2f}s)"
             )
 
     @staticmethod
     def from_backing_store(
         storage_dir: Path,
         storage_key: str,
+        stat_surf_cache: Optional[StatSurfCache] = None,
+        streaming_stats_options: Optional[StreamingStatisticsOptions] = None,
     ) -> Optional["ProviderImplFile"]:
         provider_dir = storage_dir / storage_key
         parquet_file_name = provider_dir / "surface_inventory.parquet"
 
         try:
             surface_inventory_df = pd.read_parquet(path=parquet_file_name)
-            return ProviderImplFile(storage_key, provider_dir, surface_inventory_df)
+            stacked_cubes = StackedSurfaceCubes.from_provider_dir(provider_dir)
+            return ProviderImplFile(
+                storage_key,
+                provider_dir,
+                surface_inventory_df,
+                stacked_cubes,
+                stat_surf_cache,
+                streaming_stats_options,
+            )
         except FileNotFoundError:
             return None
 
@@ -182,37 +236,22 @@ class ProviderImplFile(EnsembleSurfaceProvider):
         return self._provider_id
 
     def attributes(self) -> List[str]:
-        return sorted(list(self._inventory_df[Col.ATTRIBUTE].unique()))
+        return self._inventory_index.attributes()
 
     def surface_names_for_attribute(self, surface_attribute: str) -> List[str]:
-        return sorted(
-            list(
-                self._inventory_df.loc[
-                    self._inventory_df[Col.ATTRIBUTE] == surface_attribute
-                ][Col.NAME].unique()
-            )
-        )
+        return self._inventory_index.names_for_attribute(surface_attribute)
 
     def surface_dates_for_attribute(
         self, surface_attribute: str
     ) -> Optional[List[str]]:
-        dates = sorted(
-            list(
-                self._inventory_df.loc[
-                    self._inventory_df[Col.ATTRIBUTE] == surface_attribute
-                ][Col.DATESTR].unique()
-            )
-        )
+        dates = self._inventory_index.datestrs_for_attribute(surface_attribute)
         if len(dates) == 1 and not bool(dates[0]):
             return None
 
         return dates
 
     def realizations(self) -> List[int]:
-        unique_reals = self._inventory_df[Col.REAL].unique()
-
-        # Sort and strip out any entries with real == -1
-        return sorted([r for r in unique_reals if r >= 0])
+        return self._inventory_index.realizations()
 
     def get_surface(
         self,
@@ -233,10 +272,26 @@ class ProviderImplFile(EnsembleSurfaceProvider):
     ) -> Optional[xtgeo.RegularSurface]:
         timer = PerfTimer()
 
-        surf = self._create_statistical_surface(address)
+        if self._stat_surf_cache is None:
+            surf = self._create_statistical_surface(address)
+        else:
+            # Version the cached surface by the input surfaces, so that surfaces that
+            # are modified in place don't give us stale statistics
+            surf_fns = self._locate_simulated_surfaces(
+                attribute=address.attribute,
+                name=address.name,
+                datestr=address.datestr if address.datestr is not None else "",
+                realizations=address.realizations,
+            )
+            surf = self._stat_surf_cache.get_or_create(
+                self._provider_id,
+                source_files_version(surf_fns),
+                address,
+                lambda: self._create_statistical_surface(address),
+            )
 
         LOGGER.debug(
-            f"Created statistical surface in: {timer.elapsed_s():.2f}s ("
+            f"Got or created statistical surface in: {timer.elapsed_s():.2f}s ("
             f"[stat={address.statistic}, "
             f"attr={address.attribute}, name={address.name}, date={address.datestr}]"
         )
@@ -246,6 +301,15 @@ class ProviderImplFile(EnsembleSurfaceProvider):
     def _create_statistical_surface(
         self, address: StatisticalSurfaceAddress
     ) -> Optional[xtgeo.RegularSurface]:
+        if self._stacked_cubes is not None:
+            cube_and_info = self._stacked_cubes.get_cube(
+                attribute=address.attribute,
+                name=address.name,
+                datestr=address.datestr if address.datestr is not None else "",
+            )
+            if cube_and_info is not None:
+                return _calc_statistic_from_cube(address, *cube_and_info)
+
         surf_fns: List[str] = self._locate_simulated_surfaces(
             attribute=address.attribute,
             name=address.name,
@@ -257,8 +321,35 @@ class ProviderImplFile(EnsembleSurfaceProvider):
             LOGGER.warning(f"No input surfaces found for statistical surface {address}")
             return None
 
+        if self._should_stream_statistics(surf_fns):
+            stat_surface = self._create_statistical_surface_streaming(address, surf_fns)
+            if stat_surface is not None:
+                return stat_surface
+
         timer = PerfTimer()
 
+        # Load the surfaces concurrently into one stacked array. If the surfaces don't
+        # all share the same geometry, we fall back to loading them through xtgeo.
+        geometry_and_values = load_stacked_surface_values(surf_fns)
+        if geometry_and_values is not None:
+            geometry, stacked_values = geometry_and_values
+            et_load_s = timer.lap_s()
+
+            stat_values = calc_statistics_from_stacked_values(
+                [address.statistic], stacked_values
+            )
+            stat_surface = geometry.create_surface(stat_values[address.statistic])
+            et_calc_s = timer.lap_s()
+
+            LOGGER.debug(
+                f"Created statistical surface in: {timer.elapsed_s():.2f}s ("
+                f"load={et_load_s:.2f}s, calc={et_calc_s:.2f}s), "
+                f"[#surfaces={len(surf_fns)}, stat={address.statistic}, "
+                f"attr={address.attribute}, name={address.name}, "
+                f"date={address.datestr}]"
+            )
+            return stat_surface
+
         surfaces = xtgeo.Surfaces(surf_fns)
         et_load_s = timer.lap_s()
 
@@ -301,6 +392,42 @@ class ProviderImplFile(EnsembleSurfaceProvider):
 
         return stat_surface
 
+    def _should_stream_statistics(self, surf_fns: List[str]) -> bool:
+        """Stream over the realizations if stacking them would need too much memory"""
+        if self._streaming_stats_options is None:
+            return False
+
+        geometry = read_surface_geometry(surf_fns[0])
+        stacked_size_bytes = len(surf_fns) * geometry.ncol * geometry.nrow * 4
+        return stacked_size_bytes > self._streaming_stats_options.min_stacked_size_bytes
+
+    def _create_statistical_surface_streaming(
+        self, address: StatisticalSurfaceAddress, surf_fns: List[str]
+    ) -> Optional[xtgeo.RegularSurface]:
+        """Returns None if the surfaces don't all share the same geometry"""
+        assert self._streaming_stats_options is not None
+
+        timer = PerfTimer()
+
+        stat_values = calc_statistics_streaming(
+            [address.statistic],
+            surf_fns,
+            self._streaming_stats_options.percentile_tolerance,
+        )
+        if stat_values is None:
+            return None
+
+        geometry = read_surface_geometry(surf_fns[0])
+        stat_surface = geometry.create_surface(stat_values[address.statistic])
+
+        LOGGER.debug(
+            f"Created streaming statistical surface in: {timer.elapsed_s():.2f}s "
+            f"[#surfaces={len(surf_fns)}, stat={address.statistic}, "
+            f"attr={address.attribute}, name={address.name}, date={address.datestr}]"
+        )
+
+        return stat_surface
+
     def _get_simulated_surface(
         self, address: SimulatedSurfaceAddress
     ) -> Optional[xtgeo.RegularSurface]:
@@ -362,56 +489,48 @@ class ProviderImplFile(EnsembleSurfaceProvider):
         self, attribute: str, name: str, datestr: str, realizations: List[int]
     ) -> List[str]:
         """Returns list of file names matching the specified filter criteria"""
-        df = self._inventory_df.loc[
-            self._inventory_df[Col.TYPE] == SurfaceType.SIMULATED
-        ]
-
-        df = df.loc[
-            (df[Col.ATTRIBUTE] == attribute)
-            & (df[Col.NAME] == name)
-            & (df[Col.DATESTR] == datestr)
-            & (df[Col.REAL].isin(realizations))
-        ]
-
-        df = df[[Col.REL_PATH, Col.ORIGINAL_PATH]]
-
-        # Return file name within backing store if the surface was copied there,
-        # otherwise return the original source file name
-        fn_list: List[str] = []
-        for _index, row in df.iterrows():
-            if row[Col.REL_PATH]:
-                fn_list.append(self._provider_dir / row[Col.REL_PATH])
-            else:
-                fn_list.append(row[Col.ORIGINAL_PATH])
-
-        return fn_list
+        return self._inventory_index.locate(
+            SurfaceType.SIMULATED, attribute, name, datestr, realizations
+        )
 
     def _locate_observed_surfaces(
         self, attribute: str, name: str, datestr: str
     ) -> List[str]:
         """Returns file names of observed surfaces matching the criteria"""
-        df = self._inventory_df.loc[
-            self._inventory_df[Col.TYPE] == SurfaceType.OBSERVED
-        ]
+        return self._inventory_index.locate(
+            SurfaceType.OBSERVED, attribute, name, datestr
+        )
 
-        df = df.loc[
-            (df[Col.ATTRIBUTE] == attribute)
-            & (df[Col.NAME] == name)
-            & (df[Col.DATESTR] == datestr)
-        ]
 
-        df = df[[Col.REL_PATH, Col.ORIGINAL_PATH]]
+def _build_inventory_index(
+    surface_inventory_df: pd.DataFrame, provider_dir: Path
+) -> SurfaceInventoryIndex:
+    timer = PerfTimer()
 
-        # Return file name within backing store if the surface was copied there,
-        # otherwise return the original source file name
-        fn_list: List[str] = []
-        for _index, row in df.iterrows():
-            if row[Col.REL_PATH]:
-                fn_list.append(self._provider_dir / row[Col.REL_PATH])
-            else:
-                fn_list.append(row[Col.ORIGINAL_PATH])
+    # Use the file name within backing store if the surface was copied there,
+    # otherwise use the original source file name
+    path_arr = [
+        str(provider_dir / rel_path) if rel_path else original_path
+        for rel_path, original_path in zip(
+            surface_inventory_df[Col.REL_PATH], surface_inventory_df[Col.ORIGINAL_PATH]
+        )
+    ]
 
-        return fn_list
+    index = SurfaceInventoryIndex(
+        type_arr=surface_inventory_df[Col.TYPE].tolist(),
+        real_arr=surface_inventory_df[Col.REAL].tolist(),
+        attribute_arr=surface_inventory_df[Col.ATTRIBUTE].tolist(),
+        name_arr=surface_inventory_df[Col.NAME].tolist(),
+        datestr_arr=surface_inventory_df[Col.DATESTR].tolist(),
+        path_arr=path_arr,
+    )
+
+    LOGGER.debug(
+        f"Built surface inventory index for {len(path_arr)} surfaces "
+        f"in: {timer.elapsed_s():.2f}s"
+    )
+
+    return index
 
 
 def _find_observed_surfaces_corresponding_to_simulated(
@@ -480,6 +599,32 @@ def _compose_rel_obs_surf_pathstr(
     return str(Path(REL_OBS_DIR) / fname)
 
 
+def _calc_statistic_from_cube(
+    address: StatisticalSurfaceAddress, cube_info: StackedCubeInfo, cube: np.ndarray
+) -> Optional[xtgeo.RegularSurface]:
+    """Calculates a statistical surface directly from a memmapped stacked cube"""
+
+    timer = PerfTimer()
+
+    slice_indices = select_realizations_in_cube(cube_info, address.realizations)
+    if len(slice_indices) == 0:
+        LOGGER.warning(f"No input surfaces found for statistical surface {address}")
+        return None
+
+    stat_values = calc_statistics_from_stacked_values(
+        [address.statistic], cube, slice_indices
+    )
+    stat_surface = cube_info.geometry.create_surface(stat_values[address.statistic])
+
+    LOGGER.debug(
+        f"Created statistical surface from stacked cube in: {timer.elapsed_s():.2f}s "
+        f"[#surfaces={len(slice_indices)}, stat={address.statistic}, "
+        f"attr={address.attribute}, name={address.name}, date={address.datestr}]"
+    )
+
+    return stat_surface
+
+
 def _calc_statistic_across_surfaces(
     statistic: SurfaceStatistic, surfaces: xtgeo.Surfaces
 ) -> xtgeo.RegularSurface:
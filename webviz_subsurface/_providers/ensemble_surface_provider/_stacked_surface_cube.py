@@ -0,0 +1,236 @@
+import json
+import logging
+import warnings
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+from ._surface_discovery import SurfaceFileInfo
+from ._surface_loading import load_stacked_surface_values_into, read_surface_geometry
+from ._types import SurfaceGeometry
+from .ensemble_surface_provider import SurfaceStatistic
+
+LOGGER = logging.getLogger(__name__)
+
+REL_CUBE_DIR = "cubes"
+CUBE_INDEX_FILE_NAME = "stacked_cubes.json"
+
+# Upper limit for the size of the float64 working array used when reducing a cube,
+# the reduction is done in slabs along the column axis to stay within this limit
+_MAX_REDUCTION_SLAB_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StackedCubeInfo:
+    """Describes a cube with the stacked values of all realizations of one
+    simulated surface. The cube is a float32 array of shape (nreal, ncol, nrow) with
+    one slice per realization, in the order given by `realizations`. Undefined values
+    are stored as NaN."""
+
+    attribute: str
+    name: str
+    datestr: str
+    rel_path: str
+    realizations: List[int]
+    geometry: SurfaceGeometry
+
+
+class StackedSurfaceCubes:
+    """Gives access to the stacked surface cubes of a provider's backing store"""
+
+    def __init__(self, provider_dir: Path, cube_infos: List[StackedCubeInfo]) -> None:
+        self._provider_dir = provider_dir
+        self._cube_infos: Dict[Tuple[str, str, str], StackedCubeInfo] = {
+            (info.attribute, info.name, info.datestr): info for info in cube_infos
+        }
+
+    @staticmethod
+    def from_provider_dir(provider_dir: Path) -> Optional["StackedSurfaceCubes"]:
+        try:
+            with open(provider_dir / CUBE_INDEX_FILE_NAME, "r", encoding="utf-8") as f:
+                index_list = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        cube_infos = [
+            StackedCubeInfo(
+                attribute=entry["attribute"],
+                name=entry["name"],
+                datestr=entry["datestr"],
+                rel_path=entry["rel_path"],
+                realizations=entry["realizations"],
+                geometry=SurfaceGeometry(**entry["geometry"]),
+            )
+            for entry in index_list
+        ]
+        return StackedSurfaceCubes(provider_dir, cube_infos)
+
+    def get_cube(
+        self, attribute: str, name: str, datestr: str
+    ) -> Optional[Tuple[StackedCubeInfo, np.ndarray]]:
+        """Returns the cube info together with the cube itself as a read only memmap,
+        or None if there is no cube for the specified surface."""
+        info = self._cube_infos.get((attribute, name, datestr))
+        if info is None:
+            return None
+
+        cube = np.load(self._provider_dir / info.rel_path, mmap_mode="r")
+        return (info, cube)
+
+
+def write_stacked_surface_cubes(
+    provider_dir: Path, sim_surfaces: List[SurfaceFileInfo]
+) -> None:
+    """Load the simulated surfaces and write one stacked cube per unique
+    (attribute, name, date) to the provider directory, along with an index.
+    The surfaces are written one realization at a time into a memory mapped file, so
+    the whole cube is never held in memory. Surfaces where the realizations do not
+    share the same geometry are skipped, and statistics for these will have to be
+    calculated from the individual surface files."""
+
+    timer = PerfTimer()
+
+    (provider_dir / REL_CUBE_DIR).mkdir(parents=True, exist_ok=True)
+
+    grouped_surfaces: Dict[Tuple[str, str, str], List[SurfaceFileInfo]] = {}
+    for surfinfo in sim_surfaces:
+        key = (surfinfo.attribute, surfinfo.name, surfinfo.datestr or "")
+        grouped_surfaces.setdefault(key, []).append(surfinfo)
+
+    cube_infos: List[StackedCubeInfo] = []
+    for (attribute, name, datestr), surfinfos in grouped_surfaces.items():
+        rel_path = _compose_rel_cube_pathstr(attribute, name, datestr)
+        sorted_surfinfos = sorted(surfinfos, key=lambda s: s.real)
+        geometry = _write_single_cube(
+            provider_dir / rel_path, [s.path for s in sorted_surfinfos]
+        )
+        if geometry is None:
+            LOGGER.debug(
+                f"Not creating stacked cube for surface with differing geometries "
+                f"(attr={attribute}, name={name}, date={datestr})"
+            )
+            continue
+
+        cube_infos.append(
+            StackedCubeInfo(
+                attribute=attribute,
+                name=name,
+                datestr=datestr,
+                rel_path=rel_path,
+                realizations=[s.real for s in sorted_surfinfos],
+                geometry=geometry,
+            )
+        )
+
+    with open(provider_dir / CUBE_INDEX_FILE_NAME, "w", encoding="utf-8") as f:
+        json.dump([asdict(info) for info in cube_infos], f)
+
+    LOGGER.debug(
+        f"Wrote {len(cube_infos)} stacked surface cubes in: {timer.elapsed_s():.2f}s"
+    )
+
+
+def _write_single_cube(
+    cube_file_name: Path, surf_fns: List[str]
+) -> Optional[SurfaceGeometry]:
+    geometry = read_surface_geometry(surf_fns[0])
+    cube = np.lib.format.open_memmap(
+        cube_file_name,
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(surf_fns), geometry.ncol, geometry.nrow),
+    )
+
+    if not load_stacked_surface_values_into(surf_fns, geometry, cube):
+        # Release the memmap before removing the file
+        del cube
+        cube_file_name.unlink()
+        return None
+
+    cube.flush()
+    return geometry
+
+
+def select_realizations_in_cube(
+    cube_info: StackedCubeInfo, realizations: Sequence[int]
+) -> np.ndarray:
+    """Returns indices of the cube's slices for the requested realizations.
+    Realizations that are not present in the cube are ignored."""
+    cube_reals = np.asarray(cube_info.realizations)
+    return np.flatnonzero(np.isin(cube_reals, realizations))
+
+
+# pylint: disable=too-many-locals
+def calc_statistics_from_stacked_values(
+    statistics: Sequence[SurfaceStatistic],
+    stacked_values: np.ndarray,
+    slice_indices: Optional[np.ndarray] = None,
+) -> Dict[SurfaceStatistic, np.ndarray]:
+    """Calculate the statistics across the first axis of a (nreal, ncol, nrow) array
+    of stacked surface values, typically a memmapped cube. If given, only the slices
+    in `slice_indices` are used.
+
+    All the statistics are computed in a single pass over the data, reducing one slab
+    of columns at a time. The numpy functions are the same as those used by
+    `_calc_statistic_across_surfaces()`, so nodes that are undefined in any of the
+    realizations will be NaN in the result.
+    """
+    _nreal, ncol, nrow = stacked_values.shape
+    num_slices = (
+        len(slice_indices) if slice_indices is not None else len(stacked_values)
+    )
+    bytes_per_column = max(num_slices * nrow * 8, 1)
+    cols_per_slab = max(_MAX_REDUCTION_SLAB_BYTES // bytes_per_column, 1)
+
+    percentiles = {
+        SurfaceStatistic.P10: 10,
+        SurfaceStatistic.P90: 90,
+    }
+    requested_percentiles = [stat for stat in statistics if stat in percentiles]
+
+    results = {
+        stat: np.empty((ncol, nrow), dtype=np.float64) for stat in set(statistics)
+    }
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "All-NaN slice encountered")
+        warnings.filterwarnings("ignore", "Mean of empty slice")
+        warnings.filterwarnings("ignore", "Degrees of freedom <= 0 for slice")
+
+        for col_start in range(0, ncol, cols_per_slab):
+            col_slice = slice(col_start, min(col_start + cols_per_slab, ncol))
+            if slice_indices is not None:
+                slab = stacked_values[slice_indices, col_slice]
+            else:
+                slab = stacked_values[:, col_slice]
+            slab = slab.astype(np.float64)
+
+            if SurfaceStatistic.MEAN in results:
+                results[SurfaceStatistic.MEAN][col_slice] = np.mean(slab, axis=0)
+            if SurfaceStatistic.STDDEV in results:
+                results[SurfaceStatistic.STDDEV][col_slice] = np.std(slab, axis=0)
+            if SurfaceStatistic.MINIMUM in results:
+                results[SurfaceStatistic.MINIMUM][col_slice] = np.min(slab, axis=0)
+            if SurfaceStatistic.MAXIMUM in results:
+                results[SurfaceStatistic.MAXIMUM][col_slice] = np.max(slab, axis=0)
+            if requested_percentiles:
+                percentile_values = np.percentile(
+                    slab, [percentiles[stat] for stat in requested_percentiles], axis=0
+                )
+                for stat, values in zip(requested_percentiles, percentile_values):
+                    results[stat][col_slice] = values
+
+    return results
+
+
+def _compose_rel_cube_pathstr(attribute: str, name: str, datestr: str) -> str:
+    """Compose path to stacked cube file, relative to provider's directory"""
+    if datestr:
+        fname = f"{name}--{attribute}--{datestr}.npy"
+    else:
+        fname = f"{name}--{attribute}.npy"
+    return str(Path(REL_CUBE_DIR) / fname)
@@ -1,90 +1,138 @@
-import datetime
 import hashlib
+import json
 import logging
-import os
-import pickle  # nosec
-import uuid
+from dataclasses import asdict
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Callable, Optional
 
+import numpy as np
 import xtgeo
 
+from webviz_subsurface._utils.disk_lru_dir import DiskLruDir, touch
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+from ._types import SurfaceGeometry
 from .ensemble_surface_provider import StatisticalSurfaceAddress
 
 LOGGER = logging.getLogger(__name__)
 
-# For some obscure reason, reading of a non-existent irap file segfaults,
-# so use asymmetric file formats for read and write
-FILE_FORMAT_WRITE = "irap_binary"
-FILE_FORMAT_READ = "guess"
-FILE_EXTENSION = ".gri"
-
-# FILE_FORMAT_WRITE = "xtgregsurf"
-# FILE_FORMAT_READ = FILE_FORMAT_WRITE
-# FILE_EXTENSION = ".xtgregsurf"
+# Surfaces are stored as a single line of JSON with the geometry, followed by the
+# raw float32 values in C order. Undefined values are stored as NaN.
+FILE_EXTENSION = ".rawsurf"
 
 
 class StatSurfCache:
-    def __init__(self, cache_dir: Path) -> None:
-        self.cache_dir = cache_dir
+    """On-disk cache of statistical surfaces that can be shared between processes.
 
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        placeholder_file = self.cache_dir / "placeholder.txt"
-        placeholder_file.write_text(
-            f"Placeholder -- {datetime.datetime.now()} -- {os.getpid()}"
-        )
+    The total size of the cached surfaces is kept within `max_size_bytes` by evicting
+    the least recently used surfaces, using the files' modification times to track
+    access. Use `get_or_create()` to make sure that only one process computes any
+    given surface, other processes asking for the same surface will wait for it to
+    be stored and then read it from the cache.
+
+    The `data_version` passed along with each address should identify the state of
+    the input surfaces, see `source_files_version()`, so that surfaces computed from
+    since modified input are never returned.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self._lru_dir = DiskLruDir(cache_dir, FILE_EXTENSION, max_size_bytes)
 
     def fetch(
-        self, address: StatisticalSurfaceAddress
+        self, provider_id: str, data_version: str, address: StatisticalSurfaceAddress
     ) -> Optional[xtgeo.RegularSurface]:
-        full_surf_path = self.cache_dir / _compose_stat_surf_file_name(
-            address, FILE_EXTENSION
-        )
+        key = _compose_stat_surf_key(provider_id, data_version, address)
+        full_surf_path = self._lru_dir.path_for(key)
 
         try:
-            surf = xtgeo.surface_from_file(full_surf_path, fformat=FILE_FORMAT_READ)
-            return surf
-        # pylint: disable=bare-except
-        except:
+            surf = _read_raw_surface(full_surf_path)
+        except (FileNotFoundError, ValueError):
             return None
 
+        touch(full_surf_path)
+
+        return surf
+
     def store(
-        self, address: StatisticalSurfaceAddress, surface: xtgeo.RegularSurface
+        self,
+        provider_id: str,
+        data_version: str,
+        address: StatisticalSurfaceAddress,
+        surface: xtgeo.RegularSurface,
     ) -> None:
-        surf_fn = _compose_stat_surf_file_name(address, FILE_EXTENSION)
-        full_surf_path = self.cache_dir / surf_fn
-
-        # Try and go via a temporary file which we don't rename until writing is finished.
-        # to make the cache writing more concurrency-friendly.
-        # One problem here is that we don't control the file handle (xtgeo does) so can't
-        # enforce flush and sync of the file to disk before the rename :-(
-        # Still, we probably need a more robust way of shring the cached surfaces...
-        tmp_surf_path = self.cache_dir / (surf_fn + f"__{uuid.uuid4().hex}.tmp")
-        try:
-            surface.to_file(tmp_surf_path, fformat=FILE_FORMAT_WRITE)
-            os.replace(tmp_surf_path, full_surf_path)
-        # pylint: disable=bare-except
-        except:
-            os.remove(tmp_surf_path)
+        key = _compose_stat_surf_key(provider_id, data_version, address)
+        full_surf_path = self._lru_dir.path_for(key)
+
+        if self._lru_dir.write_atomically(
+            full_surf_path, lambda f: _write_raw_surface(f, surface)
+        ):
+            self._lru_dir.evict_if_needed()
+
+    def get_or_create(
+        self,
+        provider_id: str,
+        data_version: str,
+        address: StatisticalSurfaceAddress,
+        create_func: Callable[[], Optional[xtgeo.RegularSurface]],
+    ) -> Optional[xtgeo.RegularSurface]:
+        """Returns the cached surface if present, otherwise calls `create_func()` and
+        stores the result. Concurrent calls for the same surface, also from other
+        processes, are serialized so that the surface is only created once."""
+        surf = self.fetch(provider_id, data_version, address)
+        if surf is not None:
+            return surf
+
+        key = _compose_stat_surf_key(provider_id, data_version, address)
+        with self._lru_dir.locked(key):
+            # Someone else may have created it while we were waiting for the lock
+            surf = self.fetch(provider_id, data_version, address)
+            if surf is not None:
+                return surf
+
+            surf = create_func()
+            if surf is not None:
+                self.store(provider_id, data_version, address, surf)
+
+        return surf
+
+
+def _write_raw_surface(f: BinaryIO, surface: xtgeo.RegularSurface) -> None:
+    geometry = SurfaceGeometry.from_surface(surface)
+    values = np.ma.filled(surface.values.astype(np.float32), fill_value=np.nan)
+    f.write(json.dumps(asdict(geometry)).encode() + b"\n")
+    f.write(np.ascontiguousarray(values).tobytes())
+
+
+def _read_raw_surface(file_name: Path) -> xtgeo.RegularSurface:
+    timer = PerfTimer()
+
+    with open(file_name, "rb") as f:
+        geometry = SurfaceGeometry(**json.loads(f.readline()))
+        values = np.fromfile(f, dtype=np.float32)
+
+    if values.size != geometry.ncol * geometry.nrow:
+        raise ValueError(f"Incomplete cached surface: {file_name}")
+
+    surf = geometry.create_surface(values.reshape(geometry.ncol, geometry.nrow))
+
+    LOGGER.debug(f"Read cached statistical surface in: {timer.elapsed_s():.2f}s")
 
-        # surface.to_file(full_surf_path, fformat=FILE_FORMAT_WRITE)
+    return surf
 
 
-def _compose_stat_surf_file_name(
-    address: StatisticalSurfaceAddress, extension: str
+def _compose_stat_surf_key(
+    provider_id: str, data_version: str, address: StatisticalSurfaceAddress
 ) -> str:
-    # Should probably sort the realization list
-    # Also, what about duplicates
-    # And further, handling of missing realizations...
-
-    pickled = pickle.dumps(address.realizations, pickle.HIGHEST_PROTOCOL)
-    real_hash = hashlib.md5(pickled).hexdigest()  # nosec
-    return "--".join(
-        [
-            f"{address.statistic}",
-            f"{address.name}",
-            f"{address.attribute}",
-            f"{address.datestr}",
-            f"{real_hash}{extension}",
-        ]
+    # The realizations are sorted and de-duplicated so that equivalent addresses
+    # share the same cache entry
+    canonical_address = (
+        provider_id,
+        data_version,
+        str(address.statistic),
+        address.name,
+        address.attribute,
+        address.datestr,
+        sorted(set(address.realizations)),
     )
+    return hashlib.md5(repr(canonical_address).encode()).hexdigest()  # nosec
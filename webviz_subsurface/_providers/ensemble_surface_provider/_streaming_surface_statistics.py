@@ -0,0 +1,301 @@
+import logging
+import math
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+from ._surface_loading import (
+    DEFAULT_MAX_LOAD_WORKERS,
+    load_stacked_surface_values_into,
+    read_surface_geometry,
+)
+from ._types import SurfaceGeometry
+from .ensemble_surface_provider import SurfaceStatistic
+
+LOGGER = logging.getLogger(__name__)
+
+# Default tolerance for the approximated percentiles, relative to the range of
+# values (max - min) in each node
+DEFAULT_PERCENTILE_TOLERANCE = 1e-4
+
+# Number of bins used per refinement pass when bracketing the percentiles
+_NUM_REFINEMENT_BINS = 16
+
+# The percentiles are refined for this many nodes at a time, which bounds the memory
+# used for the per node histograms and brackets to roughly 64MB per percentile rank
+_MAX_NODES_PER_SLAB = 1024 * 1024
+
+_PERCENTILES = {
+    SurfaceStatistic.P10: 10,
+    SurfaceStatistic.P90: 90,
+}
+
+
+@dataclass(frozen=True)
+class StreamingStatisticsOptions:
+    """Controls when statistical surfaces are calculated by streaming over the
+    realizations instead of stacking them in memory.
+
+    Streaming is used when the stacked float32 values of the requested realizations
+    would exceed `min_stacked_size_bytes`. Percentiles are then approximated, with an
+    absolute error of at most `percentile_tolerance` times the node's value range.
+    """
+
+    min_stacked_size_bytes: int = 0
+    percentile_tolerance: float = DEFAULT_PERCENTILE_TOLERANCE
+
+
+# pylint: disable=too-many-locals
+def calc_statistics_streaming(
+    statistics: Sequence[SurfaceStatistic],
+    surf_fns: List[str],
+    percentile_tolerance: float = DEFAULT_PERCENTILE_TOLERANCE,
+    chunk_size: int = DEFAULT_MAX_LOAD_WORKERS,
+) -> Optional[Dict[SurfaceStatistic, np.ndarray]]:
+    """Calculate the statistics across the surfaces without holding more than
+    `chunk_size` of them in memory at a time. Returns None if the surfaces don't all
+    share the same geometry.
+
+    Mean and standard deviation are accumulated with Welford updates, and minimum and
+    maximum directly, all in a single pass over the surfaces. Percentiles are found by
+    narrowing a per node bracket around the relevant order statistics, using a
+    histogram of `_NUM_REFINEMENT_BINS` bins for each pass over the surfaces. The
+    number of passes is given by `percentile_tolerance`, and the result is within
+    `percentile_tolerance * (max - min)` of the exact value.
+
+    As for `calc_statistics_from_stacked_values()`, nodes that are undefined in any of
+    the surfaces will be NaN in the result.
+    """
+    timer = PerfTimer()
+
+    geometry = read_surface_geometry(surf_fns[0])
+    num_nodes = geometry.ncol * geometry.nrow
+    num_surfs = len(surf_fns)
+
+    count = 0
+    mean = np.zeros(num_nodes, dtype=np.float64)
+    m2_acc = np.zeros(num_nodes, dtype=np.float64)
+    min_values = np.full(num_nodes, np.inf, dtype=np.float64)
+    max_values = np.full(num_nodes, -np.inf, dtype=np.float64)
+
+    for values in _iterate_surface_values(surf_fns, geometry, chunk_size):
+        if values is None:
+            return None
+
+        count += 1
+        delta = values - mean
+        mean += delta / count
+        m2_acc += delta * (values - mean)
+        np.minimum(min_values, values, out=min_values)
+        np.maximum(max_values, values, out=max_values)
+
+    results: Dict[SurfaceStatistic, np.ndarray] = {}
+    for stat in set(statistics):
+        if stat == SurfaceStatistic.MEAN:
+            results[stat] = mean
+        elif stat == SurfaceStatistic.STDDEV:
+            results[stat] = np.sqrt(m2_acc / count)
+        elif stat == SurfaceStatistic.MINIMUM:
+            results[stat] = min_values
+        elif stat == SurfaceStatistic.MAXIMUM:
+            results[stat] = max_values
+
+    et_moments_s = timer.lap_s()
+
+    requested_percentiles = [stat for stat in set(statistics) if stat in _PERCENTILES]
+    num_passes = 0
+    if requested_percentiles:
+        num_passes = _num_refinement_passes(percentile_tolerance)
+
+        # Same interpolation between order statistics as np.percentile()
+        ranks_and_fractions = {}
+        for stat in requested_percentiles:
+            virtual_rank = _PERCENTILES[stat] / 100 * (num_surfs - 1)
+            lower_rank = int(math.floor(virtual_rank))
+            ranks_and_fractions[stat] = (lower_rank, virtual_rank - lower_rank)
+        ranks = sorted(
+            {rank for rank, _frac in ranks_and_fractions.values()}
+            | {
+                min(rank + 1, num_surfs - 1)
+                for rank, frac in ranks_and_fractions.values()
+                if frac > 0
+            }
+        )
+
+        order_stats = _find_order_statistics(
+            surf_fns, geometry, ranks, min_values, max_values, num_passes, chunk_size
+        )
+        if order_stats is None:
+            return None
+
+        for stat, (rank, frac) in ranks_and_fractions.items():
+            lower = order_stats[rank]
+            if frac > 0:
+                upper = order_stats[min(rank + 1, num_surfs - 1)]
+                percentile_values = lower + frac * (upper - lower)
+            else:
+                percentile_values = lower.copy()
+            # Any NaN in a node's values makes np.percentile() return NaN
+            percentile_values[np.isnan(mean)] = np.nan
+            results[stat] = percentile_values
+
+    et_percentiles_s = timer.lap_s()
+
+    LOGGER.debug(
+        f"Calculated streaming statistics in: {timer.elapsed_s():.2f}s ("
+        f"moments={et_moments_s:.2f}s, percentiles={et_percentiles_s:.2f}s), "
+        f"[#surfaces={num_surfs}, #percentile_passes={num_passes}]"
+    )
+
+    return {
+        stat: values.reshape(geometry.ncol, geometry.nrow)
+        for stat, values in results.items()
+    }
+
+
+def _num_refinement_passes(percentile_tolerance: float) -> int:
+    # After each pass the bracket is 1/_NUM_REFINEMENT_BINS of its previous width,
+    # and the midpoint of the final bracket is within half its width of the result
+    if percentile_tolerance <= 0:
+        raise ValueError("The percentile tolerance must be positive")
+    return max(math.ceil(math.log(0.5 / percentile_tolerance, _NUM_REFINEMENT_BINS)), 0)
+
+
+def _find_order_statistics(
+    surf_fns: List[str],
+    geometry: SurfaceGeometry,
+    ranks: List[int],
+    min_values: np.ndarray,
+    max_values: np.ndarray,
+    num_passes: int,
+    chunk_size: int,
+) -> Optional[Dict[int, np.ndarray]]:
+    """Approximate the order statistics with the given (zero based) ranks in each
+    node. The nodes are processed in slabs of at most `_MAX_NODES_PER_SLAB` nodes, at
+    the cost of reading the surfaces once per pass for each slab."""
+    num_nodes = len(min_values)
+    order_stats = {rank: np.empty(num_nodes, dtype=np.float64) for rank in ranks}
+
+    for slab_start in range(0, num_nodes, _MAX_NODES_PER_SLAB):
+        node_slice = slice(slab_start, min(slab_start + _MAX_NODES_PER_SLAB, num_nodes))
+        slab_order_stats = _find_order_statistics_in_slab(
+            surf_fns,
+            geometry,
+            ranks,
+            min_values[node_slice],
+            max_values[node_slice],
+            node_slice,
+            num_passes,
+            chunk_size,
+        )
+        if slab_order_stats is None:
+            return None
+
+        for rank, values in slab_order_stats.items():
+            order_stats[rank][node_slice] = values
+
+    return order_stats
+
+
+# pylint: disable=too-many-locals
+def _find_order_statistics_in_slab(
+    surf_fns: List[str],
+    geometry: SurfaceGeometry,
+    ranks: List[int],
+    min_values: np.ndarray,
+    max_values: np.ndarray,
+    node_slice: slice,
+    num_passes: int,
+    chunk_size: int,
+) -> Optional[Dict[int, np.ndarray]]:
+    """Approximate the order statistics for the nodes in `node_slice` by repeatedly
+    histogramming the values inside a per node bracket, and narrowing the bracket to
+    the bin that contains the rank"""
+    num_nodes = len(min_values)
+    node_indices = np.arange(num_nodes)
+    count_dtype = np.uint16 if len(surf_fns) < np.iinfo(np.uint16).max else np.uint32
+
+    with warnings.catch_warnings():
+        # Nodes that are undefined somewhere have NaN brackets, they are masked later
+        warnings.filterwarnings("ignore", "invalid value encountered")
+
+        brackets_lo = {rank: min_values.copy() for rank in ranks}
+        brackets_hi = {rank: max_values.copy() for rank in ranks}
+
+        for _pass_idx in range(num_passes):
+            scales = {}
+            for rank in ranks:
+                width = brackets_hi[rank] - brackets_lo[rank]
+                scale = np.zeros(num_nodes, dtype=np.float64)
+                np.divide(_NUM_REFINEMENT_BINS, width, out=scale, where=width > 0)
+                scales[rank] = scale
+
+            num_below = {rank: np.zeros(num_nodes, dtype=count_dtype) for rank in ranks}
+            bin_counts = {
+                rank: np.zeros((_NUM_REFINEMENT_BINS, num_nodes), dtype=count_dtype)
+                for rank in ranks
+            }
+
+            for values in _iterate_surface_values(surf_fns, geometry, chunk_size):
+                if values is None:
+                    return None
+
+                slab_values = values[node_slice]
+                for rank in ranks:
+                    num_below[rank] += slab_values < brackets_lo[rank]
+                    inside = (slab_values >= brackets_lo[rank]) & (
+                        slab_values <= brackets_hi[rank]
+                    )
+                    lo_inside = brackets_lo[rank][inside]
+                    rel_pos = (slab_values[inside] - lo_inside) * scales[rank][inside]
+                    bin_indices = np.minimum(
+                        rel_pos.astype(np.intp), _NUM_REFINEMENT_BINS - 1
+                    )
+                    # Each node occurs at most once, so no indices are repeated
+                    bin_counts[rank][bin_indices, node_indices[inside]] += 1
+
+            for rank in ranks:
+                cum_counts = num_below[rank] + np.cumsum(
+                    bin_counts[rank], axis=0, dtype=np.int64
+                )
+                # The first bin where the cumulative count passes the rank
+                bin_idx = np.minimum(
+                    np.count_nonzero(cum_counts <= rank, axis=0),
+                    _NUM_REFINEMENT_BINS - 1,
+                )
+                width = brackets_hi[rank] - brackets_lo[rank]
+                new_lo = brackets_lo[rank] + bin_idx * width / _NUM_REFINEMENT_BINS
+                brackets_hi[rank] = np.minimum(
+                    new_lo + width / _NUM_REFINEMENT_BINS, brackets_hi[rank]
+                )
+                brackets_lo[rank] = new_lo
+
+    return {rank: 0.5 * (brackets_lo[rank] + brackets_hi[rank]) for rank in ranks}
+
+
+def _iterate_surface_values(
+    surf_fns: List[str], geometry: SurfaceGeometry, chunk_size: int
+) -> Iterator[Optional[np.ndarray]]:
+    """Yields the flattened float64 values of each surface, loading `chunk_size`
+    surfaces concurrently into a reused buffer. Yields None and stops if a surface
+    has a different geometry."""
+    chunk_size = max(min(chunk_size, len(surf_fns)), 1)
+    buffer = np.empty((chunk_size, geometry.ncol, geometry.nrow), dtype=np.float32)
+    values = np.empty(geometry.ncol * geometry.nrow, dtype=np.float64)
+
+    for chunk_start in range(0, len(surf_fns), chunk_size):
+        chunk_fns = surf_fns[chunk_start : chunk_start + chunk_size]
+        chunk_buffer = buffer[: len(chunk_fns)]
+        if not load_stacked_surface_values_into(
+            chunk_fns, geometry, chunk_buffer, max_workers=chunk_size
+        ):
+            yield None
+            return
+
+        for surf_values in chunk_buffer:
+            values[...] = surf_values.reshape(-1)
+            yield values
@@ -0,0 +1,100 @@
+import gzip
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from webviz_subsurface._utils.enum_shim import StrEnum
+
+try:
+    import zstandard
+except ImportError:
+    # Optional dependency, zstd is simply not offered when it is missing
+    zstandard = None  # type: ignore
+
+# Quantized values are scaled into [0, UINT16_MAX_VALUE], and undefined values are
+# stored as UINT16_UNDEF_VALUE
+UINT16_MAX_VALUE = 65534
+UINT16_UNDEF_VALUE = 65535
+
+
+class ArrayValueEncoding(StrEnum):
+    FLOAT32 = "float32"
+    UINT16 = "uint16"
+
+
+class ContentEncoding(StrEnum):
+    ZSTD = "zstd"
+    GZIP = "gzip"
+    DEFLATE = "deflate"
+    IDENTITY = "identity"
+
+
+def available_content_encodings() -> List[ContentEncoding]:
+    """Supported content encodings, in order of preference"""
+    encodings = [ContentEncoding.GZIP, ContentEncoding.DEFLATE]
+    if zstandard is not None:
+        encodings.insert(0, ContentEncoding.ZSTD)
+    return encodings
+
+
+def negotiate_content_encoding(accepted_encodings: List[str]) -> ContentEncoding:
+    """Pick the preferred content encoding that the client accepts, given the
+    encodings listed in its Accept-Encoding header"""
+    accepted = {enc.strip().lower() for enc in accepted_encodings}
+    for encoding in available_content_encodings():
+        if encoding in accepted:
+            return encoding
+    return ContentEncoding.IDENTITY
+
+
+def quantize_float32_to_uint16(
+    values: np.ndarray, val_min: float, val_max: float
+) -> np.ndarray:
+    """Scale float32 values linearly from [val_min, val_max] to [0, UINT16_MAX_VALUE].
+    The client recovers the values as val_min + q * (val_max - val_min) / 65534.
+    NaN values are mapped to UINT16_UNDEF_VALUE."""
+    val_range = val_max - val_min
+    scale = UINT16_MAX_VALUE / val_range if val_range > 0 else 0.0
+
+    undefined = np.isnan(values)
+    scaled = np.clip((values - val_min) * scale, 0, UINT16_MAX_VALUE)
+    quantized = np.rint(np.where(undefined, 0, scaled)).astype(np.uint16)
+    quantized[undefined] = UINT16_UNDEF_VALUE
+    return quantized
+
+
+def shuffle_bytes(values: np.ndarray) -> bytes:
+    """Reorder the bytes so that the first byte of every value comes first, then the
+    second byte of every value and so on. This groups the slowly varying exponent
+    and high mantissa bytes, which makes float arrays compress much better."""
+    itemsize = values.dtype.itemsize
+    return values.view(np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def encode_array_payload(
+    float32_values: np.ndarray,
+    value_encoding: ArrayValueEncoding,
+    byte_shuffle: bool,
+    content_encoding: ContentEncoding,
+    val_min: Optional[float] = None,
+    val_max: Optional[float] = None,
+) -> bytes:
+    """Encode a float32 array for transport. Quantization to uint16 requires the
+    value range, and the byte shuffle must be undone by the client, while the
+    content encoding is undone by the browser."""
+    values = float32_values.reshape(-1)
+    if value_encoding == ArrayValueEncoding.UINT16:
+        if val_min is None or val_max is None:
+            raise ValueError("Value range is required for uint16 encoding")
+        values = quantize_float32_to_uint16(values, val_min, val_max)
+
+    payload = shuffle_bytes(values) if byte_shuffle else values.tobytes()
+
+    if content_encoding == ContentEncoding.ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(payload)
+    if content_encoding == ContentEncoding.GZIP:
+        return gzip.compress(payload, compresslevel=6)
+    if content_encoding == ContentEncoding.DEFLATE:
+        return zlib.compress(payload, 6)
+    return payload
@@ -0,0 +1,255 @@
+import abc
+import getpass
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from webviz_config.webviz_factory_registry import WEBVIZ_FACTORY_REGISTRY
+from webviz_config.webviz_instance_info import WebvizRunMode
+
+from webviz_subsurface._utils.disk_lru_dir import (
+    DiskLruDir,
+    touch,
+    write_file_atomically,
+)
+
+try:
+    import redis  # type: ignore[import-untyped]
+except ImportError:
+    # Optional dependency (the 'redis' extra), only needed by RedisBlobStore
+    redis = None  # type: ignore
+
+LOGGER = logging.getLogger(__name__)
+
+# Default disk budget for the blob store that is shared by all the surface servers
+_DEFAULT_BLOB_STORE_MAX_SIZE_MB = 2048
+
+REL_BLOB_DIR = "blobs"
+REL_REF_DIR = "refs"
+
+_DEFAULT_STORE_INSTANCE: Optional["SurfaceBlobStore"] = None
+_DEFAULT_STORE_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class BlobStoreMetrics:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class SurfaceBlobStore(abc.ABC):
+    """Store of binary blobs published by the surface servers, meant to be shared by
+    all the processes serving the app. Each process keeps its own metrics."""
+
+    def __init__(self) -> None:
+        self._metrics_lock = threading.Lock()
+        self._metrics = BlobStoreMetrics()
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._get(key)
+        with self._metrics_lock:
+            if data is None:
+                self._metrics = replace(self._metrics, misses=self._metrics.misses + 1)
+            else:
+                self._metrics = replace(
+                    self._metrics,
+                    hits=self._metrics.hits + 1,
+                    bytes_read=self._metrics.bytes_read + len(data),
+                )
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        num_evicted = self._put(key, data)
+        with self._metrics_lock:
+            self._metrics = replace(
+                self._metrics,
+                writes=self._metrics.writes + 1,
+                evictions=self._metrics.evictions + num_evicted,
+                bytes_written=self._metrics.bytes_written + len(data),
+            )
+
+    def contains(self, key: str) -> bool:
+        """Check whether the key is present without reading its data. This is not
+        counted in the metrics."""
+        return self._contains(key)
+
+    def metrics(self) -> BlobStoreMetrics:
+        with self._metrics_lock:
+            return self._metrics
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abc.abstractmethod
+    def _contains(self, key: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def _put(self, key: str, data: bytes) -> int:
+        """Store the data and return the number of evicted blobs"""
+
+
+class LocalDirBlobStore(SurfaceBlobStore):
+    """Content addressed blob store in a local directory, which can be shared by all
+    processes on the machine.
+
+    Blobs are stored under the hash of their contents, so identical payloads are only
+    stored once, and small ref files map the hash of each key to a blob. All files are
+    written atomically. The total size of the blobs is kept within `max_size_bytes`
+    by evicting the least recently used blobs.
+    """
+
+    def __init__(self, root_dir: Path, max_size_bytes: int) -> None:
+        super().__init__()
+        self.root_dir = root_dir
+        self._blob_dir = DiskLruDir(root_dir / REL_BLOB_DIR, ".blob", max_size_bytes)
+
+        (self.root_dir / REL_REF_DIR).mkdir(parents=True, exist_ok=True)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        ref_path = self._ref_path(key)
+        try:
+            digest = ref_path.read_text(encoding="ascii")
+        except FileNotFoundError:
+            return None
+
+        blob_path = self._blob_dir.path_for(digest)
+        try:
+            data = blob_path.read_bytes()
+        except FileNotFoundError:
+            # The blob has been evicted
+            ref_path.unlink(missing_ok=True)
+            return None
+
+        touch(blob_path)
+        touch(ref_path)
+        return data
+
+    def _contains(self, key: str) -> bool:
+        try:
+            digest = self._ref_path(key).read_text(encoding="ascii")
+        except FileNotFoundError:
+            return False
+        return self._blob_dir.path_for(digest).exists()
+
+    def _put(self, key: str, data: bytes) -> int:
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_dir.path_for(digest)
+
+        def write_blob(f: BinaryIO) -> None:
+            f.write(data)
+
+        def write_ref(f: BinaryIO) -> None:
+            f.write(digest.encode("ascii"))
+
+        if blob_path.exists():
+            touch(blob_path)
+        elif not self._blob_dir.write_atomically(blob_path, write_blob):
+            return 0
+
+        try:
+            write_file_atomically(self._ref_path(key), write_ref)
+        except OSError as exc:
+            LOGGER.warning(f"Failed to write blob ref to store: {exc}")
+            return 0
+
+        eviction_summary = self._blob_dir.evict_if_needed()
+        if eviction_summary.newest_evicted_mtime is not None:
+            self._remove_refs_not_used_since(eviction_summary.newest_evicted_mtime)
+
+        return eviction_summary.num_evicted
+
+    def _remove_refs_not_used_since(self, mtime: float) -> None:
+        # Refs that haven't been used since the evicted blobs were last used most
+        # likely point to evicted blobs, and would otherwise accumulate
+        for ref_path in (self.root_dir / REL_REF_DIR).iterdir():
+            try:
+                if ref_path.stat().st_mtime <= mtime:
+                    ref_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+    def _ref_path(self, key: str) -> Path:
+        key_hash = hashlib.sha256(key.encode()).hexdigest()
+        return self.root_dir / REL_REF_DIR / f"{key_hash}.ref"
+
+
+class RedisBlobStore(SurfaceBlobStore):
+    """Blob store in a Redis compatible server, for sharing blobs between machines.
+    The size of the store should be bounded on the server, e.g. with `maxmemory` and
+    the `allkeys-lru` eviction policy, so evictions are not counted here."""
+
+    def __init__(
+        self,
+        url: str,
+        key_prefix: str = "webviz_surface_blob:",
+        expire_s: Optional[int] = None,
+    ) -> None:
+        if redis is None:
+            raise ImportError(
+                "The redis package is required for RedisBlobStore, install it with "
+                "the 'redis' extra of webviz-subsurface"
+            )
+
+        super().__init__()
+        self._client = redis.Redis.from_url(url)
+        self._key_prefix = key_prefix
+        self._expire_s = expire_s
+
+    def _get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self._key_prefix + key)
+
+    def _contains(self, key: str) -> bool:
+        return bool(self._client.exists(self._key_prefix + key))
+
+    def _put(self, key: str, data: bytes) -> int:
+        self._client.set(self._key_prefix + key, data, ex=self._expire_s)
+        return 0
+
+
+def default_surface_blob_store() -> SurfaceBlobStore:
+    """Returns the blob store used by surface servers that are not given one, which
+    is shared by all processes serving the app.
+
+    Since the published surfaces are keyed on their addresses, the store must not
+    outlive the data behind the app's providers. Non-portable apps get a fresh
+    storage folder on every run, so the store is placed inside it. The storage folder
+    of portable apps may be read only, but their data never changes, so the store is
+    placed in the system's temp directory under the hash of the storage folder."""
+    # pylint: disable=global-statement
+    global _DEFAULT_STORE_INSTANCE
+    with _DEFAULT_STORE_LOCK:
+        if _DEFAULT_STORE_INSTANCE is None:
+            app_instance_info = WEBVIZ_FACTORY_REGISTRY.app_instance_info
+            storage_folder = Path(app_instance_info.storage_folder)
+            if app_instance_info.run_mode == WebvizRunMode.PORTABLE:
+                storage_folder_hash = hashlib.md5(  # nosec
+                    str(storage_folder.resolve()).encode()
+                ).hexdigest()
+                root_dir = Path(tempfile.gettempdir()) / (
+                    f"webviz_surface_blob_store__{getpass.getuser()}__"
+                    f"{storage_folder_hash}"
+                )
+            else:
+                root_dir = storage_folder / __name__
+
+            LOGGER.debug(f"Setting up shared surface blob store in: {root_dir}")
+            _DEFAULT_STORE_INSTANCE = LocalDirBlobStore(
+                root_dir, max_size_bytes=_DEFAULT_BLOB_STORE_MAX_SIZE_MB * 1024 * 1024
+            )
+
+    return _DEFAULT_STORE_INSTANCE
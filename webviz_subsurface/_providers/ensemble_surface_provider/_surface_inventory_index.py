@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# (surface type, attribute, name, datestr)
+InventoryKey = Tuple[str, str, str, str]
+
+
+@dataclass(frozen=True)
+class InventoryEntry:
+    # Sorted realization numbers, and the file names of the surfaces in the same order
+    realizations: np.ndarray
+    paths: List[str]
+
+
+class SurfaceInventoryIndex:
+    """Hashed index of a surface inventory, built once when the provider is loaded.
+
+    Each (type, attribute, name, datestr) key maps to the sorted array of realizations
+    and their file names, so that locating surfaces doesn't need to scan the whole
+    inventory. Observed surfaces are stored with realization -1.
+    """
+
+    def __init__(
+        self,
+        type_arr: Sequence[str],
+        real_arr: Sequence[int],
+        attribute_arr: Sequence[str],
+        name_arr: Sequence[str],
+        datestr_arr: Sequence[str],
+        path_arr: Sequence[str],
+    ) -> None:
+        self._entries = _build_inventory_entries(
+            type_arr, real_arr, attribute_arr, name_arr, datestr_arr, path_arr
+        )
+
+        attr_to_names: Dict[str, Set[str]] = {}
+        attr_to_dates: Dict[str, Set[str]] = {}
+        all_reals: Set[int] = set()
+        for (_surf_type, attribute, name, datestr), entry in self._entries.items():
+            attr_to_names.setdefault(attribute, set()).add(name)
+            attr_to_dates.setdefault(attribute, set()).add(datestr)
+            all_reals.update(int(real) for real in entry.realizations if real >= 0)
+
+        self._attributes = sorted(attr_to_names)
+        self._attr_to_names = {
+            attr: sorted(names) for attr, names in attr_to_names.items()
+        }
+        self._attr_to_dates = {
+            attr: sorted(dates) for attr, dates in attr_to_dates.items()
+        }
+        self._realizations = sorted(all_reals)
+
+    def attributes(self) -> List[str]:
+        return list(self._attributes)
+
+    def names_for_attribute(self, attribute: str) -> List[str]:
+        return list(self._attr_to_names.get(attribute, []))
+
+    def datestrs_for_attribute(self, attribute: str) -> List[str]:
+        """Note that surfaces without a date are listed with an empty datestr"""
+        return list(self._attr_to_dates.get(attribute, []))
+
+    def realizations(self) -> List[int]:
+        return list(self._realizations)
+
+    def locate(
+        self,
+        surface_type: str,
+        attribute: str,
+        name: str,
+        datestr: str,
+        realizations: Optional[List[int]] = None,
+    ) -> List[str]:
+        """Returns the file names of the matching surfaces, ordered by realization.
+        If realizations is None, all realizations are returned."""
+        entry = self._entries.get((surface_type, attribute, name, datestr))
+        if entry is None:
+            return []
+
+        if realizations is None:
+            return list(entry.paths)
+
+        requested = np.unique(np.asarray(realizations, dtype=np.int64))
+        positions = np.searchsorted(entry.realizations, requested)
+        in_range = positions < len(entry.realizations)
+        positions = positions[in_range]
+        found = entry.realizations[positions] == requested[in_range]
+
+        return [entry.paths[pos] for pos in positions[found]]
+
+
+def _build_inventory_entries(
+    type_arr: Sequence[str],
+    real_arr: Sequence[int],
+    attribute_arr: Sequence[str],
+    name_arr: Sequence[str],
+    datestr_arr: Sequence[str],
+    path_arr: Sequence[str],
+) -> Dict[InventoryKey, InventoryEntry]:
+    grouped: Dict[InventoryKey, List[Tuple[int, str]]] = {}
+    for surf_type, attribute, name, datestr, real, path in zip(
+        type_arr, attribute_arr, name_arr, datestr_arr, real_arr, path_arr
+    ):
+        key = (surf_type, attribute, name, datestr)
+        grouped.setdefault(key, []).append((int(real), path))
+
+    entries: Dict[InventoryKey, InventoryEntry] = {}
+    for key, reals_and_paths in grouped.items():
+        reals_and_paths.sort()
+        entries[key] = InventoryEntry(
+            realizations=np.array([r for r, _p in reals_and_paths], dtype=np.int64),
+            paths=[p for _r, p in reals_and_paths],
+        )
+
+    return entries
@@ -0,0 +1,177 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import xtgeo
+
+from webviz_subsurface._utils.perf_timer import PerfTimer
+
+from ._types import SurfaceGeometry
+
+LOGGER = logging.getLogger(__name__)
+
+# Default number of threads used for loading surfaces. Loading is mostly bound by
+# file system latency, and both file reads and numpy copies release the GIL.
+DEFAULT_MAX_LOAD_WORKERS = 16
+
+# Irap binary layout, all big endian Fortran style records:
+# <32> IDFLAG NY XORI XMAX YORI YMAX XINC YINC <32>
+# <16> NX ROT X0ORI Y0ORI <16>
+# <28> 0 0 0 0 0 0 0 <28>
+# followed by records of float32 values in Fortran order
+_IRAP_BINARY_HEADER_DTYPE = np.dtype(
+    ">i4,>i4,>i4,>f4,>f4,>f4,>f4,>f4,>f4,>i4,"
+    ">i4,>i4,>f4,>f4,>f4,>i4,"
+    ">i4,>i4,>i4,>i4,>i4,>i4,>i4,>i4,>i4"
+)
+_IRAP_BINARY_HEADER_SIZE = _IRAP_BINARY_HEADER_DTYPE.itemsize
+_IRAP_BINARY_UNDEF = 1e30
+
+
+def _is_irap_binary(buf: bytes) -> bool:
+    if len(buf) < _IRAP_BINARY_HEADER_SIZE:
+        return False
+    start_marker, id_flag = np.frombuffer(buf, dtype=">i4", count=2)
+    return start_marker == 32 and id_flag == -996
+
+
+def _decode_irap_binary_geometry(buf: bytes) -> SurfaceGeometry:
+    hed = np.frombuffer(buf, dtype=_IRAP_BINARY_HEADER_DTYPE, count=1)[0]
+    yinc = float(hed[8])
+    return SurfaceGeometry(
+        ncol=int(hed[11]),
+        nrow=int(hed[2]),
+        xori=float(hed[3]),
+        yori=float(hed[5]),
+        xinc=float(hed[7]),
+        yinc=abs(yinc),
+        rotation=float(hed[12]),
+        yflip=-1 if yinc < 0.0 else 1,
+    )
+
+
+def _decode_irap_binary_values(buf: bytes, num_values: int) -> np.ndarray:
+    """Returns the values as a flat big endian float32 array in Fortran order"""
+    data = np.frombuffer(buf, dtype=np.uint8, offset=_IRAP_BINARY_HEADER_SIZE)
+    if len(data) < 4:
+        raise ValueError("Irap binary file contains no values")
+
+    # Fast path for the common case where all records have the same size, which is
+    # what xtgeo and RMS write. The values can then be picked out with a strided view.
+    block_bytes = int(np.frombuffer(data, dtype=">i4", count=1)[0])
+    record_bytes = block_bytes + 8
+    num_records = len(data) // record_bytes
+    if (
+        block_bytes > 0
+        and block_bytes % 4 == 0
+        and num_records * record_bytes == len(data)
+        and num_records * block_bytes == 4 * num_values
+    ):
+        records = data.reshape(num_records, record_bytes)[:, 4 : 4 + block_bytes]
+        return records.view(">f4").reshape(-1)
+
+    blocks: List[np.ndarray] = []
+    pos = 0
+    while pos < len(data):
+        block_bytes = int(np.frombuffer(data, dtype=">i4", count=1, offset=pos)[0])
+        blocks.append(data[pos + 4 : pos + 4 + block_bytes].view(">f4"))
+        pos += block_bytes + 8
+
+    values = np.concatenate(blocks)
+    if len(values) != num_values:
+        raise ValueError("Unexpected number of values in irap binary file")
+    return values
+
+
+def _read_surface_file(
+    surf_fn: str,
+) -> Tuple[SurfaceGeometry, Union[bytes, xtgeo.RegularSurface]]:
+    """Returns geometry of the surface together with the file's contents if it is an
+    irap binary file. Other formats are loaded by xtgeo, and the surface is returned
+    instead of the contents."""
+    with open(surf_fn, "rb") as f:
+        buf = f.read()
+
+    if _is_irap_binary(buf):
+        return (_decode_irap_binary_geometry(buf), buf)
+
+    surface = xtgeo.surface_from_file(surf_fn)
+    return (SurfaceGeometry.from_surface(surface), surface)
+
+
+def read_surface_geometry(surf_fn: str) -> SurfaceGeometry:
+    with open(surf_fn, "rb") as f:
+        header_buf = f.read(_IRAP_BINARY_HEADER_SIZE)
+
+    if _is_irap_binary(header_buf):
+        return _decode_irap_binary_geometry(header_buf)
+
+    return SurfaceGeometry.from_surface(xtgeo.surface_from_file(surf_fn, values=False))
+
+
+def load_surface_values_into(
+    surf_fn: str, geometry: SurfaceGeometry, out: np.ndarray
+) -> bool:
+    """Load the values of a surface into `out`, which must be a float32 array of shape
+    (ncol, nrow). Undefined values are set to NaN. Irap binary files are decoded
+    directly into `out` without going via xtgeo, other formats are loaded by xtgeo.
+    Returns False if the surface's geometry is different from `geometry`."""
+    file_geometry, contents = _read_surface_file(surf_fn)
+    if file_geometry != geometry:
+        return False
+
+    if isinstance(contents, bytes):
+        flat_values = _decode_irap_binary_values(
+            contents, geometry.ncol * geometry.nrow
+        )
+        out[...] = flat_values.reshape(geometry.nrow, geometry.ncol).T
+        out[out >= _IRAP_BINARY_UNDEF] = np.nan
+    else:
+        out[...] = np.ma.filled(contents.values.astype(np.float32), fill_value=np.nan)
+
+    return True
+
+
+def load_stacked_surface_values_into(
+    surf_fns: List[str],
+    geometry: SurfaceGeometry,
+    stacked_out: np.ndarray,
+    max_workers: int = DEFAULT_MAX_LOAD_WORKERS,
+) -> bool:
+    """Load the surfaces concurrently, each into its own slice of the preallocated
+    float32 array `stacked_out` of shape (len(surf_fns), ncol, nrow).
+    Returns False if any of the surfaces have a geometry different from `geometry`,
+    in which case the contents of `stacked_out` are undefined."""
+
+    def load_one(idx: int) -> bool:
+        return load_surface_values_into(surf_fns[idx], geometry, stacked_out[idx])
+
+    num_workers = max(min(max_workers, len(surf_fns)), 1)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        return all(executor.map(load_one, range(len(surf_fns))))
+
+
+def load_stacked_surface_values(
+    surf_fns: List[str], max_workers: int = DEFAULT_MAX_LOAD_WORKERS
+) -> Optional[Tuple[SurfaceGeometry, np.ndarray]]:
+    """Load the surfaces concurrently into a stacked float32 array of shape
+    (len(surf_fns), ncol, nrow). Returns None if the surfaces don't all share the same
+    geometry."""
+    timer = PerfTimer()
+
+    geometry = read_surface_geometry(surf_fns[0])
+    stacked_values = np.empty(
+        (len(surf_fns), geometry.ncol, geometry.nrow), dtype=np.float32
+    )
+    if not load_stacked_surface_values_into(
+        surf_fns, geometry, stacked_values, max_workers
+    ):
+        return None
+
+    LOGGER.debug(
+        f"Loaded {len(surf_fns)} surfaces in: {timer.elapsed_s():.2f}s "
+        f"(max_workers={max_workers})"
+    )
+
+    return (geometry, stacked_values)
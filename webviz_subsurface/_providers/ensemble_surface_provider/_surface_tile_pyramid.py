@@ -0,0 +1,122 @@
+import io
+import math
+import warnings
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from webviz_subsurface._utils.enum_shim import StrEnum
+
+
+class DownsampleMethod(StrEnum):
+    MEAN = "mean"
+    NEAREST = "nearest"
+
+
+@dataclass(frozen=True)
+class SurfaceTileLevelMeta:
+    x_count: int
+    y_count: int
+    x_inc: float
+    y_inc: float
+    x_tile_count: int
+    y_tile_count: int
+
+
+@dataclass(frozen=True)
+class SurfaceTilePyramidMeta:
+    """Describes the tile pyramid of a surface. Level 0 is the coarsest level, and
+    the last level has the surface's full resolution. Each level halves the
+    resolution of the next one, and all tiles are tile_size x tile_size cells with
+    NaN padding beyond the surface's extent. Tile (0, 0) contains the surface's
+    origin, and tile x and y indices increase along the surface's X and Y axes."""
+
+    tile_size: int
+    levels: List[SurfaceTileLevelMeta]
+
+
+def calc_num_tile_levels(x_count: int, y_count: int, tile_size: int) -> int:
+    """Number of levels needed for the coarsest level to fit in a single tile"""
+    max_count = max(x_count, y_count, 1)
+    return max(math.ceil(math.log2(max_count / tile_size)), 0) + 1
+
+
+def downsample_factor_for_level(level: int, num_levels: int) -> int:
+    return 2 ** (num_levels - 1 - level)
+
+
+def create_tile_pyramid_meta(
+    x_count: int, y_count: int, x_inc: float, y_inc: float, tile_size: int
+) -> SurfaceTilePyramidMeta:
+    num_levels = calc_num_tile_levels(x_count, y_count, tile_size)
+    levels = []
+    for level in range(num_levels):
+        factor = downsample_factor_for_level(level, num_levels)
+        level_x_count = math.ceil(x_count / factor)
+        level_y_count = math.ceil(y_count / factor)
+        levels.append(
+            SurfaceTileLevelMeta(
+                x_count=level_x_count,
+                y_count=level_y_count,
+                x_inc=x_inc * factor,
+                y_inc=y_inc * factor,
+                x_tile_count=math.ceil(level_x_count / tile_size),
+                y_tile_count=math.ceil(level_y_count / tile_size),
+            )
+        )
+
+    return SurfaceTilePyramidMeta(tile_size=tile_size, levels=levels)
+
+
+def downsample_values(
+    values: np.ndarray, factor: int, method: DownsampleMethod
+) -> np.ndarray:
+    """Downsample a float32 array of shape (ncol, nrow), where undefined values are
+    NaN, by the given factor along both axes. Each output cell is made from the
+    block of factor x factor input cells that starts at its index times the factor.
+
+    With the MEAN method the output is the mean of the defined values in the block,
+    and NaN if none are defined. With the NEAREST method the output is the block's
+    first cell, which keeps discrete values intact.
+    """
+    if factor == 1:
+        return values
+
+    if method == DownsampleMethod.NEAREST:
+        return np.ascontiguousarray(values[::factor, ::factor])
+
+    ncol, nrow = values.shape
+    out_ncol = math.ceil(ncol / factor)
+    out_nrow = math.ceil(nrow / factor)
+    padded = np.full((out_ncol * factor, out_nrow * factor), np.nan, dtype=np.float32)
+    padded[:ncol, :nrow] = values
+    blocks = padded.reshape(out_ncol, factor, out_nrow, factor)
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "Mean of empty slice")
+        return np.nanmean(blocks, axis=(1, 3)).astype(np.float32)
+
+
+def extract_tile_as_float32_array(
+    level_values: np.ndarray, tile_x: int, tile_y: int, tile_size: int
+) -> io.BytesIO:
+    """Cut out one tile of a level's (ncol, nrow) values. The tile is laid out in the
+    same way as `surface_to_float32_array()`, with rows running along the X axis and
+    the first row at the top. Raises IndexError if the tile is outside the level."""
+    ncol, nrow = level_values.shape
+    col_start = tile_x * tile_size
+    row_start = tile_y * tile_size
+    if tile_x < 0 or tile_y < 0 or col_start >= ncol or row_start >= nrow:
+        raise IndexError(f"Tile ({tile_x}, {tile_y}) is outside the surface")
+
+    tile = np.full((tile_size, tile_size), np.nan, dtype=np.float32)
+    src_values = level_values[
+        col_start : col_start + tile_size, row_start : row_start + tile_size
+    ]
+    tile[: src_values.shape[0], : src_values.shape[1]] = src_values
+
+    byte_io = io.BytesIO()
+    byte_io.write(np.rot90(tile).tobytes())
+    byte_io.seek(0)
+    return byte_io
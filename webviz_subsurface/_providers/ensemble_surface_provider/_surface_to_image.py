@@ -1,10 +1,14 @@
 import io
 import logging
+import sys
+import threading
+from typing import Optional, Tuple
 
 import numpy as np
 import xtgeo
 from PIL import Image
 
+from webviz_subsurface._utils.enum_shim import StrEnum
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
 # !!!!!!!
@@ -142,3 +146,158 @@ def surface_to_png_bytes_optimized(surface: xtgeo.RegularSurface) -> bytes:
     LOGGER.debug(f"Total time: {timer.elapsed_s():.2f}s")
 
     return ret_bytes
+
+
+class SurfaceImageFormat(StrEnum):
+    PNG = "png"
+    WEBP = "webp"
+    QOI = "qoi"
+    RGBA = "rgba"
+
+
+class SurfaceImageEncoder:
+    """Encodes surface values to images where each node's value is scaled to a 24-bit
+    integer stored in the RGB channels, with alpha set to 0 for undefined nodes.
+
+    Unlike surface_to_png_bytes() and surface_to_png_bytes_optimized(), the RGBA
+    pixels are written directly into preallocated buffers that are reused between
+    calls, instead of allocating several temporary arrays per call. Each pixel is
+    packed as a single uint32 and the buffer is handed to PIL without copying.
+    The buffers are kept per thread, and grow as needed.
+    """
+
+    def __init__(self) -> None:
+        self._thread_local = threading.local()
+
+    def encode_surface(
+        self,
+        surface: xtgeo.RegularSurface,
+        image_format: SurfaceImageFormat = SurfaceImageFormat.PNG,
+    ) -> bytes:
+        # Flipped and transposed so that the first row in the image is the
+        # northernmost row of the surface. Note that this is just a view.
+        values = np.flip(surface.values.transpose(), axis=0)
+        return self.encode_image_values(values, image_format)
+
+    def encode_image_values(
+        self,
+        values: np.ndarray,
+        image_format: SurfaceImageFormat = SurfaceImageFormat.PNG,
+    ) -> bytes:
+        """Encode a 2d array of values that is already laid out as the image's rows.
+        Undefined values may be either masked or NaN."""
+        timer = PerfTimer()
+
+        rgba_arr = self.values_to_rgba_array(values)
+        LOGGER.debug(f"rgba pack: {timer.lap_s():.2f}s")
+
+        if image_format == SurfaceImageFormat.RGBA:
+            return rgba_arr.tobytes()
+
+        height, width = values.shape
+        image = Image.frombuffer("RGBA", (width, height), rgba_arr, "raw", "RGBA", 0, 1)
+
+        byte_io = io.BytesIO()
+        if image_format == SurfaceImageFormat.PNG:
+            # Huge speed benefit from reducing compression level
+            image.save(byte_io, format="png", compress_level=1)
+        elif image_format == SurfaceImageFormat.WEBP:
+            # Lossless and with the lowest effort, which is still considerably
+            # smaller than PNG. The RGB of transparent pixels must be kept exact.
+            image.save(byte_io, format="webp", lossless=True, quality=0, exact=True)
+        elif image_format == SurfaceImageFormat.QOI:
+            if not is_image_format_supported(image_format):
+                raise ValueError("The installed Pillow version can't write QOI")
+            image.save(byte_io, format="qoi")
+        else:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        LOGGER.debug(f"save {image_format} to bytes: {timer.lap_s():.2f}s")
+
+        return byte_io.getvalue()
+
+    def values_to_rgba_array(self, values: np.ndarray) -> np.ndarray:
+        """Returns a (height, width, 4) uint8 RGBA array, which is a view into this
+        thread's buffer and is only valid until the next call from the same thread."""
+        shape = values.shape
+        work_arr, undef_arr, packed_arr = self._get_buffers(values.size)
+        work_arr = work_arr.reshape(shape)
+        undef_arr = undef_arr.reshape(shape)
+        packed_arr = packed_arr.reshape(shape)
+        rgba_arr = packed_arr.view(np.uint8).reshape(shape[0], shape[1], 4)
+
+        np.copyto(work_arr, np.ma.getdata(values), casting="unsafe")
+        mask = np.ma.getmask(values)
+        if mask is not np.ma.nomask:
+            np.copyto(work_arr, np.nan, where=mask)
+        np.isnan(work_arr, out=undef_arr)
+
+        # fmin/fmax ignore NaN without allocating temporaries like nanmin() does
+        min_val = float(np.fmin.reduce(work_arr, axis=None))
+        max_val = float(np.fmax.reduce(work_arr, axis=None))
+        if np.isnan(min_val):
+            # All values are undefined
+            packed_arr.fill(0)
+            return rgba_arr
+
+        if max_val == min_val:
+            scale_factor = 1.0
+        else:
+            scale_factor = (256 * 256 * 256 - 1) / (max_val - min_val)
+
+        # Undefined nodes are set to min so that they end up as 0 after scaling
+        np.copyto(work_arr, min_val, where=undef_arr)
+        np.subtract(work_arr, min_val, out=work_arr)
+        np.multiply(work_arr, scale_factor, out=work_arr)
+
+        # Shift the 24-bit values up and put the alpha in the lowest byte. As a big
+        # endian uint32 the bytes are then laid out as R, G, B, A.
+        np.copyto(packed_arr, work_arr, casting="unsafe")
+        np.left_shift(packed_arr, 8, out=packed_arr)
+        np.bitwise_or(packed_arr, 0xFF, out=packed_arr)
+        np.copyto(packed_arr, 0, where=undef_arr)
+        if sys.byteorder == "little":
+            packed_arr.byteswap(inplace=True)
+
+        return rgba_arr
+
+    def _get_buffers(self, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        buffers: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = getattr(
+            self._thread_local, "buffers", None
+        )
+        if buffers is None or buffers[0].size < size:
+            buffers = (
+                np.empty(size, dtype=np.float64),
+                np.empty(size, dtype=np.bool_),
+                np.empty(size, dtype=np.uint32),
+            )
+            self._thread_local.buffers = buffers
+
+        return buffers[0][:size], buffers[1][:size], buffers[2][:size]
+
+
+def is_image_format_supported(image_format: SurfaceImageFormat) -> bool:
+    if image_format in (SurfaceImageFormat.PNG, SurfaceImageFormat.RGBA):
+        return True
+
+    Image.init()
+    return image_format.value.upper() in Image.SAVE
+
+
+_DEFAULT_ENCODER = SurfaceImageEncoder()
+
+
+def surface_to_image_bytes(
+    surface: xtgeo.RegularSurface,
+    image_format: SurfaceImageFormat = SurfaceImageFormat.PNG,
+) -> bytes:
+    """Encode the surface using a shared SurfaceImageEncoder"""
+    return _DEFAULT_ENCODER.encode_surface(surface, image_format)
+
+
+def image_values_to_image_bytes(
+    values: np.ndarray,
+    image_format: SurfaceImageFormat = SurfaceImageFormat.PNG,
+) -> bytes:
+    """Encode values that are already laid out as the image's rows using a shared
+    SurfaceImageEncoder"""
+    return _DEFAULT_ENCODER.encode_image_values(values, image_format)
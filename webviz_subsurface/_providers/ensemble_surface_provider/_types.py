@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 
+import numpy as np
+import xtgeo
+
 from .ensemble_surface_provider import SurfaceAddress
 
 
@@ -15,3 +18,41 @@ class QualifiedDiffSurfaceAddress:
     address_a: SurfaceAddress
     provider_id_b: str
     address_b: SurfaceAddress
+
+
+@dataclass(frozen=True)
+class SurfaceGeometry:
+    ncol: int
+    nrow: int
+    xori: float
+    yori: float
+    xinc: float
+    yinc: float
+    rotation: float
+    yflip: int
+
+    @staticmethod
+    def from_surface(surface: xtgeo.RegularSurface) -> "SurfaceGeometry":
+        return SurfaceGeometry(
+            ncol=int(surface.ncol),
+            nrow=int(surface.nrow),
+            xori=float(surface.xori),
+            yori=float(surface.yori),
+            xinc=float(surface.xinc),
+            yinc=float(surface.yinc),
+            rotation=float(surface.rotation),
+            yflip=int(surface.yflip),
+        )
+
+    def create_surface(self, values: np.ndarray) -> xtgeo.RegularSurface:
+        return xtgeo.RegularSurface(
+            ncol=self.ncol,
+            nrow=self.nrow,
+            xori=self.xori,
+            yori=self.yori,
+            xinc=self.xinc,
+            yinc=self.yinc,
+            rotation=self.rotation,
+            yflip=self.yflip,
+            values=np.ma.masked_invalid(values),
+        )
@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+import xtgeo
+
+from ._surface_loading import load_stacked_surface_values
+
+
+def _create_synthetic_surface_files(
+    surf_dir: Path, num_realizations: int, ncol: int, nrow: int
+) -> List[str]:
+    rng = np.random.default_rng(seed=1234)
+    surf_fns = []
+    for real in range(num_realizations):
+        values = np.ma.masked_array(rng.uniform(1000, 2000, size=(ncol, nrow)))
+        values[: ncol // 10, : nrow // 10] = np.ma.masked
+        surface = xtgeo.RegularSurface(
+            ncol=ncol, nrow=nrow, xinc=25.0, yinc=25.0, values=values
+        )
+        surf_fn = str(surf_dir / f"{real}--top--depth.gri")
+        surface.to_file(surf_fn)
+        surf_fns.append(surf_fn)
+
+    return surf_fns
+
+
+def _drop_from_page_cache(surf_fns: List[str]) -> bool:
+    """Try and evict the files from the OS page cache so that the next read is cold.
+    Only possible on platforms that support posix_fadvise()"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+
+    for surf_fn in surf_fns:
+        fd = os.open(surf_fn, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+    return True
+
+
+def _time_ms(func: Callable[[], object]) -> float:
+    start_tim = time.perf_counter()
+    func()
+    return 1000 * (time.perf_counter() - start_tim)
+
+
+def _run_loading_perf_test(surf_fns: List[str]) -> None:
+    print("## ------------------")
+    print(f"## entering _run_loading_perf_test({len(surf_fns)} realizations) ...")
+
+    def load_xtgeo() -> None:
+        xtgeo.Surfaces(surf_fns)
+
+    def load_threaded() -> None:
+        assert load_stacked_surface_values(surf_fns) is not None
+
+    for label, load_func in [
+        ("xtgeo.Surfaces", load_xtgeo),
+        ("threaded", load_threaded),
+    ]:
+        can_drop = _drop_from_page_cache(surf_fns)
+        cold_time_ms = _time_ms(load_func)
+        warm_time_ms = _time_ms(load_func)
+        cold_label = "cold" if can_drop else "cold (page cache not dropped)"
+        print(f"## {label}, {cold_label}, time (ms):", cold_time_ms)
+        print(f"## {label}, warm, time (ms):", warm_time_ms)
+
+    print("## ------------------")
+
+
+def main() -> None:
+    print()
+    print("## Running surface loading performance tests")
+    print("## =========================================")
+
+    # Optionally pass a directory on the file system of interest, e.g. a network share
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else None
+
+    ncol = 500
+    nrow = 400
+
+    print()
+    print("## surface dimensions:", ncol, nrow)
+
+    for num_realizations in [100, 300, 1000]:
+        with tempfile.TemporaryDirectory(dir=base_dir) as surf_dir:
+            surf_fns = _create_synthetic_surface_files(
+                Path(surf_dir), num_realizations, ncol, nrow
+            )
+            _run_loading_perf_test(surf_fns)
+
+    print("## done")
+
+
+# Running:
+#   python -m \
+#     webviz_subsurface._providers.ensemble_surface_provider.dev_surface_loading_perf_testing \
+#     [base_dir]
+# -------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
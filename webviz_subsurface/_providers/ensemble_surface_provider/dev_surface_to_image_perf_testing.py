@@ -0,0 +1,107 @@
+import functools
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+import xtgeo
+
+from webviz_subsurface._datainput.image_processing import array2d_to_png
+
+from ._surface_to_image import (
+    SurfaceImageEncoder,
+    SurfaceImageFormat,
+    is_image_format_supported,
+    surface_to_png_bytes,
+    surface_to_png_bytes_optimized,
+)
+
+_NUM_RUNS = 3
+
+
+def _create_synthetic_surface(ncol: int, nrow: int) -> xtgeo.RegularSurface:
+    rng = np.random.default_rng(seed=1234)
+    x_arr = np.linspace(0, 8 * np.pi, ncol)[:, np.newaxis]
+    y_arr = np.linspace(0, 6 * np.pi, nrow)[np.newaxis, :]
+    values = 1500 + 100 * np.sin(x_arr) * np.cos(y_arr)
+    values += rng.normal(0, 1, size=(ncol, nrow))
+
+    values_ma = np.ma.masked_array(values)
+    values_ma[: ncol // 10, : nrow // 10] = np.ma.masked
+
+    return xtgeo.RegularSurface(
+        ncol=ncol, nrow=nrow, xinc=25.0, yinc=25.0, values=values_ma
+    )
+
+
+def _time_best_of_ms(func: Callable[[], bytes]) -> Tuple[float, int]:
+    best_time_ms = float("inf")
+    num_bytes = 0
+    for _ in range(_NUM_RUNS):
+        start_tim = time.perf_counter()
+        num_bytes = len(func())
+        best_time_ms = min(best_time_ms, 1000 * (time.perf_counter() - start_tim))
+
+    return best_time_ms, num_bytes
+
+
+def _run_encoder_perf_test(ncol: int, nrow: int) -> None:
+    print("## ------------------")
+    print(f"## entering _run_encoder_perf_test({ncol}x{nrow}) ...")
+
+    surface = _create_synthetic_surface(ncol, nrow)
+    encoder = SurfaceImageEncoder()
+
+    def legacy_leaflet() -> bytes:
+        # Includes the same flip and scaling as SurfaceLeafletModel used to do
+        values = np.flip(surface.values.filled(np.nan).transpose(), axis=0)
+        min_val = np.nanmin(values)
+        max_val = np.nanmax(values)
+        scaled = (values - min_val) * (256 * 256 * 256 - 1) / (max_val - min_val)
+        return array2d_to_png(scaled).encode()
+
+    encoders: List[Tuple[str, Callable[[], bytes]]] = [
+        ("array2d_to_png", legacy_leaflet),
+        # surface_to_png_bytes() modifies the surface, so give it a copy
+        ("surface_to_png_bytes", lambda: surface_to_png_bytes(surface.copy())),
+        (
+            "surface_to_png_bytes_optimized",
+            lambda: surface_to_png_bytes_optimized(surface),
+        ),
+    ]
+    for image_format in SurfaceImageFormat:
+        if not is_image_format_supported(image_format):
+            print(f"## SurfaceImageEncoder {image_format}: not supported, skipping")
+            continue
+        encoders.append(
+            (
+                f"SurfaceImageEncoder {image_format}",
+                functools.partial(encoder.encode_surface, surface, image_format),
+            )
+        )
+
+    for label, encode_func in encoders:
+        time_ms, num_bytes = _time_best_of_ms(encode_func)
+        print(
+            f"## {label}: time (ms): {time_ms:.1f}, "
+            f"size (MB): {num_bytes / (1024 * 1024):.2f}"
+        )
+
+    print("## ------------------")
+
+
+def main() -> None:
+    print()
+    print("## Running surface to image performance tests")
+    print("## ==========================================")
+
+    for ncol, nrow in [(1000, 1000), (4000, 4000)]:
+        _run_encoder_perf_test(ncol, nrow)
+
+    print("## done")
+
+
+# Running:
+# python -m webviz_subsurface._providers.ensemble_surface_provider.dev_surface_to_image_perf_testing
+# -------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import hashlib
 import logging
 import os
+import tempfile
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from webviz_config.webviz_factory import WebvizFactory
 from webviz_config.webviz_factory_registry import WEBVIZ_FACTORY_REGISTRY
@@ -11,6 +12,11 @@ from webviz_config.webviz_instance_info import WebvizRunMode
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
 from ._provider_impl_file import ProviderImplFile
+from ._stat_surf_cache import StatSurfCache
+from ._streaming_surface_statistics import (
+    DEFAULT_PERCENTILE_TOLERANCE,
+    StreamingStatisticsOptions,
+)
 from ._surface_discovery import (
     discover_observed_surface_files,
     discover_per_realization_surface_files,
@@ -19,6 +25,16 @@ from .ensemble_surface_provider import EnsembleSurfaceProvider
 
 LOGGER = logging.getLogger(__name__)
 
+# Disk budget for the cache of statistical surfaces that is enabled for portable
+# apps, shared by all the providers created by the factory, and by all processes
+# using the same storage
+_PORTABLE_STAT_SURF_CACHE_MAX_SIZE_MB = 1024
+
+# Statistical surfaces whose stacked realizations would need more memory than this
+# are calculated by streaming over the realizations, trading exact percentiles for
+# not running out of memory on large ensembles
+_STREAMING_STAT_SURF_THRESHOLD_MB = 2048
+
 
 class EnsembleSurfaceProviderFactory(WebvizFactory):
     def __init__(
@@ -26,13 +42,52 @@ class EnsembleSurfaceProviderFactory(WebvizFactory):
         root_storage_folder: Path,
         allow_storage_writes: bool,
         avoid_copying_surfaces: bool,
+        create_stacked_surface_cubes: bool = False,
+        stat_surf_cache_max_size_mb: int = 0,
+        streaming_stat_surf_threshold_mb: Optional[int] = None,
+        streaming_stat_surf_percentile_tolerance: float = DEFAULT_PERCENTILE_TOLERANCE,
     ) -> None:
+        """If create_stacked_surface_cubes is True, the realizations of each simulated
+        surface are stacked into a memory mapped cube when the backing store is
+        created. Statistical surfaces are then calculated directly from the cubes.
+
+        The `stat_surf_cache_max_size_mb` parameter sets the disk budget for the cache
+        of computed statistical surfaces, which is disabled by default. The cache is
+        placed in the system's temp directory so that it is shared by all processes on
+        the machine that use the same storage folder. Since the cache is keyed on the
+        storage folder, it should only be enabled when the storage folder is reused
+        between runs, which is the case for portable apps.
+
+        If `streaming_stat_surf_threshold_mb` is specified, statistical surfaces whose
+        stacked realizations would need more memory than this are calculated by
+        streaming over the realization surfaces instead, keeping memory use constant
+        in the number of realizations. Percentiles are then approximated to within
+        `streaming_stat_surf_percentile_tolerance` times each node's value range.
+        """
         self._storage_dir = Path(root_storage_folder) / __name__
         self._allow_storage_writes = allow_storage_writes
         self._avoid_copying_surfaces = avoid_copying_surfaces
+        self._create_stacked_surface_cubes = create_stacked_surface_cubes
+
+        self._stat_surf_cache: Optional[StatSurfCache] = None
+        if stat_surf_cache_max_size_mb > 0:
+            storage_dir_hash = _make_hash_string(str(self._storage_dir.resolve()))
+            self._stat_surf_cache = StatSurfCache(
+                cache_dir=Path(tempfile.gettempdir())
+                / f"webviz_stat_surf_cache__{storage_dir_hash}",
+                max_size_bytes=stat_surf_cache_max_size_mb * 1024 * 1024,
+            )
+
+        self._streaming_stats_options: Optional[StreamingStatisticsOptions] = None
+        if streaming_stat_surf_threshold_mb is not None:
+            self._streaming_stats_options = StreamingStatisticsOptions(
+                min_stacked_size_bytes=streaming_stat_surf_threshold_mb * 1024 * 1024,
+                percentile_tolerance=streaming_stat_surf_percentile_tolerance,
+            )
 
         LOGGER.info(
-            f"EnsembleSurfaceProviderFactory init: storage_dir={self._storage_dir}"
+            f"EnsembleSurfaceProviderFactory init: storage_dir={self._storage_dir}, "
+            f"stat_surf_cache_max_size_mb={stat_surf_cache_max_size_mb}"
         )
 
         if self._allow_storage_writes:
@@ -48,11 +103,29 @@ class EnsembleSurfaceProviderFactory(WebvizFactory):
             storage_folder = app_instance_info.storage_folder
             allow_writes = app_instance_info.run_mode != WebvizRunMode.PORTABLE
             dont_copy_surfs = app_instance_info.run_mode == WebvizRunMode.NON_PORTABLE
+            # Stacking reads every surface once, which is only worth it up front when
+            # building a portable app. The portable app itself must use the same
+            # setting to find the backing store that was written with the cubes.
+            create_stacked_surface_cubes = app_instance_info.run_mode in (
+                WebvizRunMode.BUILDING_PORTABLE,
+                WebvizRunMode.PORTABLE,
+            )
+
+            # Non-portable runs get a fresh storage folder each time, which would leave
+            # behind an orphaned statistical surface cache on every run
+            stat_surf_cache_max_size_mb = (
+                _PORTABLE_STAT_SURF_CACHE_MAX_SIZE_MB
+                if app_instance_info.run_mode == WebvizRunMode.PORTABLE
+                else 0
+            )
 
             factory = EnsembleSurfaceProviderFactory(
                 root_storage_folder=storage_folder,
                 allow_storage_writes=allow_writes,
                 avoid_copying_surfaces=dont_copy_surfs,
+                create_stacked_surface_cubes=create_stacked_surface_cubes,
+                stat_surf_cache_max_size_mb=stat_surf_cache_max_size_mb,
+                streaming_stat_surf_threshold_mb=_STREAMING_STAT_SURF_THRESHOLD_MB,
             )
 
             # Store the factory object in the global factory registry
@@ -76,7 +149,14 @@ class EnsembleSurfaceProviderFactory(WebvizFactory):
             )
         )
         storage_key = f"ens__{_make_hash_string(string_to_hash)}"
-        provider = ProviderImplFile.from_backing_store(self._storage_dir, storage_key)
+        if self._create_stacked_surface_cubes:
+            storage_key += "__cubes"
+        provider = ProviderImplFile.from_backing_store(
+            self._storage_dir,
+            storage_key,
+            self._stat_surf_cache,
+            self._streaming_stats_options,
+        )
         if provider:
             LOGGER.info(
                 f"Loaded surface provider from backing store in {timer.elapsed_s():.2f}s ("
@@ -105,10 +185,16 @@ class EnsembleSurfaceProviderFactory(WebvizFactory):
             sim_surfaces=sim_surface_files,
             obs_surfaces=obs_surface_files,
             avoid_copying_surfaces=self._avoid_copying_surfaces,
+            create_stacked_cubes=self._create_stacked_surface_cubes,
         )
         et_write_s = timer.lap_s()
 
-        provider = ProviderImplFile.from_backing_store(self._storage_dir, storage_key)
+        provider = ProviderImplFile.from_backing_store(
+            self._storage_dir,
+            storage_key,
+            self._stat_surf_cache,
+            self._streaming_stats_options,
+        )
         if not provider:
             raise ValueError(f"Failed to load/create surface provider for {ens_path}")
 
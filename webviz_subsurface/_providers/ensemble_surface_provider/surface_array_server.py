@@ -3,21 +3,46 @@ import io
 import json
 import logging
 import math
-import tempfile
 from dataclasses import asdict, dataclass
-from typing import List, Optional, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
 from urllib.parse import quote
 
 import flask
-import flask_caching
+import numpy as np
 import xtgeo
 from dash import Dash
 
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
+from ._lazy_surface_resolver import (
+    LazySurfaceResolver,
+    decode_qualified_address,
+    encode_qualified_address,
+)
+from ._surface_array_encoding import (
+    ArrayValueEncoding,
+    ContentEncoding,
+    encode_array_payload,
+    negotiate_content_encoding,
+)
+from ._surface_blob_store import (
+    BlobStoreMetrics,
+    SurfaceBlobStore,
+    default_surface_blob_store,
+)
+from ._surface_tile_pyramid import (
+    DownsampleMethod,
+    SurfaceTilePyramidMeta,
+    calc_num_tile_levels,
+    create_tile_pyramid_meta,
+    downsample_factor_for_level,
+    downsample_values,
+    extract_tile_as_float32_array,
+)
 from ._surface_to_float32_array import surface_to_float32_array
 from ._types import QualifiedDiffSurfaceAddress, QualifiedSurfaceAddress
 from .ensemble_surface_provider import (
+    EnsembleSurfaceProvider,
     ObservedSurfaceAddress,
     SimulatedSurfaceAddress,
     StatisticalSurfaceAddress,
@@ -30,6 +55,9 @@ _ROOT_URL_PATH = "/SurfaceArrayServer"
 
 _SURFACE_SERVER_INSTANCE: Optional["SurfaceArrayServer"] = None
 
+# Size in cells of the square tiles served by the tile endpoint
+DEFAULT_TILE_SIZE = 256
+
 
 @dataclass(frozen=True)
 class SurfaceArrayMeta:
@@ -46,20 +74,24 @@ class SurfaceArrayMeta:
     y_count: int
     x_inc: float
     y_inc: float
+    # Digest of the published array, which identifies the surface's content
+    digest: str
 
 
 class SurfaceArrayServer:
-    def __init__(self, app: Dash) -> None:
-        cache_dir = tempfile.mkdtemp()
-        LOGGER.debug(f"Setting up file cache in: {cache_dir}")
-        self._array_cache = flask_caching.Cache(
-            config={
-                "CACHE_TYPE": "FileSystemCache",
-                "CACHE_DIR": cache_dir,
-                "CACHE_DEFAULT_TIMEOUT": 0,
-            }
+    def __init__(
+        self,
+        app: Dash,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        blob_store: Optional[SurfaceBlobStore] = None,
+    ) -> None:
+        """If no blob store is given, the default store that is shared by all
+        processes serving the app is used"""
+        self._blob_store = (
+            blob_store if blob_store is not None else default_surface_blob_store()
         )
-        self._array_cache.init_app(app.server)
+        self._tile_size = tile_size
+        self._lazy_resolver = LazySurfaceResolver()
 
         self._setup_url_rule(app)
 
@@ -80,17 +112,7 @@ class SurfaceArrayServer:
     ) -> None:
         timer = PerfTimer()
 
-        if isinstance(qualified_address, QualifiedSurfaceAddress):
-            base_cache_key = _address_to_str(
-                qualified_address.provider_id, qualified_address.address
-            )
-        else:
-            base_cache_key = _diff_address_to_str(
-                qualified_address.provider_id_a,
-                qualified_address.address_a,
-                qualified_address.provider_id_b,
-                qualified_address.address_b,
-            )
+        base_cache_key = _qualified_address_to_str(qualified_address)
 
         LOGGER.debug(
             f"Publishing surface (dim={surface.dimensions}, #cells={surface.ncol*surface.nrow}), "
@@ -105,48 +127,84 @@ class SurfaceArrayServer:
         self,
         qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
     ) -> Optional[SurfaceArrayMeta]:
-        if isinstance(qualified_address, QualifiedSurfaceAddress):
-            base_cache_key = _address_to_str(
-                qualified_address.provider_id, qualified_address.address
-            )
-        else:
-            base_cache_key = _diff_address_to_str(
-                qualified_address.provider_id_a,
-                qualified_address.address_a,
-                qualified_address.provider_id_b,
-                qualified_address.address_b,
-            )
+        base_cache_key = _qualified_address_to_str(qualified_address)
 
-        meta_cache_key = "META:" + base_cache_key
-        meta = self._array_cache.get(meta_cache_key)
-        if not meta:
-            return None
+        return self._get_meta(base_cache_key)
 
-        if not isinstance(meta, SurfaceArrayMeta):
-            LOGGER.error("Error loading SurfaceArrayMeta from cache")
-            return None
+    def blob_store_metrics(self) -> BlobStoreMetrics:
+        return self._blob_store.metrics()
 
-        return meta
+    def add_provider(self, provider: EnsembleSurfaceProvider) -> None:
+        """Make the provider's surfaces available through lazy URLs"""
+        self._lazy_resolver.add_provider(provider)
+
+    def get_or_create_surface_metadata(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> Optional[SurfaceArrayMeta]:
+        """Returns metadata for the surface, computing and publishing the surface
+        first if needed. The surface's provider(s) must have been added."""
+        base_cache_key = _qualified_address_to_str(qualified_address)
+        return self._lazy_resolver.get_or_create(
+            base_cache_key,
+            lambda: self._get_meta(base_cache_key),
+            lambda: (
+                self._get_meta(base_cache_key)
+                if self._compute_and_publish_surface(qualified_address)
+                else None
+            ),
+        )
 
     @staticmethod
-    def encode_partial_url(
+    def encode_partial_lazy_url(
         qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
     ) -> str:
-        if isinstance(qualified_address, QualifiedSurfaceAddress):
-            address_str = _address_to_str(
-                qualified_address.provider_id, qualified_address.address
-            )
-        else:
-            address_str = _diff_address_to_str(
-                qualified_address.provider_id_a,
-                qualified_address.address_a,
-                qualified_address.provider_id_b,
-                qualified_address.address_b,
-            )
+        """Returns URL that encodes the fully qualified address, so that the surface
+        can be computed when requested if it hasn't been published, or if it has been
+        evicted. The surface's provider(s) must have been added."""
+        encoded_address = encode_qualified_address(qualified_address)
+        return f"{_ROOT_URL_PATH}/lazy/{encoded_address}"
 
+    @staticmethod
+    def encode_partial_url(
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+        version: Optional[str] = None,
+    ) -> str:
+        """If the surface's digest is given as `version`, the URL identifies the exact
+        content and responses to it may be cached by the browser indefinitely"""
+        address_str = _qualified_address_to_str(qualified_address)
         url_path: str = f"{_ROOT_URL_PATH}/{quote(address_str)}"
+        if version is not None:
+            url_path += f"?v={version}"
         return url_path
 
+    @staticmethod
+    def encode_partial_tile_url_template(
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+        method: DownsampleMethod = DownsampleMethod.MEAN,
+        version: Optional[str] = None,
+    ) -> str:
+        """Returns URL template for the surface's tiles, with {z}, {x} and {y}
+        placeholders for the level and tile indices"""
+        address_str = _qualified_address_to_str(qualified_address)
+        url_path = f"{_ROOT_URL_PATH}/{quote(address_str)}"
+        url_template = f"{url_path}/tiles/{{z}}/{{x}}/{{y}}?method={method}"
+        if version is not None:
+            url_template += f"&v={version}"
+        return url_template
+
+    def get_surface_tile_pyramid_metadata(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> Optional[SurfaceTilePyramidMeta]:
+        meta = self.get_surface_metadata(qualified_address)
+        if not meta:
+            return None
+
+        return create_tile_pyramid_meta(
+            meta.x_count, meta.y_count, meta.x_inc, meta.y_inc, self._tile_size
+        )
+
     def _setup_url_rule(self, app: Dash) -> None:
         @app.server.route(_ROOT_URL_PATH + "/<full_surf_address_str>")
         def _handle_surface_array_request(full_surf_address_str: str) -> flask.Response:
@@ -158,23 +216,289 @@ class SurfaceArrayServer:
             timer = PerfTimer()
 
             array_cache_key = "ARRAY:" + full_surf_address_str
-            LOGGER.debug(f"Looking for array in cache (key={array_cache_key}")
+            meta = self._get_meta(full_surf_address_str)
+            if meta is None or not self._blob_store.contains(array_cache_key):
+                LOGGER.error(f"No surface published for: {full_surf_address_str}")
+                flask.abort(404)
+
+            def get_array_bytes() -> bytes:
+                LOGGER.debug(f"Looking for array in cache (key={array_cache_key}")
+
+                cached_array_bytes = self._blob_store.get(array_cache_key)
+                if not cached_array_bytes:
+                    LOGGER.error(
+                        f"Error getting array for address: {full_surf_address_str}"
+                    )
+                    flask.abort(404)
+                return cached_array_bytes
+
+            response = self._make_array_response(meta, "ARRAY", get_array_bytes)
+            LOGGER.debug(
+                f"Request handled from array cache in: {timer.elapsed_s():.2f}s"
+            )
+            return response
+
+        @app.server.route(_ROOT_URL_PATH + "/lazy/<encoded_address>")
+        def _handle_lazy_surface_array_request(encoded_address: str) -> flask.Response:
+            timer = PerfTimer()
+
+            try:
+                qualified_address = decode_qualified_address(encoded_address)
+            except ValueError:
+                LOGGER.error(f"Error decoding surface address: {encoded_address}")
+                flask.abort(400)
+
+            # Publishes the surface if needed, so that we know the digest of its
+            # content before answering conditional requests
+            meta = self.get_or_create_surface_metadata(qualified_address)
+            if meta is None:
+                flask.abort(404)
+
+            def get_array_bytes() -> bytes:
+                array_bytes = self._get_or_publish_array_bytes(qualified_address)
+                if not array_bytes:
+                    flask.abort(404)
+                return array_bytes
+
+            response = self._make_array_response(meta, "ARRAY", get_array_bytes)
+            LOGGER.debug(f"Lazy request handled in: {timer.elapsed_s():.2f}s")
+            return response
+
+        @app.server.route(
+            _ROOT_URL_PATH
+            + "/<full_surf_address_str>/tiles/<int:level>/<int:tile_x>/<int:tile_y>"
+        )
+        def _handle_surface_tile_request(
+            full_surf_address_str: str, level: int, tile_x: int, tile_y: int
+        ) -> flask.Response:
+            timer = PerfTimer()
 
-            cached_array_bytes = self._array_cache.get(array_cache_key)
-            if not cached_array_bytes:
-                LOGGER.error(
-                    f"Error getting array for address: {full_surf_address_str}"
+            try:
+                method = DownsampleMethod(
+                    flask.request.args.get("method", DownsampleMethod.MEAN)
                 )
+            except ValueError:
+                flask.abort(400)
+
+            tile_variant = f"TILE:{level}/{tile_x}/{tile_y}/{method}"
+
+            meta = self._get_meta(full_surf_address_str)
+            if meta is None:
+                LOGGER.error(f"No surface published for: {full_surf_address_str}")
                 flask.abort(404)
 
-            response = flask.send_file(
-                cached_array_bytes, mimetype="application/octet-stream"
-            )
+            # Key the tiles on the content, so that they follow republished surfaces
+            tile_cache_key = f"{tile_variant}:{meta.digest}"
+            if not (
+                self._blob_store.contains(tile_cache_key)
+                or self._blob_store.contains("ARRAY:" + full_surf_address_str)
+            ):
+                flask.abort(404)
+
+            def get_tile_bytes() -> bytes:
+                tile_bytes = self._blob_store.get(tile_cache_key)
+                if tile_bytes:
+                    return tile_bytes
+
+                level_values = self._get_tile_level_values(
+                    full_surf_address_str, level, method
+                )
+                if level_values is None:
+                    LOGGER.error(
+                        f"Error getting tile level {level} for address: "
+                        f"{full_surf_address_str}"
+                    )
+                    flask.abort(404)
+
+                try:
+                    tile_bytes = extract_tile_as_float32_array(
+                        level_values, tile_x, tile_y, self._tile_size
+                    ).getvalue()
+                except IndexError:
+                    flask.abort(404)
+
+                self._blob_store.put(tile_cache_key, tile_bytes)
+                return tile_bytes
+
+            response = self._make_array_response(meta, tile_variant, get_tile_bytes)
             LOGGER.debug(
-                f"Request handled from array cache in: {timer.elapsed_s():.2f}s"
+                f"Tile request handled in: {timer.elapsed_s():.2f}s "
+                f"[level={level}, tile_x={tile_x}, tile_y={tile_y}, method={method}]"
             )
             return response
 
+    def _get_or_publish_array_bytes(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> Optional[bytes]:
+        base_cache_key = _qualified_address_to_str(qualified_address)
+        array_cache_key = "ARRAY:" + base_cache_key
+        return self._lazy_resolver.get_or_create(
+            base_cache_key,
+            lambda: self._blob_store.get(array_cache_key),
+            lambda: (
+                self._blob_store.get(array_cache_key)
+                if self._compute_and_publish_surface(qualified_address)
+                else None
+            ),
+        )
+
+    def _compute_and_publish_surface(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> bool:
+        timer = PerfTimer()
+
+        surface = self._lazy_resolver.compute_surface(qualified_address)
+        if surface is None:
+            LOGGER.error(f"Error computing surface for address: {qualified_address}")
+            return False
+        et_compute_s = timer.lap_s()
+
+        self.publish_surface(qualified_address, surface)
+
+        LOGGER.debug(
+            f"Computed and published surface on request in: {timer.elapsed_s():.2f}s "
+            f"(compute={et_compute_s:.2f}s)"
+        )
+        return True
+
+    def _make_array_response(
+        self,
+        meta: SurfaceArrayMeta,
+        variant: str,
+        get_float32_bytes: Callable[[], bytes],
+    ) -> flask.Response:
+        """Returns response with the float32 array given by `get_float32_bytes`,
+        encoded as requested by the `encoding` and `shuffle` query arguments, and
+        compressed with the preferred content encoding that the client accepts.
+
+        The strong ETag is derived from the digest of the surface's content and the
+        exact representation, so conditional requests are answered with 304 before
+        any array is loaded or encoded. Callers must make sure that the surface is
+        available before calling this. Only URLs that carry the digest as the `v`
+        query argument identify fixed content, so only those responses are marked
+        as immutable, while others must be revalidated.
+        """
+        try:
+            value_encoding = ArrayValueEncoding(
+                flask.request.args.get("encoding", ArrayValueEncoding.FLOAT32)
+            )
+        except ValueError:
+            flask.abort(400)
+        byte_shuffle = flask.request.args.get("shuffle", "").lower() in ("1", "true")
+        content_encoding = negotiate_content_encoding(
+            [enc for enc, quality in flask.request.accept_encodings if quality > 0]
+        )
+
+        representation_key = (
+            f"{variant}/{value_encoding}/{int(byte_shuffle)}/{content_encoding}:"
+            f"{meta.digest}"
+        )
+        etag = hashlib.md5(representation_key.encode()).hexdigest()  # nosec
+
+        headers = {
+            "Vary": "Accept-Encoding",
+            "Cache-Control": (
+                "public, max-age=31536000, immutable"
+                if flask.request.args.get("v") == meta.digest
+                else "no-cache"
+            ),
+        }
+
+        if flask.request.if_none_match.contains(etag):
+            response = flask.Response(status=304, headers=headers)
+            response.set_etag(etag)
+            return response
+
+        headers["X-Value-Encoding"] = value_encoding
+        headers["X-Byte-Shuffle"] = "true" if byte_shuffle else "false"
+
+        # The quantized values are scaled by the value range of the whole surface
+        val_min: Optional[float] = None
+        val_max: Optional[float] = None
+        if value_encoding == ArrayValueEncoding.UINT16:
+            val_min = float(meta.val_min)
+            val_max = float(meta.val_max)
+            headers["X-Value-Min"] = str(val_min)
+            headers["X-Value-Max"] = str(val_max)
+
+        encoded_cache_key = "ENCODED:" + representation_key
+        payload = self._blob_store.get(encoded_cache_key)
+        if payload is None:
+            float32_values = np.frombuffer(get_float32_bytes(), dtype=np.float32)
+            payload = encode_array_payload(
+                float32_values,
+                value_encoding,
+                byte_shuffle,
+                content_encoding,
+                val_min=val_min,
+                val_max=val_max,
+            )
+            self._blob_store.put(encoded_cache_key, payload)
+        if content_encoding != ContentEncoding.IDENTITY:
+            headers["Content-Encoding"] = content_encoding
+
+        response = flask.Response(
+            payload, mimetype="application/octet-stream", headers=headers
+        )
+        response.set_etag(etag)
+        return response
+
+    def _get_tile_level_values(
+        self, base_cache_key: str, level: int, method: DownsampleMethod
+    ) -> Optional[np.ndarray]:
+        """Returns the (ncol, nrow) float32 values of one level of the tile pyramid,
+        downsampling and caching them from the published full resolution array"""
+        meta = self._get_meta(base_cache_key)
+        if meta is None:
+            return None
+
+        num_levels = calc_num_tile_levels(meta.x_count, meta.y_count, self._tile_size)
+        if level < 0 or level >= num_levels:
+            return None
+
+        factor = downsample_factor_for_level(level, num_levels)
+        level_shape = (
+            math.ceil(meta.x_count / factor),
+            math.ceil(meta.y_count / factor),
+        )
+
+        level_cache_key = f"LEVEL:{level}/{method}:{meta.digest}"
+        level_bytes = self._blob_store.get(level_cache_key)
+        if level_bytes is not None:
+            return np.frombuffer(level_bytes, dtype=np.float32).reshape(level_shape)
+
+        array_bytes = self._blob_store.get("ARRAY:" + base_cache_key)
+        if not array_bytes or _calc_digest(array_bytes) != meta.digest:
+            # The surface has been evicted, or republished since we read the metadata
+            return None
+
+        # Undo the rotation done by surface_to_float32_array()
+        full_values = np.rot90(
+            np.frombuffer(array_bytes, dtype=np.float32).reshape(
+                meta.y_count, meta.x_count
+            ),
+            k=-1,
+        )
+        level_values = np.ascontiguousarray(
+            downsample_values(full_values, factor, method)
+        )
+        self._blob_store.put(level_cache_key, level_values.tobytes())
+
+        return level_values
+
+    def _get_meta(self, base_cache_key: str) -> Optional[SurfaceArrayMeta]:
+        meta_bytes = self._blob_store.get("META:" + base_cache_key)
+        if not meta_bytes:
+            return None
+
+        try:
+            return SurfaceArrayMeta(**json.loads(meta_bytes))
+        except (ValueError, TypeError):
+            LOGGER.error("Error loading SurfaceArrayMeta from blob store")
+            return None
+
     def _create_and_store_array_in_cache(
         self,
         base_cache_key: str,
@@ -189,7 +513,8 @@ class SurfaceArrayServer:
         array_cache_key = "ARRAY:" + base_cache_key
         meta_cache_key = "META:" + base_cache_key
 
-        self._array_cache.add(array_cache_key, array_bytes)
+        array_bytes_value = array_bytes.getvalue()
+        self._blob_store.put(array_cache_key, array_bytes_value)
 
         meta = SurfaceArrayMeta(
             x_min=surface.xmin,
@@ -200,13 +525,14 @@ class SurfaceArrayServer:
             y_ori=surface.yori,
             x_count=surface.ncol,
             y_count=surface.nrow,
-            val_min=surface.values.min(),
-            val_max=surface.values.max(),
+            val_min=float(surface.values.min()),
+            val_max=float(surface.values.max()),
             rot_deg=surface.rotation,
             x_inc=surface.xinc,
             y_inc=surface.yinc,
+            digest=_calc_digest(array_bytes_value),
         )
-        self._array_cache.add(meta_cache_key, meta)
+        self._blob_store.put(meta_cache_key, json.dumps(asdict(meta)).encode())
         et_write_cache_s = timer.lap_s()
 
         LOGGER.debug(
@@ -216,6 +542,10 @@ class SurfaceArrayServer:
         )
 
 
+def _calc_digest(array_bytes: bytes) -> str:
+    return hashlib.md5(array_bytes).hexdigest()  # nosec
+
+
 def _address_to_str(
     provider_id: str,
     address: SurfaceAddress,
@@ -234,6 +564,20 @@ def _address_to_str(
     return f"{provider_id}___{addr_type_str}___{address.name}___{address.attribute}___{addr_hash}"
 
 
+def _qualified_address_to_str(
+    qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+) -> str:
+    if isinstance(qualified_address, QualifiedSurfaceAddress):
+        return _address_to_str(qualified_address.provider_id, qualified_address.address)
+
+    return _diff_address_to_str(
+        qualified_address.provider_id_a,
+        qualified_address.address_a,
+        qualified_address.provider_id_b,
+        qualified_address.address_b,
+    )
+
+
 def _diff_address_to_str(
     provider_id_a: str,
     address_a: SurfaceAddress,
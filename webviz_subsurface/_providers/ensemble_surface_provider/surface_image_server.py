@@ -3,21 +3,30 @@ import io
 import json
 import logging
 import math
-import tempfile
 from dataclasses import asdict, dataclass
-from typing import Any, List, Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
 from urllib.parse import quote
 
 import flask
-import flask_caching
 import xtgeo
 from dash import Dash
 
 from webviz_subsurface._utils.perf_timer import PerfTimer
 
-from ._surface_to_image import surface_to_png_bytes_optimized
+from ._lazy_surface_resolver import (
+    LazySurfaceResolver,
+    decode_qualified_address,
+    encode_qualified_address,
+)
+from ._surface_blob_store import (
+    BlobStoreMetrics,
+    SurfaceBlobStore,
+    default_surface_blob_store,
+)
+from ._surface_to_image import surface_to_image_bytes
 from ._types import QualifiedDiffSurfaceAddress, QualifiedSurfaceAddress
 from .ensemble_surface_provider import (
+    EnsembleSurfaceProvider,
     ObservedSurfaceAddress,
     SimulatedSurfaceAddress,
     StatisticalSurfaceAddress,
@@ -44,17 +53,15 @@ class SurfaceImageMeta:
 
 
 class SurfaceImageServer:
-    def __init__(self, app: Dash) -> None:
-        cache_dir = tempfile.mkdtemp()
-        LOGGER.debug(f"Setting up file cache in: {cache_dir}")
-        self._image_cache = flask_caching.Cache(
-            config={
-                "CACHE_TYPE": "FileSystemCache",
-                "CACHE_DIR": cache_dir,
-                "CACHE_DEFAULT_TIMEOUT": 0,
-            }
+    def __init__(
+        self, app: Dash, blob_store: Optional[SurfaceBlobStore] = None
+    ) -> None:
+        """If no blob store is given, the default store that is shared by all
+        processes serving the app is used"""
+        self._blob_store = (
+            blob_store if blob_store is not None else default_surface_blob_store()
         )
-        self._image_cache.init_app(app.server)
+        self._lazy_resolver = LazySurfaceResolver()
 
         self._setup_url_rule(app)
 
@@ -75,17 +82,7 @@ class SurfaceImageServer:
     ) -> None:
         timer = PerfTimer()
 
-        if isinstance(qualified_address, QualifiedSurfaceAddress):
-            base_cache_key = _address_to_str(
-                qualified_address.provider_id, qualified_address.address
-            )
-        else:
-            base_cache_key = _diff_address_to_str(
-                qualified_address.provider_id_a,
-                qualified_address.address_a,
-                qualified_address.provider_id_b,
-                qualified_address.address_b,
-            )
+        base_cache_key = _qualified_address_to_str(qualified_address)
 
         LOGGER.debug(
             f"Publishing surface (dim={surface.dimensions}, #cells={surface.ncol*surface.nrow}), "
@@ -100,44 +97,57 @@ class SurfaceImageServer:
         self,
         qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
     ) -> Optional[SurfaceImageMeta]:
-        if isinstance(qualified_address, QualifiedSurfaceAddress):
-            base_cache_key = _address_to_str(
-                qualified_address.provider_id, qualified_address.address
-            )
-        else:
-            base_cache_key = _diff_address_to_str(
-                qualified_address.provider_id_a,
-                qualified_address.address_a,
-                qualified_address.provider_id_b,
-                qualified_address.address_b,
-            )
+        base_cache_key = _qualified_address_to_str(qualified_address)
 
         meta_cache_key = "META:" + base_cache_key
-        meta = self._image_cache.get(meta_cache_key)
-        if not meta:
+        meta_bytes = self._blob_store.get(meta_cache_key)
+        if not meta_bytes:
             return None
 
-        if not isinstance(meta, SurfaceImageMeta):
-            LOGGER.error("Error loading SurfaceImageMeta from cache")
+        try:
+            return SurfaceImageMeta(**json.loads(meta_bytes))
+        except (ValueError, TypeError):
+            LOGGER.error("Error loading SurfaceImageMeta from blob store")
             return None
 
-        return meta
+    def blob_store_metrics(self) -> BlobStoreMetrics:
+        return self._blob_store.metrics()
+
+    def add_provider(self, provider: EnsembleSurfaceProvider) -> None:
+        """Make the provider's surfaces available through lazy URLs"""
+        self._lazy_resolver.add_provider(provider)
+
+    def get_or_create_surface_metadata(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> Optional[SurfaceImageMeta]:
+        """Returns metadata for the surface, computing and publishing the surface
+        first if needed. The surface's provider(s) must have been added."""
+        return self._lazy_resolver.get_or_create(
+            _qualified_address_to_str(qualified_address),
+            lambda: self.get_surface_metadata(qualified_address),
+            lambda: (
+                self.get_surface_metadata(qualified_address)
+                if self._compute_and_publish_surface(qualified_address)
+                else None
+            ),
+        )
+
+    @staticmethod
+    def encode_partial_lazy_url(
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> str:
+        """Returns URL that encodes the fully qualified address, so that the surface
+        can be computed when requested if it hasn't been published, or if it has been
+        evicted. The surface's provider(s) must have been added."""
+        encoded_address = encode_qualified_address(qualified_address)
+        return f"{_ROOT_URL_PATH}/lazy/{encoded_address}"
 
     @staticmethod
     def encode_partial_url(
         qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
     ) -> str:
-        if isinstance(qualified_address, QualifiedSurfaceAddress):
-            address_str = _address_to_str(
-                qualified_address.provider_id, qualified_address.address
-            )
-        else:
-            address_str = _diff_address_to_str(
-                qualified_address.provider_id_a,
-                qualified_address.address_a,
-                qualified_address.provider_id_b,
-                qualified_address.address_b,
-            )
+        address_str = _qualified_address_to_str(qualified_address)
 
         url_path: str = f"{_ROOT_URL_PATH}/{quote(address_str)}"
         return url_path
@@ -155,7 +165,7 @@ class SurfaceImageServer:
             img_cache_key = "IMG:" + full_surf_address_str
             LOGGER.debug(f"Looking for image in cache (key={img_cache_key}")
 
-            cached_img_bytes: Any = self._image_cache.get(img_cache_key)
+            cached_img_bytes = self._blob_store.get(img_cache_key)
             if not cached_img_bytes:
                 LOGGER.error(
                     f"Error getting image for address: {full_surf_address_str}"
@@ -170,6 +180,54 @@ class SurfaceImageServer:
             )
             return response
 
+        @app.server.route(_ROOT_URL_PATH + "/lazy/<encoded_address>")
+        def _handle_lazy_surface_image_request(encoded_address: str) -> flask.Response:
+            timer = PerfTimer()
+
+            try:
+                qualified_address = decode_qualified_address(encoded_address)
+            except ValueError:
+                LOGGER.error(f"Error decoding surface address: {encoded_address}")
+                flask.abort(400)
+
+            base_cache_key = _qualified_address_to_str(qualified_address)
+            img_cache_key = "IMG:" + base_cache_key
+            img_bytes = self._lazy_resolver.get_or_create(
+                base_cache_key,
+                lambda: self._blob_store.get(img_cache_key),
+                lambda: (
+                    self._blob_store.get(img_cache_key)
+                    if self._compute_and_publish_surface(qualified_address)
+                    else None
+                ),
+            )
+            if not img_bytes:
+                flask.abort(404)
+
+            response = flask.send_file(io.BytesIO(img_bytes), mimetype="image/png")
+            LOGGER.debug(f"Lazy request handled in: {timer.elapsed_s():.2f}s")
+            return response
+
+    def _compute_and_publish_surface(
+        self,
+        qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+    ) -> bool:
+        timer = PerfTimer()
+
+        surface = self._lazy_resolver.compute_surface(qualified_address)
+        if surface is None:
+            LOGGER.error(f"Error computing surface for address: {qualified_address}")
+            return False
+        et_compute_s = timer.lap_s()
+
+        self.publish_surface(qualified_address, surface)
+
+        LOGGER.debug(
+            f"Computed and published surface on request in: {timer.elapsed_s():.2f}s "
+            f"(compute={et_compute_s:.2f}s)"
+        )
+        return True
+
     def _create_and_store_image_in_cache(
         self,
         base_cache_key: str,
@@ -177,14 +235,14 @@ class SurfaceImageServer:
     ) -> None:
         timer = PerfTimer()
         LOGGER.debug("Converting surface to PNG image...")
-        png_bytes: bytes = surface_to_png_bytes_optimized(surface)
+        png_bytes: bytes = surface_to_image_bytes(surface)
         LOGGER.debug(f"Got PNG image, size={(len(png_bytes) / (1024 * 1024)):.2f}MB")
         et_to_image_s = timer.lap_s()
 
         img_cache_key = "IMG:" + base_cache_key
         meta_cache_key = "META:" + base_cache_key
 
-        self._image_cache.add(img_cache_key, png_bytes)
+        self._blob_store.put(img_cache_key, png_bytes)
 
         # For debugging rotations
         # unrot_surf = surface.copy()
@@ -198,12 +256,12 @@ class SurfaceImageServer:
             x_max=surface.xmax,
             y_min=surface.ymin,
             y_max=surface.ymax,
-            val_min=surface.values.min(),
-            val_max=surface.values.max(),
+            val_min=float(surface.values.min()),
+            val_max=float(surface.values.max()),
             deckgl_bounds=deckgl_bounds,
             deckgl_rot_deg=deckgl_rot,
         )
-        self._image_cache.add(meta_cache_key, meta)
+        self._blob_store.put(meta_cache_key, json.dumps(asdict(meta)).encode())
         et_write_cache_s = timer.lap_s()
 
         LOGGER.debug(
@@ -231,6 +289,20 @@ def _address_to_str(
     return f"{provider_id}___{addr_type_str}___{address.name}___{address.attribute}___{addr_hash}"
 
 
+def _qualified_address_to_str(
+    qualified_address: Union[QualifiedSurfaceAddress, QualifiedDiffSurfaceAddress],
+) -> str:
+    if isinstance(qualified_address, QualifiedSurfaceAddress):
+        return _address_to_str(qualified_address.provider_id, qualified_address.address)
+
+    return _diff_address_to_str(
+        qualified_address.provider_id_a,
+        qualified_address.address_a,
+        qualified_address.provider_id_b,
+        qualified_address.address_b,
+    )
+
+
 def _diff_address_to_str(
     provider_id_a: str,
     address_a: SurfaceAddress,
@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where we fall back to only locking within the process
+    fcntl = None  # type: ignore
+
+LOGGER = logging.getLogger(__name__)
+
+REL_LOCK_DIR = "locks"
+
+# Keys are spread over a fixed number of locks, so that neither the lock files nor
+# the in-process locks grow with the number of keys
+_NUM_LOCK_STRIPES = 64
+
+# Number of writes after which the directory is rescanned, to pick up the writes
+# and evictions done by other processes
+_WRITES_BETWEEN_SCANS = 64
+
+
+@dataclass(frozen=True)
+class EvictionSummary:
+    num_evicted: int = 0
+    size_bytes: int = 0
+    # Modification time of the most recently used file that was evicted
+    newest_evicted_mtime: Optional[float] = None
+
+
+class DiskLruDir:
+    """Directory of files that can be shared between processes, where the total size
+    of the files with the given extension is kept within `max_size_bytes` by
+    evicting the least recently used files. The files' modification times are used
+    to track access, so use `touch()` when reading a file.
+
+    Files are written atomically via a temporary file, so readers never see
+    partially written files. The total size is tracked as files are written and the
+    directory is only rescanned periodically, or when the tracked size exceeds the
+    budget.
+    """
+
+    def __init__(self, root_dir: Path, file_extension: str, max_size_bytes: int):
+        self.root_dir = root_dir
+        self._file_extension = file_extension
+        self._max_size_bytes = max_size_bytes
+        self._size_lock = threading.Lock()
+        self._writes_since_scan = 0
+        self._stripe_locks = [threading.Lock() for _ in range(_NUM_LOCK_STRIPES)]
+
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self._approx_size_bytes = sum(size for _mtime, size, _path in self._scan())
+
+    def path_for(self, file_stem: str) -> Path:
+        return self.root_dir / (file_stem + self._file_extension)
+
+    def write_atomically(
+        self, path: Path, write_func: Callable[[BinaryIO], None]
+    ) -> bool:
+        """Write the file using `write_func()` and track its size. Returns False if
+        the file couldn't be written, which is logged as a warning."""
+        try:
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+
+        try:
+            write_file_atomically(path, write_func)
+            new_size = path.stat().st_size
+        except OSError as exc:
+            LOGGER.warning(f"Failed to write file to {self.root_dir}: {exc}")
+            return False
+
+        with self._size_lock:
+            self._approx_size_bytes += new_size - old_size
+        return True
+
+    def evict_if_needed(self) -> EvictionSummary:
+        """Evict the least recently used files if the directory exceeds its budget.
+        Returns a summary of the evicted files."""
+        with self._size_lock:
+            self._writes_since_scan += 1
+            if (
+                self._approx_size_bytes <= self._max_size_bytes
+                and self._writes_since_scan < _WRITES_BETWEEN_SCANS
+            ):
+                return EvictionSummary()
+
+            self._writes_since_scan = 0
+            entries = self._scan()
+            total_size = sum(size for _mtime, size, _path in entries)
+
+            num_evicted = 0
+            evicted_size = 0
+            newest_evicted_mtime: Optional[float] = None
+            for mtime, size, path in sorted(entries):
+                if total_size <= self._max_size_bytes:
+                    break
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    # On Windows, files that are memory mapped can't be removed
+                    continue
+                total_size -= size
+                evicted_size += size
+                num_evicted += 1
+                newest_evicted_mtime = mtime
+
+            self._approx_size_bytes = total_size
+
+        if num_evicted > 0:
+            LOGGER.debug(
+                f"Evicted {num_evicted} files from {self.root_dir}, "
+                f"size is now {total_size / (1024*1024):.2f}MB"
+            )
+
+        return EvictionSummary(num_evicted, evicted_size, newest_evicted_mtime)
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[None]:
+        """Lock that serializes work on the key between threads and, where file
+        locks are supported, between processes. Note that unrelated keys may share
+        a lock."""
+        stripe = int(hashlib.md5(key.encode()).hexdigest()[:8], 16)  # nosec
+        stripe %= _NUM_LOCK_STRIPES
+
+        with self._stripe_locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+
+            lock_dir = self.root_dir / REL_LOCK_DIR
+            lock_dir.mkdir(exist_ok=True)
+            lock_path = lock_dir / f"{stripe}.lock"
+            lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(lock_fd)
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        entries: List[Tuple[float, int, Path]] = []
+        for path in self.root_dir.glob(f"*{self._file_extension}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+
+def touch(path: Path) -> None:
+    """Mark the file as recently used"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_file_atomically(path: Path, write_func: Callable[[BinaryIO], None]) -> None:
+    """Go via a temporary file which isn't renamed until writing is finished, so that
+    readers never see a partially written file"""
+    tmp_path = path.with_name(path.name + f"__{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            write_func(f)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def source_files_version(paths: List[str]) -> str:
+    """Version string that changes whenever any of the files are modified, for
+    keying cached data derived from the files. Missing files are ignored."""
+    hasher = hashlib.md5()  # nosec
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        hasher.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return hasher.hexdigest()
@@ -504,8 +504,6 @@ class CO2Migration(WebvizPluginABC):
             current_views: List[Any],
             thresholds: List[float],
         ) -> Tuple[List[Dict[Any, Any]], Optional[List[Any]], Dict[Any, Any]]:
-            # Unable to clear cache (when needed) without the protected member
-            # pylint: disable=protected-access
             current_thresholds = dict(zip(self._threshold_ids, thresholds))
             assert visualization_update >= 0  # Need the input to trigger callback
             assert mass_unit_update >= 0  # These are just to silence pylint
@@ -514,7 +512,6 @@ class CO2Migration(WebvizPluginABC):
                 current_thresholds,
                 mass_unit,
                 self._visualization_info,
-                self._surface_server._array_cache,
             )
             if self._visualization_info["change"]:
                 return [], None, no_update
@@ -8,7 +8,6 @@ import numpy as np
 import plotly.graph_objects as go
 import webviz_subsurface_components as wsc
 from dash import dcc, html, no_update
-from flask_caching import Cache
 
 from webviz_subsurface._providers import (
     EnsembleSurfaceProvider,
@@ -643,10 +642,10 @@ def process_visualization_info(
     thresholds: dict,
     unit: str,
     stored_info: Dict[str, Any],
-    cache: Cache,
 ) -> Dict[str, Any]:
     """
-    Clear surface cache if the threshold for visualization or mass unit is changed
+    Flag a change if the threshold for visualization or mass unit is changed. The
+    published surfaces are keyed on these, so they don't need to be cleared.
     """
     stored_info["attribute"] = attribute
     stored_info["change"] = False
@@ -661,8 +660,6 @@ def process_visualization_info(
             if stored_info["thresholds"][att] != thresholds[att]:
                 stored_info["change"] = True
                 stored_info["thresholds"][att] = thresholds[att]
-    if stored_info["change"]:
-        cache.clear()
     return stored_info
 
 
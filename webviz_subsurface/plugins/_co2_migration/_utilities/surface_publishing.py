@@ -1,3 +1,4 @@
+import hashlib
 import warnings
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple, Union
@@ -72,7 +73,13 @@ def publish_and_get_surface_metadata(
             address,
         )
         return meta, partial_url, None
-    provider_id: str = provider.provider_id()
+    map_type = MapType[address_map_attribute.name].value
+    # The published values depend on the mass unit and threshold, which are
+    # therefore part of the address. Surfaces published with other settings, also
+    # by other processes sharing the surface server's store, are then never served.
+    provider_id = _provider_id_with_visualization_settings(
+        provider.provider_id(), map_type, visualization_info
+    )
     qualified_address = QualifiedSurfaceAddress(provider_id, address)
     surf_meta = server.get_surface_metadata(qualified_address)
     summed_mass = None
@@ -86,11 +93,11 @@ def publish_and_get_surface_metadata(
             warnings.warn(f"Could not find surface file with properties: {address}")
             return None, None, None
 
-        if MapType[address_map_attribute.name].value == "MASS":
+        if map_type == "MASS":
             surface.values = surface.values / SCALE_DICT[visualization_info["unit"]]
             summed_mass = np.ma.sum(surface.values)
         if (
-            MapType[address_map_attribute.name].value not in ["PLUME", "MIGRATION_TIME"]
+            map_type not in ["PLUME", "MIGRATION_TIME"]
             and visualization_info["thresholds"][visualization_info["attribute"]] >= 0
         ):
             surface.operation(
@@ -102,6 +109,22 @@ def publish_and_get_surface_metadata(
     return surf_meta, server.encode_partial_url(qualified_address), summed_mass
 
 
+def _provider_id_with_visualization_settings(
+    provider_id: str, map_type: str, visualization_info: Dict[str, Any]
+) -> str:
+    settings: List[str] = []
+    if map_type == "MASS":
+        settings.append(f"unit={visualization_info['unit']}")
+    if map_type not in ["PLUME", "MIGRATION_TIME"]:
+        threshold = visualization_info["thresholds"][visualization_info["attribute"]]
+        settings.append(f"threshold={threshold}")
+    if not settings:
+        return provider_id
+
+    settings_hash = hashlib.md5(",".join(settings).encode()).hexdigest()  # nosec
+    return f"{provider_id}__{settings_hash}"
+
+
 def _publish_and_get_truncated_surface_metadata(
     server: SurfaceArrayServer,
     provider: EnsembleSurfaceProvider,
@@ -11,6 +11,7 @@ from webviz_config.webviz_plugin_subclasses import ViewABC
 from webviz_subsurface._providers.ensemble_grid_provider import (
     CellFilter,
     EnsembleGridProvider,
+    GridPropertyStatistic,
     GridVizService,
     PropertySpec,
 )
@@ -93,6 +94,10 @@ class View3D(ViewABC):
                 self._data_settings_id(DataSettings.Ids.REALIZATIONS),
                 "value",
             ),
+            Input(
+                self._data_settings_id(DataSettings.Ids.STATISTIC),
+                "value",
+            ),
             Input(self.get_store_unique_id(ElementIds.IJK_CROP_STORE), "data"),
             Input(self._color_scale_id(ColorScale.Ids.COLORRANGEMANUAL), "value"),
             Input(self._color_scale_id(ColorScale.Ids.COLORMIN), "value"),
@@ -119,6 +124,7 @@ class View3D(ViewABC):
             prop: List[str],
             date: List[str],
             realizations: List[int],
+            statistic: Optional[str],
             grid_range: List[List[int]],
             should_use_manual: List[str],
             manual_min: Optional[float],
@@ -128,10 +134,15 @@ class View3D(ViewABC):
             layers: List[Dict],
             bounds: Optional[List[float]],
         ) -> Tuple[List[Dict], Optional[List]]:
+            prop_statistic = GridPropertyStatistic(statistic) if statistic else None
             if PROPERTYTYPE(proptype) == PROPERTYTYPE.STATIC:
-                property_spec = PropertySpec(prop_name=prop[0], prop_date=None)
+                property_spec = PropertySpec(
+                    prop_name=prop[0], prop_date=None, statistic=prop_statistic
+                )
             else:
-                property_spec = PropertySpec(prop_name=prop[0], prop_date=date[0])
+                property_spec = PropertySpec(
+                    prop_name=prop[0], prop_date=date[0], statistic=prop_statistic
+                )
 
             realization = realizations[0]
 
@@ -236,6 +247,10 @@ class View3D(ViewABC):
                 self._data_settings_id(DataSettings.Ids.REALIZATIONS),
                 "value",
             ),
+            Input(
+                self._data_settings_id(DataSettings.Ids.STATISTIC),
+                "value",
+            ),
             Input(
                 self._view_id(VTKView3D.Ids.VIEW),
                 "layers",
@@ -250,21 +265,28 @@ class View3D(ViewABC):
                 "value",
             ),
         )
+        # pylint: disable=too-many-locals
         def update_infobox(
             properties: List[str],
             dates: List[str],
             realizations: List[int],
+            statistic: Optional[str],
             layers: List[dict],
             grid_range: List[List[int]],
             colormap: str,
             proptype: str,
         ) -> Tuple[List, List]:
             """Updates the information box with information on the visualized data."""
+            prop_statistic = GridPropertyStatistic(statistic) if statistic else None
             if PROPERTYTYPE(proptype) == PROPERTYTYPE.STATIC:
-                property_spec = PropertySpec(prop_name=properties[0], prop_date=None)
+                property_spec = PropertySpec(
+                    prop_name=properties[0], prop_date=None, statistic=prop_statistic
+                )
             else:
                 property_spec = PropertySpec(
-                    prop_name=properties[0], prop_date=dates[0]
+                    prop_name=properties[0],
+                    prop_date=dates[0],
+                    statistic=prop_statistic,
                 )
 
             realization = realizations[0]
@@ -315,7 +337,11 @@ class View3D(ViewABC):
                 html.Div(
                     [html.B("Date: "), html.Label(dates[0] if dates else "No date")]
                 ),
-                html.Div([html.B("Realization: "), html.Label(realization)]),
+                html.Div(
+                    [html.B("Statistic: "), html.Label(statistic)]
+                    if statistic
+                    else [html.B("Realization: "), html.Label(realization)]
+                ),
                 html.Div(
                     [
                         html.B("Color range: "),
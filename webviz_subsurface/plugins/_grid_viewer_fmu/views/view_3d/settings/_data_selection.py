@@ -1,12 +1,15 @@
 from typing import Dict, List, Optional, Tuple
 
 import webviz_core_components as wcc
-from dash import Input, Output, State, callback, no_update
+from dash import Input, Output, State, callback, html, no_update
 from dash.development.base_component import Component
 from webviz_config.utils import StrEnum
 from webviz_config.webviz_plugin_subclasses import SettingsGroupABC
 
-from webviz_subsurface._providers.ensemble_grid_provider import EnsembleGridProvider
+from webviz_subsurface._providers.ensemble_grid_provider import (
+    EnsembleGridProvider,
+    GridPropertyStatistic,
+)
 from webviz_subsurface.plugins._grid_viewer_fmu._types import PROPERTYTYPE
 
 
@@ -18,6 +21,7 @@ class DataSettings(SettingsGroupABC):
     class Ids(StrEnum):
         ID = "data-selectors"
         REALIZATIONS = "realizations"
+        STATISTIC = "statistic"
         STATIC_DYNAMIC = "static-dynamic"
         PROPERTIES = "properties"
         DATES = "dates"
@@ -29,6 +33,14 @@ class DataSettings(SettingsGroupABC):
         self.static_dynamic_options = []
         self.static_dynamic_value = None
 
+        # The statistics are calculated across the realizations that share grid
+        # geometry, which is established using geometry fingerprints. These are only
+        # computed when building portable apps.
+        self.statistics_available = all(
+            grid_provider.get_geometry_fingerprint(real) is not None
+            for real in grid_provider.realizations()
+        )
+
         if grid_provider.static_property_names():
             self.static_dynamic_options.append(
                 {"label": PROPERTYTYPE.STATIC, "value": PROPERTYTYPE.STATIC}
@@ -51,6 +63,21 @@ class DataSettings(SettingsGroupABC):
                 options=list_to_options(self.grid_provider.realizations()),
                 value=[self.grid_provider.realizations()[0]],
             ),
+            # Kept hidden in the layout when unavailable, since the view's callbacks
+            # take the statistic as input
+            html.Div(
+                style={} if self.statistics_available else {"display": "none"},
+                children=wcc.Dropdown(
+                    label="Ensemble statistic",
+                    id=self.register_component_unique_id(DataSettings.Ids.STATISTIC),
+                    options=list_to_options(
+                        [stat.value for stat in GridPropertyStatistic]
+                    ),
+                    value=None,
+                    clearable=True,
+                    placeholder="None (show selected realization)",
+                ),
+            ),
             wcc.RadioItems(
                 label="Grid property",
                 vertical=False,
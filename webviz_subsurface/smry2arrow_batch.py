@@ -7,10 +7,14 @@ import glob
 import logging
 import os
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
+import numpy as np
+import pyarrow as pa
 import res2df
+from resdata.summary import Summary, SummaryKeyWordVector
 
 logger = logging.getLogger(__name__)
 
@@ -42,17 +46,38 @@ def _get_parser() -> argparse.ArgumentParser:
         help='Eclipse base name, note that "" is required around paths with wildcards',
         default=Path("eclipse/model/*.UNSMRY"),
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of realizations to convert in parallel using a pool of processes",
+        default=1,
+    )
+    parser.add_argument(
+        "--skip-up-to-date",
+        action="store_true",
+        help="Skip conversion if the .arrow file is newer than the UNSMRY/SMSPEC files",
+    )
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help="Read the UNSMRY/SMSPEC files directly with resdata instead of going "
+        "through res2df and pandas, which is faster and uses less memory",
+    )
     return parser
 
 
+def _strip_smry_extension(smry_filename: str) -> str:
+    return (
+        smry_filename.replace(".DATA", "").replace(".UNSMRY", "").replace(".SMSPEC", "")
+    )
+
+
 def _convert_single_smry_file(smry_filename: str, arrow_filename: str) -> None:
     """Read summary data for single realization from disk and write it out to .arrow
     file using res2df.
     """
 
-    eclbase = (
-        smry_filename.replace(".DATA", "").replace(".UNSMRY", "").replace(".SMSPEC", "")
-    )
+    eclbase = _strip_smry_extension(smry_filename)
 
     eclfiles = res2df.resdatafiles.ResdataFiles(eclbase)
     sum_df = res2df.summary.df(eclfiles)
@@ -64,10 +89,71 @@ def _convert_single_smry_file(smry_filename: str, arrow_filename: str) -> None:
     res2df.summary.write_dframe_stdout_file(sum_table, arrow_filename)
 
 
-def _batch_convert_smry2arrow(
+def _convert_single_smry_file_direct(smry_filename: str, arrow_filename: str) -> None:
+    """Read summary data for single realization from disk and write it out to .arrow
+    file, going directly from the summary vectors to the arrow table without creating
+    a pandas DataFrame in between.
+
+    The resulting file is identical to the one written by _convert_single_smry_file().
+    The exception is summary files with duplicate timestamps, which res2df knows how
+    to separate, so these are handed over to _convert_single_smry_file().
+    """
+
+    eclbase = _strip_smry_extension(smry_filename)
+    summary = Summary(eclbase + ".UNSMRY", include_restart=False)
+
+    dates_np = summary.numpy_dates.astype("datetime64[ms]")
+    if not np.all(np.diff(dates_np) > np.timedelta64(0)):
+        logger.info(f"Non-increasing dates, converting using res2df: {smry_filename}")
+        _convert_single_smry_file(smry_filename, arrow_filename)
+        return
+
+    # Metadata values must be written as strings, see res2df.summary._df2pyarrow()
+    smry_meta = res2df.summary.smry_meta(summary)
+    field_list = [pa.field("DATE", pa.timestamp("ms"))]
+    column_arrays = [dates_np]
+    added_keys = set()
+    for key in SummaryKeyWordVector(summary, add_keywords=True):
+        # Repeated vectors in the SUMMARY section give duplicate keys, keep the first
+        if key in added_keys:
+            continue
+        added_keys.add(key)
+        field_metadata = {
+            bytes(meta_key, encoding="ascii"): bytes(str(value), encoding="ascii")
+            for meta_key, value in smry_meta.get(key, {}).items()
+        }
+        field_list.append(pa.field(key, pa.float32(), metadata=field_metadata))
+        column_arrays.append(summary.numpy_vector(key))
+
+    sum_table = pa.table(column_arrays, schema=pa.schema(field_list))
+
+    res2df.summary.write_dframe_stdout_file(sum_table, arrow_filename)
+
+
+def _is_arrow_file_up_to_date(smry_filename: str, arrow_filename: str) -> bool:
+    """Check if the arrow file exists and is newer than the summary files"""
+    if not os.path.isfile(arrow_filename):
+        return False
+
+    eclbase = _strip_smry_extension(smry_filename)
+    arrow_mtime = os.path.getmtime(arrow_filename)
+    for ext in [".UNSMRY", ".SMSPEC"]:
+        if (
+            os.path.isfile(eclbase + ext)
+            and os.path.getmtime(eclbase + ext) > arrow_mtime
+        ):
+            return False
+
+    return True
+
+
+def _find_smry_files_to_convert(
     ens_path: List[Path], ecl_base: Path, relative_output_dir: Path
-) -> None:
-    """Does batch conversion of UNSMRY files for all realizations within an ensemble."""
+) -> List[Tuple[str, str]]:
+    """Find the summary files of all the realizations, returning a list of
+    (smry_file, arrow_file) tuples. The output directories are created as needed."""
+
+    smry_and_arrow_files: List[Tuple[str, str]] = []
 
     for wildcarded_path in ens_path:
         globbed_real_dirs = sorted(glob.glob(str(wildcarded_path)))
@@ -82,10 +168,56 @@ def _batch_convert_smry2arrow(
                 for smry_file in globbed_smry_files:
                     basename_without_ext = Path(Path(smry_file).name).stem
                     arrow_file = real_output_dir / (basename_without_ext + ".arrow")
+                    smry_and_arrow_files.append((smry_file, str(arrow_file)))
 
-                    logger.info(f"input(smry):   {smry_file}")
-                    logger.info(f"output(arrow): {arrow_file}")
-                    _convert_single_smry_file(smry_file, str(arrow_file))
+    return smry_and_arrow_files
+
+
+def _batch_convert_smry2arrow(
+    ens_path: List[Path],
+    ecl_base: Path,
+    relative_output_dir: Path,
+    jobs: int = 1,
+    skip_up_to_date: bool = False,
+    direct: bool = False,
+) -> None:
+    """Does batch conversion of UNSMRY files for all realizations within an ensemble.
+    With `jobs` larger than 1, the realizations will be converted in parallel using
+    a pool of processes. With `direct`, the summary files are converted without going
+    through res2df and pandas.
+    """
+
+    convert_func = (
+        _convert_single_smry_file_direct if direct else _convert_single_smry_file
+    )
+
+    smry_and_arrow_files = _find_smry_files_to_convert(
+        ens_path, ecl_base, relative_output_dir
+    )
+
+    files_to_convert: List[Tuple[str, str]] = []
+    for smry_file, arrow_file in smry_and_arrow_files:
+        if skip_up_to_date and _is_arrow_file_up_to_date(smry_file, arrow_file):
+            logger.info(f"skipping up to date: {arrow_file}")
+            continue
+        files_to_convert.append((smry_file, arrow_file))
+
+    if jobs <= 1:
+        for smry_file, arrow_file in files_to_convert:
+            logger.info(f"input(smry):   {smry_file}")
+            logger.info(f"output(arrow): {arrow_file}")
+            convert_func(smry_file, arrow_file)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(convert_func, smry_file, arrow_file)
+            for smry_file, arrow_file in files_to_convert
+        ]
+        for (smry_file, arrow_file), future in zip(files_to_convert, futures):
+            future.result()
+            logger.info(f"input(smry):   {smry_file}")
+            logger.info(f"output(arrow): {arrow_file}")
 
 
 def main() -> None:
@@ -118,8 +250,17 @@ def main() -> None:
 
     logger.info(f"enspath: {enspath}")
     logger.info(f"eclbase: {eclbase}")
-
-    _batch_convert_smry2arrow(enspath, Path(eclbase), relative_output_dir)
+    logger.info(f"jobs: {args.jobs}")
+    logger.info(f"direct: {args.direct}")
+
+    _batch_convert_smry2arrow(
+        enspath,
+        Path(eclbase),
+        relative_output_dir,
+        jobs=args.jobs,
+        skip_up_to_date=args.skip_up_to_date,
+        direct=args.direct,
+    )
 
     logger.info("done")
 